@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark del detector de contradicciones (legacy vs precompilado)
+===================================================================
+
+Compara el costo POR CHUNK de:
+- LEGACY: detect_contradiction anterior. Reconstruye los diccionarios y
+          recorre keyword × patrón de negación (re.search formateado) en
+          cada llamada
+- NUEVO:  contradiction_detector. analyze_answer una vez por respuesta
+          (patrones precompilados como alternación de keywords) y
+          find_contradictions por chunk
+
+Corpus: materiales de data/materials/*.txt partidos en chunks de ~1000
+caracteres, contra un conjunto de respuestas con y sin negaciones.
+
+También verifica que ambos encuentran EXACTAMENTE las mismas
+contradicciones en cada par (respuesta, chunk).
+
+USO:
+    python benchmark_contradiction.py [--repeat 5] [--files ruta1.txt ruta2.txt]
+
+Autor: Abel Jesús Moya Acosta
+Fecha: 17 de noviembre de 2025
+"""
+
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from contradiction_detector import (CRITICAL_KEYWORDS, NEGATION_PATTERNS, QUESTION_TOPICS,
+                                    analyze_answer, find_contradictions)
+
+DEFAULT_MATERIALS_DIR = BACKEND_DIR.parent / "data" / "materials"
+CHUNK_SIZE = 1000
+
+QUESTION = "¿Qué ayuda económica recibía Henriette y quién se la enviaba por correo?"
+ANSWERS = [
+    "La condesa nunca le mandó dinero a Henriette",
+    "Henriette recibía cada año una suma de 500 francos por correo de su madre",
+    "No hubo ninguna carta, pero tampoco llegó el paquete que esperaba",
+    "El conde decidió ayudarla porque sabía que estaba enferma y sin dinero",
+    "Un puntero almacena la dirección de memoria de otra variable",
+]
+
+
+def find_contradictions_legacy(user_answer: str, chunk_text: str, question: str = "") -> list:
+    """Copia del bucle del detect_contradiction anterior (referencia para el benchmark)"""
+    answer_lower = user_answer.lower()
+    chunk_lower = chunk_text.lower()
+    # El original reconstruía ambos diccionarios en cada llamada
+    critical_keywords = {category: list(keywords) for category, keywords in CRITICAL_KEYWORDS.items()}
+    negation_patterns = list(NEGATION_PATTERNS)
+
+    contradictions_found = []
+
+    for category, keywords in critical_keywords.items():
+        for keyword in keywords:
+            if keyword in chunk_lower:
+                for pattern_template in negation_patterns:
+                    pattern = pattern_template.format(keyword=keyword)
+                    if re.search(pattern, answer_lower):
+                        contradictions_found.append({
+                            'category': category,
+                            'keyword': keyword,
+                            'pattern': pattern,
+                            'source': 'chunk'
+                        })
+
+    question_lower = question.lower() if question else ""
+    question_topics = {topic: list(keywords) for topic, keywords in QUESTION_TOPICS.items()}
+
+    for topic, topic_keywords in question_topics.items():
+        if any(tk in question_lower for tk in topic_keywords):
+            related_keywords = critical_keywords.get(topic, [])
+            if topic == 'economico':
+                related_keywords = related_keywords + critical_keywords.get('dinero', [])
+            if topic in ['evento', 'existencia']:
+                related_keywords = related_keywords + critical_keywords.get('existencia', [])
+
+            for keyword in related_keywords:
+                for pattern_template in negation_patterns:
+                    pattern = pattern_template.format(keyword=keyword)
+                    if re.search(pattern, answer_lower):
+                        if not any(c['keyword'] == keyword and c['source'] == 'question' for c in contradictions_found):
+                            contradictions_found.append({
+                                'category': topic,
+                                'keyword': keyword,
+                                'pattern': pattern,
+                                'source': 'question'
+                            })
+
+    chunk_numbers = set(re.findall(r'\b\d+\b', chunk_lower))
+    answer_numbers = set(re.findall(r'\b\d+\b', answer_lower))
+
+    significant_chunk_nums = {n for n in chunk_numbers if int(n) > 10}
+    significant_answer_nums = {n for n in answer_numbers if int(n) > 10}
+
+    if significant_chunk_nums and significant_answer_nums:
+        mismatched = significant_answer_nums - significant_chunk_nums
+        if mismatched and len(mismatched) > 0:
+            contradictions_found.append({
+                'category': 'numerico',
+                'keyword': f"números: {list(mismatched)[:2]}",
+                'pattern': 'numeric_mismatch',
+                'source': 'numeric'
+            })
+
+    return contradictions_found
+
+
+def split_chunks(text: str, size: int = CHUNK_SIZE):
+    return [text[i:i + size] for i in range(0, len(text), size) if text[i:i + size].strip()]
+
+
+def measure(fn, repeat: int) -> float:
+    """Mejor tiempo (segundos) de `repeat` corridas de fn"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark del detector de contradicciones')
+    parser.add_argument('--repeat', type=int, default=5, help='Corridas por variante (se toma la mejor)')
+    parser.add_argument('--files', nargs='*', help='Archivos .txt a usar (default: data/materials/*.txt)')
+    args = parser.parse_args()
+
+    files = [Path(f) for f in args.files] if args.files else sorted(DEFAULT_MATERIALS_DIR.glob('*.txt'))
+    if not files:
+        print(f"❌ No hay materiales .txt en {DEFAULT_MATERIALS_DIR}")
+        sys.exit(1)
+
+    chunks = split_chunks('\n\n'.join(f.read_text(encoding='utf-8') for f in files))
+    pairs = len(ANSWERS) * len(chunks)
+
+    print("=" * 70)
+    print("⏱️  BENCHMARK DETECTOR DE CONTRADICCIONES")
+    print("=" * 70)
+    print(f"📂 Archivos: {', '.join(f.name for f in files)}")
+    print(f"📝 {len(chunks)} chunks × {len(ANSWERS)} respuestas = {pairs} pares")
+
+    mismatches = sum(
+        1 for answer in ANSWERS for chunk in chunks
+        if find_contradictions(analyze_answer(answer, QUESTION), chunk)
+        != find_contradictions_legacy(answer, chunk, QUESTION)
+    )
+
+    def run_legacy():
+        for answer in ANSWERS:
+            for chunk in chunks:
+                find_contradictions_legacy(answer, chunk, QUESTION)
+
+    def run_new():
+        # Como en una validación: un análisis por respuesta, reutilizado en cada chunk
+        for answer in ANSWERS:
+            analysis = analyze_answer(answer, QUESTION)
+            for chunk in chunks:
+                find_contradictions(analysis, chunk)
+
+    def run_analysis():
+        for answer in ANSWERS:
+            analyze_answer(answer, QUESTION)
+
+    legacy = measure(run_legacy, args.repeat) / pairs * 1e6
+    new = measure(run_new, args.repeat) / pairs * 1e6
+    analysis = measure(run_analysis, args.repeat) / len(ANSWERS) * 1e6
+
+    print(f"\n   Legacy:        {legacy:10.1f} µs/chunk")
+    print(f"   Precompilado:  {new:10.1f} µs/chunk  (x{legacy / max(new, 1e-9):.0f})")
+    print(f"   analyze_answer (una vez por respuesta): {analysis:.1f} µs")
+    print(f"   Mismas contradicciones que el legacy: {'✅ SÍ' if mismatches == 0 else f'❌ NO ({mismatches} pares)'}")
+    print("\n" + "=" * 70)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark de memoria de la ingesta (pipeline por etapas vs streaming)
+=====================================================================
+
+Mide el pico de memoria (tracemalloc: objetos de Python y buffers de numpy)
+de chunking + keywords + embeddings + filas para Supabase de un documento
+sintético de N páginas:
+- ETAPAS:    texto completo → adaptive_chunking → keywords → matriz de
+             embeddings → filas por bloques de 100 (process_ingestion_job)
+- STREAMING: páginas → iter_chunk_batches → embeddings y filas por batch
+             (stream_ingestion_job; conserva chunks, keywords y la matriz
+             para el checkpoint final, igual que en main.py)
+
+El modelo se reemplaza por un encoder de hashing (384 dims, float32): el
+peso del SentenceTransformer es el mismo en ambos caminos y no se mide.
+
+También verifica que ambos caminos generan EXACTAMENTE los mismos chunks.
+
+USO:
+    python benchmark_ingestion.py [--pages 400 1000] [--batch-size 32]
+
+Autor: Abel Jesús Moya Acosta
+Fecha: 17 de noviembre de 2025
+"""
+
+import argparse
+import random
+import re
+import sys
+import time
+import tracemalloc
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from chunk_features import compute_chunk_features
+from chunking import TextStats, adaptive_chunking
+from ingestion_pipeline import iter_chunk_batches
+from lexical_index import LexicalIndex, extract_keywords
+from pdf_extraction import join_pages
+
+EMBEDDING_DIM = 384
+INSERT_BATCH = 100
+PAGE_CHARS = 2500
+
+WORDS = ("puntero memoria variable dirección función malloc free arreglo índice valor "
+         "estructura nodo lista pila cola condesa collar diamantes préstamo baile "
+         "ministerio deuda sacrificio apariencia verdad").split()
+
+
+def synthetic_pages(count: int, seed: int = 7):
+    """Páginas de ~PAGE_CHARS caracteres con oraciones y párrafos"""
+    rng = random.Random(seed)
+    for _ in range(count):
+        sentences, size = [], 0
+        while size < PAGE_CHARS:
+            sentence = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(8, 20))).capitalize() + '.'
+            sentences.append(sentence)
+            size += len(sentence) + 1
+            if rng.random() < 0.15:
+                sentences.append('\n\n')
+        yield ' '.join(sentences)
+
+
+def encode(chunks):
+    """Encoder de hashing (bolsa de palabras), misma forma que el modelo real"""
+    matrix = np.zeros((len(chunks), EMBEDDING_DIM), dtype=np.float32)
+    for row, chunk in enumerate(chunks):
+        for word in re.findall(r'\w+', chunk.lower()):
+            matrix[row, zlib.crc32(word.encode('utf-8')) % EMBEDDING_DIM] += 1.0
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-10)
+
+
+def rows_for(chunks, matrix, keywords):
+    """Filas de material_embeddings (mismos campos que main.embedding_rows)"""
+    return [
+        {"chunk_text": chunk, "embedding": embedding.tolist(), "keywords": chunk_keywords,
+         "features": compute_chunk_features(chunk)}
+        for chunk, embedding, chunk_keywords in zip(chunks, matrix, keywords)
+    ]
+
+
+def staged(pages: int, batch_size: int):
+    text, _ = join_pages(list(synthetic_pages(pages)))
+    chunks = adaptive_chunking(text, pages)
+    keywords = LexicalIndex.from_texts(chunks).chunk_keywords
+    matrix = np.concatenate([encode(chunks[i:i + batch_size]) for i in range(0, len(chunks), batch_size)])
+    for start in range(0, len(chunks), INSERT_BATCH):
+        end = start + INSERT_BATCH
+        rows_for(chunks[start:end], matrix[start:end], keywords[start:end])
+    return chunks
+
+
+def streaming(pages: int, batch_size: int):
+    chunks, keywords, blocks, pending = [], [], [], []
+    for batch in iter_chunk_batches(synthetic_pages(pages), pages, batch_size, TextStats()):
+        batch_matrix = encode(batch)
+        batch_keywords = [extract_keywords(chunk) for chunk in batch]
+        chunks.extend(batch)
+        keywords.extend(batch_keywords)
+        blocks.append(batch_matrix)
+        pending.extend(rows_for(batch, batch_matrix, batch_keywords))
+        if len(pending) >= INSERT_BATCH:
+            pending = []
+    np.concatenate(blocks)
+    return chunks
+
+
+def measure(fn, pages: int, batch_size: int):
+    """(pico en MB, segundos, chunks) de una corrida"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    chunks = fn(pages, batch_size)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / (1024 * 1024), elapsed, chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de memoria de la ingesta')
+    parser.add_argument('--pages', type=int, nargs='*', default=[100, 400], help='Tamaños de documento (páginas)')
+    parser.add_argument('--batch-size', type=int, default=32, help='Chunks por batch de embeddings')
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("🧠 BENCHMARK DE MEMORIA: INGESTA POR ETAPAS vs STREAMING")
+    print("=" * 70)
+
+    for pages in args.pages:
+        staged_peak, staged_time, staged_chunks = measure(staged, pages, args.batch_size)
+        stream_peak, stream_time, stream_chunks = measure(streaming, pages, args.batch_size)
+
+        print(f"\n📄 {pages} páginas ({pages * PAGE_CHARS / (1024 * 1024):.1f} MB de texto), "
+              f"{len(staged_chunks)} chunks")
+        print(f"   Por etapas: pico {staged_peak:8.1f} MB  ({staged_time:.1f}s)")
+        print(f"   Streaming:  pico {stream_peak:8.1f} MB  ({stream_time:.1f}s)  "
+              f"(x{staged_peak / stream_peak:.2f} menos)")
+        print(f"   Mismos chunks: {'✅ SÍ' if staged_chunks == stream_chunks else '❌ NO'}")
+
+    print("\n" + "=" * 70)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark del normalizador de texto (legacy vs motor precompilado)
+===================================================================
+
+Compara el throughput (MB/s) de:
+- LEGACY: normalize_text original (~60 re.sub por llamada, bucles fijos)
+- NUEVO:  text_normalizer.normalize_text (patrones precompilados, bucles
+          de punto fijo con salida temprana)
+- NUEVO + FAST PATH: omite la reparación OCR en chunks sin errores
+
+Corpus: materiales de data/materials/*.txt (texto limpio) + una versión con
+errores OCR simulados (sílabas separadas, palabras cortadas), partidos en
+chunks de ~1000 caracteres como en el upload.
+
+También verifica que el motor nuevo (sin fast path) produce EXACTAMENTE la
+misma salida que el legacy.
+
+USO:
+    python benchmark_normalizer.py [--repeat 5] [--files ruta1.txt ruta2.txt]
+
+Autor: Abel Jesús Moya Acosta
+Fecha: 17 de noviembre de 2025
+"""
+
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from text_normalizer import normalize_text
+
+DEFAULT_MATERIALS_DIR = BACKEND_DIR.parent / "data" / "materials"
+CHUNK_SIZE = 1000
+
+
+def normalize_text_legacy(text: str) -> str:
+    """Copia literal del normalize_text anterior (referencia para el benchmark)"""
+    if not text or not isinstance(text, str):
+        return ""
+
+    text = re.sub(r'(\w{4,})\s+([a-záéíóúñ]{1,3})\b', r'\1\2', text, flags=re.IGNORECASE)
+    text = re.sub(r'\b([a-záéíóúñ]{3,6})\s+([a-záéíóúñ]{4,})', r'\1\2', text, flags=re.IGNORECASE)
+    text = re.sub(r'(\w{3,})\s+([a-záéíóúñ]{2,4})\b', r'\1\2', text, flags=re.IGNORECASE)
+    text = re.sub(r'\b([A-ZÁÉÍÓÚÑ])\s+([a-záéíóúñ]{3,})', r'\1\2', text)
+    text = re.sub(r'([¿¡])(\w+)\s+(\w{1,3})([?!])', r'\1\2\3\4', text)
+
+    text = re.sub(r'([a-záéíóúñ])([A-ZÁÉÍÓÚÑ])', r'\1 \2', text)
+
+    common_articles = ['el', 'la', 'los', 'las', 'un', 'una', 'unos', 'unas', 'al', 'del']
+    for art in common_articles:
+        text = re.sub(rf'\b({art})([a-záéíóúñ]{{3,}})', rf'\1 \2', text, flags=re.IGNORECASE)
+        text = re.sub(rf'([a-záéíóúñ]{{3,}})({art})\b', rf'\1 \2', text, flags=re.IGNORECASE)
+
+    common_preps = ['con', 'en', 'de', 'a', 'por', 'para', 'sin', 'sobre', 'entre', 'hasta', 'desde']
+    for prep in common_preps:
+        text = re.sub(rf'\b({prep})([a-záéíóúñ]{{3,}})', rf'\1 \2', text, flags=re.IGNORECASE)
+        text = re.sub(rf'([a-záéíóúñ]{{3,}})({prep})\b', rf'\1 \2', text, flags=re.IGNORECASE)
+
+    for _ in range(5):
+        text = re.sub(r'\b(\w{1,2})\s+(\w{1,2})\b', r'\1\2', text)
+
+    for _ in range(3):
+        text = re.sub(r'\b(\w{2,4})\s+(\w{3,6})\b', r'\1\2', text)
+
+    text = re.sub(r'(\w)-\s+(\w)', r'\1\2', text)
+    text = re.sub(r'\s{2,}', ' ', text)
+    text = re.sub(r'\s+([.,;:!?¿¡»)])', r'\1', text)
+    text = re.sub(r'([.,;:!?])([A-Za-zÁ-úÑñ¿¡])', r'\1 \2', text)
+    text = re.sub(r'([(\[{«"\'¿¡])\s+', r'\1', text)
+
+    return text.strip()
+
+
+def simulate_ocr_damage(text: str, seed: int = 42) -> str:
+    """Introduce errores OCR típicos: sílabas separadas y palabras cortadas"""
+    rng = random.Random(seed)
+    words = []
+    for word in text.split(' '):
+        if len(word) >= 6 and rng.random() < 0.3:
+            cut = rng.randint(2, len(word) - 2)
+            word = f"{word[:cut]} {word[cut:]}"
+        words.append(word)
+    return ' '.join(words)
+
+
+def split_chunks(text: str, size: int = CHUNK_SIZE):
+    return [text[i:i + size] for i in range(0, len(text), size) if text[i:i + size].strip()]
+
+
+def measure(fn, chunks, repeat: int) -> float:
+    """Retorna MB/s de fn sobre los chunks (mejor de `repeat` corridas)"""
+    total_bytes = sum(len(c.encode('utf-8')) for c in chunks)
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for chunk in chunks:
+            fn(chunk)
+        best = min(best, time.perf_counter() - start)
+    return (total_bytes / (1024 * 1024)) / best if best > 0 else float('inf')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark del normalizador de texto')
+    parser.add_argument('--repeat', type=int, default=5, help='Corridas por variante (se toma la mejor)')
+    parser.add_argument('--files', nargs='*', help='Archivos .txt a usar (default: data/materials/*.txt)')
+    args = parser.parse_args()
+
+    files = [Path(f) for f in args.files] if args.files else sorted(DEFAULT_MATERIALS_DIR.glob('*.txt'))
+    if not files:
+        print(f"❌ No hay materiales .txt en {DEFAULT_MATERIALS_DIR}")
+        sys.exit(1)
+
+    clean_text = '\n\n'.join(f.read_text(encoding='utf-8') for f in files)
+    corpora = {
+        'limpio': split_chunks(clean_text),
+        'con errores OCR': split_chunks(simulate_ocr_damage(clean_text)),
+    }
+
+    print("=" * 70)
+    print("⏱️  BENCHMARK NORMALIZADOR DE TEXTO")
+    print("=" * 70)
+    print(f"📂 Archivos: {', '.join(f.name for f in files)}")
+
+    for name, chunks in corpora.items():
+        total_kb = sum(len(c.encode('utf-8')) for c in chunks) / 1024
+
+        mismatches = sum(1 for c in chunks if normalize_text(c, fast_path=False) != normalize_text_legacy(c))
+
+        legacy = measure(normalize_text_legacy, chunks, args.repeat)
+        compiled = measure(lambda c: normalize_text(c, fast_path=False), chunks, args.repeat)
+        fast = measure(lambda c: normalize_text(c, fast_path=True), chunks, args.repeat)
+
+        print(f"\n📝 Corpus {name}: {len(chunks)} chunks, {total_kb:.1f} KB")
+        print(f"   Legacy:               {legacy:8.2f} MB/s")
+        print(f"   Precompilado:         {compiled:8.2f} MB/s  (x{compiled / legacy:.2f})")
+        print(f"   Precompilado + fast:  {fast:8.2f} MB/s  (x{fast / legacy:.2f})")
+        print(f"   Salida idéntica al legacy: {'✅ SÍ' if mismatches == 0 else f'❌ NO ({mismatches} chunks)'}")
+
+    print("\n" + "=" * 70)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark del OCR (legacy vs pipeline productor/consumidor)
+============================================================
+
+Compara el throughput (páginas/minuto) de:
+- LEGACY: extract_with_tesseract anterior. convert_from_bytes por página
+          (pdftoppm re-parsea el PDF completo cada vez), thread_count=1,
+          gc.collect() cada 10 páginas, todo en serie
+- NUEVO:  pdf_extraction.ocr_pages. Documento abierto una vez con PyMuPDF,
+          pixmaps en escala de grises por una cola acotada a N workers
+          Tesseract, DPI por página según PDF_OCR_MEMORY_MB
+
+Ambos usan el mismo DPI objetivo (ocr_dpi) para que la comparación sea justa.
+También reporta la similitud del texto (difflib) entre ambas salidas.
+
+Requiere tesseract, poppler-utils, pytesseract, pdf2image y PyMuPDF.
+
+USO:
+    python benchmark_ocr.py documento.pdf [--pages 20] [--workers 4]
+
+Autor: Abel Jesús Moya Acosta
+Fecha: 17 de noviembre de 2025
+"""
+
+import argparse
+import difflib
+import gc
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from pdf_extraction import PDF_OCR_WORKERS, count_pdf_pages, ocr_dpi, ocr_pages
+
+
+def ocr_legacy(pdf_content: bytes, page_numbers, dpi: int) -> dict:
+    """Copia del bucle del extract_with_tesseract anterior (referencia para el benchmark)"""
+    import pytesseract
+    from pdf2image import convert_from_bytes
+
+    results = {}
+    for page_num in page_numbers:
+        images = convert_from_bytes(
+            pdf_content,
+            dpi=dpi,
+            first_page=page_num,
+            last_page=page_num,
+            grayscale=True,
+            thread_count=1
+        )
+        if images:
+            results[page_num] = pytesseract.image_to_string(images[0], lang='spa+eng')
+            del images
+        if page_num % 10 == 0:
+            gc.collect()
+    return results
+
+
+def _run(label: str, fn) -> tuple:
+    started = time.perf_counter()
+    results = fn()
+    elapsed = time.perf_counter() - started
+    pages_per_minute = len(results) / max(elapsed, 1e-6) * 60
+    print(f"   {label:<8} {len(results):>4} págs  {elapsed:>8.1f} s  {pages_per_minute:>8.1f} págs/min")
+    return results, pages_per_minute
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark OCR legacy vs pipeline")
+    parser.add_argument("pdf", help="PDF a procesar")
+    parser.add_argument("--pages", type=int, default=20, help="Páginas a procesar desde la 1 (0 = todas)")
+    parser.add_argument("--workers", type=int, default=PDF_OCR_WORKERS, help="Workers Tesseract del pipeline")
+    args = parser.parse_args()
+
+    pdf_path = Path(args.pdf)
+    pdf_content = pdf_path.read_bytes()
+    total_pages = count_pdf_pages(str(pdf_path))
+    if total_pages <= 0:
+        sys.exit("❌ No se pudo contar las páginas del PDF")
+    last_page = min(total_pages, args.pages) if args.pages > 0 else total_pages
+    page_numbers = list(range(1, last_page + 1))
+    dpi = ocr_dpi(len(page_numbers))
+
+    print("=" * 70)
+    print(f"📄 {pdf_path.name}: {len(page_numbers)}/{total_pages} páginas, {dpi} DPI, "
+          f"{args.workers} workers")
+    print("=" * 70)
+
+    legacy, legacy_ppm = _run("LEGACY", lambda: ocr_legacy(pdf_content, page_numbers, dpi))
+    new, new_ppm = _run("NUEVO", lambda: ocr_pages(pdf_content, page_numbers, workers=args.workers, dpi=dpi))
+
+    common = sorted(set(legacy) & set(new))
+    similarity = (
+        sum(difflib.SequenceMatcher(None, legacy[n], new[n]).ratio() for n in common) / len(common)
+        if common else 0.0
+    )
+    print("-" * 70)
+    print(f"⚡ Speedup: {new_ppm / max(legacy_ppm, 1e-6):.2f}x")
+    print(f"🔤 Similitud de texto legacy vs nuevo: {similarity:.1%} ({len(common)} páginas)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Features de chunk precalculadas al crear los chunks
+
+HybridValidator recalculaba en CADA validación, para cada chunk candidato,
+datos que solo dependen del texto del chunk:
+- compute_reasoning_score: ~100 chunk_lower.count(verbo) + conteo de
+  caracteres de diálogo
+- apply_pedagogical_boost: len(ref_text.split())
+- detect_contradiction: re.findall de los números del chunk
+
+Ahora se calculan UNA vez al guardar los chunks (upload_material y
+reprocess_material.py) y se persisten junto a las keywords del índice
+léxico (columna material_embeddings.features o sidecar .meta.json del
+almacén local). En validación solo se leen.
+
+Materiales guardados antes (o con otra CHUNK_FEATURES_VERSION): las
+features se calculan una vez al cargar el material en la caché.
+
+Autor: Abel Jesús Moya Acosta
+Fecha: 17 de noviembre de 2025
+"""
+
+import json
+import re
+from typing import Any, Dict, List, Optional
+
+# Versión del formato de features (si cambia el cálculo, se incrementa y
+# las features persistidas con otra versión se recalculan al cargar)
+CHUNK_FEATURES_VERSION = 1
+
+# ═══════════════════════════════════════════════════════════════
+# VERBOS DE RAZONAMIENTO (para reasoning_score)
+# Verbos que indican pensamiento, opinión, deducción, etc.
+# ═══════════════════════════════════════════════════════════════
+REASONING_VERBS = [
+    # Verbos de pensamiento
+    'pensó', 'pensaba', 'piensa', 'pensar', 'pensando',
+    'creyó', 'creía', 'cree', 'creer', 'creyendo',
+    'supuso', 'suponía', 'supone', 'suponer', 'suponiendo',
+    'imaginó', 'imaginaba', 'imagina', 'imaginar', 'imaginando',
+
+    # Verbos de deducción/conclusión
+    'dedujo', 'deducía', 'deduce', 'deducir', 'deduciendo',
+    'concluyó', 'concluía', 'concluye', 'concluir', 'concluyendo',
+    'infirió', 'infería', 'infiere', 'inferir', 'infiriendo',
+    'razonó', 'razonaba', 'razona', 'razonar', 'razonando',
+
+    # Verbos de sospecha/duda
+    'sospechó', 'sospechaba', 'sospecha', 'sospechar', 'sospechando',
+    'dudó', 'dudaba', 'duda', 'dudar', 'dudando',
+    'desconfió', 'desconfiaba', 'desconfía', 'desconfiar',
+
+    # Verbos de decisión/juicio
+    'decidió', 'decidía', 'decide', 'decidir', 'decidiendo',
+    'juzgó', 'juzgaba', 'juzga', 'juzgar', 'juzgando',
+    'opinó', 'opinaba', 'opina', 'opinar', 'opinando',
+    'consideró', 'consideraba', 'considera', 'considerar',
+
+    # Verbos de comprensión
+    'comprendió', 'comprendía', 'comprende', 'comprender',
+    'entendió', 'entendía', 'entiende', 'entender',
+    'advirtió', 'advertía', 'advierte', 'advertir',
+    'notó', 'notaba', 'nota', 'notar',
+    'percibió', 'percibía', 'percibe', 'percibir',
+
+    # Verbos de intención
+    'pretendió', 'pretendía', 'pretende', 'pretender',
+    'intentó', 'intentaba', 'intenta', 'intentar',
+    'quiso', 'quería', 'quiere', 'querer',
+    'buscó', 'buscaba', 'busca', 'buscar',
+
+    # Verbos de reflexión
+    'reflexionó', 'reflexionaba', 'reflexiona', 'reflexionar',
+    'meditó', 'meditaba', 'medita', 'meditar',
+    'analizó', 'analizaba', 'analiza', 'analizar',
+]
+
+# Caracteres que indican diálogo
+# Valor efectivo de la lista original de HybridValidator: sus comillas
+# tipográficas se guardaron como comillas rectas, así que '"' cuenta tres
+# veces y la última entrada quedó como ', '. Se conserva tal cual para no
+# cambiar los scores ya calibrados.
+DIALOGUE_CHARS = ['"', '«', '»', '—', '-', '"', '"', ', ']
+
+NUMBER_PATTERN = re.compile(r'\b\d+\b')
+
+
+def compute_chunk_features(text: str) -> Dict[str, Any]:
+    """
+    Features de un chunk que solo dependen de su texto
+
+    Returns:
+        dict: {
+            'version': CHUNK_FEATURES_VERSION,
+            'reasoning_score': 0.6 * dialogue_ratio + 0.4 * reasoning_ratio, en [0, 1],
+            'dialogue_ratio': proporción normalizada de marcadores de diálogo,
+            'reasoning_ratio': densidad normalizada de verbos de razonamiento,
+            'word_count': palabras del chunk (split por espacios),
+            'numbers': números distintos del chunk (strings, ordenados)
+        }
+    """
+    text = text or ""
+    text_lower = text.lower()
+    words = text_lower.split()
+    features = {
+        'version': CHUNK_FEATURES_VERSION,
+        'reasoning_score': 0.0,
+        'dialogue_ratio': 0.0,
+        'reasoning_ratio': 0.0,
+        'word_count': len(words),
+        'numbers': sorted(set(NUMBER_PATTERN.findall(text_lower)))
+    }
+    if len(text) < 10:
+        return features
+
+    # 1. RATIO DE DIÁLOGO: proporción de caracteres que son marcadores de diálogo
+    dialogue_count = sum(text.count(char) for char in DIALOGUE_CHARS)
+    dialogue_ratio = min(1.0, dialogue_count / (len(text) * 0.05))  # Normalizar
+
+    # 2. RATIO DE VERBOS DE RAZONAMIENTO
+    # Normalizar: esperamos ~1-3 verbos de razonamiento por cada 100 palabras
+    reasoning_count = sum(text_lower.count(verb) for verb in REASONING_VERBS)
+    reasoning_ratio = min(1.0, (reasoning_count / max(len(words), 1)) * 50)
+
+    # COMBINAR: 60% diálogo + 40% verbos de razonamiento
+    score = 0.6 * dialogue_ratio + 0.4 * reasoning_ratio
+
+    features['reasoning_score'] = max(0.0, min(1.0, score))
+    features['dialogue_ratio'] = dialogue_ratio
+    features['reasoning_ratio'] = reasoning_ratio
+    return features
+
+
+def compute_features_batch(texts: List[str]) -> List[Dict[str, Any]]:
+    """Features de varios chunks (para guardar junto a sus embeddings)"""
+    return [compute_chunk_features(text) for text in texts]
+
+
+def parse_chunk_features(value) -> Optional[Dict[str, Any]]:
+    """Features persistidas (dict o string JSON); None si faltan o son de otra versión"""
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return None
+    if isinstance(value, dict) and value.get('version') == CHUNK_FEATURES_VERSION:
+        return value
+    return None
+
+
+def chunk_features(chunk: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Features de un chunk en formato HybridValidator
+
+    Usa las persistidas ('features'); si no hay, las calcula desde
+    'text_full' y las deja en el chunk (los chunks de la caché de
+    materiales no se vuelven a calcular).
+    """
+    features = parse_chunk_features(chunk.get('features'))
+    if features is None:
+        features = compute_chunk_features(chunk.get('text_full', ''))
+        chunk['features'] = features
+    return features
@@ -14,7 +14,7 @@ Fecha: 7 de octubre de 2025
 """
 
 import re
-from typing import List, Tuple
+from typing import Iterable, Iterator, List, Tuple
 from io import BytesIO
 import os
 import subprocess
@@ -116,9 +116,26 @@ except ImportError:
     PYPDF2_AVAILABLE = False
     print("⚠️ PyPDF2 no disponible")
 
+# Extracción por rangos de páginas en paralelo (pdftotext / PyMuPDF)
+from pdf_extraction import (
+    PdfSource, extract_pages, iter_pages, join_pages, ocr_dpi, ocr_pages, pdf_file, split_pages
+)
+from extraction_cache import content_digest, document_key, extraction_cache, file_digest
+
+# OCR selectivo: solo páginas sin capa de texto o con texto corrupto
+PDF_SELECTIVE_OCR = os.getenv('PDF_SELECTIVE_OCR', 'true').lower() == 'true'
+# Tope de páginas por documento que van a OCR (VPS con poca RAM/CPU)
+PDF_OCR_MAX_PAGES = int(os.getenv('PDF_OCR_MAX_PAGES', '300'))
+# Menos caracteres que esto en una página = sin capa de texto
+PAGE_MIN_TEXT_CHARS = 20
+# Copia .txt de cada conversión en DATA_DIR/txt_convertidos (depuración)
+PDF_SAVE_TXT_COPY = os.getenv('PDF_SAVE_TXT_COPY', 'false').lower() == 'true'
+# Extracción en streaming: páginas que se clasifican y envían a OCR juntas
+PDF_STREAM_WINDOW_PAGES = int(os.getenv('PDF_STREAM_WINDOW_PAGES', '20'))
+
 # ✅ Normalizador para limpiar chunks de errores OCR
 try:
-    from text_normalizer import normalize_text
+    from normalization_cache import normalize_cached
     NORMALIZER_AVAILABLE = True
     print("✅ text_normalizer cargado - chunks serán normalizados")
 except ImportError:
@@ -126,6 +143,32 @@ except ImportError:
     print("⚠️ text_normalizer no disponible")
 
 
+def save_txt_copy(text: str, original_filename: str):
+    """
+    Guarda una copia del texto extraído en DATA_DIR/txt_convertidos/<nombre>.txt
+    
+    Solo para depuración: desactivada salvo PDF_SAVE_TXT_COPY=true.
+    """
+    if not PDF_SAVE_TXT_COPY:
+        return
+    try:
+        data_dir = os.environ.get('DATA_DIR', '/data')
+        txt_dir = os.path.join(data_dir, 'txt_convertidos')
+        os.makedirs(txt_dir, exist_ok=True)
+        
+        # Generar nombre del TXT basado en el PDF original
+        base_name = os.path.splitext(original_filename)[0]  # Quitar .pdf
+        txt_filename = f"{base_name}.txt"
+        txt_copy_path = os.path.join(txt_dir, txt_filename)
+        
+        with open(txt_copy_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        print(f"   📄 TXT guardado: {txt_filename}")
+        print(f"   📂 Ubicación: {txt_copy_path}")
+    except Exception as e:
+        print(f"   ⚠️ No se pudo guardar copia TXT: {e}")
+
+
 def extract_with_pdftotext(pdf_content: bytes, original_filename: str = "documento") -> tuple[str, int]:
     """
     Extrae texto de un PDF usando pdftotext (poppler-utils)
@@ -135,6 +178,8 @@ def extract_with_pdftotext(pdf_content: bytes, original_filename: str = "documen
     - Extrae texto embebido real del PDF
     - Mantiene layout y espaciado correcto
     - Guarda una copia .txt con el nombre original
+    - Documentos largos: un proceso pdftotext -f/-l por rango de páginas
+      en paralelo (pdf_extraction), unidos en orden
     
     Args:
         pdf_content: Contenido del PDF en bytes
@@ -146,64 +191,13 @@ def extract_with_pdftotext(pdf_content: bytes, original_filename: str = "documen
     if not PDFTOTEXT_AVAILABLE:
         return "", 0
     
-    temp_dir = None
     try:
-        temp_dir = tempfile.mkdtemp()
-        input_path = os.path.join(temp_dir, 'input.pdf')
-        output_path = os.path.join(temp_dir, 'output.txt')
-        
-        # Guardar PDF
-        with open(input_path, 'wb') as f:
-            f.write(pdf_content)
-        
-        # Ejecutar pdftotext con layout para mantener formato
-        result = subprocess.run([
-            'pdftotext',
-            '-layout',      # Mantiene layout original
-            '-enc', 'UTF-8', # Codificación UTF-8
-            input_path,
-            output_path
-        ], capture_output=True, text=True, timeout=60)
-        
-        if result.returncode != 0:
-            print(f"   ⚠️ pdftotext error: {result.stderr}")
-            return "", 0
-        
-        # Leer texto extraído
-        with open(output_path, 'r', encoding='utf-8', errors='ignore') as f:
-            text = f.read()
+        pages = extract_pages(pdf_content, engine='pdftotext')
+        text, _ = join_pages(pages)
         
-        # ✅ Guardar copia del TXT con el nombre original del PDF
-        try:
-            data_dir = os.environ.get('DATA_DIR', '/data')
-            txt_dir = os.path.join(data_dir, 'txt_convertidos')
-            os.makedirs(txt_dir, exist_ok=True)
-            
-            # Generar nombre del TXT basado en el PDF original
-            base_name = os.path.splitext(original_filename)[0]  # Quitar .pdf
-            txt_filename = f"{base_name}.txt"
-            txt_copy_path = os.path.join(txt_dir, txt_filename)
-            
-            with open(txt_copy_path, 'w', encoding='utf-8') as f:
-                f.write(text)
-            print(f"   📄 TXT guardado: {txt_filename}")
-            print(f"   📂 Ubicación: {txt_copy_path}")
-        except Exception as e:
-            print(f"   ⚠️ No se pudo guardar copia TXT: {e}")
-        
-        # Contar páginas con PyMuPDF o estimación
-        num_pages = 1
-        if PYMUPDF_AVAILABLE:
-            try:
-                import fitz
-                pdf_doc = fitz.open(stream=pdf_content, filetype="pdf")
-                num_pages = len(pdf_doc)
-                pdf_doc.close()
-            except:
-                # Estimar páginas por caracteres (aprox 2000 chars/página)
-                num_pages = max(1, len(text) // 2000)
+        save_txt_copy(text, original_filename)
         
-        return text.strip(), num_pages
+        return text.strip(), max(1, len(pages))
         
     except subprocess.TimeoutExpired:
         print("   ⚠️ pdftotext timeout")
@@ -211,9 +205,6 @@ def extract_with_pdftotext(pdf_content: bytes, original_filename: str = "documen
     except Exception as e:
         print(f"   ⚠️ pdftotext error: {e}")
         return "", 0
-    finally:
-        if temp_dir and os.path.exists(temp_dir):
-            shutil.rmtree(temp_dir, ignore_errors=True)
 
 
 def preprocess_pdf_with_ocrmypdf(pdf_content: bytes) -> bytes:
@@ -288,120 +279,44 @@ def preprocess_pdf_with_ocrmypdf(pdf_content: bytes) -> bytes:
 
 def extract_with_tesseract(pdf_content: bytes) -> Tuple[str, int, int]:
     """
-    Extrae texto usando Tesseract OCR REAL
+    Extrae texto usando Tesseract OCR REAL (todas las páginas)
     
-    ✅ OPTIMIZADO PARA MEMORIA BAJA (2GB VPS):
-    - Procesa UNA página a la vez (no todas a memoria)
-    - DPI reducido a 150 (suficiente para texto, menos RAM)
-    - Libera memoria después de cada página
-    - Para PDFs muy grandes, usa fallback automático
+    ✅ PIPELINE (pdf_extraction.ocr_pages):
+    - El PDF se abre UNA vez (PyMuPDF) y cada página se renderiza en escala
+      de grises (antes: convert_from_bytes re-parseaba el PDF por página)
+    - Cola acotada hacia PDF_OCR_WORKERS procesos Tesseract en paralelo
+    - DPI por página ajustado a PDF_OCR_MEMORY_MB (VPS de 2GB)
     
     MEJOR para PDFs con texto corrupto o escaneados.
     """
-    import gc
-    
     print("🔍 Usando Tesseract OCR (mejor calidad)...")
     
-    # Primero, obtener el número total de páginas sin cargar imágenes
-    try:
-        # Usar PyMuPDF para contar páginas (muy eficiente en memoria)
-        if PYMUPDF_AVAILABLE:
-            import fitz
-            pdf_doc = fitz.open(stream=pdf_content, filetype="pdf")
-            total_pages = len(pdf_doc)
-            pdf_doc.close()
-        else:
-            # Fallback: convertir solo primera página para contar
-            first_page = convert_from_bytes(pdf_content, dpi=72, first_page=1, last_page=1)
-            total_pages = len(convert_from_bytes(pdf_content, dpi=72))
-            del first_page
-            gc.collect()
-    except Exception as e:
-        print(f"   ⚠️ Error contando páginas: {e}")
-        total_pages = 0
-    
-    # Si el PDF es muy grande (>100 páginas), usar DPI más bajo o fallback
-    # ✅ MEJORADO: DPI más alto para mejor calidad de OCR
-    if total_pages > 100:
-        print(f"   ⚠️ PDF muy grande ({total_pages} págs), usando DPI 150 para ahorrar memoria")
-        dpi = 150
-    elif total_pages > 50:
-        print(f"   📄 PDF mediano ({total_pages} págs), usando DPI 200")
-        dpi = 200
-    else:
-        print(f"   📄 PDF pequeño ({total_pages} págs), usando DPI 300 (alta calidad)")
-        dpi = 300
-    
-    text = ""
+    results = ocr_pages(pdf_content)
+    pages = [results[number] for number in sorted(results)]
     error_count = 0
-    processed_pages = 0
     
-    # Procesar página por página para ahorrar memoria
-    try:
-        for page_num in range(1, total_pages + 1):
-            try:
-                # Convertir SOLO esta página a imagen
-                images = convert_from_bytes(
-                    pdf_content, 
-                    dpi=dpi, 
-                    first_page=page_num, 
-                    last_page=page_num,
-                    grayscale=True,  # Menos memoria
-                    thread_count=1   # Menos memoria
-                )
-                
-                if images:
-                    # Aplicar OCR con idioma español
-                    page_text = pytesseract.image_to_string(images[0], lang='spa+eng')
-                    
-                    # Contar posibles errores
-                    error_count += len(re.findall(r'[a-z]{3,}[A-Z][a-z]{2,}', page_text))
-                    error_count += len(re.findall(r'\b\w{1,2}\s+\w{1,2}\s+\w{1,2}\b', page_text))
-                    
-                    text += page_text + "\n\n"
-                    processed_pages += 1
-                    
-                    # Liberar memoria inmediatamente
-                    del images
-                    del page_text
-                
-                # Log de progreso cada 10 páginas
-                if page_num % 10 == 0:
-                    print(f"   OCR página {page_num}/{total_pages}...")
-                    gc.collect()  # Forzar limpieza de memoria
-                    
-            except Exception as page_error:
-                print(f"   ⚠️ Error en página {page_num}: {page_error}")
-                continue
-                
-    except Exception as e:
-        print(f"   ❌ Error general en Tesseract: {e}")
-        if processed_pages == 0:
-            raise e
-    
-    # Limpieza final
-    gc.collect()
+    for page_text in pages:
+        # Contar posibles errores
+        error_count += len(re.findall(r'[a-z]{3,}[A-Z][a-z]{2,}', page_text))
+        error_count += len(re.findall(r'\b\w{1,2}\s+\w{1,2}\s+\w{1,2}\b', page_text))
     
-    print(f"   ✅ Tesseract completado: {len(text)} caracteres de {processed_pages} páginas")
-    return text.strip(), processed_pages if processed_pages > 0 else total_pages, error_count
+    text, _ = join_pages(pages)
+    print(f"   ✅ Tesseract completado: {len(text)} caracteres de {len(pages)} páginas")
+    return text.strip(), len(pages), error_count
 
 
 def extract_with_pymupdf(pdf_content: bytes) -> Tuple[str, int, int]:
-    """Extrae texto con PyMuPDF"""
-    pdf_document = fitz.open(stream=pdf_content, filetype="pdf")
-    text = ""
-    total_pages = len(pdf_document)
+    """Extrae texto con PyMuPDF (rangos de páginas en paralelo si el documento es largo)"""
+    pages = extract_pages(pdf_content, engine='pymupdf')
     error_count = 0
     
-    for page in pdf_document:
-        page_text = page.get_text("text")
+    for page_text in pages:
         # Contar errores de OCR (palabras pegadas o fragmentadas)
         error_count += len(re.findall(r'[a-z]{3,}[A-Z][a-z]{2,}', page_text))  # palabrasPegadas
         error_count += len(re.findall(r'\b\w{1,2}\s+\w{1,2}\s+\w{1,2}\b', page_text))  # f ra g men tos
-        text += page_text + "\n\n"
     
-    pdf_document.close()
-    return text.strip(), total_pages, error_count
+    text, _ = join_pages(pages)
+    return text.strip(), len(pages), error_count
 
 
 def detect_corrupted_text(text: str) -> Tuple[bool, str]:
@@ -550,11 +465,70 @@ def repair_corrupted_spacing(text: str) -> str:
     return text
 
 
+def classify_page_text(text: str) -> Tuple[str, str]:
+    """
+    Clasifica el texto embebido de UNA página
+    
+    detect_corrupted_text decide para el documento completo con umbrales
+    absolutos (p.ej. >20 fragmentos); aquí los umbrales son proporciones,
+    válidas para una página de cualquier largo.
+    
+    Returns:
+        Tuple[str, str]: (clase, razón) con clase:
+            'ok'      → usar la capa de texto
+            'empty'   → sin capa de texto (página escaneada) → OCR
+            'corrupt' → capa de texto ilegible → OCR
+    """
+    stripped = text.strip() if text else ""
+    if len(stripped) < PAGE_MIN_TEXT_CHARS:
+        return 'empty', f"Sin capa de texto ({len(stripped)} chars)"
+    
+    chars = len(stripped)
+    words = stripped.split()
+    word_count = max(1, len(words))
+    
+    # Caracteres de control o de reemplazo (fuentes sin tabla ToUnicode)
+    bad_chars = len(re.findall(r'[\x00-\x08\x0b\x0e-\x1f\x7f-\x9f\ufffd]', stripped))
+    if bad_chars > chars * 0.01:
+        return 'corrupt', f"Caracteres de control ({bad_chars})"
+    
+    # Mayoría de símbolos en vez de letras o dígitos (glifos mapeados a basura)
+    letters = len(re.findall(r'[a-záéíóúüñA-ZÁÉÍÓÚÜÑ]', stripped))
+    readable = letters + len(re.findall(r'\d', stripped))
+    non_space = chars - len(re.findall(r'\s', stripped))
+    if non_space and readable / non_space < 0.5:
+        return 'corrupt', f"Pocas letras ({readable / non_space:.0%})"
+    
+    if letters >= 50:
+        vowels = len(re.findall(r'[aeiouáéíóúüAEIOUÁÉÍÓÚÜ]', stripped))
+        if vowels / letters < 0.25:
+            return 'corrupt', f"Ratio de vocales muy bajo ({vowels / letters:.1%})"
+    
+    weird_case = len(re.findall(r'\b[a-z]+[A-Z][a-z]*\b', stripped))
+    if weird_case > word_count * 0.05:
+        return 'corrupt', f"Mezcla inusual de mayúsculas ({weird_case} palabras)"
+    
+    lowered = stripped.lower()
+    fragmented = len(re.findall(r'\b[a-záéíóú]\s[a-záéíóú]{1,2}\s[a-záéíóú]', lowered))
+    if fragmented > word_count * 0.05:
+        return 'corrupt', f"Palabras fragmentadas por espacios ({fragmented})"
+    
+    glued = len(re.findall(r'[a-záéíóú]{25,}', lowered))
+    if glued > word_count * 0.02:
+        return 'corrupt', f"Palabras pegadas sin espacios ({glued})"
+    
+    no_vowel = len(re.findall(r'\b[bcdfghjklmnpqrstvwxyz]{5,}\b', lowered))
+    if no_vowel > word_count * 0.02:
+        return 'corrupt', f"Palabras sin vocales ({no_vowel})"
+    
+    return 'ok', "Texto parece normal"
+
+
 def extract_with_pypdf2(pdf_content: bytes) -> Tuple[str, int, int]:
     """Extrae texto con PyPDF2"""
     pdf_file = BytesIO(pdf_content)
     pdf_reader = PyPDF2.PdfReader(pdf_file)
-    text = ""
+    pages = []
     total_pages = len(pdf_reader.pages)
     error_count = 0
     
@@ -562,93 +536,342 @@ def extract_with_pypdf2(pdf_content: bytes) -> Tuple[str, int, int]:
         page_text = page.extract_text() or ""
         error_count += len(re.findall(r'[a-z]{3,}[A-Z][a-z]{2,}', page_text))
         error_count += len(re.findall(r'\b\w{1,2}\s+\w{1,2}\s+\w{1,2}\b', page_text))
-        text += page_text + "\n"
+        pages.append(page_text)
     
+    text, _ = join_pages(pages, separator="\n")
     return text.strip(), total_pages, error_count
 
 
-def extract_text_from_pdf(pdf_content: bytes, original_filename: str = "documento.pdf") -> tuple[str, int]:
+def _text_layer_methods(pdf_path: str, total_pages: int = None) -> list:
+    """Métodos rápidos disponibles, en orden: (nombre, función que itera las páginas)"""
+    methods = []
+    if PDFTOTEXT_AVAILABLE:
+        methods.append(('pdftotext', lambda: iter_pages(pdf_path, engine='pdftotext', total_pages=total_pages)))
+    if PYMUPDF_AVAILABLE:
+        methods.append(('PyMuPDF', lambda: iter_pages(pdf_path, engine='pymupdf')))
+    if PYPDF2_AVAILABLE:
+        methods.append(('PyPDF2', lambda: (page.extract_text() or "" for page in PyPDF2.PdfReader(pdf_path).pages)))
+    return methods
+
+
+def extract_text_layer_pages(pdf: PdfSource) -> Tuple[List[str], str]:
     """
-    Extrae texto de un archivo PDF usando métodos RÁPIDOS (sin OCR)
+    Texto embebido de cada página con el primer método rápido que funcione
     
-    ✅ ESTRATEGIA RÁPIDA - SIN OCR:
+    Orden: pdftotext → PyMuPDF → PyPDF2. Si ninguno produce texto (PDF
+    escaneado) se retornan igual las páginas vacías del primero que pudo
+    leer el documento: el OCR selectivo las completa.
     
-    Orden de prioridad:
-    1. PDFTOTEXT (instantáneo, extrae texto embebido)
-    2. PyMuPDF (rápido, extrae texto embebido)
-    3. PyPDF2 (rápido, último recurso)
+    Args:
+        pdf: Ruta del PDF o PDF en bytes
     
-    ⚠️ NO usa OCR (Tesseract/ocrmypdf) - eso toma minutos
-    El texto puede tener espacios raros pero funciona para validación semántica.
+    Returns:
+        Tuple[List[str], str]: (texto por página, método)
+    """
+    empty_result = None
+    with pdf_file(pdf) as pdf_path:
+        for name, iterate in _text_layer_methods(pdf_path):
+            print(f"   ⚡ Intentando {name}...")
+            try:
+                pages = list(iterate())
+            except Exception as e:
+                print(f"   ⚠️ {name} falló: {e}")
+                continue
+            total_chars = sum(len(page.strip()) for page in pages)
+            if total_chars > 50:
+                print(f"   ✅ {name} exitoso: {total_chars} chars, {len(pages)} páginas")
+                return pages, name
+            print(f"   ⚠️ {name} produjo muy poco texto ({total_chars} chars)")
+            if empty_result is None and pages:
+                empty_result = (pages, name)
+    
+    return empty_result if empty_result else ([], "")
+
+
+def iter_text_layer_pages(pdf_path: str, total_pages: int = None) -> Iterator[str]:
+    """
+    Versión en streaming de extract_text_layer_pages (mismo orden y criterio)
+    
+    Las páginas se retienen solo hasta que el método supera los 50
+    caracteres; desde ahí se entregan a medida que llegan. Si el método
+    falla o no llega al umbral antes de terminar, nada se entregó todavía
+    y se prueba el siguiente, igual que en la versión en lista.
+    """
+    empty_pages = None
+    for name, iterate in _text_layer_methods(pdf_path, total_pages):
+        print(f"   ⚡ Intentando {name}...")
+        pending, total_chars, streaming = [], 0, False
+        try:
+            for page in iterate():
+                if streaming:
+                    yield page
+                    continue
+                pending.append(page)
+                total_chars += len(page.strip())
+                if total_chars > 50:
+                    print(f"   ✅ {name}: capa de texto encontrada, páginas en streaming")
+                    streaming = True
+                    yield from pending
+                    pending = None
+        except Exception as e:
+            if streaming:
+                raise
+            print(f"   ⚠️ {name} falló: {e}")
+            continue
+        if streaming:
+            return
+        print(f"   ⚠️ {name} produjo muy poco texto ({total_chars} chars)")
+        if empty_pages is None and pending:
+            empty_pages = pending
+    
+    if empty_pages:
+        yield from empty_pages
+
+
+def ocr_corrupt_pages(pdf: PdfSource, pages: List[str], first_page: int = 1,
+                      max_pages: int = None, **ocr_options) -> Tuple[List[str], int]:
+    """
+    OCR SOLO de las páginas cuya capa de texto está vacía o corrupta
+    
+    Las páginas buenas conservan el texto embebido (instantáneo); las malas
+    se envían en paralelo a Tesseract (pdf_extraction.ocr_pages). El texto
+    OCR reemplaza al embebido solo si es mejor.
     
     Args:
-        pdf_content: Contenido del PDF en bytes
+        pdf: Ruta del PDF o PDF en bytes
+        pages: Texto embebido de páginas consecutivas
+        first_page: Número (base 1) de pages[0] en el documento
+        max_pages: Tope de páginas a OCR (default: PDF_OCR_MAX_PAGES)
+        **ocr_options: Opciones de ocr_pages (p.ej. dpi)
+    
+    Returns:
+        Tuple[List[str], int]: (páginas en orden, páginas reemplazadas por OCR)
+    """
+    if max_pages is None:
+        max_pages = PDF_OCR_MAX_PAGES
+    classes = [classify_page_text(page) for page in pages]
+    bad_pages = [number for number, (label, _) in enumerate(classes, start=first_page) if label != 'ok']
+    if not bad_pages:
+        return pages, 0
+    
+    print(f"   🔍 {len(bad_pages)}/{len(pages)} páginas sin texto útil "
+          f"(p.ej. pág. {bad_pages[0]}: {classes[bad_pages[0] - first_page][1]})")
+    if not (PDF_SELECTIVE_OCR and TESSERACT_AVAILABLE):
+        print("   ⚠️ OCR selectivo no disponible, se usa la capa de texto")
+        return pages, 0
+    if len(bad_pages) > max_pages:
+        print(f"   ⚠️ Solo se aplica OCR a {max_pages} páginas más (PDF_OCR_MAX_PAGES)")
+        bad_pages = bad_pages[:max_pages]
+        if not bad_pages:
+            return pages, 0
+    
+    ocr_results = ocr_pages(pdf, bad_pages, **ocr_options)
+    
+    merged = list(pages)
+    replaced = 0
+    for number, ocr_text in ocr_results.items():
+        previous_label = classes[number - first_page][0]
+        ocr_label, _ = classify_page_text(ocr_text)
+        # Página escaneada: cualquier texto es mejor; corrupta: solo si el OCR es legible
+        if ocr_label == 'ok' or (previous_label == 'empty' and ocr_text.strip()):
+            merged[number - first_page] = ocr_text
+            replaced += 1
+    
+    print(f"   ✅ OCR selectivo: {replaced}/{len(bad_pages)} páginas reemplazadas")
+    return merged, replaced
+
+
+def iter_ocr_corrupt_pages(pdf_path: str, pages: Iterable[str], total_pages: int = None,
+                           window: int = None) -> Iterator[str]:
+    """
+    ocr_corrupt_pages por ventanas de páginas consecutivas (streaming)
+    
+    Cada ventana se entrega en cuanto sus páginas malas pasan por OCR. El
+    tope PDF_OCR_MAX_PAGES es para todo el documento. Como no se sabe de
+    antemano cuántas páginas irán a OCR, el DPI (ocr_dpi) se estima
+    proyectando la proporción de páginas malas vistas hasta ahora.
+    """
+    window = window or PDF_STREAM_WINDOW_PAGES
+    budget = PDF_OCR_MAX_PAGES
+    seen = bad_seen = replaced_total = 0
+    
+    def flush(batch: List[str]) -> List[str]:
+        nonlocal budget, seen, bad_seen, replaced_total
+        first_page = seen + 1
+        seen += len(batch)
+        bad = sum(1 for page in batch if classify_page_text(page)[0] != 'ok')
+        if not bad:
+            return batch
+        bad_seen += bad
+        projected = round(bad_seen / seen * total_pages) if total_pages else bad_seen
+        merged, replaced = ocr_corrupt_pages(pdf_path, batch, first_page=first_page, max_pages=budget,
+                                             dpi=ocr_dpi(min(projected, PDF_OCR_MAX_PAGES)))
+        budget = max(0, budget - bad)
+        replaced_total += replaced
+        return merged
+    
+    batch = []
+    for page in pages:
+        batch.append(page)
+        if len(batch) >= window:
+            yield from flush(batch)
+            batch = []
+    if batch:
+        yield from flush(batch)
+    if bad_seen:
+        print(f"   ✅ OCR selectivo: {replaced_total}/{bad_seen} páginas reemplazadas")
+
+
+def extraction_profile() -> str:
+    """Opciones que cambian el resultado de la extracción (parte de la clave de caché)"""
+    return f"ocr={PDF_SELECTIVE_OCR and TESSERACT_AVAILABLE}"
+
+
+def extract_pdf_document(pdf: PdfSource, original_filename: str = "documento.pdf",
+                         content_sha256: str = None) -> dict:
+    """
+    Extrae texto de un archivo PDF: capa de texto rápida + OCR por página
+    
+    ✅ ESTRATEGIA:
+    0. Caché por SHA-256 del PDF (extraction_cache): un PDF ya procesado
+       retorna al instante
+    1. Texto embebido por página con el primer método rápido que funcione
+       (pdftotext → PyMuPDF → PyPDF2, rangos de páginas en paralelo)
+    2. Cada página se clasifica (classify_page_text)
+    3. SOLO las páginas vacías o corruptas van a Tesseract, en paralelo
+    4. Cada página se limpia y se unen en orden
+    
+    Un PDF digital no paga OCR; uno mixto solo lo paga en sus páginas
+    escaneadas (antes el OCR era todo o nada y por eso estaba desactivado).
+    
+    Args:
+        pdf: Ruta del PDF (p.ej. el archivo del trabajo de ingesta; los
+             extractores lo leen directamente) o PDF en bytes (se escribe
+             una sola vez a un temporal)
         original_filename: Nombre del archivo PDF original (para guardar TXT)
+        content_sha256: (Opcional) SHA-256 del PDF si ya se calculó al subirlo
         
     Returns:
-        tuple: (texto extraído, número total de páginas)
+        dict: text, pages (total de páginas) y page_offsets (inicio de
+        cada página dentro de text)
     """
     import gc
     
-    print(f"📖 Extrayendo texto del PDF (modo rápido, sin OCR)...")
+    print(f"📖 Extrayendo texto del PDF (capa de texto + OCR selectivo)...")
     print(f"   📁 Archivo: {original_filename}")
     
-    # ═══════════════════════════════════════════════════════════════════════
-    # PASO 1: PDFTOTEXT (INSTANTÁNEO - Primera opción)
-    # ═══════════════════════════════════════════════════════════════════════
-    if PDFTOTEXT_AVAILABLE:
-        print("   ⚡ Intentando pdftotext (instantáneo)...")
-        try:
-            text_pdftotext, pages_pdftotext = extract_with_pdftotext(pdf_content, original_filename)
-            
-            if len(text_pdftotext.strip()) > 50:
-                print(f"   ✅ pdftotext exitoso: {len(text_pdftotext)} chars, {pages_pdftotext} páginas")
-                text = aggressive_text_cleanup(text_pdftotext)
-                gc.collect()
-                return text, pages_pdftotext
-            else:
-                print(f"   ⚠️ pdftotext produjo muy poco texto ({len(text_pdftotext)} chars)")
-        except Exception as e:
-            print(f"   ⚠️ pdftotext falló: {e}")
+    if content_sha256 is None:
+        is_bytes = isinstance(pdf, (bytes, bytearray))
+        content_sha256 = content_digest(pdf) if is_bytes else file_digest(pdf)
+    cache_key = document_key(content_sha256, extraction_profile())
+    cached = extraction_cache.get_document(cache_key)
+    if cached is not None:
+        print(f"   ⚡ Extracción en caché: {len(cached['text'])} chars, {cached['pages']} páginas")
+        return cached
+    
+    with pdf_file(pdf) as pdf_path:
+        pages, _ = extract_text_layer_pages(pdf_path)
+        if pages:
+            pages, _ = ocr_corrupt_pages(pdf_path, pages)
+    
+    if pages:
+        raw_text, _ = join_pages(pages)
+        
+        if len(raw_text.strip()) > 50:
+            save_txt_copy(raw_text, original_filename)
+            # Limpieza por página: los offsets siguen siendo válidos y las
+            # reglas de unión de fragmentos no cruzan el límite entre páginas
+            text, page_offsets = join_pages([aggressive_text_cleanup(page) for page in pages])
+            extraction_cache.put_document(cache_key, text, len(pages), page_offsets)
+            gc.collect()
+            return {"text": text, "pages": len(pages), "page_offsets": page_offsets}
     
-    # ═══════════════════════════════════════════════════════════════════════
-    # PASO 2: PyMuPDF (rápido - segunda opción)
-    # ═══════════════════════════════════════════════════════════════════════
-    if PYMUPDF_AVAILABLE:
-        print("   📖 Intentando PyMuPDF...")
-        try:
-            text_mupdf, pages_mupdf, errors_mupdf = extract_with_pymupdf(pdf_content)
-            
-            if len(text_mupdf.strip()) > 50:
-                print(f"   ✅ PyMuPDF exitoso: {len(text_mupdf)} chars, {pages_mupdf} páginas")
-                text = aggressive_text_cleanup(text_mupdf)
-                gc.collect()
-                return text, pages_mupdf
-            else:
-                print(f"   ⚠️ PyMuPDF produjo muy poco texto ({len(text_mupdf)} chars)")
-        except Exception as e:
-            print(f"   ⚠️ PyMuPDF falló: {e}")
+    # Si llegamos aquí, ningún método funcionó
+    raise Exception("No se pudo extraer texto del PDF con ningún método")
+
+
+def iter_pdf_pages(pdf_path: str, original_filename: str = "documento.pdf",
+                   content_sha256: str = None, total_pages: int = None) -> Iterator[str]:
+    """
+    Versión en streaming de extract_pdf_document: páginas limpias, en orden
     
-    # ═══════════════════════════════════════════════════════════════════════
-    # PASO 3: PyPDF2 (último recurso rápido)
-    # ═══════════════════════════════════════════════════════════════════════
-    if PYPDF2_AVAILABLE:
-        print("   📄 Intentando PyPDF2...")
-        try:
-            text_pypdf2, pages_pypdf2, errors_pypdf2 = extract_with_pypdf2(pdf_content)
-            
-            if len(text_pypdf2.strip()) > 50:
-                print(f"   ✅ PyPDF2 exitoso: {len(text_pypdf2)} chars, {pages_pypdf2} páginas")
-                text = aggressive_text_cleanup(text_pypdf2)
-                gc.collect()
-                return text, pages_pypdf2
+    Misma estrategia (caché → capa de texto → OCR selectivo → limpieza por
+    página), pero cada página se entrega en cuanto está lista: el chunking
+    y los embeddings del pipeline de ingesta empiezan con el primer rango
+    de páginas. Al terminar, el documento se guarda en extraction_cache
+    igual que con extract_pdf_document, salvo que su texto supere
+    extraction_cache.max_document_bytes: en ese caso las páginas no se
+    retienen (la memoria no crece con el tamaño del libro).
+    
+    Args:
+        pdf_path: Ruta del PDF (archivo del trabajo de ingesta)
+        original_filename: Nombre del archivo PDF original (para guardar TXT)
+        content_sha256: (Opcional) SHA-256 del PDF si ya se calculó al subirlo
+        total_pages: (Opcional) Páginas del documento si ya se conocen
+    
+    Yields:
+        str: Texto limpio de cada página (join_pages de todas = el text
+        de extract_pdf_document)
+    """
+    print(f"📖 Extrayendo texto del PDF en streaming (capa de texto + OCR selectivo)...")
+    print(f"   📁 Archivo: {original_filename}")
+    
+    cache_key = document_key(content_sha256 or file_digest(pdf_path), extraction_profile())
+    cached = extraction_cache.get_document(cache_key)
+    if cached is not None:
+        print(f"   ⚡ Extracción en caché: {len(cached['text'])} chars, {cached['pages']} páginas")
+        yield from split_pages(cached['text'], cached['page_offsets'])
+        return
+    
+    # Solo se acumula lo que se va a guardar (caché / copia TXT)
+    cleaned_pages = [] if extraction_cache.path else None
+    cleaned_bytes = 0
+    raw_pages = [] if PDF_SAVE_TXT_COPY else None
+    raw_chars = 0
+    
+    pages = iter_text_layer_pages(pdf_path, total_pages)
+    for page in iter_ocr_corrupt_pages(pdf_path, pages, total_pages):
+        raw_chars += len(page.strip())
+        if raw_pages is not None:
+            raw_pages.append(page)
+        cleaned = aggressive_text_cleanup(page)
+        if cleaned_pages is not None:
+            cleaned_bytes += len(cleaned.encode('utf-8'))
+            if cleaned_bytes > extraction_cache.max_document_bytes:
+                # Documento demasiado grande para la caché: soltar lo acumulado
+                print(f"   ℹ️ Documento de más de {extraction_cache.max_document_bytes // (1024 * 1024)} MB "
+                      f"de texto: no se guarda en la caché de extracción")
+                cleaned_pages = None
             else:
-                print(f"   ⚠️ PyPDF2 produjo muy poco texto ({len(text_pypdf2)} chars)")
-        except Exception as e:
-            print(f"   ⚠️ PyPDF2 falló: {e}")
+                cleaned_pages.append(cleaned)
+        yield cleaned
+    
+    if raw_chars <= 50:
+        # Ningún método funcionó (lo poco entregado no alcanza para un chunk)
+        raise Exception("No se pudo extraer texto del PDF con ningún método")
+    
+    if raw_pages is not None:
+        save_txt_copy(join_pages(raw_pages)[0], original_filename)
+    if cleaned_pages is not None:
+        text, page_offsets = join_pages(cleaned_pages)
+        extraction_cache.put_document(cache_key, text, len(cleaned_pages), page_offsets)
+
+
+def extract_text_from_pdf(pdf: PdfSource, original_filename: str = "documento.pdf",
+                          content_sha256: str = None) -> tuple[str, int]:
+    """
+    Extrae texto de un archivo PDF (ver extract_pdf_document)
     
-    # Si llegamos aquí, ningún método funcionó
-    raise Exception("No se pudo extraer texto del PDF con ningún método rápido")
+    Args:
+        pdf: Ruta del PDF o PDF en bytes
+        original_filename: Nombre del archivo PDF original (para guardar TXT)
+        content_sha256: (Opcional) SHA-256 del PDF si ya se calculó al subirlo
+        
+    Returns:
+        tuple: (texto extraído, número total de páginas)
+    """
+    document = extract_pdf_document(pdf, original_filename, content_sha256)
+    return document["text"], document["pages"]
 
 
 def aggressive_text_cleanup(text: str) -> str:
@@ -777,7 +1000,7 @@ def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200) -> List[st
     
     # ✅ NUEVO: Normalizar todos los chunks para corregir errores OCR
     if NORMALIZER_AVAILABLE:
-        chunks = [normalize_text(chunk) for chunk in chunks]
+        chunks = [normalize_cached(chunk) for chunk in chunks]
         print(f"✅ Chunks normalizados: errores OCR corregidos")
     
     return chunks
@@ -839,6 +1062,57 @@ def get_text_stats(text: str, real_pages: int = None) -> dict:
         "real_pages": real_pages if real_pages else estimated_pages  # Devolver el conteo real si existe
     }
 
+class TextStats:
+    """
+    get_text_stats incremental: se alimenta página por página
+    
+    Da el mismo resultado que get_text_stats sobre las páginas unidas con
+    "\\n\\n" (pipeline en streaming, que nunca arma el texto completo).
+    """
+    
+    def __init__(self):
+        self.characters = 0
+        self.characters_no_spaces = 0
+        self.words = 0
+        self.word_chars = 0
+        self.sentences = 0
+        self.paragraphs = 0
+        self.parts = 0
+        # Fragmento después del último [.!?]: la oración sigue en la próxima página
+        self._sentence_tail = ""
+    
+    def add(self, text: str):
+        if self.parts:
+            # Separador "\n\n" entre páginas
+            self.characters += 2
+            self.characters_no_spaces += 2
+        self.parts += 1
+        self.characters += len(text)
+        self.characters_no_spaces += len(text.replace(' ', ''))
+        words = text.split()
+        self.words += len(words)
+        self.word_chars += sum(len(word) for word in words)
+        self.paragraphs += len([p for p in text.split('\n\n') if p.strip()])
+        
+        sentences = re.split(r'[.!?]+', self._sentence_tail + "\n\n" + text if self.parts > 1 else text)
+        self._sentence_tail = sentences.pop()
+        self.sentences += len([s for s in sentences if s.strip()])
+    
+    def result(self, real_pages: int = None) -> dict:
+        sentences = self.sentences + (1 if self._sentence_tail.strip() else 0)
+        estimated_pages = self.characters // 1300 if not real_pages else real_pages
+        return {
+            "characters": self.characters,
+            "characters_no_spaces": self.characters_no_spaces,
+            "words": self.words,
+            "sentences": sentences,
+            "paragraphs": self.paragraphs,
+            "avg_word_length": round(self.word_chars / self.words, 2) if self.words else 0,
+            "avg_sentence_length": round(self.words / sentences, 2) if sentences else 0,
+            "estimated_pages": estimated_pages,
+            "real_pages": real_pages if real_pages else estimated_pages
+        }
+
 def chunk_by_paragraphs(text: str, max_chunk_size: int = 1000) -> List[str]:
     """
     Divide el texto en chunks basándose en párrafos
@@ -916,7 +1190,7 @@ def smart_chunk(text: str, target_size: int = 500, min_size: int = 100) -> List[
     # ✅ NUEVO: Normalizar todos los chunks para corregir errores OCR
     if NORMALIZER_AVAILABLE:
         print(f"🧹 Normalizando {len(chunks)} chunks (corrigiendo errores OCR)...")
-        chunks = [normalize_text(chunk) for chunk in chunks]
+        chunks = [normalize_cached(chunk) for chunk in chunks]
         print(f"✅ Chunks normalizados correctamente")
     
     return chunks
@@ -950,25 +1224,36 @@ def adaptive_chunking(text: str, total_pages: int) -> List[str]:
     """
     print(f"\n🎯 CHUNKING ADAPTATIVO para PDF de {total_pages} páginas")
     
+    strategy, params = adaptive_chunk_params(total_pages)
+    print(f"   {strategy}")
+    return semantic_chunking(text, **params)
+
+def adaptive_chunk_params(total_pages: int) -> Tuple[str, dict]:
+    """
+    Parámetros de semantic_chunking según el tamaño del PDF (ver adaptive_chunking)
+    
+    Returns:
+        Tuple[str, dict]: (estrategia, kwargs de semantic_chunking / SemanticChunker)
+    """
     if total_pages <= 50:
         # PDFs pequeños: máximo detalle
-        print("   📘 Estrategia: DETALLADA (80-180 palabras/chunk)")
-        return semantic_chunking(text, min_words=80, max_words=180, overlap_words=20)
+        return "📘 Estrategia: DETALLADA (80-180 palabras/chunk)", \
+            {"min_words": 80, "max_words": 180, "overlap_words": 20}
     
     elif total_pages <= 300:
         # PDFs medianos: balance detalle/eficiencia
-        print("   📗 Estrategia: MODERADA (150-350 palabras/chunk)")
-        return semantic_chunking(text, min_words=150, max_words=350, overlap_words=30)
+        return "📗 Estrategia: MODERADA (150-350 palabras/chunk)", \
+            {"min_words": 150, "max_words": 350, "overlap_words": 30}
     
     elif total_pages <= 1000:
         # PDFs grandes: priorizar coherencia
-        print("   📕 Estrategia: AMPLIA (250-600 palabras/chunk)")
-        return semantic_chunking(text, min_words=250, max_words=600, overlap_words=50)
+        return "📕 Estrategia: AMPLIA (250-600 palabras/chunk)", \
+            {"min_words": 250, "max_words": 600, "overlap_words": 50}
     
     else:
         # PDFs masivos: reducir ruido al máximo
-        print("   📚 Estrategia: EXTENSIVA (400-1000 palabras/chunk)")
-        return semantic_chunking(text, min_words=400, max_words=1000, overlap_words=80)
+        return "📚 Estrategia: EXTENSIVA (400-1000 palabras/chunk)", \
+            {"min_words": 400, "max_words": 1000, "overlap_words": 80}
 
 def semantic_chunking(text: str, min_words: int = 150, max_words: int = 400, overlap_words: int = 15) -> List[str]:
     """
@@ -983,6 +1268,7 @@ def semantic_chunking(text: str, min_words: int = 150, max_words: int = 400, ove
     ✅ Context anchors: 15 palabras de overlap entre chunks
     ✅ Rango adaptativo: 150-400 palabras (no caracteres fijos)
     ✅ Respeta límites de ideas completas
+    ✅ Núcleo compartido con SemanticChunker (versión incremental por páginas)
     
     EJEMPLO DE RESULTADO:
     - Chunk antiguo (1000 chars): "...una amiga de convento que se enemis..." (cortado)
@@ -999,71 +1285,13 @@ def semantic_chunking(text: str, min_words: int = 150, max_words: int = 400, ove
     Returns:
         List[str]: Chunks semánticos con context anchors
     """
-    text = clean_text(text)
-    
-    # 1. DIVIDIR POR PÁRRAFOS (respeta estructura del documento)
-    paragraphs = [p.strip() for p in text.split('\n\n') if p.strip()]
-    
-    chunks = []
-    current_chunk = []
-    word_count = 0
+    chunker = SemanticChunker(min_words, max_words, overlap_words)
     
     print(f"\n🧠 INICIANDO CHUNKING SEMÁNTICO...")
     print(f"   Rango: {min_words}-{max_words} palabras por chunk")
     print(f"   Context anchors: {overlap_words} palabras de overlap")
     
-    for paragraph in paragraphs:
-        paragraph_words = paragraph.split()
-        paragraph_word_count = len(paragraph_words)
-        
-        # Si el párrafo es muy largo (> max_words), dividirlo por oraciones
-        if paragraph_word_count > max_words:
-            sentences = re.split(r'(?<=[.!?])\s+', paragraph)
-            
-            for sentence in sentences:
-                sentence_words = sentence.split()
-                sentence_word_count = len(sentence_words)
-                
-                # Si agregar esta oración supera max_words, guardar chunk actual
-                if word_count + sentence_word_count > max_words and word_count >= min_words:
-                    # Guardar chunk actual
-                    chunk_text = ' '.join(current_chunk)
-                    chunks.append(chunk_text)
-                    
-                    # Context anchor: últimas N palabras del chunk anterior
-                    overlap = current_chunk[-overlap_words:] if len(current_chunk) >= overlap_words else current_chunk
-                    current_chunk = overlap + sentence_words
-                    word_count = len(current_chunk)
-                else:
-                    current_chunk.extend(sentence_words)
-                    word_count += sentence_word_count
-        else:
-            # Párrafo completo cabe en el chunk actual
-            if word_count + paragraph_word_count > max_words and word_count >= min_words:
-                # Guardar chunk actual
-                chunk_text = ' '.join(current_chunk)
-                chunks.append(chunk_text)
-                
-                # Context anchor
-                overlap = current_chunk[-overlap_words:] if len(current_chunk) >= overlap_words else current_chunk
-                current_chunk = overlap + paragraph_words
-                word_count = len(current_chunk)
-            else:
-                # Agregar párrafo al chunk actual
-                if current_chunk:
-                    current_chunk.append('\n\n')
-                current_chunk.extend(paragraph_words)
-                word_count += paragraph_word_count
-    
-    # Agregar último chunk
-    if current_chunk:
-        chunk_text = ' '.join(current_chunk)
-        chunks.append(chunk_text)
-    
-    # Normalizar chunks
-    if NORMALIZER_AVAILABLE:
-        print(f"🧹 Normalizando {len(chunks)} chunks semánticos...")
-        chunks = [normalize_text(chunk) for chunk in chunks]
+    chunks = chunker.feed(text) + chunker.finish()
     
     # Estadísticas
     chunk_lengths = [len(chunk.split()) for chunk in chunks]
@@ -1076,3 +1304,83 @@ def semantic_chunking(text: str, min_words: int = 150, max_words: int = 400, ove
     print(f"   Context anchors: {overlap_words} palabras de overlap\n")
     
     return chunks
+
+
+# Límite entre oraciones (semantic_chunking subdivide por oraciones)
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+
+
+class SemanticChunker:
+    """
+    semantic_chunking incremental: recibe el texto por partes (páginas) y
+    entrega cada chunk apenas se completa
+    
+    clean_text colapsa todo el espacio en blanco (también los \\n\\n), así
+    que el documento completo es un solo "párrafo" y semantic_chunking lo
+    arma oración por oración. Aquí se hace lo mismo sin tener el texto
+    completo: la última oración de cada parte queda pendiente porque puede
+    continuar en la siguiente página. Alimentar las páginas una por una da
+    exactamente los mismos chunks que semantic_chunking sobre el texto unido.
+    """
+    
+    def __init__(self, min_words: int = 150, max_words: int = 400, overlap_words: int = 15):
+        self.min_words = min_words
+        self.max_words = max_words
+        self.overlap_words = overlap_words
+        self._pending = ""
+        self._current_chunk: List[str] = []
+        self._word_count = 0
+    
+    def feed(self, text: str) -> List[str]:
+        """Agrega una parte del texto; retorna los chunks que quedaron completos"""
+        text = clean_text(text)
+        if not text:
+            return []
+        sentences = SENTENCE_BOUNDARY.split(f"{self._pending} {text}" if self._pending else text)
+        self._pending = sentences.pop()
+        return self._add_sentences(sentences)
+    
+    def finish(self) -> List[str]:
+        """Fin del texto: retorna los chunks restantes (incluye el último)"""
+        chunks = self._add_sentences([self._pending]) if self._pending else []
+        self._pending = ""
+        if self._current_chunk:
+            chunks.append(self._emit(self._current_chunk))
+        self._current_chunk = []
+        self._word_count = 0
+        return chunks
+    
+    def _add_sentences(self, sentences: List[str]) -> List[str]:
+        chunks = []
+        for sentence in sentences:
+            sentence_words = sentence.split()
+            sentence_word_count = len(sentence_words)
+            
+            # Si agregar esta oración supera max_words, guardar chunk actual
+            if self._word_count + sentence_word_count > self.max_words and self._word_count >= self.min_words:
+                chunks.append(self._emit(self._current_chunk))
+                
+                # Context anchor: últimas N palabras del chunk anterior
+                current = self._current_chunk
+                overlap = current[-self.overlap_words:] if len(current) >= self.overlap_words else current
+                self._current_chunk = overlap + sentence_words
+                self._word_count = len(self._current_chunk)
+            else:
+                self._current_chunk.extend(sentence_words)
+                self._word_count += sentence_word_count
+        return chunks
+    
+    @staticmethod
+    def _emit(words: List[str]) -> str:
+        chunk = ' '.join(words)
+        # Normalizar chunk (corrige errores OCR)
+        return normalize_cached(chunk) if NORMALIZER_AVAILABLE else chunk
+
+
+def iter_semantic_chunks(texts: Iterable[str], min_words: int = 150, max_words: int = 400,
+                         overlap_words: int = 15) -> Iterator[str]:
+    """Chunks de semantic_chunking a medida que llegan las partes del texto (páginas)"""
+    chunker = SemanticChunker(min_words, max_words, overlap_words)
+    for text in texts:
+        yield from chunker.feed(text)
+    yield from chunker.finish()
@@ -0,0 +1,410 @@
+"""
+Detector de contradicciones precompilado (NLI simplificado)
+
+HybridValidator.detect_contradiction reconstruía en CADA llamada los
+diccionarios de keywords críticos y temas de pregunta, y recorría
+keyword × patrón de negación formateando y buscando cientos de regex
+(~350 keywords × 35 patrones). Se llama una vez por chunk pre-filtrado en
+cada validación, así que el costo se pagaba N veces por request.
+
+Ahora:
+- Léxicos y patrones son constantes del módulo. Cada patrón de negación se
+  compila UNA vez como una sola alternación de todos los keywords, dentro
+  de un lookahead para encontrar también coincidencias solapadas (igual
+  que un re.search independiente por keyword)
+- El análisis de la respuesta (keywords negados y con qué patrones,
+  contradicciones con la pregunta, números) no depende del chunk: se hace
+  una vez por request (analyze_answer, guardado en ScoringContext)
+- Por chunk solo queda verificar si los keywords negados (casi siempre
+  0-3) aparecen en el chunk y comparar números
+
+El resultado (contradicción, penalización y motivo) es idéntico al de la
+implementación anterior, incluido el orden de las contradicciones.
+
+Autor: Abel Jesús Moya Acosta
+Fecha: 17 de noviembre de 2025
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# ═══════════════════════════════════════════════════════════════
+# KEYWORDS CRÍTICOS EXPANDIDOS (GENERALIZADO PARA CUALQUIER PDF)
+# ═══════════════════════════════════════════════════════════════
+# Agrupados por categoría semántica - funciona para múltiples dominios
+CRITICAL_KEYWORDS: Dict[str, List[str]] = {
+    # ─────────────────────────────────────────────────────────────
+    # ECONOMÍA / DINERO (expandido)
+    # ─────────────────────────────────────────────────────────────
+    'dinero': ['dinero', 'francos', 'billetes', 'moneda', 'plata', 'efectivo',
+               'suma', 'pago', 'precio', 'costo', 'valor', 'fortuna', 'riqueza',
+               'pobre', 'rico', 'deuda', 'préstamo', 'herencia', 'tesoro'],
+
+    # ─────────────────────────────────────────────────────────────
+    # ENVÍO / COMUNICACIÓN
+    # ─────────────────────────────────────────────────────────────
+    'envio': ['envió', 'enviaba', 'enviar', 'mandó', 'mandaba', 'mandar',
+              'recibía', 'recibió', 'recibir', 'entregó', 'entregaba', 'entregar',
+              'llegó', 'llegaba', 'llegar', 'trajo', 'traía', 'traer'],
+    'correo': ['correo', 'carta', 'cartas', 'sobre', 'sobres', 'correspondencia',
+               'mensaje', 'mensajes', 'telegrama', 'paquete', 'envío'],
+
+    # ─────────────────────────────────────────────────────────────
+    # AYUDA / ASISTENCIA
+    # ─────────────────────────────────────────────────────────────
+    'ayuda': ['ayuda', 'ayudó', 'ayudaba', 'ayudar', 'asistencia', 'apoyo',
+              'auxilio', 'socorro', 'colaboración', 'contribución', 'donación'],
+
+    # ─────────────────────────────────────────────────────────────
+    # CRIMEN / JUSTICIA
+    # ─────────────────────────────────────────────────────────────
+    'robo': ['robó', 'robar', 'robo', 'hurto', 'ladrón', 'robado', 'robaron',
+             'sustrajo', 'sustraer', 'apropió', 'apropiar', 'estafó', 'estafa'],
+    'culpa': ['culpable', 'inocente', 'sospechoso', 'acusado', 'condenado',
+              'absuelto', 'criminal', 'delincuente', 'cómplice', 'víctima'],
+
+    # ─────────────────────────────────────────────────────────────
+    # EXISTENCIA / OCURRENCIA (NUEVO - GENERAL)
+    # ─────────────────────────────────────────────────────────────
+    'existencia': ['existió', 'existía', 'existe', 'existir', 'hubo', 'había',
+                   'ocurrió', 'ocurría', 'ocurrir', 'sucedió', 'sucedía', 'suceder',
+                   'pasó', 'pasaba', 'pasar', 'aconteció', 'tuvo', 'tenía', 'tiene'],
+
+    # ─────────────────────────────────────────────────────────────
+    # VERDAD / CERTEZA (NUEVO - GENERAL)
+    # ─────────────────────────────────────────────────────────────
+    'verdad': ['verdad', 'cierto', 'real', 'realidad', 'verdadero', 'auténtico',
+               'legítimo', 'genuino', 'válido', 'confirmado', 'probado', 'demostrado'],
+
+    # ─────────────────────────────────────────────────────────────
+    # SALUD / ESTADO FÍSICO (NUEVO)
+    # ─────────────────────────────────────────────────────────────
+    'salud': ['enfermo', 'enferma', 'enfermedad', 'salud', 'sano', 'sana',
+              'curó', 'curaba', 'curar', 'murió', 'moría', 'morir', 'muerte',
+              'herido', 'herida', 'lesión', 'recuperó', 'recuperar', 'sobrevivió'],
+
+    # ─────────────────────────────────────────────────────────────
+    # EMOCIONES / SENTIMIENTOS (NUEVO)
+    # ─────────────────────────────────────────────────────────────
+    'emocion': ['feliz', 'triste', 'alegre', 'miedo', 'asustado', 'contento',
+                'enojado', 'furioso', 'preocupado', 'ansioso', 'nervioso', 'tranquilo',
+                'enamorado', 'amaba', 'odiaba', 'quería', 'deseaba', 'temía', 'esperaba'],
+
+    # ─────────────────────────────────────────────────────────────
+    # EVENTOS / SUCESOS (NUEVO)
+    # ─────────────────────────────────────────────────────────────
+    'evento': ['guerra', 'batalla', 'conflicto', 'revolución', 'terremoto', 'accidente',
+               'incendio', 'inundación', 'catástrofe', 'desastre', 'celebración', 'fiesta',
+               'boda', 'funeral', 'nacimiento', 'reunión', 'encuentro', 'viaje'],
+
+    # ─────────────────────────────────────────────────────────────
+    # TIEMPO / TEMPORALIDAD (NUEVO)
+    # ─────────────────────────────────────────────────────────────
+    'tiempo': ['antes', 'después', 'durante', 'siempre', 'frecuentemente',
+               'diariamente', 'anualmente', 'mensualmente', 'primero', 'último',
+               'antiguo', 'moderno', 'reciente', 'pasado', 'futuro', 'presente'],
+
+    # ─────────────────────────────────────────────────────────────
+    # UBICACIÓN / LUGAR (NUEVO)
+    # ─────────────────────────────────────────────────────────────
+    'ubicacion': ['aquí', 'allí', 'cerca', 'lejos', 'dentro', 'fuera', 'arriba', 'abajo',
+                  'norte', 'sur', 'este', 'oeste', 'ciudad', 'pueblo', 'país', 'región',
+                  'casa', 'edificio', 'palacio', 'habitación', 'lugar', 'sitio'],
+
+    # ─────────────────────────────────────────────────────────────
+    # PERSONAS / RELACIONES (NUEVO)
+    # ─────────────────────────────────────────────────────────────
+    'persona': ['padre', 'madre', 'hijo', 'hija', 'hermano', 'hermana', 'esposo', 'esposa',
+                'amigo', 'enemigo', 'rey', 'reina', 'conde', 'condesa', 'señor', 'señora',
+                'jefe', 'empleado', 'sirviente', 'criado', 'niño', 'adulto', 'anciano'],
+
+    # ─────────────────────────────────────────────────────────────
+    # ACCIONES / VERBOS COMUNES (NUEVO)
+    # ─────────────────────────────────────────────────────────────
+    'accion': ['hizo', 'hacía', 'hacer', 'dijo', 'decía', 'decir', 'vio', 'veía', 'ver',
+               'oyó', 'oía', 'oír', 'sabía', 'saber', 'conocía', 'conocer', 'pensaba', 'pensar',
+               'quiso', 'quería', 'querer', 'pudo', 'podía', 'poder', 'debía', 'deber',
+               'logró', 'lograr', 'consiguió', 'conseguir', 'intentó', 'intentar',
+               'decidió', 'decidir', 'descubrió', 'descubrir', 'encontró', 'encontrar'],
+
+    # ─────────────────────────────────────────────────────────────
+    # CANTIDAD / NÚMEROS (NUEVO)
+    # ─────────────────────────────────────────────────────────────
+    'cantidad': ['todo', 'nada', 'mucho', 'poco', 'algunos', 'ninguno', 'varios',
+                 'único', 'solo', 'solamente', 'doble', 'triple', 'mitad', 'completo',
+                 'mayoría', 'minoría', 'total', 'parcial', 'entero'],
+
+    # ─────────────────────────────────────────────────────────────
+    # CIENCIA / ACADÉMICO (NUEVO)
+    # ─────────────────────────────────────────────────────────────
+    'ciencia': ['experimento', 'teoría', 'hipótesis', 'resultado', 'conclusión',
+                'descubrimiento', 'invento', 'investigación', 'estudio', 'análisis',
+                'prueba', 'evidencia', 'demostración', 'fórmula', 'ley', 'principio'],
+}
+
+# ═══════════════════════════════════════════════════════════════
+# PATRONES DE NEGACIÓN EXPANDIDOS
+# ═══════════════════════════════════════════════════════════════
+NEGATION_PATTERNS: List[str] = [
+    # Patrones directos (negación + keyword)
+    r'\bno\s+{keyword}\b',
+    r'\bnunca\s+{keyword}\b',
+    r'\bjamás\s+{keyword}\b',
+    r'\bsin\s+{keyword}\b',
+    r'\bningún\s+{keyword}\b',
+    r'\bninguna\s+{keyword}\b',
+    r'\bnada\s+de\s+{keyword}\b',
+    r'\bnadie\s+{keyword}\b',
+    # Patrones con 1 palabra intermedia
+    r'\bno\s+\w+\s+{keyword}\b',
+    r'\bnunca\s+\w+\s+{keyword}\b',
+    r'\bno\s+le\s+\w+\s+{keyword}\b',
+    r'\bnunca\s+le\s+\w+\s+{keyword}\b',
+    r'\bno\s+se\s+\w+\s+{keyword}\b',
+    r'\bnunca\s+se\s+\w+\s+{keyword}\b',
+    # Patrones con 2 palabras intermedias
+    r'\bno\s+\w+\s+\w+\s+{keyword}\b',
+    r'\bnunca\s+\w+\s+\w+\s+{keyword}\b',
+    r'\bjamás\s+\w+\s+\w+\s+{keyword}\b',
+    # Patrones con 3 palabras intermedias
+    r'\bno\s+\w+\s+\w+\s+\w+\s+{keyword}\b',
+    r'\bnunca\s+\w+\s+\w+\s+\w+\s+{keyword}\b',
+    # Patrones compuestos con "pero"
+    r'\bpero\s+no\s+{keyword}\b',
+    r'\bpero\s+nunca\s+{keyword}\b',
+    r'\bpero\s+no\s+\w+\s+{keyword}\b',
+    r'\bpero\s+nunca\s+\w+\s+{keyword}\b',
+    r'\bpero\s+nunca\s+\w+\s+\w+\s+{keyword}\b',
+    # Patrones con "tampoco" (NUEVO)
+    r'\btampoco\s+{keyword}\b',
+    r'\btampoco\s+\w+\s+{keyword}\b',
+    # Patrones con "ni" (NUEVO)
+    r'\bni\s+{keyword}\b',
+    r'\bni\s+\w+\s+{keyword}\b',
+    r'\bni\s+siquiera\s+{keyword}\b',
+]
+
+# Detectar tema de la pregunta - EXPANDIDO para múltiples dominios
+QUESTION_TOPICS: Dict[str, List[str]] = {
+    # Económico
+    'economico': ['ayuda económica', 'dinero', 'económica', 'francos', 'billetes',
+                  'pago', 'suma', 'precio', 'costo', 'fortuna', 'herencia', 'deuda'],
+    # Envío/Comunicación
+    'envio': ['recibía', 'enviaba', 'mandaba', 'por correo', 'carta', 'mensaje',
+              'llegaba', 'entregaba', 'correspondencia'],
+    # Existencia/Ocurrencia
+    'existencia': ['ocurrió', 'sucedió', 'pasó', 'hubo', 'existió', 'había',
+                   'tuvo lugar', 'aconteció', 'se produjo'],
+    # Salud
+    'salud': ['enfermedad', 'enfermo', 'murió', 'curó', 'salud', 'herido',
+              'recuperó', 'sobrevivió', 'falleció'],
+    # Emociones
+    'emocion': ['sentía', 'emoción', 'feliz', 'triste', 'miedo', 'amaba',
+                'odiaba', 'quería', 'temía'],
+    # Eventos
+    'evento': ['guerra', 'batalla', 'accidente', 'celebración', 'boda',
+               'viaje', 'reunión', 'encuentro'],
+    # Verdad
+    'verdad': ['verdad', 'cierto', 'real', 'confirmó', 'demostró', 'probó'],
+    # Acciones
+    'accion': ['hizo', 'dijo', 'decidió', 'logró', 'consiguió', 'intentó',
+               'descubrió', 'encontró', 'vio', 'oyó'],
+}
+
+# (categoría, keyword) en el orden en que se recorrían: los keywords
+# repetidos en dos categorías (p.ej. 'quería') cuentan dos veces
+_CHUNK_KEYWORDS: List[Tuple[str, str]] = [
+    (category, keyword) for category, keywords in CRITICAL_KEYWORDS.items() for keyword in keywords
+]
+_ALL_KEYWORDS = sorted({keyword for _, keyword in _CHUNK_KEYWORDS}, key=len, reverse=True)
+_KEYWORD_ALTERNATION = '(?P<keyword>' + '|'.join(re.escape(keyword) for keyword in _ALL_KEYWORDS) + ')'
+
+# Un regex por patrón con TODOS los keywords. El lookahead hace que cada
+# posición se pruebe aunque esté dentro de una coincidencia anterior: se
+# encuentra lo mismo que con un re.search por keyword. En cada posición
+# solo un keyword puede cumplir el \b final (son palabras completas)
+_COMPILED_PATTERNS = [
+    re.compile('(?=' + template.format(keyword=_KEYWORD_ALTERNATION) + ')')
+    for template in NEGATION_PATTERNS
+]
+# Palabra de negación con la que empieza cada patrón: sin ella en la
+# respuesta, el patrón no puede coincidir
+_PATTERN_TRIGGERS = [re.match(r'\\b(\w+)', template).group(1) for template in NEGATION_PATTERNS]
+_TRIGGER_REGEX = re.compile(r'\b(?:' + '|'.join(sorted(set(_PATTERN_TRIGGERS))) + r')\b')
+
+_NUMBER_REGEX = re.compile(r'\b\d+\b')
+
+
+class AnswerContradictions:
+    """
+    Análisis de la respuesta que NO depende del chunk (uno por request)
+
+    Attributes:
+        negated: {keyword: índices de NEGATION_PATTERNS que lo niegan en la respuesta}
+        chunk_candidates: (categoría, keyword) negados, en el orden de CRITICAL_KEYWORDS
+        question_contradictions: Contradicciones con la pregunta (no dependen del chunk)
+        significant_numbers: Números > 10 de la respuesta
+    """
+
+    def __init__(self, negated: Dict[str, List[int]], question_contradictions: List[dict],
+                 significant_numbers: set):
+        self.negated = negated
+        self.chunk_candidates = [
+            (category, keyword) for category, keyword in _CHUNK_KEYWORDS if keyword in negated
+        ]
+        self.question_contradictions = question_contradictions
+        self.significant_numbers = significant_numbers
+
+
+def _negated_keywords(answer_lower: str) -> Dict[str, List[int]]:
+    """{keyword: patrones (en orden) que lo niegan en la respuesta}"""
+    triggers = set(_TRIGGER_REGEX.findall(answer_lower))
+    negated: Dict[str, List[int]] = {}
+    if not triggers:
+        return negated
+    for index, (pattern, trigger) in enumerate(zip(_COMPILED_PATTERNS, _PATTERN_TRIGGERS)):
+        if trigger not in triggers:
+            continue
+        for match in pattern.finditer(answer_lower):
+            indices = negated.setdefault(match.group('keyword'), [])
+            if not indices or indices[-1] != index:
+                indices.append(index)
+    return negated
+
+
+def analyze_answer(user_answer: str, question: str = "") -> AnswerContradictions:
+    """
+    Analiza la respuesta una sola vez para todos los chunks de un request
+
+    Args:
+        user_answer: Respuesta del usuario
+        question: Pregunta original (ESTRATEGIA 2: contradicción con la pregunta)
+    """
+    answer_lower = user_answer.lower()
+    negated = _negated_keywords(answer_lower)
+
+    # ESTRATEGIA 2: Contradicción con la PREGUNTA (no depende del chunk)
+    question_contradictions = []
+    question_lower = question.lower() if question else ""
+    if negated and question_lower:
+        added = set()
+        for topic, topic_keywords in QUESTION_TOPICS.items():
+            # Si la pregunta trata sobre este tema
+            if not any(tk in question_lower for tk in topic_keywords):
+                continue
+            # Buscar keywords relacionados de CRITICAL_KEYWORDS
+            related_keywords = CRITICAL_KEYWORDS.get(topic, [])
+            # También agregar keywords del tema 'dinero' si es económico
+            if topic == 'economico':
+                related_keywords = related_keywords + CRITICAL_KEYWORDS.get('dinero', [])
+            # Agregar keywords de existencia para temas de eventos
+            if topic in ['evento', 'existencia']:
+                related_keywords = related_keywords + CRITICAL_KEYWORDS.get('existencia', [])
+
+            for keyword in related_keywords:
+                # Evitar duplicados: un keyword cuenta una sola vez (primer patrón que lo niega)
+                if keyword in negated and keyword not in added:
+                    added.add(keyword)
+                    question_contradictions.append({
+                        'category': topic,
+                        'keyword': keyword,
+                        'pattern': NEGATION_PATTERNS[negated[keyword][0]].format(keyword=keyword),
+                        'source': 'question'
+                    })
+
+    answer_numbers = set(_NUMBER_REGEX.findall(answer_lower))
+    significant_numbers = {n for n in answer_numbers if int(n) > 10}
+
+    return AnswerContradictions(negated, question_contradictions, significant_numbers)
+
+
+def find_contradictions(analysis: AnswerContradictions, chunk_text: str,
+                        chunk_numbers: Optional[Iterable[str]] = None) -> List[dict]:
+    """
+    Contradicciones de la respuesta con un chunk (en el orden de la implementación original)
+
+    Args:
+        analysis: analyze_answer de la respuesta
+        chunk_text: Texto del chunk
+        chunk_numbers: (Opcional) Números del chunk ya extraídos (features del chunk)
+    """
+    contradictions_found = []
+
+    # ESTRATEGIA 1: Contradicción con el CHUNK (solo keywords que la respuesta niega)
+    if analysis.chunk_candidates:
+        chunk_lower = chunk_text.lower()
+        for category, keyword in analysis.chunk_candidates:
+            # Verificar si el keyword está en el chunk (es relevante)
+            if keyword in chunk_lower:
+                for index in analysis.negated[keyword]:
+                    contradictions_found.append({
+                        'category': category,
+                        'keyword': keyword,
+                        'pattern': NEGATION_PATTERNS[index].format(keyword=keyword),
+                        'source': 'chunk'
+                    })
+
+    # ESTRATEGIA 2: Contradicción con la PREGUNTA (precalculada)
+    contradictions_found.extend(analysis.question_contradictions)
+
+    # ESTRATEGIA 3: Detección de contradicción numérica
+    # Si el chunk menciona un número y la respuesta menciona otro diferente
+    # (excluyendo números muy comunes como 1, 2)
+    if analysis.significant_numbers:
+        if chunk_numbers is None:
+            chunk_numbers = _NUMBER_REGEX.findall(chunk_text.lower())
+        significant_chunk_nums = {n for n in chunk_numbers if int(n) > 10}
+        if significant_chunk_nums:
+            mismatched = analysis.significant_numbers - significant_chunk_nums
+            if mismatched:
+                # Hay números en la respuesta que no están en el chunk
+                contradictions_found.append({
+                    'category': 'numerico',
+                    'keyword': f"números: {list(mismatched)[:2]}",
+                    'pattern': 'numeric_mismatch',
+                    'source': 'numeric'
+                })
+
+    return contradictions_found
+
+
+def contradiction_penalty(contradictions_found: List[dict]) -> Tuple[bool, float, str]:
+    """
+    Penalización según las contradicciones encontradas
+
+    Returns:
+        Tuple[bool, float, str]: (is_contradiction, penalty_factor, reason)
+    """
+    if not contradictions_found:
+        return False, 1.0, ""
+
+    # Cuantas más contradicciones, mayor penalización
+    num_contradictions = len(contradictions_found)
+
+    # Verificar si hay contradicciones con la PREGUNTA (más graves)
+    has_question_contradiction = any(c.get('source') == 'question' for c in contradictions_found)
+
+    # ═══════════════════════════════════════════════════════════════
+    # PENALIZACIÓN MÁS SEVERA:
+    # - Contradicción con la pregunta = muy grave (el usuario niega
+    #   exactamente lo que la pregunta pregunta)
+    # - Múltiples contradicciones = grave
+    # ═══════════════════════════════════════════════════════════════
+    if has_question_contradiction:
+        # Si niega algo que la pregunta pregunta directamente
+        # Ejemplo: pregunta sobre "ayuda económica" y responde "nunca le mandó dinero"
+        penalty = 0.20  # Reducir score al 20% (forzar rechazo)
+        severity = "MUY GRAVE (contradice la pregunta)"
+    elif num_contradictions >= 3:
+        penalty = 0.25  # Reducir score al 25%
+        severity = "GRAVE"
+    elif num_contradictions >= 2:
+        penalty = 0.30  # Reducir score al 30%
+        severity = "MODERADA"
+    else:
+        penalty = 0.40  # Reducir score al 40%
+        severity = "LEVE"
+
+    keywords_negated = [c['keyword'] for c in contradictions_found[:3]]
+    reason = f"Contradicción {severity}: negación de '{', '.join(keywords_negated)}'"
+    return True, penalty, reason
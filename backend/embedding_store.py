@@ -0,0 +1,339 @@
+"""
+Almacén binario de embeddings para el modo local (sin Supabase)
+
+Antes cada material se guardaba en data/embeddings como JSON con indent=2
+(384 floats como texto por chunk) y validate_answer, get_stats y
+migrate_existing_materials hacían json.load del archivo completo en cada
+llamada: segundos para un libro de 5k chunks y ~5x más disco.
+
+Formato por material (material_{id}_{timestamp}.*):
+- .npy        Matriz float32 (N x 384), filas con norma 1. Se abre con
+              np.load(mmap_mode='r'): los workers de uvicorn comparten las
+              páginas a través de la caché del sistema operativo
+- .texts      Textos de los chunks concatenados en UTF-8 (también mmap)
+- .meta.json  Sidecar compacto: count, dim, offsets de cada texto en .texts,
+              keywords del índice léxico, features precalculadas de cada
+              chunk (chunk_features.py) y total de caracteres. Se escribe
+              al final: si existe, el material está completo
+
+Los JSON antiguos se convierten la primera vez que se leen
+(convert_legacy_file) y se pueden eliminar con:
+    python embedding_store.py --migrate --remove-json
+
+Autor: Abel Jesús Moya Acosta
+Fecha: 17 de noviembre de 2025
+"""
+
+import argparse
+import json
+import mmap
+import os
+import re
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+STORE_FORMAT = 1
+META_SUFFIX = ".meta.json"
+
+# Longitud del texto de vista previa (igual que material_cache)
+PREVIEW_LENGTH = 200
+
+_STEM_PATTERN = re.compile(r"^material_(\d+)_(.+)$")
+
+
+def material_stem(material_id: int, timestamp: str) -> str:
+    """Nombre base de los archivos de un material: material_{id}_{timestamp}"""
+    return f"material_{material_id}_{timestamp}"
+
+
+def parse_stem(stem: str):
+    """(material_id, timestamp) a partir del nombre base, o None si no coincide"""
+    match = _STEM_PATTERN.match(stem)
+    if not match:
+        return None
+    # Igual que el índice antiguo: timestamp = fecha (parte antes del primer '_')
+    return int(match.group(1)), match.group(2).split('_')[0]
+
+
+def _atomic_write(path: Path, data: bytes):
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def save_material(directory: Path, stem: str, texts: List[str], embeddings,
+                  keywords: Optional[List[List[str]]] = None,
+                  features: Optional[List[dict]] = None) -> Path:
+    """
+    Guarda un material en formato binario
+
+    Args:
+        directory: Directorio de embeddings (data/embeddings)
+        stem: Nombre base (material_stem)
+        texts: Texto completo de cada chunk (ya normalizado)
+        embeddings: Matriz o lista de vectores (N x d); se guardan con norma 1
+        keywords: (Opcional) Keywords del índice léxico por chunk
+        features: (Opcional) Features precalculadas por chunk (chunk_features.py)
+
+    Returns:
+        Ruta del sidecar .meta.json
+    """
+    directory = Path(directory)
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    if matrix.ndim != 2:
+        matrix = matrix.reshape(len(texts), -1)
+    # Norma 1: el coseno no cambia y el pre-filtrado usa la matriz directamente
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms < 1e-10] = 1.0
+    matrix = np.ascontiguousarray(matrix / norms, dtype=np.float32)
+
+    encoded = [text.encode('utf-8') for text in texts]
+    offsets = [0]
+    for chunk_bytes in encoded:
+        offsets.append(offsets[-1] + len(chunk_bytes))
+
+    npy_path = directory / f"{stem}.npy"
+    tmp_npy = directory / f"{stem}.npy.tmp"
+    with open(tmp_npy, 'wb') as f:
+        np.save(f, matrix)
+    os.replace(tmp_npy, npy_path)
+    _atomic_write(directory / f"{stem}.texts", b"".join(encoded))
+
+    meta = {
+        "format": STORE_FORMAT,
+        "count": len(texts),
+        "dim": int(matrix.shape[1]) if matrix.size else 0,
+        "offsets": offsets,
+        "total_characters": sum(len(text) for text in texts),
+        "keywords": keywords,
+        "features": features
+    }
+    meta_path = directory / f"{stem}{META_SUFFIX}"
+    _atomic_write(meta_path, json.dumps(meta, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+    return meta_path
+
+
+class LocalChunks:
+    """
+    Secuencia de chunks en el formato de HybridValidator, construidos bajo demanda
+
+    El pre-filtrado solo toca los K candidatos: los demás textos ni se
+    decodifican. 'embedding' es una vista de la fila de la matriz mmap.
+    """
+
+    def __init__(self, material: "LocalMaterial"):
+        self._material = material
+
+    def __len__(self) -> int:
+        return len(self._material)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        index = int(index)  # índices numpy (top_k_indices) → int de Python
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self._material.chunk(index)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._material.chunk(i)
+
+
+class LocalMaterial:
+    """
+    Material abierto desde el almacén binario (matriz y textos por mmap)
+
+    Attributes:
+        matrix: Matriz float32 (N x d) de solo lectura, filas con norma 1
+        chunks: Secuencia de chunks (LocalChunks) para HybridValidator
+    """
+
+    def __init__(self, meta_path: Path):
+        meta_path = Path(meta_path)
+        self.meta_path = meta_path
+        self.stem = meta_path.name[:-len(META_SUFFIX)]
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+
+        self.count = int(self.meta["count"])
+        self.offsets = self.meta["offsets"]
+        self.keywords = self.meta.get("keywords")
+        self.features = self.meta.get("features")
+        self.matrix = np.load(meta_path.with_name(f"{self.stem}.npy"), mmap_mode='r')
+
+        texts_path = meta_path.with_name(f"{self.stem}.texts")
+        if self.offsets[-1] > 0:
+            with open(texts_path, 'rb') as f:
+                self._texts = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._texts = b""
+
+        self.chunks = LocalChunks(self)
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def total_characters(self) -> int:
+        return int(self.meta.get("total_characters", 0))
+
+    def text(self, index: int) -> str:
+        return self._texts[self.offsets[index]:self.offsets[index + 1]].decode('utf-8')
+
+    def chunk(self, index: int) -> Dict[str, Any]:
+        text = self.text(index)
+        chunk = {
+            "chunk_id": index,
+            "text": text[:PREVIEW_LENGTH] + "..." if len(text) > PREVIEW_LENGTH else text,
+            "text_full": text,
+            "embedding": self.matrix[index]
+        }
+        # Solo las keywords: la expansión la hace HybridValidator para los K candidatos
+        if self.keywords is not None:
+            chunk["keywords"] = self.keywords[index]
+        if self.features is not None:
+            chunk["features"] = self.features[index]
+        return chunk
+
+    def disk_bytes(self) -> int:
+        return sum(
+            self.meta_path.with_name(f"{self.stem}{suffix}").stat().st_size
+            for suffix in (".npy", ".texts", META_SUFFIX)
+        )
+
+
+def is_legacy_file(path: Path) -> bool:
+    """JSON antiguo (lista de chunks), no el sidecar .meta.json"""
+    return path.suffix == ".json" and not path.name.endswith(META_SUFFIX)
+
+
+def convert_legacy_file(path: Path, remove_json: bool = False) -> Path:
+    """
+    Convierte un JSON antiguo (lista de chunks con 'text_full' y 'embedding')
+    al formato binario
+
+    Returns:
+        Ruta del sidecar .meta.json
+    """
+    path = Path(path)
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    texts = [chunk.get("text_full", chunk.get("text", "")) for chunk in data]
+    embeddings = [chunk["embedding"] for chunk in data]
+    keywords = [chunk.get("keywords") for chunk in data]
+    if any(k is None for k in keywords):
+        keywords = None
+
+    meta_path = save_material(path.parent, path.stem, texts, embeddings, keywords=keywords)
+    if remove_json:
+        path.unlink()
+    return meta_path
+
+
+def convert_legacy_files(directory: Path, remove_json: bool = False) -> int:
+    """Convierte todos los JSON antiguos sin versión binaria. Retorna cuántos se convirtieron"""
+    directory = Path(directory)
+    converted = 0
+    for path in sorted(directory.glob("material_*.json")):
+        if not is_legacy_file(path):
+            continue
+        meta_path = path.with_name(f"{path.stem}{META_SUFFIX}")
+        if meta_path.exists():
+            if remove_json:
+                path.unlink()
+            continue
+        try:
+            convert_legacy_file(path, remove_json=remove_json)
+            converted += 1
+        except Exception as e:
+            print(f"⚠️ Error convirtiendo {path.name}: {e}")
+    return converted
+
+
+def open_material(directory: Path, material_id=None) -> Optional[LocalMaterial]:
+    """
+    Abre un material del almacén (el más reciente si hay varias versiones)
+
+    Si solo existe el JSON antiguo, se convierte una vez y se abre el binario.
+    Sin material_id se abre el primer material disponible (comportamiento
+    anterior del fallback local de validate_answer).
+
+    Returns:
+        LocalMaterial o None si no hay material
+    """
+    directory = Path(directory)
+    pattern = f"material_{material_id}_*" if material_id is not None else "material_*"
+
+    meta_paths = sorted(directory.glob(f"{pattern}{META_SUFFIX}"))
+    if not meta_paths:
+        legacy_paths = sorted(p for p in directory.glob(f"{pattern}.json") if is_legacy_file(p))
+        if not legacy_paths:
+            return None
+        meta_paths = [convert_legacy_file(legacy_paths[-1])]
+
+    return LocalMaterial(meta_paths[-1] if material_id is not None else meta_paths[0])
+
+
+def list_materials(directory: Path) -> List[Dict[str, Any]]:
+    """
+    Resumen de los materiales guardados (sin cargar matrices ni textos)
+
+    Solo lectura: los JSON antiguos sin versión binaria no se listan ni se
+    convierten (se convierten en open_material o con convert_legacy_files).
+
+    Returns:
+        Lista de dicts con material_id, timestamp, total_chunks,
+        total_characters y disk_bytes
+    """
+    directory = Path(directory)
+    materials = []
+    for meta_path in sorted(directory.glob(f"material_*{META_SUFFIX}")):
+        stem = meta_path.name[:-len(META_SUFFIX)]
+        parsed = parse_stem(stem)
+        if parsed is None:
+            continue
+        try:
+            material = LocalMaterial(meta_path)
+            materials.append({
+                "material_id": parsed[0],
+                "timestamp": parsed[1],
+                "stem": stem,
+                "total_chunks": len(material),
+                "total_characters": material.total_characters,
+                "disk_bytes": material.disk_bytes()
+            })
+        except Exception as e:
+            print(f"⚠️ Error leyendo {meta_path.name}: {e}")
+    return materials
+
+
+def store_stats(directory: Path) -> Dict[str, Any]:
+    """Estadísticas del almacén para /api/stats (solo lectura, ver list_materials)"""
+    materials = list_materials(directory)
+    return {
+        "materials": len(materials),
+        "total_embeddings": sum(m["total_chunks"] for m in materials),
+        "total_bytes": sum(m["disk_bytes"] for m in materials),
+        "legacy_json_files": sum(1 for p in Path(directory).glob("material_*.json") if is_legacy_file(p))
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Almacén binario de embeddings (modo local)")
+    parser.add_argument("--dir", default=str(Path(__file__).parent.parent / "data" / "embeddings"),
+                        help="Directorio de embeddings")
+    parser.add_argument("--migrate", action="store_true", help="Convertir los JSON antiguos")
+    parser.add_argument("--remove-json", action="store_true", help="Eliminar los JSON ya convertidos")
+    args = parser.parse_args()
+
+    if args.migrate:
+        count = convert_legacy_files(Path(args.dir), remove_json=args.remove_json)
+        print(f"✅ {count} materiales convertidos a formato binario")
+    print(json.dumps(store_stats(Path(args.dir)), indent=2))
@@ -12,32 +12,31 @@ Fecha: 7 de octubre de 2025
 
 from sentence_transformers import SentenceTransformer
 import numpy as np
-from typing import List, Union
+from typing import Iterator, List, Tuple, Union
 import json
 from pathlib import Path
 import os
 
-# Aquí se importa normalizador de texto
-from text_normalizer import normalize_text, normalize_text_batch, detect_ocr_errors
+# Aquí se importa normalizador de texto (con caché direccionada por contenido)
+from text_normalizer import detect_ocr_errors
+from normalization_cache import normalize_cached, normalize_cached_batch
+from model_manager import ModelManager
 
-# Cargar modelo globalmente para reutilizar
+# Modelo compartido por todo el proceso: carga en segundo plano, estado y
+# descarga por inactividad en model_manager (MODEL_IDLE_UNLOAD_SECONDS)
 MODEL_NAME = os.getenv('MODEL_NAME', 'all-MiniLM-L6-v2')
-model = None
+model_manager = ModelManager(MODEL_NAME, lambda: SentenceTransformer(MODEL_NAME))
+
+# Tamaño de micro-batch para generar embeddings en lote (upload de materiales)
+EMBEDDING_BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', '32'))
 
 def load_model():
-    """Carga el modelo de embeddings si no está cargado"""
-    global model
-    if model is None:
-        print(f"🔄 Cargando modelo {MODEL_NAME}...")
-        try:
-            model = SentenceTransformer(MODEL_NAME)
-            print(f"✅ Modelo {MODEL_NAME} cargado exitosamente")
-        except Exception as e:
-            print(f"❌ Error cargando modelo: {e}")
-            raise
-    return model
+    """Devuelve el modelo de embeddings (lo carga y espera si no está en memoria)"""
+    return model_manager.get()
 
-def generate_embeddings(text: Union[str, List[str]], debug_ocr: bool = False) -> np.ndarray:
+def generate_embeddings(text: Union[str, List[str]], debug_ocr: bool = False,
+                        show_progress_bar: bool = True, batch_size: int = 32,
+                        normalize: bool = True) -> np.ndarray:
     """
     Genera embeddings para texto o lista de textos
     
@@ -46,6 +45,10 @@ def generate_embeddings(text: Union[str, List[str]], debug_ocr: bool = False) ->
     Args:
         text: Texto o lista de textos a vectorizar
         debug_ocr: Si True, imprime estadísticas de errores OCR detectados
+        show_progress_bar: Mostrar barra de progreso al vectorizar listas
+        batch_size: Textos por forward pass del modelo al vectorizar listas
+        normalize: Si False, el texto ya viene normalizado (p.ej. chunks del
+                   chunking) y se vectoriza tal cual
         
     Returns:
         np.ndarray: Array de embeddings (384 dimensiones)
@@ -54,7 +57,7 @@ def generate_embeddings(text: Union[str, List[str]], debug_ocr: bool = False) ->
     
     if isinstance(text, str):
         # Aquí se normaliza el texto antes de embedding
-        normalized = normalize_text(text)
+        normalized = normalize_cached(text) if normalize else text
         
         # Debug: Mostrar correcciones si se solicita
         if debug_ocr and normalized != text:
@@ -68,15 +71,62 @@ def generate_embeddings(text: Union[str, List[str]], debug_ocr: bool = False) ->
         return model.encode(normalized, convert_to_numpy=True)
     else:
         # Normalizar lista de textos
-        normalized_list = normalize_text_batch(text)
+        normalized_list = normalize_cached_batch(text) if normalize else list(text)
         
         # Debug: Contar textos con errores
-        if debug_ocr:
+        if debug_ocr and normalize:
             errors_count = sum(1 for t in text if detect_ocr_errors(t)['has_errors'])
             if errors_count > 0:
                 print(f"\n⚠️  {errors_count}/{len(text)} textos tenían errores OCR (corregidos)")
         
-        return model.encode(normalized_list, convert_to_numpy=True, show_progress_bar=True)
+        return model.encode(normalized_list, convert_to_numpy=True,
+                            show_progress_bar=show_progress_bar, batch_size=batch_size)
+
+def plan_embedding_batches(texts: List[str], batch_size: int = None) -> List[List[int]]:
+    """
+    Agrupa los índices de los textos en micro-batches de longitud parecida
+    
+    Los textos se ordenan por longitud (descendente) para que el tokenizer
+    rellene (padding) lo mínimo posible dentro de cada batch.
+    
+    Args:
+        texts: Lista de textos a vectorizar
+        batch_size: Textos por batch (default: EMBEDDING_BATCH_SIZE)
+        
+    Returns:
+        List[List[int]]: Índices originales de los textos de cada batch
+    """
+    if batch_size is None:
+        batch_size = EMBEDDING_BATCH_SIZE
+    batch_size = max(1, int(batch_size))
+    
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+    return [order[start:start + batch_size] for start in range(0, len(order), batch_size)]
+
+def iter_embedding_batches(texts: List[str], batch_size: int = None,
+                           normalize: bool = True) -> Iterator[Tuple[List[int], np.ndarray]]:
+    """
+    Genera embeddings de una lista de textos en micro-batches
+    
+    Los textos se ordenan por longitud (descendente) antes de agruparlos, así
+    cada batch contiene textos de tamaño parecido y el tokenizer rellena
+    (padding) lo mínimo posible. Cada batch es UNA sola llamada a
+    generate_embeddings (un forward pass del modelo).
+    
+    Args:
+        texts: Lista de textos a vectorizar
+        batch_size: Textos por batch (default: EMBEDDING_BATCH_SIZE)
+        normalize: Si False, los textos ya vienen normalizados
+        
+    Yields:
+        Tuple[List[int], np.ndarray]: (índices originales de los textos del batch,
+                                       embeddings del batch en ese mismo orden)
+    """
+    for batch_indices in plan_embedding_batches(texts, batch_size):
+        batch_texts = [texts[i] for i in batch_indices]
+        batch_embeddings = generate_embeddings(batch_texts, show_progress_bar=False,
+                                               batch_size=len(batch_texts), normalize=normalize)
+        yield batch_indices, batch_embeddings
 
 def calculate_similarity(embedding1: Union[np.ndarray, List], 
                         embedding2: Union[np.ndarray, List]) -> float:
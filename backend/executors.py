@@ -0,0 +1,156 @@
+"""
+Capa de ejecución: pools de trabajo para los endpoints async
+
+upload_material, validate_answer y validate_answer_by_topic son `async def`
+pero llamaban código bloqueante directamente (extracción de PDF con
+subprocesos/PyMuPDF, SentenceTransformer.encode, cliente síncrono de
+supabase-py). Un solo upload congelaba el event loop de uvicorn: ninguna
+otra petición (ni el propio stream SSE de progreso) avanzaba hasta terminar.
+
+Ahora el trabajo bloqueante se envía a pools acotados y el handler solo
+hace `await`:
+
+- io:     llamadas de red/disco (Supabase, archivos). Muchos hilos, casi
+          siempre esperando respuesta
+- cpu:    trabajo CPU interactivo y corto (scoring de validación)
+- ingest: trabajo CPU pesado de ingesta (extracción de PDF, chunking,
+          batches de embeddings). Pool separado y pequeño, así un PDF
+          grande no deja en cola a las validaciones concurrentes
+
+Se usan hilos (no procesos): el modelo de embeddings (torch), numpy y los
+subprocesos de extracción liberan el GIL, y el modelo no se puede compartir
+entre procesos sin cargarlo una vez por proceso.
+
+Cada pool expone métricas (tareas en cola, activas, completadas, espera
+máxima) en /api/health.
+
+Autor: Abel Jesús Moya Acosta
+Fecha: 17 de noviembre de 2025
+"""
+
+import asyncio
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+# Configuración (variables de entorno)
+IO_POOL_WORKERS = int(os.getenv('IO_POOL_WORKERS', '16'))
+CPU_POOL_WORKERS = int(os.getenv('CPU_POOL_WORKERS', str(min(4, os.cpu_count() or 1))))
+INGEST_POOL_WORKERS = int(os.getenv('INGEST_POOL_WORKERS', '2'))
+
+
+class WorkerPool:
+    """
+    ThreadPoolExecutor acotado con métricas de profundidad de cola
+
+    Attributes:
+        name: Nombre del pool (io, cpu, ingest)
+        max_workers: Hilos máximos
+        queued: Tareas enviadas que aún no empiezan
+        active: Tareas en ejecución
+    """
+
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max(1, int(max_workers))
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                            thread_name_prefix=f"recuiva-{name}")
+        self._lock = threading.Lock()
+
+        self.queued = 0
+        self.active = 0
+        self.completed = 0
+        self.failed = 0
+        self.max_queue_depth = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def _run(self, fn: Callable, submitted_at: float) -> Any:
+        wait = time.perf_counter() - submitted_at
+        with self._lock:
+            self.queued -= 1
+            self.active += 1
+            self.total_wait_seconds += wait
+            self.max_wait_seconds = max(self.max_wait_seconds, wait)
+        try:
+            result = fn()
+        except BaseException:
+            with self._lock:
+                self.failed += 1
+            raise
+        else:
+            with self._lock:
+                self.completed += 1
+        finally:
+            with self._lock:
+                self.active -= 1
+        return result
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Ejecuta fn(*args, **kwargs) en el pool y espera el resultado sin bloquear el loop"""
+        with self._lock:
+            self.queued += 1
+            self.max_queue_depth = max(self.max_queue_depth, self.queued)
+        call = functools.partial(fn, *args, **kwargs)
+        future = self._executor.submit(self._run, call, time.perf_counter())
+        future.add_done_callback(self._on_done)
+        return await asyncio.wrap_future(future)
+
+    def _on_done(self, future):
+        # Tarea cancelada antes de empezar (p.ej. el cliente cerró la conexión)
+        if future.cancelled():
+            with self._lock:
+                self.queued -= 1
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            # La espera se acumula para toda tarea que empezó (exitosa o fallida)
+            started = self.completed + self.failed
+            return {
+                "max_workers": self.max_workers,
+                "queued": self.queued,
+                "active": self.active,
+                "completed": self.completed,
+                "failed": self.failed,
+                "max_queue_depth": self.max_queue_depth,
+                "avg_wait_ms": round(self.total_wait_seconds / started * 1000, 2) if started else 0.0,
+                "max_wait_ms": round(self.max_wait_seconds * 1000, 2)
+            }
+
+
+# Instancias globales (una por proceso)
+io_pool = WorkerPool("io", IO_POOL_WORKERS)
+cpu_pool = WorkerPool("cpu", CPU_POOL_WORKERS)
+ingest_pool = WorkerPool("ingest", INGEST_POOL_WORKERS)
+
+
+async def run_io(fn: Callable, *args, **kwargs) -> Any:
+    """Llamada de red/disco bloqueante (p.ej. `query.execute`) en el pool io"""
+    return await io_pool.run(fn, *args, **kwargs)
+
+
+async def run_cpu(fn: Callable, *args, **kwargs) -> Any:
+    """Trabajo CPU interactivo (validación) en el pool cpu"""
+    return await cpu_pool.run(fn, *args, **kwargs)
+
+
+async def run_ingest(fn: Callable, *args, **kwargs) -> Any:
+    """Trabajo CPU pesado de ingesta (PDF, chunking, embeddings) en el pool ingest"""
+    return await ingest_pool.run(fn, *args, **kwargs)
+
+
+def pool_stats() -> Dict[str, Dict[str, Any]]:
+    """Métricas de todos los pools (para /api/health)"""
+    return {pool.name: pool.stats() for pool in (io_pool, cpu_pool, ingest_pool)}
+
+
+def shutdown_pools(wait: bool = True):
+    """Detiene los pools (llamar al apagar el servidor)"""
+    for pool in (io_pool, cpu_pool, ingest_pool):
+        pool.shutdown(wait=wait)
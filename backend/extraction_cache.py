@@ -0,0 +1,242 @@
+"""
+Caché en disco de extracción de PDF y OCR direccionada por contenido
+
+Volver a subir o reprocesar el mismo PDF (reprocess_material.py, varios
+estudiantes subiendo la misma separata del curso) repetía pdftotext y el
+OCR desde cero.
+
+Este módulo guarda en SQLite (EXTRACTION_CACHE_PATH):
+- Documentos: clave = SHA-256 de (versión + perfil de extracción + bytes
+  del PDF). Valor: texto limpio, número de páginas y offset de inicio de
+  cada página en el texto
+- Páginas OCR: clave = SHA-256 de (versión + idioma + píxeles de la página
+  renderizada). Una página escaneada idéntica en otro PDF (otra edición de
+  la separata) tampoco se vuelve a pasar por Tesseract
+
+Expulsión LRU acotada por bytes (EXTRACTION_CACHE_MAX_MB), compartida por
+documentos y páginas. last_used se actualiza en cada acierto.
+
+Subir EXTRACTION_CACHE_VERSION al cambiar la extracción o la limpieza de
+texto: las entradas de otra versión nunca se reutilizan.
+
+Autor: Abel Jesús Moya Acosta
+Fecha: 17 de noviembre de 2025
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Configuración (variables de entorno)
+DEFAULT_CACHE_PATH = Path(__file__).parent.parent / "data" / "cache" / "extraction_cache.sqlite3"
+EXTRACTION_CACHE_PATH = os.getenv('EXTRACTION_CACHE_PATH', str(DEFAULT_CACHE_PATH))
+EXTRACTION_CACHE_MAX_MB = float(os.getenv('EXTRACTION_CACHE_MAX_MB', '512'))
+# Texto máximo de un documento para guardarlo en caché desde la extracción en
+# streaming (chunking.iter_pdf_pages acumula sus páginas hasta ese tamaño)
+EXTRACTION_CACHE_MAX_DOCUMENT_MB = float(os.getenv('EXTRACTION_CACHE_MAX_DOCUMENT_MB', '8'))
+
+EXTRACTION_CACHE_VERSION = "1"
+
+
+def content_digest(data: bytes) -> str:
+    """SHA-256 de un PDF en memoria"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_digest(path, block_size: int = 1024 * 1024) -> str:
+    """SHA-256 de un PDF en disco, leído por bloques (sin cargarlo entero)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def document_key(content_sha256: str, profile: str = "") -> str:
+    """
+    Clave de un documento: SHA-256 del PDF + versión + perfil de extracción
+
+    Recibe el hash ya calculado (la subida lo calcula mientras escribe el
+    archivo) para no volver a leer el PDF.
+    """
+    return hashlib.sha256(
+        f"doc\0{EXTRACTION_CACHE_VERSION}\0{profile}\0{content_sha256}".encode('utf-8')
+    ).hexdigest()
+
+
+def page_key(pixels: bytes, lang: str) -> str:
+    """Clave de una página OCR: hash de la imagen renderizada + idioma"""
+    digest = hashlib.sha256(f"page\0{EXTRACTION_CACHE_VERSION}\0{lang}\0".encode('utf-8'))
+    digest.update(pixels)
+    return digest.hexdigest()
+
+
+class ExtractionCache:
+    """
+    Caché LRU en SQLite de documentos extraídos y páginas OCR
+
+    Thread-safe (una conexión por instancia protegida por lock) y segura
+    entre procesos uvicorn (SQLite en modo WAL).
+    """
+
+    def __init__(self, path: Optional[str], max_bytes: int,
+                 max_document_bytes: int = int(EXTRACTION_CACHE_MAX_DOCUMENT_MB * 1024 * 1024)):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_document_bytes = min(max_document_bytes, max_bytes)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._total_bytes: Optional[int] = None
+
+        self.document_hits = 0
+        self.document_misses = 0
+        self.page_hits = 0
+        self.page_misses = 0
+        self.evicted = 0
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        """Abre (una vez) el archivo de caché; None si está desactivado o falla"""
+        if self._conn is not None or not self.path:
+            return self._conn
+        try:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, kind TEXT NOT NULL, value TEXT NOT NULL, "
+                "size INTEGER NOT NULL, last_used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_last_used ON entries(last_used)")
+            conn.commit()
+            self._total_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            self._conn = conn
+        except sqlite3.Error as e:
+            print(f"⚠️ Caché de extracción desactivada: {e}")
+            self.path = None
+        return self._conn
+
+    def _get(self, key: str) -> Optional[str]:
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return None
+            try:
+                row = conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                conn.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+                conn.commit()
+                return row[0]
+            except sqlite3.Error as e:
+                print(f"⚠️ Error leyendo caché de extracción: {e}")
+                return None
+
+    def _put(self, key: str, kind: str, value: str):
+        size = len(value.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, kind, value, size, last_used) VALUES (?, ?, ?, ?, ?)",
+                    (key, kind, value, size, time.time())
+                )
+                # Total real (otros procesos también escriben), luego expulsar LRU
+                self._total_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+                if self._total_bytes > self.max_bytes:
+                    self._evict_locked(conn)
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"⚠️ Error guardando en caché de extracción: {e}")
+
+    def _evict_locked(self, conn: sqlite3.Connection):
+        """Elimina las entradas menos usadas hasta quedar en el 90% del límite"""
+        target = int(self.max_bytes * 0.9)
+        removed = []
+        total = self._total_bytes
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY last_used ASC"):
+            if total <= target:
+                break
+            removed.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM entries WHERE key = ?", removed)
+        self._total_bytes = total
+        self.evicted += len(removed)
+
+    # ─── Documentos ──────────────────────────────────────────────────────
+
+    def get_document(self, key: str) -> Optional[Dict[str, Any]]:
+        """{'text', 'pages', 'page_offsets'} o None"""
+        value = self._get(key)
+        if value is None:
+            self.document_misses += 1
+            return None
+        self.document_hits += 1
+        return json.loads(value)
+
+    def put_document(self, key: str, text: str, pages: int, page_offsets: List[int]):
+        value = json.dumps({"text": text, "pages": pages, "page_offsets": page_offsets},
+                           ensure_ascii=False, separators=(',', ':'))
+        self._put(key, "document", value)
+
+    # ─── Páginas OCR ─────────────────────────────────────────────────────
+
+    def get_page(self, key: str) -> Optional[str]:
+        value = self._get(key)
+        if value is None:
+            self.page_misses += 1
+        else:
+            self.page_hits += 1
+        return value
+
+    def put_page(self, key: str, text: str):
+        self._put(key, "page", text)
+
+    def clear(self):
+        with self._lock:
+            conn = self._connect()
+            if conn is not None:
+                try:
+                    conn.execute("DELETE FROM entries")
+                    conn.commit()
+                except sqlite3.Error as e:
+                    print(f"⚠️ Error vaciando caché de extracción: {e}")
+            self._total_bytes = 0
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def stats(self) -> Dict[str, Any]:
+        document_requests = self.document_hits + self.document_misses
+        page_requests = self.page_hits + self.page_misses
+        return {
+            "enabled": bool(self.path),
+            "size_mb": round((self._total_bytes or 0) / (1024 * 1024), 2),
+            "max_mb": round(self.max_bytes / (1024 * 1024), 2),
+            "document_hits": self.document_hits,
+            "document_misses": self.document_misses,
+            "page_hits": self.page_hits,
+            "page_misses": self.page_misses,
+            "evicted": self.evicted,
+            "document_hit_rate": round(self.document_hits / document_requests, 3) if document_requests else 0.0,
+            "page_hit_rate": round(self.page_hits / page_requests, 3) if page_requests else 0.0
+        }
+
+
+# Instancia global (una por proceso)
+extraction_cache = ExtractionCache(
+    path=EXTRACTION_CACHE_PATH or None,
+    max_bytes=int(EXTRACTION_CACHE_MAX_MB * 1024 * 1024)
+)
@@ -1,26 +1,195 @@
-import numpy as np
+import heapq
+import math
 import re
+import numpy as np
 from typing import List, Dict, Tuple
 from rank_bm25 import BM25Okapi
 
+from chunk_features import DIALOGUE_CHARS, REASONING_VERBS, chunk_features, compute_chunk_features
+from contradiction_detector import (AnswerContradictions, analyze_answer, contradiction_penalty,
+                                    find_contradictions)
+from lexical_index import STOPWORDS, extract_keywords, expand_keywords
+
+
+def compile_patterns(patterns) -> re.Pattern:
+    """Alternación precompilada de subcadenas: equivale a any(p in texto for p in patterns)"""
+    return re.compile('|'.join(re.escape(pattern) for pattern in patterns))
+
+
+# ═══════════════════════════════════════════════════════════════
+# PATRONES DE TIPO DE PREGUNTA
+# Se compilan una vez al importar el módulo (una búsqueda por pregunta en
+# lugar de un `in` por patrón) y se comparten entre validadores e hilos.
+# ═══════════════════════════════════════════════════════════════
+
+# Patrones para preguntas de RAZONAMIENTO (classify_question_type)
+REASONING_QUESTION_PATTERNS = (
+    # Causales
+    'por qué', 'por que', 'cuál es la razón', 'cual es la razon',
+    'qué razones', 'que razones', 'qué motivo', 'que motivo',
+    'a qué se debe', 'a que se debe', 'cómo se explica', 'como se explica',
+    
+    # Procesos mentales
+    'qué proceso de pensamiento', 'que proceso de pensamiento',
+    'qué pensó', 'que penso', 'qué opinión', 'que opinion',
+    'qué postura', 'que postura', 'cómo interpreta', 'como interpreta',
+    'qué intención', 'que intencion', 'con qué propósito', 'con que proposito',
+    
+    # Inferencia
+    'qué sugiere', 'que sugiere', 'qué indica', 'que indica',
+    'qué permite deducir', 'que permite deducir', 'qué implica', 'que implica',
+    'qué se puede inferir', 'que se puede inferir',
+    'qué conclusión', 'que conclusion',
+    
+    # Significado
+    'qué representa', 'que representa', 'qué simboliza', 'que simboliza',
+    'qué significa', 'que significa', 'cuál es el significado',
+    'qué importancia tiene', 'que importancia tiene',
+)
+
+# Patrones para preguntas LITERALES (classify_question_type)
+LITERAL_QUESTION_PATTERNS = (
+    # Hechos directos
+    'qué hizo', 'que hizo', 'qué dijo', 'que dijo',
+    'dónde estaba', 'donde estaba', 'dónde se encontraba', 'donde se encontraba',
+    'cuándo ocurrió', 'cuando ocurrio', 'cuándo sucedió', 'cuando sucedio',
+    'quién era', 'quien era', 'quiénes eran', 'quienes eran',
+    
+    # Relaciones/Datos
+    'qué relación tenía', 'que relacion tenia', 'qué recibía', 'que recibia',
+    'qué papel cumple', 'que papel cumple', 'cuántos', 'cuantos',
+    'qué tipo de', 'que tipo de', 'cuál era', 'cual era',
+    
+    # Descripciones
+    'cómo era', 'como era', 'cómo se llamaba', 'como se llamaba',
+    'qué contenía', 'que contenia', 'qué incluía', 'que incluia',
+)
+
+# Keywords para preguntas INFERENCIALES (is_inferential_question)
+INFERENTIAL_QUESTION_KEYWORDS = (
+    # Causales - "¿Por qué?"
+    'por qué', 'por que', 'cuál es la razón', 'cual es la razon',
+    'qué razones', 'que razones', 'qué motivo', 'que motivo',
+    'a qué se debe', 'a que se debe', 'cómo se explica', 'como se explica',
+    
+    # Inferenciales - Deducción
+    'qué sugiere', 'que sugiere', 'qué indica', 'que indica',
+    'qué permite deducir', 'que permite deducir', 'qué implica', 'que implica',
+    'qué evidencia', 'que evidencia', 'qué indicio', 'que indicio',
+    'cómo deduce', 'como deduce', 'cómo sabes', 'como sabes',
+    'qué puedes inferir', 'que puedes inferir',
+    'qué conclusión', 'que conclusion',
+    
+    # Predictivas
+    'qué pasaría si', 'que pasaria si', 'qué crees que', 'que crees que',
+    'qué hubiera pasado', 'que hubiera pasado',
+    
+    # Comparativas/Analíticas
+    'en qué se diferencia', 'en que se diferencia',
+    'qué relación', 'que relacion', 'cómo se relaciona', 'como se relaciona',
+    'qué tienen en común', 'que tienen en comun',
+    
+    # Intenciones/Propósito
+    'con qué intención', 'con que intencion',
+    'para qué', 'para que', 'cuál es el propósito', 'cual es el proposito',
+    'qué pretende', 'que pretende',
+    
+    # Significado/Simbolismo (NUEVO)
+    'qué representa', 'que representa', 'qué simboliza', 'que simboliza',
+    'qué significa', 'que significa', 'cuál es el significado', 'cual es el significado',
+    'qué importancia', 'que importancia', 'cuál es la importancia', 'cual es la importancia',
+    'qué papel', 'que papel', 'qué rol', 'que rol',
+    'qué sentido', 'que sentido',
+)
+
+REASONING_QUESTION_REGEX = compile_patterns(REASONING_QUESTION_PATTERNS)
+LITERAL_QUESTION_REGEX = compile_patterns(LITERAL_QUESTION_PATTERNS)
+INFERENTIAL_QUESTION_REGEX = compile_patterns(INFERENTIAL_QUESTION_KEYWORDS)
+
+
+class ScoringContext:
+    """
+    Datos de una validación que NO dependen del chunk evaluado
+    
+    Se calculan una sola vez por request y se reutilizan para todos los
+    chunks pre-filtrados:
+    - Embeddings de la respuesta y de "pregunta + respuesta" (un solo encode)
+    - Keywords de pregunta y respuesta
+    - Tipo de pregunta (razonamiento/literal) y si es inferencial
+    - Bonus por longitud de la respuesta
+    - Análisis de negaciones de la respuesta (detect_contradiction)
+    """
+    
+    def __init__(self, question: str, answer: str, answer_embedding: np.ndarray,
+                 query_embedding: np.ndarray, question_keywords: List[str],
+                 answer_keywords: List[str], question_type: str,
+                 is_inferential: bool, length_bonus: float):
+        self.question = question
+        self.answer = answer
+        self.answer_embedding = answer_embedding
+        self.query_embedding = query_embedding
+        self.question_keywords = question_keywords
+        self.answer_keywords = answer_keywords
+        self.combined_keywords = list(set(question_keywords + answer_keywords))
+        self.question_type = question_type
+        self.is_inferential = is_inferential
+        self.length_bonus = length_bonus
+        
+        # Datos del conjunto de candidatos (ver HybridValidator.prepare_candidates)
+        # Indexados por POSICIÓN del chunk en la lista de candidatos
+        self.candidate_keywords: List[List[str]] = None
+        self.candidate_expanded: List[set] = None
+        self.candidate_bm25: np.ndarray = None
+        
+        # La expansión de keywords de la respuesta no depende del chunk
+        self.answer_expanded = expand_keywords(answer_keywords)
+        
+        # Negaciones y números de la respuesta (detección de contradicciones)
+        self.contradictions = analyze_answer(answer, question)
+
+
 class HybridValidator:
-    def __init__(self, embedding_model):
+    # Número de chunks que pasan el pre-filtrado semántico (coseno)
+    DEFAULT_PREFILTER_TOP_K = 15
+    # Chunks que se reportan en el resultado (top_3_scores)
+    REPORTED_TOP_K = 3
+    
+    # Umbrales para clasificación de respuestas (basados en Short Answer Grading - SAG)
+    # Estos umbrales se aplican sobre S_raw (score bruto en [0,1])
+    DEFAULT_THRESHOLDS = {
+        'excelente': 0.85,   # ≥0.85 → Excelente (90-100%)
+        'bueno': 0.70,       # 0.70-0.84 → Bueno (70-89%)
+        'aceptable': 0.50,   # 0.50-0.69 → Aceptable (50-69%)
+        'rechazo': 0.50      # <0.50 → Necesita mejorar (0-49%)
+    }
+    # Pesos optimizados para OCR + parafraseo (basado en literatura SAG)
+    # Priorizan semántica sobre léxico por errores OCR en PDFs
+    DEFAULT_WEIGHTS = {
+        'bm25': 0.05,        # 5% - Coincidencias léxicas (reducido por OCR)
+        'cosine': 0.80,      # 80% - Similitud semántica (eje principal)
+        'coverage': 0.15     # 15% - Cobertura de keywords clave
+    }
+    
+    def __init__(self, embedding_model, prefilter_top_k: int = DEFAULT_PREFILTER_TOP_K,
+                 prune_candidates: bool = True, thresholds: Dict[str, float] = None,
+                 weights: Dict[str, float] = None):
+        """
+        Args:
+            embedding_model: Modelo con .encode (SentenceTransformer)
+            prefilter_top_k: Chunks que pasan el pre-filtrado por coseno
+            prune_candidates: Branch-and-bound en score_candidates (ver score_upper_bound)
+            thresholds: Umbrales que reemplazan a DEFAULT_THRESHOLDS (mismas claves)
+            weights: Pesos que reemplazan a DEFAULT_WEIGHTS (mismas claves)
+        
+        El validador no guarda estado por request (todo vive en ScoringContext):
+        una misma instancia se comparte entre hilos (ver validator_registry).
+        """
         self.model = embedding_model
-        # Umbrales para clasificación de respuestas (basados en Short Answer Grading - SAG)
-        # Estos umbrales se aplican sobre S_raw (score bruto en [0,1])
-        self.thresholds = {
-            'excelente': 0.85,   # ≥0.85 → Excelente (90-100%)
-            'bueno': 0.70,       # 0.70-0.84 → Bueno (70-89%)
-            'aceptable': 0.50,   # 0.50-0.69 → Aceptable (50-69%)
-            'rechazo': 0.50      # <0.50 → Necesita mejorar (0-49%)
-        }
-        # Pesos optimizados para OCR + parafraseo (basado en literatura SAG)
-        # Priorizan semántica sobre léxico por errores OCR en PDFs
-        self.weights = {
-            'bm25': 0.05,        # 5% - Coincidencias léxicas (reducido por OCR)
-            'cosine': 0.80,      # 80% - Similitud semántica (eje principal)
-            'coverage': 0.15     # 15% - Cobertura de keywords clave
-        }
+        self.prefilter_top_k = max(1, int(prefilter_top_k))
+        # Branch-and-bound en score_candidates (ver score_upper_bound)
+        self.prune_candidates = prune_candidates
+        self.thresholds = self._override(self.DEFAULT_THRESHOLDS, thresholds, 'thresholds')
+        self.weights = self._override(self.DEFAULT_WEIGHTS, weights, 'weights')
         # Rango de normalización para cosine similarity (valores empíricos)
         # AJUSTADO: Para PDFs con texto corrupto/OCR, los cosines son más bajos
         # Basado en all-MiniLM-L6-v2 + análisis de respuestas reales
@@ -32,57 +201,28 @@ class HybridValidator:
         self.expected_min = 0.25  # Respuesta muy mala → 0% (antes: 0.30)
         self.expected_max = 0.85  # Respuesta excelente → 100% (antes: 0.90)
         
-        self.stopwords = {'el', 'la', 'los', 'las', 'un', 'una', 'de', 'del', 'a', 'al', 'en', 'por', 'para', 'con', 'y', 'o', 'pero', 'si', 'no', 'que', 'como', 'cuando', 'donde', 'cual', 'quien', 'su', 'sus', 'mi', 'mis', 'tu', 'tus', 'se', 'le', 'lo', 'me', 'te', 'nos', 'os'}
+        self.stopwords = frozenset(STOPWORDS)
         
-        # ═══════════════════════════════════════════════════════════════
-        # VERBOS DE RAZONAMIENTO (para compute_reasoning_score)
-        # Verbos que indican pensamiento, opinión, deducción, etc.
-        # ═══════════════════════════════════════════════════════════════
-        self.reasoning_verbs = [
-            # Verbos de pensamiento
-            'pensó', 'pensaba', 'piensa', 'pensar', 'pensando',
-            'creyó', 'creía', 'cree', 'creer', 'creyendo',
-            'supuso', 'suponía', 'supone', 'suponer', 'suponiendo',
-            'imaginó', 'imaginaba', 'imagina', 'imaginar', 'imaginando',
-            
-            # Verbos de deducción/conclusión
-            'dedujo', 'deducía', 'deduce', 'deducir', 'deduciendo',
-            'concluyó', 'concluía', 'concluye', 'concluir', 'concluyendo',
-            'infirió', 'infería', 'infiere', 'inferir', 'infiriendo',
-            'razonó', 'razonaba', 'razona', 'razonar', 'razonando',
-            
-            # Verbos de sospecha/duda
-            'sospechó', 'sospechaba', 'sospecha', 'sospechar', 'sospechando',
-            'dudó', 'dudaba', 'duda', 'dudar', 'dudando',
-            'desconfió', 'desconfiaba', 'desconfía', 'desconfiar',
-            
-            # Verbos de decisión/juicio
-            'decidió', 'decidía', 'decide', 'decidir', 'decidiendo',
-            'juzgó', 'juzgaba', 'juzga', 'juzgar', 'juzgando',
-            'opinó', 'opinaba', 'opina', 'opinar', 'opinando',
-            'consideró', 'consideraba', 'considera', 'considerar',
-            
-            # Verbos de comprensión
-            'comprendió', 'comprendía', 'comprende', 'comprender',
-            'entendió', 'entendía', 'entiende', 'entender',
-            'advirtió', 'advertía', 'advierte', 'advertir',
-            'notó', 'notaba', 'nota', 'notar',
-            'percibió', 'percibía', 'percibe', 'percibir',
-            
-            # Verbos de intención
-            'pretendió', 'pretendía', 'pretende', 'pretender',
-            'intentó', 'intentaba', 'intenta', 'intentar',
-            'quiso', 'quería', 'quiere', 'querer',
-            'buscó', 'buscaba', 'busca', 'buscar',
-            
-            # Verbos de reflexión
-            'reflexionó', 'reflexionaba', 'reflexiona', 'reflexionar',
-            'meditó', 'meditaba', 'medita', 'meditar',
-            'analizó', 'analizaba', 'analiza', 'analizar',
-        ]
-        
-        # Caracteres que indican diálogo
-        self.dialogue_chars = ['"', '«', '»', '—', '-', '"', '"', ''', ''']
+        # Verbos de razonamiento y caracteres de diálogo (compute_reasoning_score);
+        # el cálculo vive en chunk_features y se persiste al crear los chunks
+        self.reasoning_verbs = REASONING_VERBS
+        self.dialogue_chars = DIALOGUE_CHARS
+    
+    @staticmethod
+    def _override(defaults: Dict[str, float], values: Dict[str, float], name: str) -> Dict[str, float]:
+        """Copia de defaults con los valores dados (claves desconocidas o valores no finitos/negativos → ValueError)"""
+        merged = dict(defaults)
+        for key, value in (values or {}).items():
+            if key not in defaults:
+                raise ValueError(f"{name}: clave desconocida '{key}' (válidas: {', '.join(defaults)})")
+            try:
+                number = float(value)
+            except (TypeError, ValueError):
+                number = float('nan')
+            if not math.isfinite(number) or number < 0:
+                raise ValueError(f"{name}: '{key}' debe ser un número finito >= 0 (recibido {value!r})")
+            merged[key] = number
+        return merged
     
     def classify_question_type(self, question: str) -> str:
         """
@@ -108,58 +248,13 @@ class HybridValidator:
         """
         question_lower = question.lower()
         
-        # Patrones para preguntas de RAZONAMIENTO
-        reasoning_patterns = [
-            # Causales
-            'por qué', 'por que', 'cuál es la razón', 'cual es la razon',
-            'qué razones', 'que razones', 'qué motivo', 'que motivo',
-            'a qué se debe', 'a que se debe', 'cómo se explica', 'como se explica',
-            
-            # Procesos mentales
-            'qué proceso de pensamiento', 'que proceso de pensamiento',
-            'qué pensó', 'que penso', 'qué opinión', 'que opinion',
-            'qué postura', 'que postura', 'cómo interpreta', 'como interpreta',
-            'qué intención', 'que intencion', 'con qué propósito', 'con que proposito',
-            
-            # Inferencia
-            'qué sugiere', 'que sugiere', 'qué indica', 'que indica',
-            'qué permite deducir', 'que permite deducir', 'qué implica', 'que implica',
-            'qué se puede inferir', 'que se puede inferir',
-            'qué conclusión', 'que conclusion',
-            
-            # Significado
-            'qué representa', 'que representa', 'qué simboliza', 'que simboliza',
-            'qué significa', 'que significa', 'cuál es el significado',
-            'qué importancia tiene', 'que importancia tiene',
-        ]
-        
-        # Patrones para preguntas LITERALES
-        literal_patterns = [
-            # Hechos directos
-            'qué hizo', 'que hizo', 'qué dijo', 'que dijo',
-            'dónde estaba', 'donde estaba', 'dónde se encontraba', 'donde se encontraba',
-            'cuándo ocurrió', 'cuando ocurrio', 'cuándo sucedió', 'cuando sucedio',
-            'quién era', 'quien era', 'quiénes eran', 'quienes eran',
-            
-            # Relaciones/Datos
-            'qué relación tenía', 'que relacion tenia', 'qué recibía', 'que recibia',
-            'qué papel cumple', 'que papel cumple', 'cuántos', 'cuantos',
-            'qué tipo de', 'que tipo de', 'cuál era', 'cual era',
-            
-            # Descripciones
-            'cómo era', 'como era', 'cómo se llamaba', 'como se llamaba',
-            'qué contenía', 'que contenia', 'qué incluía', 'que incluia',
-        ]
-        
         # Verificar patrones de razonamiento primero
-        for pattern in reasoning_patterns:
-            if pattern in question_lower:
-                return 'reasoning'
+        if REASONING_QUESTION_REGEX.search(question_lower):
+            return 'reasoning'
         
         # Verificar patrones literales
-        for pattern in literal_patterns:
-            if pattern in question_lower:
-                return 'literal'
+        if LITERAL_QUESTION_REGEX.search(question_lower):
+            return 'literal'
         
         # Por defecto
         return 'other'
@@ -181,44 +276,16 @@ class HybridValidator:
         FÓRMULA:
         score = 0.6 * dialogue_ratio + 0.4 * reasoning_verbs_normalized
         
+        En validación se usa el valor precalculado del chunk
+        (chunk_features.chunk_features); este método lo calcula desde el texto.
+        
         Args:
             chunk_text: Texto del chunk
             
         Returns:
             float: Score en [0, 1]
         """
-        if not chunk_text or len(chunk_text) < 10:
-            return 0.0
-        
-        chunk_lower = chunk_text.lower()
-        
-        # ═══════════════════════════════════════════════════════════════
-        # 1. RATIO DE DIÁLOGO
-        # Proporción de caracteres que son marcadores de diálogo
-        # ═══════════════════════════════════════════════════════════════
-        dialogue_count = sum(chunk_text.count(char) for char in self.dialogue_chars)
-        dialogue_ratio = min(1.0, dialogue_count / (len(chunk_text) * 0.05))  # Normalizar
-        
-        # ═══════════════════════════════════════════════════════════════
-        # 2. RATIO DE VERBOS DE RAZONAMIENTO
-        # Contar apariciones de verbos de pensamiento/opinión
-        # ═══════════════════════════════════════════════════════════════
-        words = chunk_lower.split()
-        word_count = max(len(words), 1)
-        
-        reasoning_count = 0
-        for verb in self.reasoning_verbs:
-            reasoning_count += chunk_lower.count(verb)
-        
-        # Normalizar: esperamos ~1-3 verbos de razonamiento por cada 100 palabras
-        reasoning_ratio = min(1.0, (reasoning_count / word_count) * 50)
-        
-        # ═══════════════════════════════════════════════════════════════
-        # COMBINAR: 60% diálogo + 40% verbos de razonamiento
-        # ═══════════════════════════════════════════════════════════════
-        score = 0.6 * dialogue_ratio + 0.4 * reasoning_ratio
-        
-        return max(0.0, min(1.0, score))
+        return compute_chunk_features(chunk_text)['reasoning_score']
     
     def normalize_cosine(self, cosine_sim: float) -> float:
         """
@@ -297,47 +364,11 @@ class HybridValidator:
         Returns:
             bool: True si es inferencial, False si es literal
         """
-        # Keywords para preguntas INFERENCIALES (requieren razonamiento)
-        inferential_keywords = [
-            # Causales - "¿Por qué?"
-            'por qué', 'por que', 'cuál es la razón', 'cual es la razon',
-            'qué razones', 'que razones', 'qué motivo', 'que motivo',
-            'a qué se debe', 'a que se debe', 'cómo se explica', 'como se explica',
-            
-            # Inferenciales - Deducción
-            'qué sugiere', 'que sugiere', 'qué indica', 'que indica',
-            'qué permite deducir', 'que permite deducir', 'qué implica', 'que implica',
-            'qué evidencia', 'que evidencia', 'qué indicio', 'que indicio',
-            'cómo deduce', 'como deduce', 'cómo sabes', 'como sabes',
-            'qué puedes inferir', 'que puedes inferir',
-            'qué conclusión', 'que conclusion',
-            
-            # Predictivas
-            'qué pasaría si', 'que pasaria si', 'qué crees que', 'que crees que',
-            'qué hubiera pasado', 'que hubiera pasado',
-            
-            # Comparativas/Analíticas
-            'en qué se diferencia', 'en que se diferencia',
-            'qué relación', 'que relacion', 'cómo se relaciona', 'como se relaciona',
-            'qué tienen en común', 'que tienen en comun',
-            
-            # Intenciones/Propósito
-            'con qué intención', 'con que intencion',
-            'para qué', 'para que', 'cuál es el propósito', 'cual es el proposito',
-            'qué pretende', 'que pretende',
-            
-            # Significado/Simbolismo (NUEVO)
-            'qué representa', 'que representa', 'qué simboliza', 'que simboliza',
-            'qué significa', 'que significa', 'cuál es el significado', 'cual es el significado',
-            'qué importancia', 'que importancia', 'cuál es la importancia', 'cual es la importancia',
-            'qué papel', 'que papel', 'qué rol', 'que rol',
-            'qué sentido', 'que sentido'
-        ]
-        
-        question_lower = question.lower()
-        return any(keyword in question_lower for keyword in inferential_keywords)
+        return bool(INFERENTIAL_QUESTION_REGEX.search(question.lower()))
     
-    def detect_contradiction(self, user_answer: str, chunk_text: str, question: str = "") -> Tuple[bool, float, str]:
+    def detect_contradiction(self, user_answer: str, chunk_text: str, question: str = "",
+                             analysis: AnswerContradictions = None,
+                             chunk_numbers: List[str] = None) -> Tuple[bool, float, str]:
         """
         Detecta si la respuesta del usuario CONTRADICE el contenido del chunk.
         
@@ -367,310 +398,32 @@ class HybridValidator:
             user_answer: Respuesta del usuario
             chunk_text: Texto del chunk de referencia
             question: Pregunta original (para contexto)
+            analysis: (Opcional) analyze_answer(user_answer, question) ya calculado
+                      (ScoringContext.contradictions); evita repetir el
+                      análisis de la respuesta en cada chunk
+            chunk_numbers: (Opcional) Números del chunk (features precalculadas)
             
         Returns:
             Tuple[bool, float, str]: (is_contradiction, penalty_factor, reason)
         """
-        answer_lower = user_answer.lower()
-        chunk_lower = chunk_text.lower()
-        
-        # ═══════════════════════════════════════════════════════════════
-        # KEYWORDS CRÍTICOS EXPANDIDOS (GENERALIZADO PARA CUALQUIER PDF)
-        # ═══════════════════════════════════════════════════════════════
-        # Agrupados por categoría semántica - funciona para múltiples dominios
-        critical_keywords = {
-            # ─────────────────────────────────────────────────────────────
-            # ECONOMÍA / DINERO (expandido)
-            # ─────────────────────────────────────────────────────────────
-            'dinero': ['dinero', 'francos', 'billetes', 'moneda', 'plata', 'efectivo', 
-                       'suma', 'pago', 'precio', 'costo', 'valor', 'fortuna', 'riqueza',
-                       'pobre', 'rico', 'deuda', 'préstamo', 'herencia', 'tesoro'],
-            
-            # ─────────────────────────────────────────────────────────────
-            # ENVÍO / COMUNICACIÓN
-            # ─────────────────────────────────────────────────────────────
-            'envio': ['envió', 'enviaba', 'enviar', 'mandó', 'mandaba', 'mandar', 
-                      'recibía', 'recibió', 'recibir', 'entregó', 'entregaba', 'entregar',
-                      'llegó', 'llegaba', 'llegar', 'trajo', 'traía', 'traer'],
-            'correo': ['correo', 'carta', 'cartas', 'sobre', 'sobres', 'correspondencia',
-                       'mensaje', 'mensajes', 'telegrama', 'paquete', 'envío'],
-            
-            # ─────────────────────────────────────────────────────────────
-            # AYUDA / ASISTENCIA
-            # ─────────────────────────────────────────────────────────────
-            'ayuda': ['ayuda', 'ayudó', 'ayudaba', 'ayudar', 'asistencia', 'apoyo',
-                      'auxilio', 'socorro', 'colaboración', 'contribución', 'donación'],
-            
-            # ─────────────────────────────────────────────────────────────
-            # CRIMEN / JUSTICIA
-            # ─────────────────────────────────────────────────────────────
-            'robo': ['robó', 'robar', 'robo', 'hurto', 'ladrón', 'robado', 'robaron',
-                     'sustrajo', 'sustraer', 'apropió', 'apropiar', 'estafó', 'estafa'],
-            'culpa': ['culpable', 'inocente', 'sospechoso', 'acusado', 'condenado',
-                      'absuelto', 'criminal', 'delincuente', 'cómplice', 'víctima'],
-            
-            # ─────────────────────────────────────────────────────────────
-            # EXISTENCIA / OCURRENCIA (NUEVO - GENERAL)
-            # ─────────────────────────────────────────────────────────────
-            'existencia': ['existió', 'existía', 'existe', 'existir', 'hubo', 'había',
-                           'ocurrió', 'ocurría', 'ocurrir', 'sucedió', 'sucedía', 'suceder',
-                           'pasó', 'pasaba', 'pasar', 'aconteció', 'tuvo', 'tenía', 'tiene'],
-            
-            # ─────────────────────────────────────────────────────────────
-            # VERDAD / CERTEZA (NUEVO - GENERAL)
-            # ─────────────────────────────────────────────────────────────
-            'verdad': ['verdad', 'cierto', 'real', 'realidad', 'verdadero', 'auténtico',
-                       'legítimo', 'genuino', 'válido', 'confirmado', 'probado', 'demostrado'],
-            
-            # ─────────────────────────────────────────────────────────────
-            # SALUD / ESTADO FÍSICO (NUEVO)
-            # ─────────────────────────────────────────────────────────────
-            'salud': ['enfermo', 'enferma', 'enfermedad', 'salud', 'sano', 'sana',
-                      'curó', 'curaba', 'curar', 'murió', 'moría', 'morir', 'muerte',
-                      'herido', 'herida', 'lesión', 'recuperó', 'recuperar', 'sobrevivió'],
-            
-            # ─────────────────────────────────────────────────────────────
-            # EMOCIONES / SENTIMIENTOS (NUEVO)
-            # ─────────────────────────────────────────────────────────────
-            'emocion': ['feliz', 'triste', 'alegre', 'miedo', 'asustado', 'contento',
-                        'enojado', 'furioso', 'preocupado', 'ansioso', 'nervioso', 'tranquilo',
-                        'enamorado', 'amaba', 'odiaba', 'quería', 'deseaba', 'temía', 'esperaba'],
-            
-            # ─────────────────────────────────────────────────────────────
-            # EVENTOS / SUCESOS (NUEVO)
-            # ─────────────────────────────────────────────────────────────
-            'evento': ['guerra', 'batalla', 'conflicto', 'revolución', 'terremoto', 'accidente',
-                       'incendio', 'inundación', 'catástrofe', 'desastre', 'celebración', 'fiesta',
-                       'boda', 'funeral', 'nacimiento', 'reunión', 'encuentro', 'viaje'],
-            
-            # ─────────────────────────────────────────────────────────────
-            # TIEMPO / TEMPORALIDAD (NUEVO)
-            # ─────────────────────────────────────────────────────────────
-            'tiempo': ['antes', 'después', 'durante', 'siempre', 'frecuentemente',
-                       'diariamente', 'anualmente', 'mensualmente', 'primero', 'último',
-                       'antiguo', 'moderno', 'reciente', 'pasado', 'futuro', 'presente'],
-            
-            # ─────────────────────────────────────────────────────────────
-            # UBICACIÓN / LUGAR (NUEVO)
-            # ─────────────────────────────────────────────────────────────
-            'ubicacion': ['aquí', 'allí', 'cerca', 'lejos', 'dentro', 'fuera', 'arriba', 'abajo',
-                          'norte', 'sur', 'este', 'oeste', 'ciudad', 'pueblo', 'país', 'región',
-                          'casa', 'edificio', 'palacio', 'habitación', 'lugar', 'sitio'],
-            
-            # ─────────────────────────────────────────────────────────────
-            # PERSONAS / RELACIONES (NUEVO)
-            # ─────────────────────────────────────────────────────────────
-            'persona': ['padre', 'madre', 'hijo', 'hija', 'hermano', 'hermana', 'esposo', 'esposa',
-                        'amigo', 'enemigo', 'rey', 'reina', 'conde', 'condesa', 'señor', 'señora',
-                        'jefe', 'empleado', 'sirviente', 'criado', 'niño', 'adulto', 'anciano'],
-            
-            # ─────────────────────────────────────────────────────────────
-            # ACCIONES / VERBOS COMUNES (NUEVO)
-            # ─────────────────────────────────────────────────────────────
-            'accion': ['hizo', 'hacía', 'hacer', 'dijo', 'decía', 'decir', 'vio', 'veía', 'ver',
-                       'oyó', 'oía', 'oír', 'sabía', 'saber', 'conocía', 'conocer', 'pensaba', 'pensar',
-                       'quiso', 'quería', 'querer', 'pudo', 'podía', 'poder', 'debía', 'deber',
-                       'logró', 'lograr', 'consiguió', 'conseguir', 'intentó', 'intentar',
-                       'decidió', 'decidir', 'descubrió', 'descubrir', 'encontró', 'encontrar'],
-            
-            # ─────────────────────────────────────────────────────────────
-            # CANTIDAD / NÚMEROS (NUEVO)
-            # ─────────────────────────────────────────────────────────────
-            'cantidad': ['todo', 'nada', 'mucho', 'poco', 'algunos', 'ninguno', 'varios',
-                         'único', 'solo', 'solamente', 'doble', 'triple', 'mitad', 'completo',
-                         'mayoría', 'minoría', 'total', 'parcial', 'entero'],
-            
-            # ─────────────────────────────────────────────────────────────
-            # CIENCIA / ACADÉMICO (NUEVO)
-            # ─────────────────────────────────────────────────────────────
-            'ciencia': ['experimento', 'teoría', 'hipótesis', 'resultado', 'conclusión',
-                        'descubrimiento', 'invento', 'investigación', 'estudio', 'análisis',
-                        'prueba', 'evidencia', 'demostración', 'fórmula', 'ley', 'principio'],
-        }
-        
-        # ═══════════════════════════════════════════════════════════════
-        # PATRONES DE NEGACIÓN EXPANDIDOS
-        # ═══════════════════════════════════════════════════════════════
-        negation_patterns = [
-            # Patrones directos (negación + keyword)
-            r'\bno\s+{keyword}\b',
-            r'\bnunca\s+{keyword}\b',
-            r'\bjamás\s+{keyword}\b',
-            r'\bsin\s+{keyword}\b',
-            r'\bningún\s+{keyword}\b',
-            r'\bninguna\s+{keyword}\b',
-            r'\bnada\s+de\s+{keyword}\b',
-            r'\bnadie\s+{keyword}\b',
-            # Patrones con 1 palabra intermedia
-            r'\bno\s+\w+\s+{keyword}\b',
-            r'\bnunca\s+\w+\s+{keyword}\b',
-            r'\bno\s+le\s+\w+\s+{keyword}\b',
-            r'\bnunca\s+le\s+\w+\s+{keyword}\b',
-            r'\bno\s+se\s+\w+\s+{keyword}\b',
-            r'\bnunca\s+se\s+\w+\s+{keyword}\b',
-            # Patrones con 2 palabras intermedias
-            r'\bno\s+\w+\s+\w+\s+{keyword}\b',
-            r'\bnunca\s+\w+\s+\w+\s+{keyword}\b',
-            r'\bjamás\s+\w+\s+\w+\s+{keyword}\b',
-            # Patrones con 3 palabras intermedias
-            r'\bno\s+\w+\s+\w+\s+\w+\s+{keyword}\b',
-            r'\bnunca\s+\w+\s+\w+\s+\w+\s+{keyword}\b',
-            # Patrones compuestos con "pero"
-            r'\bpero\s+no\s+{keyword}\b',
-            r'\bpero\s+nunca\s+{keyword}\b',
-            r'\bpero\s+no\s+\w+\s+{keyword}\b',
-            r'\bpero\s+nunca\s+\w+\s+{keyword}\b',
-            r'\bpero\s+nunca\s+\w+\s+\w+\s+{keyword}\b',
-            # Patrones con "tampoco" (NUEVO)
-            r'\btampoco\s+{keyword}\b',
-            r'\btampoco\s+\w+\s+{keyword}\b',
-            # Patrones con "ni" (NUEVO)
-            r'\bni\s+{keyword}\b',
-            r'\bni\s+\w+\s+{keyword}\b',
-            r'\bni\s+siquiera\s+{keyword}\b',
-        ]
-        
-        contradictions_found = []
-        
-        # ═══════════════════════════════════════════════════════════════
-        # ESTRATEGIA 1: Contradicción con el CHUNK
-        # ═══════════════════════════════════════════════════════════════
-        for category, keywords in critical_keywords.items():
-            for keyword in keywords:
-                # Verificar si el keyword está en el chunk (es relevante)
-                if keyword in chunk_lower:
-                    # Buscar si el usuario NIEGA este keyword
-                    for pattern_template in negation_patterns:
-                        pattern = pattern_template.format(keyword=keyword)
-                        if re.search(pattern, answer_lower):
-                            contradictions_found.append({
-                                'category': category,
-                                'keyword': keyword,
-                                'pattern': pattern,
-                                'source': 'chunk'
-                            })
+        # Léxicos y patrones están precompilados en contradiction_detector;
+        # lo que depende solo de la respuesta se analiza una vez por request
+        if analysis is None:
+            analysis = analyze_answer(user_answer, question)
         
-        # ═══════════════════════════════════════════════════════════════
-        # ESTRATEGIA 2: Contradicción con la PREGUNTA (EXPANDIDA)
-        # ═══════════════════════════════════════════════════════════════
-        question_lower = question.lower() if question else ""
-        
-        # Detectar tema de la pregunta - EXPANDIDO para múltiples dominios
-        question_topics = {
-            # Económico
-            'economico': ['ayuda económica', 'dinero', 'económica', 'francos', 'billetes', 
-                          'pago', 'suma', 'precio', 'costo', 'fortuna', 'herencia', 'deuda'],
-            # Envío/Comunicación
-            'envio': ['recibía', 'enviaba', 'mandaba', 'por correo', 'carta', 'mensaje',
-                      'llegaba', 'entregaba', 'correspondencia'],
-            # Existencia/Ocurrencia
-            'existencia': ['ocurrió', 'sucedió', 'pasó', 'hubo', 'existió', 'había',
-                           'tuvo lugar', 'aconteció', 'se produjo'],
-            # Salud
-            'salud': ['enfermedad', 'enfermo', 'murió', 'curó', 'salud', 'herido',
-                      'recuperó', 'sobrevivió', 'falleció'],
-            # Emociones
-            'emocion': ['sentía', 'emoción', 'feliz', 'triste', 'miedo', 'amaba',
-                        'odiaba', 'quería', 'temía'],
-            # Eventos
-            'evento': ['guerra', 'batalla', 'accidente', 'celebración', 'boda',
-                       'viaje', 'reunión', 'encuentro'],
-            # Verdad
-            'verdad': ['verdad', 'cierto', 'real', 'confirmó', 'demostró', 'probó'],
-            # Acciones
-            'accion': ['hizo', 'dijo', 'decidió', 'logró', 'consiguió', 'intentó',
-                       'descubrió', 'encontró', 'vio', 'oyó'],
-        }
-        
-        for topic, topic_keywords in question_topics.items():
-            # Si la pregunta trata sobre este tema
-            if any(tk in question_lower for tk in topic_keywords):
-                # Buscar keywords relacionados de critical_keywords
-                related_keywords = critical_keywords.get(topic, [])
-                # También agregar keywords del tema 'dinero' si es económico
-                if topic == 'economico':
-                    related_keywords = related_keywords + critical_keywords.get('dinero', [])
-                # Agregar keywords de existencia para temas de eventos
-                if topic in ['evento', 'existencia']:
-                    related_keywords = related_keywords + critical_keywords.get('existencia', [])
-                
-                for keyword in related_keywords:
-                    for pattern_template in negation_patterns:
-                        pattern = pattern_template.format(keyword=keyword)
-                        if re.search(pattern, answer_lower):
-                            # Evitar duplicados
-                            if not any(c['keyword'] == keyword and c['source'] == 'question' for c in contradictions_found):
-                                contradictions_found.append({
-                                    'category': topic,
-                                    'keyword': keyword,
-                                    'pattern': pattern,
-                                    'source': 'question'
-                                })
+        is_contradiction, penalty, reason = contradiction_penalty(
+            find_contradictions(analysis, chunk_text, chunk_numbers=chunk_numbers)
+        )
         
-        # ═══════════════════════════════════════════════════════════════
-        # ESTRATEGIA 3: Detección de contradicción numérica (NUEVO)
-        # ═══════════════════════════════════════════════════════════════
-        # Si el chunk menciona un número y la respuesta menciona otro diferente
-        chunk_numbers = set(re.findall(r'\b\d+\b', chunk_lower))
-        answer_numbers = set(re.findall(r'\b\d+\b', answer_lower))
-        
-        # Si hay números en ambos y no coinciden (excluyendo números muy comunes como 1, 2)
-        significant_chunk_nums = {n for n in chunk_numbers if int(n) > 10}
-        significant_answer_nums = {n for n in answer_numbers if int(n) > 10}
-        
-        if significant_chunk_nums and significant_answer_nums:
-            mismatched = significant_answer_nums - significant_chunk_nums
-            if mismatched and len(mismatched) > 0:
-                # Hay números en la respuesta que no están en el chunk
-                contradictions_found.append({
-                    'category': 'numerico',
-                    'keyword': f"números: {list(mismatched)[:2]}",
-                    'pattern': 'numeric_mismatch',
-                    'source': 'numeric'
-                })
-        
-        if contradictions_found:
-            # Cuantas más contradicciones, mayor penalización
-            num_contradictions = len(contradictions_found)
-            
-            # Verificar si hay contradicciones con la PREGUNTA (más graves)
-            question_contradictions = [c for c in contradictions_found if c.get('source') == 'question']
-            has_question_contradiction = len(question_contradictions) > 0
-            
-            # ═══════════════════════════════════════════════════════════════
-            # PENALIZACIÓN MÁS SEVERA:
-            # - Contradicción con la pregunta = muy grave (el usuario niega
-            #   exactamente lo que la pregunta pregunta)
-            # - Múltiples contradicciones = grave
-            # ═══════════════════════════════════════════════════════════════
-            
-            if has_question_contradiction:
-                # Si niega algo que la pregunta pregunta directamente
-                # Ejemplo: pregunta sobre "ayuda económica" y responde "nunca le mandó dinero"
-                penalty = 0.20  # Reducir score al 20% (forzar rechazo)
-                severity = "MUY GRAVE (contradice la pregunta)"
-            elif num_contradictions >= 3:
-                penalty = 0.25  # Reducir score al 25%
-                severity = "GRAVE"
-            elif num_contradictions >= 2:
-                penalty = 0.30  # Reducir score al 30%
-                severity = "MODERADA"
-            else:
-                penalty = 0.40  # Reducir score al 40%
-                severity = "LEVE"
-            
-            keywords_negated = [c['keyword'] for c in contradictions_found[:3]]
-            reason = f"Contradicción {severity}: negación de '{', '.join(keywords_negated)}'"
-            
+        if is_contradiction:
             print(f"   ⚠️ CONTRADICCIÓN DETECTADA: {reason}")
             print(f"   📉 Penalización: score × {penalty}")
-            
-            return True, penalty, reason
         
-        return False, 1.0, ""
+        return is_contradiction, penalty, reason
     
     def apply_pedagogical_boost(self, score_raw: float, cosine: float, 
-                                user_answer: str, ref_text: str, question: str = "") -> float:
+                                user_answer: str, ref_text: str, question: str = "",
+                                is_inferential: bool = None, ref_word_count: int = None) -> float:
         """
         Booster pedagógico para respuestas de comprensión lectora.
         
@@ -710,11 +463,14 @@ class HybridValidator:
             user_answer: Texto de la respuesta del usuario
             ref_text: Texto del chunk de referencia
             question: Texto de la pregunta (para detectar tipo)
+            is_inferential: (Opcional) Tipo ya calculado en el ScoringContext
+            ref_word_count: (Opcional) Palabras del chunk (features precalculadas)
             
         Returns:
             float: Score después del boost (máx 0.99)
         """
-        is_inferential = question and self.is_inferential_question(question)
+        if is_inferential is None:
+            is_inferential = question and self.is_inferential_question(question)
         
         # Umbrales diferenciados según tipo de pregunta
         if is_inferential:
@@ -736,7 +492,9 @@ class HybridValidator:
         
         # Calcular ratio de longitud (palabras)
         len_user = max(len(user_answer.split()), 1)
-        len_ref = max(len(ref_text.split()), 1)
+        if ref_word_count is None:
+            ref_word_count = len(ref_text.split())
+        len_ref = max(ref_word_count, 1)
         len_ratio = len_user / len_ref
         
         boosted = score_raw
@@ -763,50 +521,91 @@ class HybridValidator:
             return embedding
         return embedding / norm
     
+    @staticmethod
+    def build_chunk_matrix(chunks) -> np.ndarray:
+        """
+        Construye la matriz (N x d) de embeddings de chunks normalizados (norma 1)
+        
+        Se calcula una sola vez por material (ver material_cache) para que el
+        pre-filtrado sea un único producto matriz-vector.
+        """
+        matrix = np.asarray([chunk['embedding'] for chunk in chunks], dtype=np.float32)
+        if matrix.ndim != 2:
+            matrix = matrix.reshape(len(chunks), -1)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        # Igual que normalize_embedding: vectores (casi) nulos se dejan como están
+        norms[norms < 1e-10] = 1.0
+        return matrix / norms
+    
+    @staticmethod
+    def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+        """
+        Índices de los k scores más altos, ordenados de mayor a menor
+        
+        Usa argpartition (O(N)) en vez de ordenar todo. En empates se
+        prefiere el índice menor, igual que un sort estable descendente.
+        """
+        n = len(scores)
+        k = min(k, n)
+        if k <= 0:
+            return np.zeros(0, dtype=np.int64)
+        
+        if k < n:
+            candidates = np.argpartition(-scores, k - 1)[:k]
+            kth_score = scores[candidates].min()
+            above = np.flatnonzero(scores > kth_score)
+            ties = np.flatnonzero(scores == kth_score)[:k - len(above)]
+            candidates = np.concatenate([above, ties])
+        else:
+            candidates = np.arange(n)
+        
+        # Orden: score descendente, luego índice ascendente (desempate estable)
+        return candidates[np.lexsort((candidates, -scores[candidates]))]
+    
     def extract_keywords(self, text: str):
-        # Normalizar texto antes de extraer keywords (quitar espacios OCR)
-        # Ejemplo: "H enriet te" → "Henriette"
-        text = re.sub(r'\b(\w{1,2})\s+(\w{1,2})\b', r'\1\2', text)
-        for _ in range(3):
-            text = re.sub(r'\b(\w{1,2})\s+(\w{1,2})\b', r'\1\2', text)
-        text = re.sub(r'\b(\w{2,4})\s+(\w{3,6})\b', r'\1\2', text)
-        
-        text = text.lower()
-        words = re.findall(r'\b\w{3,}\b', text)
-        keywords = [w for w in words if w not in self.stopwords]
-        return keywords
+        # Ver lexical_index.extract_keywords (misma tokenización que el índice persistido)
+        return extract_keywords(text, self.stopwords)
     
     def expand_keywords(self, keywords):
-        expanded = set(keywords)
-        for word in keywords:
-            expanded.add(word)
-            if len(word) >= 6:
-                expanded.add(word[:6])
-            elif len(word) >= 5:
-                expanded.add(word[:5])
-            if word[0].isupper():
-                expanded.add(word.lower())
-        return expanded
+        return expand_keywords(keywords)
     
-    def bm25_score(self, query_keywords, chunk_text: str, corpus):
-        tokenized_corpus = [self.extract_keywords(text) for text in corpus]
+    def bm25_scores(self, query_keywords, tokenized_corpus) -> np.ndarray:
+        """
+        Scores BM25 de TODOS los documentos con un solo índice
         
+        Args:
+            query_keywords: Keywords de la consulta (se expanden con expand_keywords)
+            tokenized_corpus: Lista de listas de keywords (una por documento)
+            
+        Returns:
+            np.ndarray: Score BM25 por documento, en el mismo orden del corpus
+        """
         # Protección: si el corpus está vacío o todos los documentos vacíos
         if not tokenized_corpus or all(len(doc) == 0 for doc in tokenized_corpus):
-            return 0.0
+            return np.zeros(len(tokenized_corpus))
         
-        bm25 = BM25Okapi(tokenized_corpus)
         expanded_query = list(self.expand_keywords(query_keywords))
         
         # Protección: si la query está vacía
         if not expanded_query:
-            return 0.0
+            return np.zeros(len(tokenized_corpus))
+        
+        bm25 = BM25Okapi(tokenized_corpus)
+        return np.asarray(bm25.get_scores(expanded_query), dtype=float)
+    
+    def bm25_score(self, query_keywords, chunk_text: str, corpus):
+        """
+        Score BM25 de un chunk dentro de un corpus (API de compatibilidad)
+        
+        validate_answer usa prepare_candidates (un índice por conjunto de
+        candidatos). El chunk se ubica por POSICIÓN del texto en el corpus,
+        no comparando listas de tokens (dos chunks pueden tokenizar igual).
+        """
+        tokenized_corpus = [self.extract_keywords(text) for text in corpus]
+        scores = self.bm25_scores(query_keywords, tokenized_corpus)
         
-        scores = bm25.get_scores(expanded_query)
-        chunk_keywords = self.extract_keywords(chunk_text)
         try:
-            chunk_index = tokenized_corpus.index(chunk_keywords)
-            return scores[chunk_index]
+            return scores[corpus.index(chunk_text)]
         except ValueError:
             return np.mean(scores) if len(scores) > 0 else 0.0
     
@@ -816,37 +615,119 @@ class HybridValidator:
         similarity = np.dot(emb1_norm, emb2_norm)
         return max(0.0, min(1.0, similarity))
     
-    def calculate_coverage(self, answer_keywords, chunk_keywords):
-        answer_expanded = self.expand_keywords(answer_keywords)
-        chunk_expanded = self.expand_keywords(chunk_keywords)
+    def calculate_coverage(self, answer_keywords, chunk_keywords,
+                           answer_expanded=None, chunk_expanded=None):
+        # Las expansiones pueden venir precalculadas (ScoringContext / índice léxico)
+        if answer_expanded is None:
+            answer_expanded = self.expand_keywords(answer_keywords)
+        if chunk_expanded is None:
+            chunk_expanded = self.expand_keywords(chunk_keywords)
         intersection = answer_expanded & chunk_expanded
         if len(answer_expanded) == 0:
             return 0.0
         coverage = len(intersection) / len(answer_expanded)
         return coverage
     
-    def hybrid_score(self, question: str, answer: str, chunk, all_chunks):
-        question_keywords = self.extract_keywords(question)
-        answer_keywords = self.extract_keywords(answer)
-        combined_keywords = list(set(question_keywords + answer_keywords))
+    def build_scoring_context(self, question: str, answer: str,
+                              include_query: bool = True) -> ScoringContext:
+        """
+        Prepara todo lo que no depende del chunk (ver ScoringContext)
         
-        answer_embedding = self.normalize_embedding(
-            self.model.encode(answer, convert_to_tensor=False)
+        Respuesta y "pregunta + respuesta" se codifican en UNA sola llamada
+        a model.encode (un forward pass en batch).
+        
+        Args:
+            question: Texto de la pregunta
+            answer: Respuesta del estudiante
+            include_query: Si False, solo se codifica la respuesta (el embedding
+                           de la consulta solo se usa en el pre-filtrado)
+        """
+        texts = [answer, f"{question} {answer}"] if include_query else [answer]
+        embeddings = self.model.encode(texts, convert_to_tensor=False)
+        
+        answer_embedding = self.normalize_embedding(np.asarray(embeddings[0]))
+        query_embedding = self.normalize_embedding(np.asarray(embeddings[1])) if include_query else None
+        
+        return ScoringContext(
+            question=question,
+            answer=answer,
+            answer_embedding=answer_embedding,
+            query_embedding=query_embedding,
+            question_keywords=self.extract_keywords(question),
+            answer_keywords=self.extract_keywords(answer),
+            question_type=self.classify_question_type(question),
+            is_inferential=bool(question and self.is_inferential_question(question)),
+            length_bonus=self.length_bonus(answer)
         )
+    
+    def prepare_candidates(self, context: ScoringContext, candidates) -> ScoringContext:
+        """
+        Tokeniza los chunks candidatos UNA vez y calcula BM25 para todos
+        con un único índice (una llamada a get_scores)
+        
+        Si el chunk trae 'keywords' / 'keywords_expanded' precalculadas
+        (índice léxico del material, ver lexical_index.py) no se re-tokeniza.
+        Los resultados quedan en el contexto, indexados por posición.
+        """
+        context.candidate_keywords = [
+            c['keywords'] if c.get('keywords') is not None else self.extract_keywords(c['text_full'])
+            for c in candidates
+        ]
+        context.candidate_expanded = [
+            c['keywords_expanded'] if c.get('keywords_expanded') is not None else self.expand_keywords(keywords)
+            for c, keywords in zip(candidates, context.candidate_keywords)
+        ]
+        context.candidate_bm25 = self.bm25_scores(context.combined_keywords,
+                                                  context.candidate_keywords)
+        return context
+    
+    def hybrid_score(self, question: str, answer: str, chunk, all_chunks,
+                     context: ScoringContext = None, candidate_index: int = None):
+        """
+        Score híbrido (BM25 + Coseno + Cobertura) de un chunk
+        
+        Args:
+            context: (Opcional) ScoringContext de la validación
+            candidate_index: (Opcional) Posición del chunk en all_chunks; si el
+                             contexto tiene candidatos preparados, se usan su
+                             BM25 y sus keywords sin volver a tokenizar
+        """
+        # Todo lo que no depende del chunk se calcula una vez por validación
+        if context is None:
+            context = self.build_scoring_context(question, answer, include_query=False)
+        
+        use_candidates = candidate_index is not None and context.candidate_bm25 is not None
+        
+        answer_keywords = context.answer_keywords
+        combined_keywords = context.combined_keywords
+        answer_embedding = context.answer_embedding
+        
         chunk_embedding = self.normalize_embedding(
             np.array(chunk['embedding'])
         )
+        # Reasoning score, palabras y números del chunk (precalculados al guardarlo)
+        features = chunk_features(chunk)
         
-        corpus = [c['text_full'] for c in all_chunks]
-        bm25_score_raw = self.bm25_score(combined_keywords, chunk['text_full'], corpus)
+        if use_candidates:
+            bm25_score_raw = float(context.candidate_bm25[candidate_index])
+        else:
+            corpus = [c['text_full'] for c in all_chunks]
+            bm25_score_raw = self.bm25_score(combined_keywords, chunk['text_full'], corpus)
         bm25_normalized = min(1.0, bm25_score_raw / 10.0)
         
         cosine_score_raw = self.cosine_similarity(answer_embedding, chunk_embedding)
         # NUEVO: Normalizar cosine al rango 0-1 basado en valores empíricos
         cosine_normalized = self.normalize_cosine(cosine_score_raw)
         
-        chunk_keywords = self.extract_keywords(chunk['text_full'])
-        coverage_score = self.calculate_coverage(answer_keywords, chunk_keywords)
+        if use_candidates:
+            chunk_keywords = context.candidate_keywords[candidate_index]
+            chunk_expanded = context.candidate_expanded[candidate_index]
+        else:
+            chunk_keywords = self.extract_keywords(chunk['text_full'])
+            chunk_expanded = self.expand_keywords(chunk_keywords)
+        coverage_score = self.calculate_coverage(answer_keywords, chunk_keywords,
+                                                 answer_expanded=context.answer_expanded,
+                                                 chunk_expanded=chunk_expanded)
         
         # Score base: combinar métricas normalizadas con pesos calibrados
         # 80% semántica + 15% cobertura + 5% léxico (reducido por OCR)
@@ -857,7 +738,7 @@ class HybridValidator:
         )
         
         # Aplicar bonus por longitud razonable (+5% máximo)
-        bonus = self.length_bonus(answer)
+        bonus = context.length_bonus
         score_raw = max(0.0, min(1.0, score_base + bonus))  # Clamp a [0,1]
         
         # NUEVO: Aplicar boost pedagógico para respuestas concisas pero correctas
@@ -867,7 +748,9 @@ class HybridValidator:
             cosine=cosine_normalized,
             user_answer=answer,
             ref_text=chunk['text_full'],
-            question=question  # Para detectar preguntas inferenciales
+            question=question,  # Para detectar preguntas inferenciales
+            is_inferential=context.is_inferential,
+            ref_word_count=features['word_count']
         )
         
         # ═══════════════════════════════════════════════════════════════
@@ -875,8 +758,8 @@ class HybridValidator:
         # ═══════════════════════════════════════════════════════════════
         # Si la pregunta es de razonamiento, dar boost a chunks con más
         # diálogo y verbos de pensamiento/opinión
-        question_type = self.classify_question_type(question)
-        reasoning_score = self.compute_reasoning_score(chunk['text_full'])
+        question_type = context.question_type
+        reasoning_score = features['reasoning_score']
         reasoning_boost_applied = 0.0
         
         if question_type == 'reasoning' and reasoning_score > 0.1:
@@ -895,7 +778,9 @@ class HybridValidator:
         is_contradiction, penalty_factor, contradiction_reason = self.detect_contradiction(
             user_answer=answer,
             chunk_text=chunk['text_full'],
-            question=question
+            question=question,
+            analysis=context.contradictions,
+            chunk_numbers=features['numbers']
         )
         
         if is_contradiction:
@@ -915,10 +800,9 @@ class HybridValidator:
             'score_raw': round(score_raw, 4),  # Score bruto [0,1]
             'score_pct': score_pct,  # Porcentaje [0-100]
             'final': round(score_raw, 4),  # Mantener compatibilidad
-            'weights': self.weights,
+            'weights': dict(self.weights),
             'keywords_found': list(
-                self.expand_keywords(answer_keywords) & 
-                self.expand_keywords(chunk_keywords)
+                context.answer_expanded & chunk_expanded
             )[:5],
             # NUEVO: Info de contradicción para debugging
             'contradiction_detected': is_contradiction,
@@ -949,7 +833,18 @@ class HybridValidator:
             'threshold': 0.08
         }
     
-    def validate_answer(self, question: str, user_answer: str, chunks):
+    def validate_answer(self, question: str, user_answer: str, chunks, chunk_matrix: np.ndarray = None):
+        """
+        Valida una respuesta contra los chunks de un material
+        
+        Args:
+            question: Texto de la pregunta
+            user_answer: Respuesta del estudiante
+            chunks: Lista de chunks con 'text_full' y 'embedding'
+            chunk_matrix: (Opcional) Matriz (N x d) de embeddings normalizados en el
+                          mismo orden que chunks (ver build_chunk_matrix). Si no se
+                          pasa, se construye aquí.
+        """
         if not chunks or len(chunks) == 0:
             return {
                 'is_valid': False,
@@ -958,13 +853,9 @@ class HybridValidator:
                 'category': 'error'
             }
         
-        if len(user_answer.strip()) < 10:
-            return {
-                'is_valid': False,
-                'confidence': 0.0,
-                'feedback': 'La respuesta es demasiado corta (minimo 10 caracteres)',
-                'category': 'error'
-            }
+        length_error = self.answer_length_error(user_answer)
+        if length_error is not None:
+            return length_error
         
         # ═══════════════════════════════════════════════════════════════════════
         # 🆕 CORRECCIÓN PROFESOR SEMANA 15: PRE-FILTRADO SEMÁNTICO
@@ -973,47 +864,216 @@ class HybridValidator:
         # encontrara palabras clave en chunks irrelevantes (ej: "puntero" aparecía
         # en varios lugares pero el sistema elegía el chunk incorrecto).
         #
-        # SOLUCIÓN: Primero filtrar los TOP 15 chunks más similares semánticamente
+        # SOLUCIÓN: Primero filtrar los TOP 15 chunks (prefilter_top_k) más similares semánticamente
         # usando SOLO similitud coseno, y DESPUÉS aplicar el hybrid_score completo.
         # Esto asegura que BM25 opere sobre un corpus relevante.
         # ═══════════════════════════════════════════════════════════════════════
         
-        # Paso 1: Generar embedding de la respuesta del usuario + pregunta
-        combined_query = f"{question} {user_answer}"
-        query_embedding = self.normalize_embedding(
-            self.model.encode(combined_query, convert_to_tensor=False)
-        )
+        # Paso 1: Contexto de scoring (una sola pasada del modelo para
+        # respuesta y "pregunta + respuesta"; reutilizado en todos los chunks)
+        context = self.build_scoring_context(question, user_answer)
+        query_embedding = context.query_embedding
         
-        # Paso 2: Calcular similitud coseno con TODOS los chunks (rápido)
-        chunk_similarities = []
-        for chunk in chunks:
-            chunk_embedding = self.normalize_embedding(np.array(chunk['embedding']))
-            cosine_sim = self.cosine_similarity(query_embedding, chunk_embedding)
-            chunk_similarities.append((chunk, cosine_sim))
+        # Paso 2: Calcular similitud coseno con TODOS los chunks
+        # Un solo producto matriz-vector sobre la matriz de chunks normalizados
+        if chunk_matrix is None:
+            chunk_matrix = self.build_chunk_matrix(chunks)
+        cosine_sims = np.clip(chunk_matrix @ query_embedding.astype(np.float32), 0.0, 1.0)
         
-        # Paso 3: Ordenar por similitud coseno y tomar TOP 15
-        chunk_similarities.sort(key=lambda x: x[1], reverse=True)
-        TOP_K_PREFILTER = min(15, len(chunks))  # Máximo 15 chunks pre-filtrados
-        prefiltered_chunks = [c for c, _ in chunk_similarities[:TOP_K_PREFILTER]]
+        # Paso 3: Tomar TOP K por similitud coseno (argpartition, sin ordenar todo)
+        top_indices = self.top_k_indices(cosine_sims, self.prefilter_top_k)
+        prefiltered_chunks = [chunks[i] for i in top_indices]
         
         print(f"   🔍 Pre-filtrado: {len(prefiltered_chunks)} de {len(chunks)} chunks (cosine)")
-        print(f"   📊 Top 3 cosine pre-filter: {[round(s, 3) for _, s in chunk_similarities[:3]]}")
+        print(f"   📊 Top 3 cosine pre-filter: {[round(float(cosine_sims[i]), 3) for i in top_indices[:3]]}")
         
         # Log de chunks pre-filtrados para debugging (profesor pidió poder ver esto)
         print(f"   📋 Chunks pre-filtrados IDs: {[c.get('chunk_id', 'N/A') for c in prefiltered_chunks[:5]]}...")
         
+        return self.score_candidates(question, user_answer, context, prefiltered_chunks,
+                                     total_chunks=len(chunks), prefilter_method='cosine_similarity')
+    
+    def answer_length_error(self, user_answer: str):
+        """Resultado de error si la respuesta es demasiado corta (None si es válida)"""
+        if len(user_answer.strip()) < 10:
+            return {
+                'is_valid': False,
+                'confidence': 0.0,
+                'feedback': 'La respuesta es demasiado corta (minimo 10 caracteres)',
+                'category': 'error'
+            }
+        return None
+    
+    def validate_with_retriever(self, question: str, user_answer: str, retrieve,
+                                total_chunks: int = None, prefilter_method: str = 'pgvector'):
+        """
+        Valida una respuesta pidiendo los candidatos a un recuperador externo
+        
+        En vez de recibir TODOS los chunks del material, el pre-filtrado
+        (top K por coseno) lo resuelve el recuperador, p.ej. la RPC de
+        pgvector match_material_chunks (ver retrieval.py): solo viajan K chunks.
+        
+        Todo corre en el hilo que llama. validate_answer (main.py) usa las
+        mismas piezas por separado para no ocupar el pool cpu con la RPC:
+        build_scoring_context (cpu) → recuperador (io) → score_retrieved (cpu).
+        
+        Args:
+            question: Texto de la pregunta
+            user_answer: Respuesta del estudiante
+            retrieve: Función (query_embedding, k) -> chunks con 'text_full' y
+                      'embedding', ordenados por similitud descendente
+            total_chunks: (Opcional) Chunks totales del material, para el reporte
+            prefilter_method: Origen de los candidatos (para prefilter_info),
+                              p.ej. 'pgvector' o 'hybrid_rpc' (léxico + vectorial)
+        """
+        length_error = self.answer_length_error(user_answer)
+        if length_error is not None:
+            return length_error
+        
+        # Paso 1: Contexto de scoring (igual que validate_answer)
+        context = self.build_scoring_context(question, user_answer)
+        
+        # Paso 2-3: TOP K por similitud coseno, calculado por el recuperador
+        prefiltered_chunks = retrieve(context.query_embedding.astype(np.float32), self.prefilter_top_k)
+        
+        return self.score_retrieved(question, user_answer, context, prefiltered_chunks,
+                                    total_chunks=total_chunks, prefilter_method=prefilter_method)
+    
+    def score_retrieved(self, question: str, user_answer: str, context: ScoringContext,
+                        prefiltered_chunks, total_chunks: int = None,
+                        prefilter_method: str = 'pgvector'):
+        """
+        Puntúa los candidatos devueltos por un recuperador (ver validate_with_retriever)
+        
+        Args:
+            context: ScoringContext de build_scoring_context(question, user_answer)
+            prefiltered_chunks: Chunks con 'text_full' y 'embedding', ordenados
+                                por similitud descendente
+        """
+        prefiltered_chunks = list(prefiltered_chunks)
+        if not prefiltered_chunks:
+            return {
+                'is_valid': False,
+                'confidence': 0.0,
+                'feedback': 'No hay chunks disponibles para validacion',
+                'category': 'error'
+            }
+        
+        total_chunks = total_chunks or len(prefiltered_chunks)
+        print(f"   🔍 Pre-filtrado ({prefilter_method}): {len(prefiltered_chunks)} de {total_chunks} chunks")
+        print(f"   📋 Chunks pre-filtrados IDs: {[c.get('chunk_id', 'N/A') for c in prefiltered_chunks[:5]]}...")
+        
+        return self.score_candidates(question, user_answer, context, prefiltered_chunks,
+                                     total_chunks=total_chunks, prefilter_method=prefilter_method)
+    
+    def score_upper_bound(self, cosine_normalized: float, context: ScoringContext) -> float:
+        """
+        Cota superior del score final de un chunk conociendo solo su coseno
+        
+        Recorre las mismas etapas que hybrid_score con el peor caso para el
+        resto de componentes:
+        - BM25 y cobertura al máximo (1.0)
+        - Boost pedagógico: sin boost bajo el umbral base (0.30 inferencial,
+          0.40 literal); como máximo x1.5 (síntesis) con tope 0.99
+        - Boost de razonamiento: como máximo +20% con tope 0.99
+        - Contradicción: solo puede bajar el score (factor <= 1)
+        
+        Es no decreciente en el coseno: si un chunk no puede superar al
+        tercer mejor, tampoco los que tienen menor coseno.
+        
+        Si cambian los pesos o los topes de apply_pedagogical_boost /
+        hybrid_score, actualizar aquí (test_hybrid_validator verifica que la
+        cota nunca quede por debajo del score real). Solo es válida con pesos
+        finitos y >= 0 (ver bound_is_sound).
+        """
+        score_base = (
+            self.weights['bm25'] * 1.0 +
+            self.weights['cosine'] * cosine_normalized +
+            self.weights['coverage'] * 1.0
+        )
+        bound = max(0.0, min(1.0, score_base + context.length_bonus))
+        
+        base_threshold = 0.30 if context.is_inferential else 0.40
+        if cosine_normalized >= base_threshold:
+            bound = min(bound * 1.5, 0.99)
+        
+        if context.question_type == 'reasoning':
+            bound = max(bound, min(bound * 1.20, 0.99))
+        
+        return bound
+    
+    def bound_is_sound(self) -> bool:
+        """
+        score_upper_bound toma BM25 y cobertura al máximo (1.0): con un peso
+        negativo o no finito deja de ser cota y la poda descartaría chunks
+        del top 3. En ese caso score_candidates evalúa todos los candidatos.
+        """
+        return all(math.isfinite(weight) and weight >= 0 for weight in self.weights.values())
+    
+    def score_candidates(self, question: str, user_answer: str, context: ScoringContext,
+                         prefiltered_chunks, total_chunks: int,
+                         prefilter_method: str = 'cosine_similarity'):
+        """
+        Aplica hybrid_score a los candidatos pre-filtrados y arma el resultado
+        
+        Args:
+            question: Texto de la pregunta
+            user_answer: Respuesta del estudiante
+            context: Contexto de scoring (ver build_scoring_context)
+            prefiltered_chunks: Candidatos (top K por coseno)
+            total_chunks: Chunks totales del material (para prefilter_info)
+            prefilter_method: Origen del pre-filtrado (para prefilter_info)
+        """
         # Paso 4: Aplicar hybrid_score SOLO a los chunks pre-filtrados
-        scored_chunks = []
-        for chunk in prefiltered_chunks:
-            score, details = self.hybrid_score(question, user_answer, chunk, prefiltered_chunks)
-            scored_chunks.append((chunk, score, details))
+        # BM25: un solo índice para todo el conjunto de candidatos
+        self.prepare_candidates(context, prefiltered_chunks)
+        
+        # Branch-and-bound: candidatos en orden de coseno descendente. Cuando la
+        # cota superior (score_upper_bound) de un chunk no supera al tercer
+        # mejor score, ese chunk y todos los siguientes quedan fuera del top 3:
+        # no se calcula su BM25/cobertura/boosts/contradicción.
+        # El top 3, su orden y la ambigüedad (top1 - top2) no cambian.
+        order = list(range(len(prefiltered_chunks)))
+        cosines = None
+        if self.prune_candidates and len(order) > self.REPORTED_TOP_K and self.bound_is_sound():
+            cosines = [
+                self.normalize_cosine(self.cosine_similarity(
+                    context.answer_embedding, self.normalize_embedding(np.array(chunk['embedding']))
+                ))
+                for chunk in prefiltered_chunks
+            ]
+            order.sort(key=lambda i: cosines[i], reverse=True)
         
-        ranked_chunks = sorted(scored_chunks, key=lambda x: x[1], reverse=True)
+        scored_chunks = []
+        best_scores = []  # min-heap con los REPORTED_TOP_K mejores scores
+        for position in order:
+            if (cosines is not None and len(best_scores) >= self.REPORTED_TOP_K
+                    and self.score_upper_bound(cosines[position], context) < best_scores[0]):
+                break
+            chunk = prefiltered_chunks[position]
+            score, details = self.hybrid_score(question, user_answer, chunk, prefiltered_chunks,
+                                               context=context, candidate_index=position)
+            scored_chunks.append((position, chunk, score, details))
+            if len(best_scores) < self.REPORTED_TOP_K:
+                heapq.heappush(best_scores, score)
+            elif score > best_scores[0]:
+                heapq.heapreplace(best_scores, score)
+        
+        if len(scored_chunks) < len(prefiltered_chunks):
+            print(f"   ✂️ Branch-and-bound: {len(prefiltered_chunks) - len(scored_chunks)}/"
+                  f"{len(prefiltered_chunks)} candidatos descartados por cota superior")
+        
+        # Mismo orden que un sorted estable sobre todos los candidatos
+        # (empates por posición en la lista pre-filtrada)
+        ranked_chunks = [
+            (chunk, score, details)
+            for _, chunk, score, details in sorted(scored_chunks, key=lambda x: (-x[2], x[0]))
+        ]
         
         # Log de resultado del hybrid score
         print(f"   🎯 Top 3 hybrid scores: {[round(s, 3) for _, s, _ in ranked_chunks[:3]]}")
         
-        top_k = ranked_chunks[:3]
+        top_k = ranked_chunks[:self.REPORTED_TOP_K]
         
         ambiguity = self.detect_ambiguity([(c, s) for c, s, _ in ranked_chunks])
         
@@ -1064,10 +1124,12 @@ class HybridValidator:
             'weights_used': self.weights,
             # 🆕 NUEVO: Info de pre-filtrado para debugging/pruebas
             'prefilter_info': {
-                'total_chunks': len(chunks),
+                'total_chunks': total_chunks,
                 'prefiltered_chunks': len(prefiltered_chunks),
-                'prefilter_method': 'cosine_similarity',
-                'top_prefiltered_ids': [c.get('chunk_id', 'N/A') for c in prefiltered_chunks[:5]]
+                'prefilter_method': prefilter_method,
+                'prefilter_top_k': self.prefilter_top_k,
+                'top_prefiltered_ids': [c.get('chunk_id', 'N/A') for c in prefiltered_chunks[:5]],
+                'scored_chunks': len(scored_chunks)
             }
         }
         
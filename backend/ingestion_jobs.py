@@ -0,0 +1,737 @@
+"""
+Cola de trabajos de ingesta (procesamiento de materiales en segundo plano)
+
+Antes, todo el pipeline del PDF (extracción → chunking → embeddings →
+guardado) corría dentro de la petición HTTP de /api/materials/upload: un
+libro de 1000 páginas podía superar el timeout de nginx y un reinicio del
+servidor perdía todo el trabajo hecho.
+
+Ahora:
+- El endpoint escribe el archivo por bloques directamente en el directorio
+  del trabajo (calculando su SHA-256 al vuelo), crea el trabajo y responde.
+  El PDF nunca está completo en memoria: los extractores leen ese archivo
+- Workers (tareas asyncio del mismo proceso) toman los trabajos de la cola
+  y ejecutan el pipeline por ETAPAS con checkpoint en disco
+- Si el servidor se reinicia, el trabajo se retoma desde la última etapa
+  completada (los trabajos 'running' sin latido se vuelven a encolar)
+- Un trabajo que tumba al worker una y otra vez no se reencola para
+  siempre: tras INGESTION_JOB_MAX_ATTEMPTS intentos queda 'failed'
+- Cada evento de progreso se guarda en la tabla job_events; el stream SSE
+  /api/upload-progress/{session_id} los recibe al instante a través de
+  progress_broker.py (listeners de JobStore) y los re-lee de ahí al reconectar
+
+Todo vive en SQLite + archivos locales (data/jobs), sin servicios externos.
+Varios procesos uvicorn pueden compartir la cola: tomar un trabajo es un
+UPDATE atómico.
+
+Autor: Abel Jesús Moya Acosta
+Fecha: 17 de noviembre de 2025
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+
+from executors import run_io
+
+# Configuración (variables de entorno)
+DEFAULT_JOBS_DIR = Path(__file__).parent.parent / "data" / "jobs"
+INGESTION_JOBS_DIR = Path(os.getenv('INGESTION_JOBS_DIR', str(DEFAULT_JOBS_DIR)))
+INGESTION_WORKERS = int(os.getenv('INGESTION_WORKERS', '1'))
+# Un trabajo 'running' sin latido durante este tiempo se considera huérfano
+INGESTION_JOB_STALE_SECONDS = float(os.getenv('INGESTION_JOB_STALE_SECONDS', '60'))
+# Intentos (claims) de un trabajo antes de darlo por fallido al reencolarlo
+INGESTION_JOB_MAX_ATTEMPTS = int(os.getenv('INGESTION_JOB_MAX_ATTEMPTS', '3'))
+# Tamaño de bloque al escribir una subida en disco
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+# Etapas del pipeline (en orden) y su valor en materials.processing_status
+JOB_STAGES = ('extraction', 'chunking', 'embedding', 'storage')
+STAGE_STATUS = {
+    'extraction': 'extracting',
+    'chunking': 'chunking',
+    'embedding': 'embedding',
+    'storage': 'storing',
+}
+
+# Estados de un trabajo
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_COMPLETED = 'completed'
+JOB_FAILED = 'failed'
+
+# data.reason del evento 'error' de un trabajo que agotó sus intentos
+REASON_MAX_ATTEMPTS = 'max_attempts'
+
+
+def _pid_alive(pid: int) -> bool:
+    """True si existe un proceso con ese PID en este host"""
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobStore:
+    """
+    Persistencia de trabajos, eventos de progreso y checkpoints
+
+    - SQLite (jobs_dir/ingestion_jobs.sqlite3): tablas jobs y job_events
+    - Archivos por trabajo (jobs_dir/<job_id>/): archivo subido y checkpoints
+      de cada etapa (JSON, o .npy para matrices de embeddings)
+    """
+
+    def __init__(self, jobs_dir: Path, max_attempts: int = INGESTION_JOB_MAX_ATTEMPTS):
+        self.jobs_dir = Path(jobs_dir)
+        self.max_attempts = max(1, int(max_attempts))
+        self.jobs_dir.mkdir(parents=True, exist_ok=True)
+        self.db_path = self.jobs_dir / "ingestion_jobs.sqlite3"
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False,
+                                     isolation_level=None, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        # Callbacks (job_id, seq, event) tras cada commit; event=None: trabajo nuevo
+        self._listeners: List[Callable[[str, int, Optional[dict]], None]] = []
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                session_id TEXT,
+                user_id TEXT,
+                filename TEXT NOT NULL,
+                file_path TEXT NOT NULL,
+                status TEXT NOT NULL,
+                stage TEXT,
+                completed_stages TEXT NOT NULL DEFAULT '[]',
+                progress INTEGER NOT NULL DEFAULT 0,
+                message TEXT,
+                material_id TEXT,
+                result TEXT,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                worker TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at);
+            CREATE INDEX IF NOT EXISTS idx_jobs_session ON jobs(session_id);
+            CREATE TABLE IF NOT EXISTS job_events (
+                job_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                event TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (job_id, seq)
+            );
+        """)
+        # Columnas agregadas después de la primera versión del esquema
+        columns = {row['name'] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        if 'content_sha256' not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN content_sha256 TEXT")
+
+    @staticmethod
+    def _to_dict(row: Optional[sqlite3.Row]) -> Optional[dict]:
+        if row is None:
+            return None
+        job = dict(row)
+        job['completed_stages'] = json.loads(job['completed_stages'] or '[]')
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+    def job_dir(self, job_id: str) -> Path:
+        return self.jobs_dir / job_id
+
+    def add_listener(self, callback: Callable[[str, int, Optional[dict]], None]):
+        """
+        Registra un callback que se llama tras cada commit de un evento
+        (job_id, seq, event) o de un trabajo nuevo (job_id, 0, None)
+
+        Se ejecuta en el hilo que escribió (normalmente el pool io).
+        """
+        self._listeners.append(callback)
+
+    def _notify(self, job_id: str, seq: int, event: Optional[dict]):
+        for callback in self._listeners:
+            try:
+                callback(job_id, seq, event)
+            except Exception as e:
+                print(f"⚠️ Error en listener de trabajos: {e}")
+
+    def data_version(self) -> int:
+        """
+        Cambia cuando OTRA conexión (otro proceso uvicorn) hace commit
+
+        Consulta barata (no lee tablas): sirve para detectar eventos
+        escritos por otros workers sin re-leer job_events.
+        """
+        with self._lock:
+            return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    # ─── Trabajos ────────────────────────────────────────────────────────
+
+    def spool_path(self) -> Path:
+        """Archivo temporal para una subida en curso (mismo disco que los trabajos)"""
+        incoming = self.jobs_dir / "incoming"
+        incoming.mkdir(exist_ok=True)
+        return incoming / f"{uuid.uuid4().hex}.part"
+
+    def create_job_from_file(self, filename: str, source_path: Path, content_sha256: Optional[str] = None,
+                             session_id: Optional[str] = None, user_id: Optional[str] = None) -> dict:
+        """Mueve (sin copiar) un archivo ya escrito en disco al trabajo nuevo y lo encola"""
+        job_id = uuid.uuid4().hex
+        job_dir = self.job_dir(job_id)
+        job_dir.mkdir(parents=True, exist_ok=True)
+        file_path = job_dir / f"upload{Path(filename).suffix.lower()}"
+        os.replace(source_path, file_path)
+
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, session_id, user_id, filename, file_path, content_sha256, status, "
+                "created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, session_id, user_id, filename, str(file_path), content_sha256, JOB_QUEUED, now, now)
+            )
+        self._notify(job_id, 0, None)
+        return self.get_job(job_id)
+
+    def create_job(self, filename: str, content: bytes, session_id: Optional[str] = None,
+                   user_id: Optional[str] = None) -> dict:
+        """Guarda el archivo subido (en memoria) y encola un trabajo nuevo"""
+        spool = self.spool_path()
+        spool.write_bytes(content)
+        return self.create_job_from_file(filename, spool, hashlib.sha256(content).hexdigest(),
+                                         session_id=session_id, user_id=user_id)
+
+    def get_job(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row)
+
+    def get_job_by_session(self, session_id: str) -> Optional[dict]:
+        """Trabajo más reciente de una sesión de upload (SSE)"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM jobs WHERE session_id = ? ORDER BY created_at DESC LIMIT 1",
+                (session_id,)
+            ).fetchone()
+        return self._to_dict(row)
+
+    def claim_next(self, worker: str) -> Optional[dict]:
+        """
+        Toma (atómicamente) el trabajo encolado más antiguo
+
+        Un trabajo encolado que ya agotó sus intentos (p.ej. reencolado por
+        otro proceso) no se ejecuta: se marca fallido y se toma el siguiente.
+        """
+        while True:
+            with self._lock:
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    row = self._conn.execute(
+                        "SELECT id, attempts FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1",
+                        (JOB_QUEUED,)
+                    ).fetchone()
+                    if row is None:
+                        self._conn.execute("COMMIT")
+                        return None
+                    exhausted = row['attempts'] >= self.max_attempts
+                    if exhausted:
+                        self._fail_exhausted_locked(row['id'], row['attempts'])
+                    else:
+                        self._conn.execute(
+                            "UPDATE jobs SET status = ?, worker = ?, attempts = attempts + 1, "
+                            "updated_at = ? WHERE id = ?",
+                            (JOB_RUNNING, worker, time.time(), row['id'])
+                        )
+                    self._conn.execute("COMMIT")
+                except Exception:
+                    self._conn.execute("ROLLBACK")
+                    raise
+            if not exhausted:
+                return self.get_job(row['id'])
+            self._emit_exhausted(row['id'], row['attempts'])
+
+    def update_job(self, job_id: str, **fields):
+        """Actualiza campos del trabajo (y su latido updated_at)"""
+        if 'result' in fields:
+            fields['result'] = json.dumps(fields['result'], ensure_ascii=False)
+        if 'completed_stages' in fields:
+            fields['completed_stages'] = json.dumps(fields['completed_stages'])
+        fields['updated_at'] = time.time()
+        columns = ', '.join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?",
+                               (*fields.values(), job_id))
+
+    def requeue_stale(self, stale_seconds: float = INGESTION_JOB_STALE_SECONDS) -> int:
+        """
+        Vuelve a encolar trabajos 'running' cuyo worker dejó de dar latido (reinicio/caída)
+
+        Returns:
+            int: Trabajos reencolados (los que agotaron sus intentos quedan fallidos)
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id FROM jobs WHERE status = ? AND updated_at < ?",
+                (JOB_RUNNING, time.time() - stale_seconds)
+            ).fetchall()
+        return self._requeue_running([row['id'] for row in rows])
+
+    def requeue_dead_workers(self, hostname: str) -> int:
+        """
+        Vuelve a encolar trabajos 'running' de procesos de ESTE host que ya no
+        existen (el servidor se reinició). Los de procesos vivos no se tocan.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, worker FROM jobs WHERE status = ? AND worker LIKE ?",
+                (JOB_RUNNING, f"{hostname}:%")
+            ).fetchall()
+        orphaned = []
+        for row in rows:
+            try:
+                pid = int(row['worker'].split(':', 1)[1].split('#', 1)[0])
+            except (ValueError, IndexError):
+                continue
+            if not _pid_alive(pid):
+                orphaned.append(row['id'])
+        return self._requeue_running(orphaned)
+
+    def _requeue_running(self, job_ids: List[str]) -> int:
+        """
+        Reencola trabajos 'running' huérfanos; los que ya usaron
+        max_attempts intentos se marcan fallidos (evento 'error')
+        """
+        requeued, exhausted = 0, []
+        with self._lock:
+            for job_id in job_ids:
+                row = self._conn.execute(
+                    "SELECT attempts FROM jobs WHERE id = ? AND status = ?", (job_id, JOB_RUNNING)
+                ).fetchone()
+                if row is None:
+                    continue  # otro proceso ya lo reencoló o terminó
+                if row['attempts'] >= self.max_attempts:
+                    self._fail_exhausted_locked(job_id, row['attempts'])
+                    exhausted.append((job_id, row['attempts']))
+                else:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = ?, worker = NULL WHERE id = ? AND status = ?",
+                        (JOB_QUEUED, job_id, JOB_RUNNING)
+                    )
+                    requeued += 1
+        for job_id, attempts in exhausted:
+            self._emit_exhausted(job_id, attempts)
+        return requeued
+
+    def _exhausted_message(self, attempts: int) -> str:
+        return (f"El trabajo se interrumpió en {attempts} intento(s) sin terminar "
+                f"(máximo INGESTION_JOB_MAX_ATTEMPTS={self.max_attempts})")
+
+    def _fail_exhausted_locked(self, job_id: str, attempts: int):
+        self._conn.execute(
+            "UPDATE jobs SET status = ?, worker = NULL, error = ?, updated_at = ? WHERE id = ?",
+            (JOB_FAILED, self._exhausted_message(attempts), time.time(), job_id)
+        )
+
+    def _emit_exhausted(self, job_id: str, attempts: int):
+        """Evento 'error' (misma forma que un fallo del handler) para un trabajo sin intentos"""
+        message = self._exhausted_message(attempts)
+        job = self.get_job(job_id)
+        print(f"❌ [JOB {job_id[:8]}] {message}")
+        self.add_event(job_id, {
+            'type': 'error',
+            'step': 'error',
+            'message': f'❌ Error: {message}',
+            'progress': 0,
+            'data': {'error': message, 'job_id': job_id, 'reason': REASON_MAX_ATTEMPTS,
+                     'attempts': attempts, 'material_id': job['material_id'] if job else None}
+        })
+
+    def requeue(self, job_id: str) -> bool:
+        """
+        Reintenta un trabajo fallido (retoma desde el último checkpoint)
+
+        Un reintento manual empieza con el contador de intentos en cero.
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, error = NULL, attempts = 0, updated_at = ? "
+                "WHERE id = ? AND status = ?",
+                (JOB_QUEUED, time.time(), job_id, JOB_FAILED)
+            )
+        return cursor.rowcount > 0
+
+    def counts(self) -> Dict[str, int]:
+        """Número de trabajos por estado"""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {row['status']: row['n'] for row in rows}
+
+    # ─── Eventos de progreso ─────────────────────────────────────────────
+
+    def add_event(self, job_id: str, event: dict) -> int:
+        """Agrega un evento al historial del trabajo y actualiza su progreso"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                seq = self._conn.execute(
+                    "SELECT COALESCE(MAX(seq), 0) + 1 FROM job_events WHERE job_id = ?", (job_id,)
+                ).fetchone()[0]
+                self._conn.execute(
+                    "INSERT INTO job_events (job_id, seq, event, created_at) VALUES (?, ?, ?, ?)",
+                    (job_id, seq, json.dumps(event, ensure_ascii=False, default=str), now)
+                )
+                self._conn.execute(
+                    "UPDATE jobs SET progress = ?, message = ?, updated_at = ? WHERE id = ?",
+                    (int(event.get('progress', 0)), event.get('message'), now, job_id)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        self._notify(job_id, seq, event)
+        return seq
+
+    def events_since(self, job_id: str, after_seq: int = 0) -> List[tuple]:
+        """Eventos con seq > after_seq, en orden: [(seq, event), ...]"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, event FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq",
+                (job_id, after_seq)
+            ).fetchall()
+        return [(row['seq'], json.loads(row['event'])) for row in rows]
+
+    def prune_events(self, max_age_seconds: float) -> int:
+        """Elimina el historial de eventos de trabajos terminados hace más de max_age_seconds"""
+        cutoff = time.time() - max_age_seconds
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM job_events WHERE job_id IN ("
+                "SELECT id FROM jobs WHERE status IN (?, ?) AND updated_at < ?)",
+                (JOB_COMPLETED, JOB_FAILED, cutoff)
+            )
+        return cursor.rowcount
+
+    # ─── Checkpoints ─────────────────────────────────────────────────────
+
+    def save_checkpoint(self, job_id: str, stage: str, data: Any):
+        """
+        Guarda el resultado de una etapa (escritura atómica: tmp + rename)
+
+        data puede ser un dict/list serializable a JSON o un np.ndarray.
+        """
+        job_dir = self.job_dir(job_id)
+        job_dir.mkdir(parents=True, exist_ok=True)
+        if isinstance(data, np.ndarray):
+            path = job_dir / f"{stage}.npy"
+            tmp_path = job_dir / f"{stage}.tmp.npy"
+            np.save(tmp_path, data)
+        else:
+            path = job_dir / f"{stage}.json"
+            tmp_path = job_dir / f"{stage}.json.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def load_checkpoint(self, job_id: str, stage: str) -> Any:
+        """Resultado guardado de una etapa (None si no existe)"""
+        job_dir = self.job_dir(job_id)
+        npy_path = job_dir / f"{stage}.npy"
+        if npy_path.exists():
+            return np.load(npy_path)
+        json_path = job_dir / f"{stage}.json"
+        if json_path.exists():
+            with open(json_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return None
+
+    def cleanup_files(self, job_id: str):
+        """Elimina el archivo subido y los checkpoints (tras completar)"""
+        shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class JobContext:
+    """
+    Vista de un trabajo en ejecución para el handler del pipeline
+
+    Los métodos async delegan la E/S (SQLite, checkpoints) al pool io.
+    """
+
+    def __init__(self, store: JobStore, job: dict):
+        self.store = store
+        self.job = job
+        self.job_id = job['id']
+
+    @property
+    def file_path(self) -> Path:
+        return Path(self.job['file_path'])
+
+    @property
+    def content_sha256(self) -> Optional[str]:
+        return self.job.get('content_sha256')
+
+    def is_done(self, stage: str) -> bool:
+        return stage in self.job['completed_stages']
+
+    async def start_stage(self, stage: str):
+        self.job['stage'] = stage
+        await run_io(self.store.update_job, self.job_id, stage=stage)
+
+    async def complete_stage(self, stage: str, data: Any = None):
+        """Guarda el checkpoint de la etapa y la marca como completada"""
+        if data is not None:
+            await self.save(stage, data)
+        if stage not in self.job['completed_stages']:
+            self.job['completed_stages'].append(stage)
+        await run_io(self.store.update_job, self.job_id,
+                     completed_stages=self.job['completed_stages'])
+
+    async def save(self, name: str, data: Any):
+        """Guarda un checkpoint auxiliar (p.ej. estadísticas de una etapa)"""
+        await run_io(self.store.save_checkpoint, self.job_id, name, data)
+
+    async def load(self, name: str) -> Any:
+        return await run_io(self.store.load_checkpoint, self.job_id, name)
+
+    async def set_material_id(self, material_id):
+        self.job['material_id'] = material_id
+        await run_io(self.store.update_job, self.job_id, material_id=str(material_id))
+
+    async def progress(self, step: str, message: str, progress: int, data: dict = None):
+        """Registra un evento de progreso (lo lee el stream SSE)"""
+        event = {
+            'type': 'progress',
+            'step': step,
+            'message': message,
+            'progress': progress,
+            'data': data or {}
+        }
+        await run_io(self.store.add_event, self.job_id, event)
+        print(f"📤 [JOB {self.job_id[:8]}] {step} → {message} ({progress}%)")
+
+
+class IngestionQueue:
+    """
+    Workers asyncio que consumen la cola de trabajos de ingesta
+
+    El handler recibe un JobContext y retorna el resultado (dict) del trabajo.
+    El trabajo pesado del handler debe ir a los pools (run_ingest/run_io)
+    para no bloquear el event loop.
+    """
+
+    def __init__(self, store: JobStore, workers: int = INGESTION_WORKERS,
+                 poll_interval: float = 1.0, stale_seconds: float = INGESTION_JOB_STALE_SECONDS):
+        self.store = store
+        self.workers = max(1, int(workers))
+        self.poll_interval = poll_interval
+        self.stale_seconds = stale_seconds
+        self.worker_name = f"{socket.gethostname()}:{os.getpid()}"
+        self._handler: Optional[Callable[[JobContext], Awaitable[dict]]] = None
+        self._on_exhausted: Optional[Callable[[dict], Awaitable[None]]] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._notifications: set = set()
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._finished: Dict[str, asyncio.Event] = {}
+
+    def start(self, handler: Callable[[JobContext], Awaitable[dict]],
+              on_exhausted: Optional[Callable[[dict], Awaitable[None]]] = None):
+        """
+        Arranca los workers (llamar desde el evento startup de FastAPI)
+
+        Args:
+            handler: Pipeline de un trabajo (recibe JobContext)
+            on_exhausted: Se llama con el trabajo cuando agota sus intentos
+                          sin que el handler termine (p.ej. para marcar el
+                          material como 'failed')
+        """
+        self._handler = handler
+        self._on_exhausted = on_exhausted
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self.store.add_listener(self._on_store_event)
+        requeued = self.store.requeue_dead_workers(socket.gethostname())
+        if requeued:
+            print(f"♻️ {requeued} trabajo(s) de ingesta interrumpido(s) se retomarán desde su último checkpoint")
+        self._tasks = [asyncio.create_task(self._worker_loop(n)) for n in range(self.workers)]
+        print(f"✅ Cola de ingesta iniciada ({self.workers} worker(s), {self.store.db_path})")
+
+    def _on_store_event(self, job_id: str, seq: int, event: Optional[dict]):
+        """Listener de JobStore (hilo io): avisa de los trabajos sin intentos al event loop"""
+        if (self._on_exhausted is None or not event or event.get('type') != 'error'
+                or (event.get('data') or {}).get('reason') != REASON_MAX_ATTEMPTS):
+            return
+        self._loop.call_soon_threadsafe(self._schedule_exhausted, job_id)
+
+    def _schedule_exhausted(self, job_id: str):
+        task = self._loop.create_task(self._notify_exhausted(job_id))
+        self._notifications.add(task)
+        task.add_done_callback(self._notifications.discard)
+
+    async def _notify_exhausted(self, job_id: str):
+        finished = self._finished.pop(job_id, None)
+        if finished is not None:
+            finished.set()
+        try:
+            job = await run_io(self.store.get_job, job_id)
+            if job is not None:
+                await self._on_exhausted(job)
+        except Exception as e:
+            print(f"⚠️ Error notificando trabajo sin intentos {job_id[:8]}: {e}")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self):
+        """Despierta a los workers (hay un trabajo nuevo)"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def enqueue(self, filename: str, content: bytes, session_id: Optional[str] = None,
+                      user_id: Optional[str] = None) -> dict:
+        job = await run_io(self.store.create_job, filename, content,
+                           session_id=session_id, user_id=user_id)
+        self.notify()
+        return job
+
+    async def enqueue_stream(self, filename: str, read: Callable[[int], Awaitable[bytes]],
+                             session_id: Optional[str] = None, user_id: Optional[str] = None) -> dict:
+        """
+        Encola una subida leyéndola por bloques (p.ej. UploadFile.read)
+
+        Cada bloque se escribe al archivo del trabajo y se suma al SHA-256
+        en el pool io: en memoria solo hay un bloque a la vez.
+        """
+        spool = self.store.spool_path()
+        digest = hashlib.sha256()
+
+        def write_block(f, block: bytes):
+            digest.update(block)
+            f.write(block)
+
+        try:
+            f = await run_io(open, spool, 'wb')
+            try:
+                while True:
+                    block = await read(UPLOAD_CHUNK_BYTES)
+                    if not block:
+                        break
+                    await run_io(write_block, f, block)
+            finally:
+                await run_io(f.close)
+            job = await run_io(self.store.create_job_from_file, filename, spool, digest.hexdigest(),
+                               session_id=session_id, user_id=user_id)
+        except BaseException:
+            spool.unlink(missing_ok=True)
+            raise
+        self.notify()
+        return job
+
+    async def wait_for(self, job_id: str, timeout: Optional[float] = None) -> dict:
+        """Espera a que un trabajo termine (completado o fallido)"""
+        deadline = time.monotonic() + timeout if timeout else None
+        while True:
+            job = await run_io(self.store.get_job, job_id)
+            if job is None or job['status'] in (JOB_COMPLETED, JOB_FAILED):
+                return job
+            event = self._finished.setdefault(job_id, asyncio.Event())
+            remaining = deadline - time.monotonic() if deadline else self.poll_interval
+            if deadline and remaining <= 0:
+                return job
+            try:
+                await asyncio.wait_for(event.wait(), timeout=min(remaining, self.poll_interval))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _worker_loop(self, worker_number: int):
+        worker = f"{self.worker_name}#{worker_number}"
+        while True:
+            try:
+                job = await run_io(self.store.claim_next, worker)
+                if job is None:
+                    # Sin trabajos: esperar aviso o revisar huérfanos periódicamente
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                    except asyncio.TimeoutError:
+                        await run_io(self.store.requeue_stale, self.stale_seconds)
+                    continue
+                await self._run_job(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ Error en worker de ingesta {worker}: {e}")
+                await asyncio.sleep(self.poll_interval)
+
+    async def _heartbeat(self, job_id: str):
+        """Mantiene vivo updated_at mientras una etapa larga no emite eventos"""
+        while True:
+            await asyncio.sleep(max(1.0, self.stale_seconds / 3))
+            await run_io(self.store.update_job, job_id)
+
+    async def _run_job(self, job: dict):
+        job_id = job['id']
+        resumed = job['completed_stages']
+        print(f"\n🏭 [JOB {job_id[:8]}] Procesando {job['filename']} (intento {job['attempts']})"
+              + (f" - retomando tras: {', '.join(resumed)}" if resumed else ""))
+
+        heartbeat = asyncio.create_task(self._heartbeat(job_id))
+        try:
+            result = await self._handler(JobContext(self.store, job))
+        except Exception as e:
+            print(f"❌ [JOB {job_id[:8]}] Falló: {e}")
+            await run_io(self.store.update_job, job_id, status=JOB_FAILED, error=str(e))
+            await run_io(self.store.add_event, job_id, {
+                'type': 'error',
+                'step': 'error',
+                'message': f'❌ Error: {str(e)}',
+                'progress': 0,
+                'data': {'error': str(e), 'job_id': job_id}
+            })
+        else:
+            await run_io(self.store.update_job, job_id, status=JOB_COMPLETED, result=result,
+                         progress=100, stage=None)
+            await run_io(self.store.add_event, job_id, {
+                'type': 'complete',
+                'step': 'complete',
+                'message': '🎉 Material procesado exitosamente',
+                'progress': 100,
+                'data': result
+            })
+            await run_io(self.store.cleanup_files, job_id)
+            print(f"✅ [JOB {job_id[:8]}] Completado")
+        finally:
+            heartbeat.cancel()
+            finished = self._finished.pop(job_id, None)
+            if finished is not None:
+                finished.set()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "started": len(self._tasks) > 0,
+            "jobs": self.store.counts()
+        }
@@ -0,0 +1,228 @@
+"""
+Pipeline de ingesta en streaming (páginas → chunks → embeddings → guardado)
+
+El pipeline por etapas (process_ingestion_job) materializaba cada etapa
+completa antes de empezar la siguiente: el texto entero, luego la lista de
+chunks, luego una lista con cada embedding como lista de floats de Python
+(más dos copias del texto de cada chunk), y recién ahí insertaba. En el
+VPS de 2 GB el pico de memoria era la suma de todo eso y la base de datos
+no recibía nada hasta que terminaba la extracción.
+
+Ahora, para un trabajo nuevo:
+- Las páginas salen de un generador (chunking.iter_pdf_pages) a medida que
+  se extrae cada rango
+- SemanticChunker entrega cada chunk apenas se completa (mismos chunks que
+  adaptive_chunking sobre el texto completo) y se agrupan en batches
+- Cada batch se vectoriza y se inserta en cuanto está listo
+- Entre etapas hay colas asyncio acotadas (PIPELINE_QUEUE_BATCHES): una
+  etapa lenta frena a la anterior en vez de acumular batches en memoria,
+  y mientras tanto las etapas se solapan (se inserta el batch N mientras
+  se vectoriza el N+1 y se extraen las páginas siguientes)
+
+El generador avanza de a un elemento por tarea del pool ingest (igual que
+los batches de embeddings): entre elementos el pool atiende otras tareas y
+el event loop queda libre para SSE y validaciones.
+
+Checkpoints: cada batch vectorizado se guarda en el directorio del trabajo
+(chunks + keywords en JSON, embeddings en .npy; ver CheckpointedEmbedder).
+Si el proceso se cae a mitad del libro, el reintento vuelve a leer y
+trocear el documento (rápido: la capa de texto y el OCR por página están en
+caché) pero no recalcula los embeddings de los batches ya guardados.
+Un trabajo con etapas completas (el streaming terminó) sigue por etapas.
+
+Autor: Abel Jesús Moya Acosta
+Fecha: 17 de noviembre de 2025
+"""
+
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Iterable, Iterator, List, Optional, Tuple
+
+from chunking import TextStats, adaptive_chunk_params, iter_semantic_chunks
+from executors import run_io, run_ingest
+
+# Configuración (variables de entorno)
+STREAMING_INGESTION = os.getenv('STREAMING_INGESTION', 'true').lower() == 'true'
+# Batches en espera entre dos etapas (acota la memoria en vuelo)
+PIPELINE_QUEUE_BATCHES = int(os.getenv('PIPELINE_QUEUE_BATCHES', '2'))
+
+_END = object()
+
+# Prefijo de los checkpoints por batch en el directorio del trabajo
+BATCH_CHECKPOINT_PREFIX = 'stream_batch'
+
+
+def iter_chunk_batches(pages: Iterable[str], total_pages: int, batch_size: int,
+                       stats: TextStats) -> Iterator[List[str]]:
+    """
+    Chunks adaptativos de las páginas, en batches de batch_size
+
+    Args:
+        pages: Texto de cada página (o el texto completo de un TXT)
+        total_pages: Páginas del documento (elige la estrategia de chunking)
+        batch_size: Chunks por batch (EMBEDDING_BATCH_SIZE)
+        stats: Acumulador de estadísticas; stats.parts = páginas leídas
+
+    Yields:
+        List[str]: Chunks normalizados, en orden
+    """
+    strategy, params = adaptive_chunk_params(total_pages)
+    print(f"\n🎯 CHUNKING ADAPTATIVO (streaming) para {total_pages} páginas")
+    print(f"   {strategy}")
+
+    def counted_pages():
+        for page in pages:
+            stats.add(page)
+            yield page
+
+    batch = []
+    for chunk in iter_semantic_chunks(counted_pages(), **params):
+        batch.append(chunk)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def batch_checkpoint_names(index: int) -> Tuple[str, str]:
+    """Nombres (chunks + keywords, embeddings) del checkpoint del batch index"""
+    name = f"{BATCH_CHECKPOINT_PREFIX}_{index:05d}"
+    return name, f"{name}_embeddings"
+
+
+async def save_batch_checkpoint(ctx, index: int, chunks: List[str], keywords: List[List[str]], matrix):
+    """
+    Guarda un batch vectorizado (ctx: JobContext)
+
+    La matriz se escribe primero: el JSON marca el batch como completo.
+    """
+    chunks_name, matrix_name = batch_checkpoint_names(index)
+    await ctx.save(matrix_name, matrix)
+    await ctx.save(chunks_name, {'chunks': chunks, 'keywords': keywords})
+
+
+async def load_batch_checkpoint(ctx, index: int) -> Optional[Tuple[List[str], List[List[str]], Any]]:
+    """(chunks, keywords, matriz) del batch index, o None si no se guardó"""
+    chunks_name, matrix_name = batch_checkpoint_names(index)
+    data = await ctx.load(chunks_name)
+    if data is None:
+        return None
+    matrix = await ctx.load(matrix_name)
+    if matrix is None:
+        return None
+    return data['chunks'], data['keywords'], matrix
+
+
+class CheckpointedEmbedder:
+    """
+    Etapa de embeddings del streaming con checkpoint por batch
+
+    Recibe los batches en orden. Mientras el checkpoint del batch N exista y
+    tenga EXACTAMENTE los mismos chunks (el chunking es determinista), se
+    reutiliza sin llamar al modelo; desde el primer batch sin checkpoint (o
+    distinto) se vectoriza y se guarda cada uno.
+
+    Uso:
+        embedder = CheckpointedEmbedder(ctx, lambda batch: run_ingest(embed_chunk_batch, batch))
+        await run_pipeline(batches, embedder, store)   # store recibe (batch, matriz, keywords)
+    """
+
+    def __init__(self, ctx, embed_batch: Callable[[List[str]], Awaitable[tuple]]):
+        """
+        Args:
+            ctx: JobContext del trabajo
+            embed_batch: Corrutina batch -> (matriz float32, keywords)
+        """
+        self.ctx = ctx
+        self.embed_batch = embed_batch
+        self.index = 0
+        self.resuming = True
+        self.reused = 0
+
+    async def __call__(self, batch: List[str]) -> tuple:
+        index = self.index
+        self.index += 1
+
+        if self.resuming:
+            saved = await load_batch_checkpoint(self.ctx, index)
+            if saved is not None and saved[0] == batch:
+                self.reused += 1
+                return batch, saved[2], saved[1]
+            if saved is not None:
+                print(f"⚠️ El batch {index} no coincide con su checkpoint: se recalcula desde aquí")
+            self.resuming = False
+
+        matrix, keywords = await self.embed_batch(batch)
+        await save_batch_checkpoint(self.ctx, index, batch, keywords, matrix)
+        return batch, matrix, keywords
+
+
+async def _next_item(source: Iterator) -> Any:
+    """Siguiente elemento del generador, calculado en el pool ingest"""
+    future = asyncio.ensure_future(run_ingest(next, source, _END))
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        # El hilo sigue dentro del generador: esperar a que salga antes de cerrarlo
+        await asyncio.wait([future])
+        raise
+
+
+async def _produce(source: Iterator, out_queue: asyncio.Queue):
+    try:
+        while True:
+            item = await _next_item(source)
+            if item is _END:
+                break
+            await out_queue.put(item)
+        await out_queue.put(_END)
+    finally:
+        # Libera temporales y pools de extracción aunque el pipeline se cancele
+        close = getattr(source, 'close', None)
+        if close is not None:
+            await run_io(close)
+
+
+async def _stage(in_queue: asyncio.Queue, fn: Callable[[Any], Awaitable[Any]],
+                 out_queue: asyncio.Queue = None):
+    while True:
+        item = await in_queue.get()
+        if item is _END:
+            break
+        result = await fn(item)
+        if out_queue is not None:
+            await out_queue.put(result)
+    if out_queue is not None:
+        await out_queue.put(_END)
+
+
+async def run_pipeline(source: Iterator, *stages: Callable[[Any], Awaitable[Any]],
+                       queue_size: int = PIPELINE_QUEUE_BATCHES):
+    """
+    Ejecuta source → stages[0] → stages[1] → ... con colas acotadas
+
+    Todas las etapas corren a la vez. Cada etapa es una corrutina que
+    recibe un elemento y retorna el que pasa a la siguiente (lo que retorna
+    la última se descarta). Si una etapa falla, se cancelan las demás, se
+    cierra el generador y se propaga la excepción.
+
+    Args:
+        source: Generador síncrono (avanza en el pool ingest)
+        *stages: Corrutinas de cada etapa, en orden
+        queue_size: Elementos en espera entre dos etapas
+    """
+    queues = [asyncio.Queue(maxsize=max(1, queue_size)) for _ in stages]
+    coroutines = [_produce(source, queues[0])]
+    for index, stage in enumerate(stages):
+        out_queue = queues[index + 1] if index + 1 < len(stages) else None
+        coroutines.append(_stage(queues[index], stage, out_queue))
+
+    tasks = [asyncio.ensure_future(coroutine) for coroutine in coroutines]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
@@ -0,0 +1,87 @@
+"""
+Índice léxico por material (keywords por chunk)
+
+Antes, la extracción de keywords (~6 pasadas de regex por texto) y su
+expansión por prefijos se recalculaban desde el texto crudo en CADA
+validación.
+
+Ahora el índice se construye UNA vez al subir (o re-procesar) el material:
+- Keywords tokenizadas de cada chunk (columna material_embeddings.keywords)
+- Expansión por prefijos de cada chunk (se deriva de las keywords al cargar)
+
+En validación solo quedan búsquedas y aritmética sobre estas estructuras.
+
+Autor: Abel Jesús Moya Acosta
+Fecha: 17 de noviembre de 2025
+"""
+
+import re
+from typing import List, Set
+
+STOPWORDS = {'el', 'la', 'los', 'las', 'un', 'una', 'de', 'del', 'a', 'al', 'en', 'por', 'para', 'con', 'y', 'o', 'pero', 'si', 'no', 'que', 'como', 'cuando', 'donde', 'cual', 'quien', 'su', 'sus', 'mi', 'mis', 'tu', 'tus', 'se', 'le', 'lo', 'me', 'te', 'nos', 'os'}
+
+# Patrones precompilados para unir palabras fragmentadas por OCR
+# Ejemplo: "H enriet te" → "Henriette"
+FRAGMENT_SHORT_PATTERN = re.compile(r'\b(\w{1,2})\s+(\w{1,2})\b')
+FRAGMENT_MIXED_PATTERN = re.compile(r'\b(\w{2,4})\s+(\w{3,6})\b')
+KEYWORD_PATTERN = re.compile(r'\b\w{3,}\b')
+
+
+def extract_keywords(text: str, stopwords: Set[str] = STOPWORDS) -> List[str]:
+    """
+    Extrae keywords (palabras de 3+ letras sin stopwords) de un texto
+
+    Args:
+        text: Texto a tokenizar
+        stopwords: Conjunto de stopwords a excluir
+
+    Returns:
+        List[str]: Keywords en orden de aparición (con repeticiones, BM25 usa frecuencias)
+    """
+    # Normalizar texto antes de extraer keywords (quitar espacios OCR)
+    # Hasta 4 pasadas; se detiene apenas el texto deja de cambiar
+    for _ in range(4):
+        merged = FRAGMENT_SHORT_PATTERN.sub(r'\1\2', text)
+        if merged == text:
+            break
+        text = merged
+    text = FRAGMENT_MIXED_PATTERN.sub(r'\1\2', text)
+
+    words = KEYWORD_PATTERN.findall(text.lower())
+    return [w for w in words if w not in stopwords]
+
+
+def expand_keywords(keywords) -> Set[str]:
+    """Expande keywords con sus prefijos (6 o 5 letras) para tolerar variaciones"""
+    expanded = set(keywords)
+    for word in keywords:
+        if len(word) >= 6:
+            expanded.add(word[:6])
+        elif len(word) >= 5:
+            expanded.add(word[:5])
+        if word[0].isupper():
+            expanded.add(word.lower())
+    return expanded
+
+
+class LexicalIndex:
+    """
+    Índice léxico de un material
+
+    BM25 se calcula sobre los candidatos de cada validación (ver
+    HybridValidator.bm25_scores), así que el índice solo guarda lo que
+    evita re-tokenizar: las keywords de cada chunk y su expansión.
+
+    Attributes:
+        chunk_keywords: Keywords de cada chunk (mismo orden que los chunks)
+        chunk_expanded: Keywords expandidas (set) de cada chunk
+    """
+
+    def __init__(self, chunk_keywords: List[List[str]]):
+        self.chunk_keywords = chunk_keywords
+        self.chunk_expanded = [expand_keywords(keywords) for keywords in chunk_keywords]
+
+    @classmethod
+    def from_texts(cls, texts: List[str], stopwords: Set[str] = STOPWORDS) -> "LexicalIndex":
+        """Construye el índice tokenizando los textos de los chunks"""
+        return cls([extract_keywords(text, stopwords) for text in texts])
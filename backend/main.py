@@ -15,13 +15,14 @@ from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
 import asyncio
-from queue import Queue
 import uvicorn
 import json
 from pathlib import Path
 from datetime import datetime
 import time  # ✅ AGREGADO: Para medición de tiempo de procesamiento
 import os
+import shutil
+import uuid
 from dotenv import load_dotenv
 import argparse
 import sys
@@ -39,17 +40,59 @@ GROQ_ENABLED = False
 
 # Módulos básicos de embeddings
 try:
-    from embeddings_module import generate_embeddings, calculate_similarity, load_model
-    from chunking import chunk_text, extract_text_from_pdf, get_text_stats, semantic_chunking
-    from text_normalizer import normalize_text  # ✅ NUEVO: Para normalizar chunks al cargar
+    from embeddings_module import (
+        generate_embeddings, calculate_similarity, model_manager,
+        plan_embedding_batches, EMBEDDING_BATCH_SIZE
+    )
+    from chunking import (
+        extract_pdf_document, get_text_stats, semantic_chunking, iter_pdf_pages, TextStats
+    )
+    from lexical_index import LexicalIndex, extract_keywords
+    # Pipeline de ingesta en streaming (páginas → chunks → embeddings → guardado)
+    from ingestion_pipeline import STREAMING_INGESTION, CheckpointedEmbedder, iter_chunk_batches, run_pipeline
+    from pdf_extraction import count_pdf_pages
     MODULES_LOADED = True
 except ImportError as e:
     print(f"⚠️ Módulos de embeddings no disponibles: {e}")
 
+# Estado del modelo de embeddings (solo biblioteca estándar)
+from model_manager import ModelUnavailableError
+
+# Caché en memoria de embeddings por material (solo depende de numpy)
+from material_cache import material_cache, build_cached_material, find_chunk, invalidate_material
+
+# Pools de trabajo: el código bloqueante no corre en el event loop
+from executors import run_io, run_cpu, run_ingest, pool_stats, shutdown_pools
+
+# Trabajos de ingesta en segundo plano (upload → cola → pipeline por etapas)
+from ingestion_jobs import (
+    JobStore, JobContext, IngestionQueue, INGESTION_JOBS_DIR, STAGE_STATUS, JOB_FAILED
+)
+from progress_broker import ProgressBroker
+
+# Features de chunk precalculadas al guardar (reasoning score, palabras, números)
+from chunk_features import compute_chunk_features, compute_features_batch
+
+# Normalización de texto con caché direccionada por contenido (solo stdlib)
+from text_normalizer import NORMALIZER_VERSION
+from normalization_cache import normalize_cached, normalization_cache
+
+# Caché en disco de extracción de PDF y OCR por hash de contenido (solo stdlib)
+from extraction_cache import extraction_cache
+
+# Almacén binario de embeddings del modo local (.npy + mmap)
+from embedding_store import (
+    material_stem, save_material, open_material, list_materials, store_stats,
+    convert_legacy_files
+)
+
+# Recuperación top-K en la base de datos (RETRIEVAL_MODE=pgvector)
+from retrieval import (RETRIEVAL_MODE, RETRIEVAL_RPC_ERRORS, use_pgvector_retrieval, use_hybrid_retrieval,
+                       fetch_top_chunks)
+
 # Validadores semánticos
 try:
-    from semantic_validator import SemanticValidator
-    from hybrid_validator import HybridValidator
+    from validator_registry import ValidatorRegistry
 except ImportError as e:
     print(f"⚠️ Validadores semánticos no disponibles: {e}")
 
@@ -166,21 +209,23 @@ MIN_DOCUMENT_SIZE = int(os.getenv("MIN_DOCUMENT_SIZE", "200000"))
 materials_db = []
 questions_db = []
 
-# ✅ NUEVO: Cola para eventos de progreso (SSE)
-progress_events = {}  # {session_id: Queue()}
+# Cola de trabajos de ingesta (SQLite + archivos en data/jobs)
+ingestion_store = JobStore(INGESTION_JOBS_DIR)
+ingestion_queue = IngestionQueue(ingestion_store)
 
-# Inicializar validador semántico (solo si se importó correctamente)
-semantic_validator = None
+# Eventos de progreso empujados al stream SSE (sin sondeo por cliente)
+progress_broker = ProgressBroker(ingestion_store)
+
+# Validadores compartidos por todo el proceso (uno por configuración, con
+# recarga en caliente de umbrales/pesos: POST /api/validators/reload)
+validator_registry = None
 if MODULES_LOADED:
     try:
-        semantic_validator = SemanticValidator(
-            threshold_excellent=THRESHOLD_EXCELLENT,
-            threshold_good=THRESHOLD_GOOD,
-            threshold_acceptable=THRESHOLD_ACCEPTABLE
-        )
+        # model_manager.handle: los validadores no retienen el modelo (descarga por inactividad)
+        validator_registry = ValidatorRegistry(model_manager.handle)
     except Exception as e:
-        print(f"⚠️ No se pudo inicializar SemanticValidator: {e}")
-        semantic_validator = None
+        print(f"⚠️ No se pudo inicializar el registro de validadores: {e}")
+        validator_registry = None
 
 # ==================== FUNCIONES AUXILIARES ====================
 
@@ -195,7 +240,7 @@ async def get_current_user(authorization: Optional[str]):
         supabase = get_supabase_client()
         
         # Verificar el token con Supabase
-        user_response = supabase.auth.get_user(token)
+        user_response = await run_io(supabase.auth.get_user, token)
         
         if not user_response.user:
             raise HTTPException(status_code=401, detail="Token inválido")
@@ -232,22 +277,44 @@ async def startup_event():
     # Cargar índice de materiales
     load_materials_index()
     
-    # Precargar modelo de embeddings solo si los módulos están disponibles
+    # Modelo de embeddings en segundo plano: el servidor acepta conexiones
+    # (health checks) mientras carga. Estado en /api/model/status
     if MODULES_LOADED:
-        try:
-            load_model()
-            print("✅ Modelo de embeddings cargado exitosamente")
-        except Exception as e:
-            print(f"⚠️ Error cargando modelo: {e}")
+        model_manager.start()
+        # Construir los validadores compartidos antes del primer request
+        # (guardan model_manager.handle: no esperan a que termine la carga)
+        if validator_registry is not None:
+            try:
+                validator_registry.hybrid()
+                validator_registry.semantic()
+                print("✅ Validadores listos (HybridValidator + SemanticValidator)")
+            except Exception as e:
+                print(f"⚠️ Error construyendo validadores: {e}")
     else:
         print("⚠️ Módulos de embeddings no disponibles - modo limitado")
     
+    # Broker de progreso (SSE) y workers de la cola de ingesta (retoman trabajos interrumpidos)
+    progress_broker.start()
+    if MODULES_LOADED:
+        ingestion_queue.start(process_ingestion_job, on_exhausted=fail_exhausted_job_material)
+    
     # Ya no necesitamos load_existing_materials() porque usamos índice persistente
     # load_existing_materials()
     print(f"📚 Materiales en índice: {len(materials_db)}")
     print("\n✅ Backend listo y escuchando en http://localhost:8000")
     print("📖 Documentación disponible en http://localhost:8000/docs\n")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Detener la cola de ingesta y los pools de trabajo al apagar el servidor"""
+    await ingestion_queue.stop()
+    await progress_broker.stop()
+    if MODULES_LOADED:
+        await model_manager.stop()
+    shutdown_pools(wait=False)
+    normalization_cache.close()
+    extraction_cache.close()
+
 @app.get("/api/upload-progress/{session_id}")
 async def upload_progress(session_id: str):
     """
@@ -255,39 +322,24 @@ async def upload_progress(session_id: str):
     
     El frontend abre esta conexión ANTES de subir el archivo,
     y recibe eventos de progreso mientras se procesa.
+    
+    Los eventos los empuja progress_broker en cuanto se registran; al
+    conectar se repite lo ya emitido (la conexión puede abrirse antes del
+    upload o re-abrirse sin perder eventos).
     """
     print(f"🔌 [SSE] Nueva conexión SSE para session: {session_id}")
     
     async def event_generator():
-        # Crear cola para este session_id
-        if session_id not in progress_events:
-            progress_events[session_id] = Queue()
-            print(f"📝 [SSE] Cola creada para session: {session_id}")
-        
-        queue = progress_events[session_id]
+        async for event in progress_broker.stream(session_id):
+            if event is None:
+                # Keepalive: comentario SSE (EventSource lo ignora)
+                yield ": keepalive\n\n"
+                continue
+            
+            print(f"📤 [SSE] Enviando evento a frontend: {event.get('step')} ({event.get('progress')}%)")
+            yield f"data: {json.dumps(event)}\n\n"
         
-        try:
-            while True:
-                # Esperar eventos de la cola
-                await asyncio.sleep(0.1)
-                
-                if not queue.empty():
-                    event = queue.get()
-                    
-                    print(f"📤 [SSE] Enviando evento a frontend: {event.get('step')} ({event.get('progress')}%)")
-                    
-                    # Enviar evento SSE
-                    yield f"data: {json.dumps(event)}\n\n"
-                    
-                    # Si es evento final, cerrar conexión
-                    if event.get('type') == 'complete' or event.get('type') == 'error':
-                        print(f"🔚 [SSE] Cerrando conexión SSE: {session_id}")
-                        break
-        finally:
-            # Limpiar cola al cerrar conexión
-            if session_id in progress_events:
-                del progress_events[session_id]
-                print(f"🗑️ [SSE] Cola eliminada: {session_id}")
+        print(f"🔚 [SSE] Cerrando conexión SSE: {session_id}")
     
     return StreamingResponse(
         event_generator(),
@@ -323,299 +375,733 @@ async def root():
 async def upload_material(
     file: UploadFile = File(...),
     user_id: Optional[str] = Header(None, alias="X-User-ID"),
-    session_id: Optional[str] = Header(None, alias="X-Session-ID")  # ✅ NUEVO
+    session_id: Optional[str] = Header(None, alias="X-Session-ID"),  # ✅ NUEVO
+    wait: bool = False
 ):
     """
     Endpoint para subir materiales (PDF o TXT)
-    Procesa, chunkinea, vectoriza y guarda en Supabase
+    Guarda el archivo y encola un trabajo de ingesta en segundo plano
+    (extracción → chunking → embeddings → guardado, ver process_ingestion_job)
     
     Args:
         file: Archivo PDF o TXT (mínimo 80 páginas recomendado)
         user_id: ID del usuario autenticado (desde header X-User-ID)
         session_id: ID de sesión para tracking de progreso SSE
+        wait: Si True, espera a que termine el procesamiento y retorna el
+              material procesado (comportamiento anterior)
         
     Returns:
-        Información del material procesado
+        Trabajo encolado (job_id, session_id) o, con wait=True, información
+        del material procesado
     """
+    # IMPORTANTE: Requiere autenticación real
+    # El user_id DEBE venir del header X-User-ID enviado por el frontend
+    # después de que el usuario se autentique con Supabase Auth
+    if SUPABASE_ENABLED and not user_id:
+        print("⚠️ ADVERTENCIA: No se recibió user_id en el header X-User-ID")
+        print("   Asegúrate de que el usuario esté autenticado en el frontend")
+        raise HTTPException(
+            status_code=401,
+            detail="No autenticado. Debes iniciar sesión primero."
+        )
     
-    # ✅ NUEVO: Función helper para enviar eventos de progreso
-    async def send_progress(step: str, message: str, progress: int, data: dict = None):
-        """Envía evento de progreso vía SSE con delay para animación"""
-        if session_id and session_id in progress_events:
-            event = {
-                'type': 'progress',
-                'step': step,
-                'message': message,
-                'progress': progress,
-                'data': data or {}
-            }
-            progress_events[session_id].put(event)
-            print(f"📤 [SSE] Evento enviado: {step} → {message} ({progress}%)")
-            # ⏱️ Delay para que frontend tenga tiempo de animar
-            await asyncio.sleep(0.3)
-        else:
-            print(f"⚠️ [SSE] No se pudo enviar evento (session_id: {session_id}, existe: {session_id in progress_events if session_id else False})")
+    # Validar tipo de archivo
+    if not file.filename.endswith(('.pdf', '.txt')):
+        raise HTTPException(
+            status_code=400, 
+            detail="Solo se permiten archivos PDF o TXT"
+        )
+    
+    if not MODULES_LOADED:
+        raise HTTPException(
+            status_code=503,
+            detail="Módulos de procesamiento no disponibles"
+        )
     
     try:
-        # ⏱️ NUEVO: Iniciar medición de tiempo
-        start_time = time.time()
-        
-        # IMPORTANTE: Requiere autenticación real
-        # El user_id DEBE venir del header X-User-ID enviado por el frontend
-        # después de que el usuario se autentique con Supabase Auth
-        if SUPABASE_ENABLED and not user_id:
-            print("⚠️ ADVERTENCIA: No se recibió user_id en el header X-User-ID")
-            print("   Asegúrate de que el usuario esté autenticado en el frontend")
-            raise HTTPException(
-                status_code=401,
-                detail="No autenticado. Debes iniciar sesión primero."
-            )
-        
-        # Validar tipo de archivo
-        if not file.filename.endswith(('.pdf', '.txt')):
-            raise HTTPException(
-                status_code=400, 
-                detail="Solo se permiten archivos PDF o TXT"
-            )
-        
         print(f"📥 Recibiendo archivo: {file.filename}")
-        await send_progress('upload', f'📥 Recibiendo {file.filename}', 5)
         
-        # Leer contenido
-        content = await file.read()
-        await send_progress('reading', '📄 Leyendo contenido del archivo', 10)
-        
-        # Extraer texto según el tipo de archivo
+        # Escribir el archivo por bloques en el directorio del trabajo (con su
+        # SHA-256) y crear el trabajo: la cola lo procesa en segundo plano
+        session_id = session_id or f"upload_{uuid.uuid4().hex}"
+        job = await ingestion_queue.enqueue_stream(file.filename, file.read, session_id=session_id, user_id=user_id)
+        await run_io(ingestion_store.add_event, job['id'], {
+            'type': 'progress',
+            'step': 'upload',
+            'message': f'📥 {file.filename} recibido, en cola de procesamiento',
+            'progress': 5,
+            'data': {'job_id': job['id']}
+        })
+        print(f"📋 Trabajo de ingesta encolado: {job['id']} (session: {session_id})")
+    except Exception as e:
+        print(f"❌ Error encolando material: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error procesando material: {str(e)}")
+    
+    if wait:
+        job = await ingestion_queue.wait_for(job['id'])
+        if job['status'] == JOB_FAILED:
+            raise HTTPException(status_code=500, detail=f"Error procesando material: {job['error']}")
+        return job['result']
+    
+    return {
+        "success": True,
+        "job_id": job['id'],
+        "session_id": session_id,
+        "status": job['status'],
+        "message": f"Material {file.filename} recibido, procesando en segundo plano",
+        "progress_url": f"/api/upload-progress/{session_id}",
+        "status_url": f"/api/jobs/{job['id']}"
+    }
+
+async def set_material_status(material_uuid: Optional[str], status: str):
+    """Actualiza materials.processing_status (no interrumpe el trabajo si falla)"""
+    if not material_uuid:
+        return
+    try:
+        supabase = get_supabase_client()
+        await run_io(supabase.table('materials').update({'processing_status': status}).eq('id', material_uuid).execute)
+    except Exception as e:
+        print(f"⚠️ No se pudo actualizar processing_status de {material_uuid}: {e}")
+
+async def fail_exhausted_job_material(job: dict):
+    """Un trabajo agotó sus intentos sin terminar (la cola ya emitió el evento 'error')"""
+    await set_material_status(job.get('material_id'), 'failed')
+
+# Filas por INSERT en material_embeddings (evita timeouts)
+EMBEDDING_INSERT_BATCH = 100
+
+def embedding_rows(material_uuid: str, start_index: int, chunks: List[str],
+                   chunk_matrix: np.ndarray, keywords: List[List[str]]) -> List[dict]:
+    """
+    Filas de material_embeddings para chunks consecutivos desde start_index
+    
+    chunk_text ya viene normalizado desde chunking.py; normalizer_version
+    marca la fila para no re-normalizarla al cargarla en validación.
+    features: reasoning score, palabras y números del chunk (chunk_features.py),
+    calculados aquí una vez para que la validación no los recalcule.
+    """
+    return [
+        {
+            "material_id": material_uuid,
+            "chunk_index": start_index + offset,
+            "chunk_text": chunk,
+            "embedding": embedding.tolist(),  # pgvector acepta arrays directamente
+            "keywords": chunk_keywords,
+            "features": compute_chunk_features(chunk),
+            "normalizer_version": NORMALIZER_VERSION
+        }
+        for offset, (chunk, embedding, chunk_keywords) in enumerate(zip(chunks, chunk_matrix, keywords))
+    ]
+
+async def insert_embedding_rows(supabase, material_uuid: str, start_index: int, chunks: List[str],
+                                chunk_matrix: np.ndarray, keywords: List[List[str]]):
+    """Inserta un batch (<= EMBEDDING_INSERT_BATCH) de chunks con sus embeddings"""
+    rows = await run_ingest(embedding_rows, material_uuid, start_index, chunks, chunk_matrix, keywords)
+    return await run_io(supabase.table('material_embeddings').insert(rows).execute)
+
+async def update_material_totals(supabase, material_uuid: str, total_chunks: int, stats: dict):
+    """Completa los datos del material registrado al inicio del trabajo"""
+    return await run_io(supabase.table('materials').update({
+        "total_chunks": total_chunks,
+        "total_characters": stats['characters'],
+        "estimated_pages": stats["real_pages"]  # Usar páginas reales del PDF
+        # file_path y storage_path los dejamos NULL por ahora
+    }).eq('id', material_uuid).execute)
+
+def supabase_material_result(job: dict, material_uuid: str, title: str, file_type: str, total_chunks: int,
+                             stats: dict, embedding_stats: dict, created_at) -> dict:
+    """Resumen del material guardado en Supabase (respuesta del trabajo de ingesta)"""
+    # ⏱️ Tiempo total desde que se encoló el trabajo
+    elapsed_time = time.time() - job['created_at']
+    print(f"\n{'='*70}")
+    print(f"✅ MATERIAL PROCESADO EXITOSAMENTE")
+    print(f"{'='*70}")
+    print(f"⏱️  TIEMPO TOTAL DE PROCESAMIENTO: {elapsed_time:.2f} segundos")
+    print(f"   📄 Páginas procesadas: {stats.get('real_pages', stats['estimated_pages'])}")
+    print(f"   ✂️  Chunks generados: {total_chunks}")
+    print(f"   🧠 Embeddings creados: {total_chunks}")
+    print(f"   ⚡ Velocidad embeddings: {embedding_stats.get('chunks_per_second')} chunks/s")
+    print(f"   💾 Material ID: {material_uuid}")
+    print(f"{'='*70}\n")
+    
+    # Retornar respuesta con UUID de Supabase
+    return {
+        "success": True,
+        "material_id": material_uuid,
+        "message": f"Material procesado y guardado en Supabase: {total_chunks} chunks generados",
+        "processing_time_seconds": round(elapsed_time, 2),  # ✅ NUEVO: Retornar tiempo
+        "embedding_stats": embedding_stats,
+        "data": {
+            "id": material_uuid,
+            "user_id": job['user_id'],
+            "title": title,
+            "filename": job['filename'],
+            "file_type": file_type,
+            "total_chunks": total_chunks,
+            "total_characters": stats['characters'],
+            "estimated_pages": stats["estimated_pages"],
+            "real_pages": stats.get("real_pages", None),
+            "created_at": created_at
+        }
+    }
+
+async def save_material_locally(ctx: JobContext, title: str, chunks: List[str], chunk_matrix: np.ndarray,
+                                keywords: List[List[str]], stats: dict, embedding_stats: dict) -> dict:
+    """Fallback: guarda el material en disco (Supabase no disponible o falló)"""
+    job = ctx.job
+    filename = job['filename']
+    print(f"\n💾 Guardando localmente (Supabase no disponible)")
+    material_id = get_next_material_id()
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    
+    # Guardar archivo original
+    original_filename = filename
+    safe_filename = f"{original_filename.rsplit('.', 1)[0]}_{material_id}_{timestamp}.{original_filename.rsplit('.', 1)[1]}"
+    material_file_path = MATERIALS_DIR / safe_filename
+    
+    print(f"💾 Guardando archivo original: {material_file_path}")
+    await run_io(shutil.copyfile, ctx.file_path, material_file_path)
+    
+    material_data = {
+        "id": material_id,
+        "filename": filename,
+        "saved_filename": safe_filename,
+        "file_path": str(material_file_path),
+        "file_exists": True,
+        "title": title,
+        "uploaded_at": timestamp,
+        "total_chunks": len(chunks),
+        "total_characters": stats['characters'],
+        "estimated_pages": stats["estimated_pages"],
+        "real_pages": stats.get("real_pages", None)  # Páginas reales del PDF
+    }
+    
+    materials_db.append(material_data)
+    save_materials_index()  # Guardar índice persistente
+    
+    # Guardar embeddings en el almacén binario (matriz .npy + textos + sidecar)
+    embeddings_stem = material_stem(material_id, timestamp)
+    print(f"💾 Guardando embeddings en: {EMBEDDINGS_DIR / embeddings_stem}.npy")
+    
+    features = await run_cpu(compute_features_batch, list(chunks))
+    await run_io(
+        save_material, EMBEDDINGS_DIR, embeddings_stem,
+        list(chunks), chunk_matrix, keywords=keywords, features=features
+    )
+    await ctx.complete_stage('storage')
+    
+    # ⏱️ Tiempo total desde que se encoló el trabajo
+    elapsed_time = time.time() - job['created_at']
+    print(f"✅ Material {material_id} procesado exitosamente")
+    print(f"⏱️  TIEMPO TOTAL DE PROCESAMIENTO: {elapsed_time:.2f} segundos")
+    print(f"   📄 Páginas procesadas: {stats['real_pages']}")
+    print(f"   ✂️  Chunks generados: {len(chunks)}")
+    print(f"   🧠 Embeddings creados: {len(chunk_matrix)}")
+    
+    return {
+        "success": True,
+        "material_id": material_id,
+        "message": f"Material procesado exitosamente: {len(chunks)} chunks generados",
+        "processing_time_seconds": round(elapsed_time, 2),  # ✅ NUEVO: Retornar tiempo
+        "embedding_stats": embedding_stats,
+        "data": material_data
+    }
+
+def embed_chunk_batch(chunks: List[str]) -> tuple:
+    """Embeddings (float32) y keywords de un batch de chunks ya normalizados"""
+    embeddings = generate_embeddings(chunks, show_progress_bar=False, batch_size=len(chunks), normalize=False)
+    return np.asarray(embeddings, dtype=np.float32), [extract_keywords(chunk) for chunk in chunks]
+
+async def stream_ingestion_job(ctx: JobContext, material_uuid: Optional[str], title: str,
+                               file_type: str) -> Optional[dict]:
+    """
+    Pipeline de ingesta en streaming (ver ingestion_pipeline.py)
+    
+    Páginas → SemanticChunker → batches de embeddings → INSERT en Supabase,
+    las etapas solapadas y conectadas por colas acotadas. Nunca existe el
+    texto completo ni una lista con todos los embeddings como floats de
+    Python: solo los chunks y la matriz float32 (para el checkpoint y el
+    fallback local).
+    
+    Los chunks, keywords y embeddings son los mismos que los del pipeline
+    por etapas. Cada batch vectorizado se guarda como checkpoint
+    (CheckpointedEmbedder): si el proceso se cae, el reintento vuelve a
+    entrar aquí y solo vectoriza desde el primer batch sin guardar (las filas
+    de Supabase se borran y se reinsertan desde los checkpoints). Al
+    terminar se guardan los checkpoints de chunking y embedding: si el
+    guardado final falla, el reintento sigue por etapas sin recalcular nada.
+    
+    Returns:
+        dict: Igual que process_ingestion_job; None si el documento no se
+        puede procesar en streaming (PDF sin conteo de páginas)
+    """
+    job = ctx.job
+    filename = job['filename']
+    
+    await ctx.start_stage('extraction')
+    await set_material_status(material_uuid, STAGE_STATUS['extraction'])
+    await ctx.progress('reading', '📄 Leyendo contenido del archivo', 10)
+    
+    if file_type == 'pdf':
+        # El chunking adaptativo necesita el total de páginas antes de la primera
+        total_pages = await run_io(count_pdf_pages, str(ctx.file_path))
+        if total_pages <= 0:
+            print("⚠️ No se pudo contar las páginas del PDF: se usa el pipeline por etapas")
+            return None
+        pdf_page_count = total_pages
+        pages = iter_pdf_pages(str(ctx.file_path), filename, ctx.content_sha256, total_pages)
+        await ctx.progress('extracting', f'📖 Extrayendo texto de PDF ({total_pages} páginas)...', 15, {'pages': total_pages})
+    else:
+        text = (await run_io(ctx.file_path.read_bytes)).decode('utf-8')
         pdf_page_count = None
-        if file.filename.endswith('.pdf'):
-            print("📄 Extrayendo texto de PDF...")
-            await send_progress('extracting', '📖 Extrayendo texto de PDF...', 15)
-            text, pdf_page_count = extract_text_from_pdf(content, file.filename)
-            print(f"📄 PDF con {pdf_page_count} páginas reales")
-            await send_progress('extracted', f'✅ Texto extraído: {pdf_page_count} páginas', 25, {'pages': pdf_page_count})
-        else:
-            text = content.decode('utf-8')
-            pdf_page_count = None
-        
-        # Obtener estadísticas del texto (pasando el conteo real de páginas del PDF)
-        stats = get_text_stats(text, real_pages=pdf_page_count)
-        
-        print(f"📊 Estadísticas del documento:")
-        print(f"   📄 Páginas: {stats['real_pages']}")
-        print(f"   📝 Caracteres: {stats['characters']:,}")
-        print(f"   📚 Palabras: {stats['words']:,}")
-        print(f"   ✂️ Chunk size: {DEFAULT_CHUNK_SIZE} | Overlap: {DEFAULT_CHUNK_OVERLAP}")
-        
-        # Validar tamaño mínimo (aprox 80 páginas = ~200,000 caracteres)
-        if len(text) < MIN_DOCUMENT_SIZE:
-            print(f"⚠️ Advertencia: Documento pequeño ({len(text)} caracteres)")
-            # Permitir pero advertir
-        
-        # Chunking del texto (adaptativo según tamaño del PDF)
-        print("✂️ Dividiendo en chunks...")
-        await send_progress('chunking', '✂️ Dividiendo en fragmentos (chunks adaptativos)...', 30)
-        from chunking import adaptive_chunking
-        # Usar pdf_page_count (puede ser None si no se pudo extraer)
-        page_count = pdf_page_count if pdf_page_count else stats['estimated_pages']
-        chunks = adaptive_chunking(text, page_count)
-        print(f"✅ Generados {len(chunks)} chunks optimizados para {page_count} páginas")
-        await send_progress('chunked', f'✅ {len(chunks)} fragmentos creados (optimizados)', 40, {'total_chunks': len(chunks), 'total_pages': page_count})
-        
-        # Generar embeddings para cada chunk
-        print("🧠 Generando embeddings...")
-        await send_progress('embeddings_start', '🧠 Generando embeddings (vectores semánticos)...', 45)
-        embeddings_data = []
-        
-        for i, chunk in enumerate(chunks):
-            if i % 10 == 0:
-                print(f"   Procesando chunk {i+1}/{len(chunks)}...")
+        total_pages = get_text_stats(text)['estimated_pages']
+        pages = iter([text])
+    
+    text_stats = TextStats()
+    batches = iter_chunk_batches(pages, total_pages, EMBEDDING_BATCH_SIZE, text_stats)
+    
+    chunks: List[str] = []
+    keywords: List[List[str]] = []
+    matrix_blocks: List[np.ndarray] = []
+    pending_rows: List[dict] = []
+    saved = 0
+    embedding_started = False
+    db_error = None
+    supabase = None
+    
+    if material_uuid:
+        try:
+            supabase = get_supabase_client()
+            # Un intento anterior pudo dejar chunks parciales
+            await run_io(supabase.table('material_embeddings').delete().eq('material_id', material_uuid).execute)
+        except Exception as e:
+            db_error = e
+    
+    async def flush_rows():
+        nonlocal pending_rows, saved
+        if pending_rows:
+            await run_io(supabase.table('material_embeddings').insert(pending_rows).execute)
+            saved += len(pending_rows)
+            pending_rows = []
+    
+    # Batches con checkpoint de un intento anterior no vuelven a pasar por el modelo
+    embedder = CheckpointedEmbedder(ctx, lambda batch: run_ingest(embed_chunk_batch, batch))
+    
+    async def embed(batch: List[str]) -> tuple:
+        nonlocal embedding_started
+        if not embedding_started:
+            embedding_started = True
+            await set_material_status(material_uuid, STAGE_STATUS['embedding'])
+        return await embedder(batch)
+    
+    async def store(embedded: tuple):
+        nonlocal db_error
+        batch, batch_matrix, batch_keywords = embedded
+        start_index = len(chunks)
+        chunks.extend(batch)
+        keywords.extend(batch_keywords)
+        matrix_blocks.append(batch_matrix)
+        
+        if supabase is not None and db_error is None:
+            try:
+                # features + .tolist() de cada fila: CPU, fuera del event loop
+                pending_rows.extend(await run_ingest(
+                    embedding_rows, material_uuid, start_index, batch, batch_matrix, batch_keywords
+                ))
+                if len(pending_rows) >= EMBEDDING_INSERT_BATCH:
+                    await flush_rows()
+            except Exception as e:
+                # Se sigue procesando: al final se guarda localmente
+                db_error = e
+                pending_rows.clear()
+                print(f"❌ Error guardando en Supabase: {e}")
+        
+        # Progreso de 15% a 90% según las páginas ya leídas
+        progress = 15 + int(min(1.0, text_stats.parts / max(total_pages, 1)) * 75)
+        await ctx.progress('embeddings_progress', f'🔄 {len(chunks)} fragmentos procesados ({saved} guardados)', progress, {
+            'current': len(chunks),
+            'saved': saved,
+            'pages_read': text_stats.parts,
+            'total_pages': pdf_page_count
+        })
+    
+    print(f"🌊 Ingesta en streaming: batches de {EMBEDDING_BATCH_SIZE} chunks")
+    embeddings_start_time = time.time()
+    await run_pipeline(batches, embed, store)
+    embedding_time = time.time() - embeddings_start_time
+    
+    if not chunks:
+        raise Exception("No se generaron chunks del documento")
+    
+    chunk_matrix = np.concatenate(matrix_blocks)
+    del matrix_blocks
+    stats = text_stats.result(real_pages=pdf_page_count)
+    embedding_stats = {
+        "batch_size": EMBEDDING_BATCH_SIZE,
+        "embedding_time_seconds": round(embedding_time, 2),
+        "chunks_per_second": round(len(chunks) / embedding_time, 2) if embedding_time > 0 else None,
+        "streaming": True
+    }
+    print(f"✅ {len(chunks)} chunks y embeddings en {embedding_time:.2f}s ({stats['real_pages']} páginas)")
+    if embedder.reused:
+        print(f"♻️ {embedder.reused} batch(es) reutilizados desde checkpoint")
+        embedding_stats["resumed_batches"] = embedder.reused
+    
+    # Checkpoints (el texto completo nunca se armó: el chunking no se recalcula)
+    await ctx.complete_stage('extraction', {'text': None, 'pdf_page_count': pdf_page_count, 'page_offsets': None})
+    await ctx.complete_stage('chunking', {
+        'chunks': chunks,
+        'stats': stats,
+        'page_count': total_pages,
+        'keywords': keywords
+    })
+    await ctx.save('embedding_stats', embedding_stats)
+    await ctx.complete_stage('embedding', chunk_matrix)
+    await ctx.progress('embeddings_complete', f'✅ {len(chunk_matrix)} embeddings generados', 90, embedding_stats)
+    
+    # ===== GUARDADO =====
+    await ctx.start_stage('storage')
+    if supabase is not None and db_error is None:
+        await set_material_status(material_uuid, STAGE_STATUS['storage'])
+        try:
+            await flush_rows()
+            result = await update_material_totals(supabase, material_uuid, len(chunks), stats)
+            if not result.data:
+                raise Exception("No se recibió respuesta de Supabase")
+            print(f"✅ {saved} embeddings guardados en Supabase (pgvector)")
+            await set_material_status(material_uuid, 'completed')
+            await ctx.complete_stage('storage')
+            return supabase_material_result(
+                job, material_uuid, title, file_type, len(chunks), stats,
+                embedding_stats, result.data[0].get('created_at')
+            )
+        except Exception as e:
+            db_error = e
+    
+    if db_error is not None:
+        print(f"❌ Error guardando en Supabase: {db_error}")
+        await set_material_status(material_uuid, 'failed')
+        await ctx.progress('saving_error', f'⚠️ Error guardando en Supabase: {str(db_error)}', 90, {'error': str(db_error)})
+        print("⚠️ Continuando con almacenamiento local...")
+    
+    return await save_material_locally(ctx, title, chunks, chunk_matrix, keywords, stats, embedding_stats)
+
+async def process_ingestion_job(ctx: JobContext) -> dict:
+    """
+    Pipeline de ingesta de un material (lo ejecuta la cola de trabajos)
+    
+    Un trabajo nuevo corre en streaming (stream_ingestion_job: etapas
+    solapadas, checkpoint por batch de embeddings). Cada etapa guarda un
+    checkpoint: si el servidor se reinicia, el trabajo se retoma desde la
+    última etapa completada (o desde el último batch guardado del streaming).
+    
+    Etapas:
+    1. extraction: texto del PDF/TXT
+    2. chunking:   chunks adaptativos + índice léxico
+    3. embedding:  matriz de embeddings (float32, N x 384)
+    4. storage:    Supabase (pgvector) o almacenamiento local
+    
+    Returns:
+        dict: Información del material procesado (misma forma que la antigua
+              respuesta de /api/materials/upload)
+    """
+    job = ctx.job
+    filename = job['filename']
+    user_id = job['user_id']
+    is_pdf = filename.endswith('.pdf')
+    title = filename.replace('.pdf', '').replace('.txt', '').replace('_', ' ').title()
+    file_type = 'pdf' if is_pdf else 'txt'
+    
+    # ===== REGISTRAR MATERIAL EN SUPABASE (processing_status sigue las etapas) =====
+    material_uuid = job.get('material_id')
+    if SUPABASE_ENABLED and user_id and not material_uuid:
+        try:
+            supabase = get_supabase_client()
+            result = await run_io(supabase.table('materials').insert({
+                "user_id": user_id,
+                "title": title,
+                "file_name": filename,
+                "file_type": file_type,
+                "processing_status": "pending"
+            }).execute)
+            if result.data:
+                material_uuid = result.data[0]['id']
+                await ctx.set_material_id(material_uuid)
+                print(f"✅ Material registrado en Supabase con UUID: {material_uuid}")
+        except Exception as e:
+            print(f"⚠️ No se pudo registrar el material en Supabase: {e}")
+    
+    try:
+        # ===== TRABAJO NUEVO (O INTERRUMPIDO EN STREAMING): PIPELINE EN STREAMING =====
+        # Un reintento retoma los embeddings desde el primer batch sin checkpoint
+        if STREAMING_INGESTION and not ctx.job['completed_stages']:
+            result = await stream_ingestion_job(ctx, material_uuid, title, file_type)
+            if result is not None:
+                return result
+        
+        # ===== ETAPA 1: EXTRACCIÓN =====
+        extraction = await ctx.load('extraction') if ctx.is_done('extraction') else None
+        if extraction is None:
+            await ctx.start_stage('extraction')
+            await set_material_status(material_uuid, STAGE_STATUS['extraction'])
+            await ctx.progress('reading', '📄 Leyendo contenido del archivo', 10)
+            page_offsets = None
+            
+            if is_pdf:
+                print("📄 Extrayendo texto de PDF...")
+                await ctx.progress('extracting', '📖 Extrayendo texto de PDF...', 15)
+                # Los extractores leen el archivo del trabajo (sin cargarlo en memoria)
+                document = await run_ingest(extract_pdf_document, str(ctx.file_path), filename, ctx.content_sha256)
+                text, pdf_page_count, page_offsets = document['text'], document['pages'], document['page_offsets']
+                print(f"📄 PDF con {pdf_page_count} páginas reales")
+                await ctx.progress('extracted', f'✅ Texto extraído: {pdf_page_count} páginas', 25, {'pages': pdf_page_count})
+            else:
+                text = (await run_io(ctx.file_path.read_bytes)).decode('utf-8')
+                pdf_page_count = None
+            
+            extraction = {'text': text, 'pdf_page_count': pdf_page_count, 'page_offsets': page_offsets}
+            await ctx.complete_stage('extraction', extraction)
+        
+        # None si lo generó el pipeline en streaming (su chunking ya tiene checkpoint)
+        text = extraction['text']
+        pdf_page_count = extraction['pdf_page_count']
+        
+        # ===== ETAPA 2: CHUNKING =====
+        chunking = await ctx.load('chunking') if ctx.is_done('chunking') else None
+        if chunking is None:
+            await ctx.start_stage('chunking')
+            await set_material_status(material_uuid, STAGE_STATUS['chunking'])
+            
+            # Obtener estadísticas del texto (pasando el conteo real de páginas del PDF)
+            stats = get_text_stats(text, real_pages=pdf_page_count)
+            
+            print(f"📊 Estadísticas del documento:")
+            print(f"   📄 Páginas: {stats['real_pages']}")
+            print(f"   📝 Caracteres: {stats['characters']:,}")
+            print(f"   📚 Palabras: {stats['words']:,}")
+            print(f"   ✂️ Chunk size: {DEFAULT_CHUNK_SIZE} | Overlap: {DEFAULT_CHUNK_OVERLAP}")
+            
+            # Validar tamaño mínimo (aprox 80 páginas = ~200,000 caracteres)
+            if len(text) < MIN_DOCUMENT_SIZE:
+                print(f"⚠️ Advertencia: Documento pequeño ({len(text)} caracteres)")
+                # Permitir pero advertir
+            
+            # Chunking del texto (adaptativo según tamaño del PDF)
+            print("✂️ Dividiendo en chunks...")
+            await ctx.progress('chunking', '✂️ Dividiendo en fragmentos (chunks adaptativos)...', 30)
+            from chunking import adaptive_chunking
+            # Usar pdf_page_count (puede ser None si no se pudo extraer)
+            page_count = pdf_page_count if pdf_page_count else stats['estimated_pages']
+            chunks = await run_ingest(adaptive_chunking, text, page_count)
+            print(f"✅ Generados {len(chunks)} chunks optimizados para {page_count} páginas")
+            
+            # Índice léxico del material (keywords por chunk)
+            # Se calcula una vez aquí para que la validación no re-tokenice
+            lexical_index = await run_ingest(LexicalIndex.from_texts, chunks)
+            
+            chunking = {
+                'chunks': chunks,
+                'stats': stats,
+                'page_count': page_count,
+                'keywords': lexical_index.chunk_keywords
+            }
+            await ctx.complete_stage('chunking', chunking)
+            await ctx.progress('chunked', f'✅ {len(chunks)} fragmentos creados (optimizados)', 40, {'total_chunks': len(chunks), 'total_pages': page_count})
+        
+        # adaptive_chunking ya devuelve los chunks normalizados (corrige OCR):
+        # se vectorizan y guardan TAL CUAL, sin volver a normalizar
+        normalized_chunks = chunking['chunks']
+        chunks = normalized_chunks
+        stats = chunking['stats']
+        keywords = chunking['keywords']
+        
+        # ===== ETAPA 3: EMBEDDINGS =====
+        chunk_matrix = await ctx.load('embedding') if ctx.is_done('embedding') else None
+        if chunk_matrix is None:
+            await ctx.start_stage('embedding')
+            await set_material_status(material_uuid, STAGE_STATUS['embedding'])
+            
+            # Generar embeddings en micro-batches (ordenados por longitud para minimizar padding)
+            print(f"🧠 Generando embeddings (batches de {EMBEDDING_BATCH_SIZE})...")
+            await ctx.progress('embeddings_start', '🧠 Generando embeddings (vectores semánticos)...', 45)
+            
+            chunk_embeddings = [None] * len(normalized_chunks)
+            
+            embeddings_start_time = time.time()
+            processed_chunks = 0
+            # Un batch = una tarea del pool de ingesta: entre batches el pool atiende
+            # otras tareas y el event loop sigue libre para SSE y validaciones
+            for batch_number, batch_indices in enumerate(
+                    plan_embedding_batches(normalized_chunks, EMBEDDING_BATCH_SIZE), start=1):
+                batch_embeddings = await run_ingest(
+                    generate_embeddings,
+                    [normalized_chunks[i] for i in batch_indices],
+                    show_progress_bar=False,
+                    batch_size=len(batch_indices),
+                    normalize=False
+                )
+                for idx, embedding in zip(batch_indices, batch_embeddings):
+                    chunk_embeddings[idx] = embedding
+                processed_chunks += len(batch_indices)
+                
+                print(f"   Batch {batch_number}: {processed_chunks}/{len(normalized_chunks)} chunks")
                 # Progreso de 45% a 70% (25% del total para embeddings)
-                progress = 45 + int((i / len(chunks)) * 25)
-                await send_progress('embeddings_progress', f'🔄 Procesando chunk {i+1}/{len(chunks)}', progress, {
-                    'current': i + 1,
-                    'total': len(chunks)
+                progress = 45 + int((processed_chunks / len(normalized_chunks)) * 25)
+                await ctx.progress('embeddings_progress', f'🔄 Procesando chunk {processed_chunks}/{len(normalized_chunks)}', progress, {
+                    'current': processed_chunks,
+                    'total': len(normalized_chunks),
+                    'batch': batch_number
                 })
             
-            # ✅ NUEVO: Normalizar chunk ANTES de generar embedding (corrige OCR)
-            normalized_chunk = normalize_text(chunk)
+            embedding_time = time.time() - embeddings_start_time
+            embedding_stats = {
+                "batch_size": EMBEDDING_BATCH_SIZE,
+                "embedding_time_seconds": round(embedding_time, 2),
+                "chunks_per_second": round(len(normalized_chunks) / embedding_time, 2) if embedding_time > 0 else None
+            }
+            
+            chunk_matrix = np.asarray(chunk_embeddings, dtype=np.float32)
+            await ctx.save('embedding_stats', embedding_stats)
+            await ctx.complete_stage('embedding', chunk_matrix)
             
-            embedding = generate_embeddings(normalized_chunk)
-            embeddings_data.append({
-                "chunk_id": i,
-                "text": normalized_chunk[:200] + "..." if len(normalized_chunk) > 200 else normalized_chunk,
-                "text_full": normalized_chunk,  # ✅ Guardar chunk normalizado
-                "embedding": embedding.tolist()
-            })
+            print(f"✅ Embeddings generados: {len(chunk_matrix)} ({embedding_stats['chunks_per_second']} chunks/s)")
+            await ctx.progress('embeddings_complete', f'✅ {len(chunk_matrix)} embeddings generados', 70, embedding_stats)
         
-        print(f"✅ Embeddings generados: {len(embeddings_data)}")
-        await send_progress('embeddings_complete', f'✅ {len(embeddings_data)} embeddings generados', 70)
+        embedding_stats = await ctx.load('embedding_stats') or {}
+        
+        # ===== ETAPA 4: GUARDADO =====
+        await ctx.start_stage('storage')
         
         # ===== GUARDAR EN SUPABASE (SI ESTÁ HABILITADO) =====
-        if SUPABASE_ENABLED and user_id:
+        if material_uuid:
             print(f"\n💾 Guardando en Supabase para usuario: {user_id}")
-            await send_progress('saving_start', '💾 Guardando en base de datos...', 75)
+            await set_material_status(material_uuid, STAGE_STATUS['storage'])
+            await ctx.progress('saving_start', '💾 Guardando en base de datos...', 75)
             try:
                 supabase = get_supabase_client()
                 
-                # Preparar datos para Supabase
-                title = file.filename.replace('.pdf', '').replace('.txt', '').replace('_', ' ').title()
-                file_type = 'pdf' if file.filename.endswith('.pdf') else 'txt'
-                
-                # Insertar en tabla materials
-                material_insert = {
-                    "user_id": user_id,
-                    "title": title,
-                    "file_name": file.filename,
-                    "file_type": file_type,
-                    "total_chunks": len(chunks),
-                    "total_characters": len(text),
-                    "estimated_pages": stats["real_pages"],  # Usar páginas reales del PDF
-                    "processing_status": "completed"
-                    # file_path y storage_path los dejamos NULL por ahora
-                }
-                
-                result = supabase.table('materials').insert(material_insert).execute()
+                # Completar datos del material registrado al inicio del trabajo
+                result = await update_material_totals(supabase, material_uuid, len(chunks), stats)
                 
                 if result.data and len(result.data) > 0:
-                    material_uuid = result.data[0]['id']
-                    print(f"✅ Material guardado en Supabase con UUID: {material_uuid}")
-                    await send_progress('material_saved', '✅ Material registrado', 80, {'material_id': material_uuid})
+                    print(f"✅ Material actualizado en Supabase con UUID: {material_uuid}")
+                    await ctx.progress('material_saved', '✅ Material registrado', 80, {'material_id': material_uuid})
+                    
+                    # Si el trabajo se interrumpió a mitad del guardado, quitar los chunks parciales
+                    await run_io(supabase.table('material_embeddings').delete().eq('material_id', material_uuid).execute)
                     
                     # ===== GUARDAR EMBEDDINGS EN SUPABASE CON PGVECTOR =====
-                    print(f"💾 Guardando {len(embeddings_data)} embeddings en Supabase...")
-                    await send_progress('embeddings_save_start', f'💾 Guardando {len(embeddings_data)} embeddings...', 85)
+                    print(f"💾 Guardando {len(chunks)} embeddings en Supabase...")
+                    await ctx.progress('embeddings_save_start', f'💾 Guardando {len(chunks)} embeddings...', 85)
                     
-                    # Preparar datos para inserción batch
-                    embeddings_to_insert = []
+                    # Insertar en batches de 100 para evitar timeouts (las filas se arman
+                    # por batch: nunca hay una copia de todos los embeddings como listas)
                     batch_count = 0
-                    for i, emb_data in enumerate(embeddings_data):
-                        # ✅ NUEVO: Normalizar chunk_text antes de guardar (ya viene normalizado desde chunking.py)
-                        # pero por si acaso, normalizamos de nuevo para garantizar consistencia
-                        chunk_text_clean = emb_data["text_full"]
-                        
-                        embeddings_to_insert.append({
-                            "material_id": material_uuid,
-                            "chunk_index": i,
-                            "chunk_text": chunk_text_clean,
-                            "embedding": emb_data["embedding"]  # pgvector acepta arrays directamente
-                        })
-                        
-                        # Insertar en batches de 100 para evitar timeouts
-                        if len(embeddings_to_insert) == 100 or i == len(embeddings_data) - 1:
-                            batch_result = supabase.table('material_embeddings').insert(embeddings_to_insert).execute()
-                            if batch_result.data:
-                                batch_count += 1
-                                print(f"   ✅ Batch {batch_count}: {len(embeddings_to_insert)} embeddings guardados")
-                                # Progreso de 85% a 95% para guardado de embeddings
-                                progress = 85 + int((i / len(embeddings_data)) * 10)
-                                await send_progress('embeddings_batch', f'✅ Batch {batch_count}: {len(embeddings_to_insert)} embeddings', progress, {
-                                    'batch': batch_count,
-                                    'saved': i + 1,
-                                    'total': len(embeddings_data)
-                                })
-                            embeddings_to_insert = []
+                    for start in range(0, len(chunks), EMBEDDING_INSERT_BATCH):
+                        end = min(start + EMBEDDING_INSERT_BATCH, len(chunks))
+                        batch_result = await insert_embedding_rows(
+                            supabase, material_uuid, start, chunks[start:end],
+                            chunk_matrix[start:end], keywords[start:end]
+                        )
+                        if batch_result.data:
+                            batch_count += 1
+                            print(f"   ✅ Batch {batch_count}: {end - start} embeddings guardados")
+                            # Progreso de 85% a 95% para guardado de embeddings
+                            progress = 85 + int(((end - 1) / len(chunks)) * 10)
+                            await ctx.progress('embeddings_batch', f'✅ Batch {batch_count}: {end - start} embeddings', progress, {
+                                'batch': batch_count,
+                                'saved': end,
+                                'total': len(chunks)
+                            })
                     
                     print(f"✅ Todos los embeddings guardados en Supabase (pgvector)")
+                    await set_material_status(material_uuid, 'completed')
+                    await ctx.complete_stage('storage')
                     
-                    # ⏱️ NUEVO: Calcular tiempo total de procesamiento
-                    elapsed_time = time.time() - start_time
-                    print(f"\n{'='*70}")
-                    print(f"✅ MATERIAL PROCESADO EXITOSAMENTE")
-                    print(f"{'='*70}")
-                    print(f"⏱️  TIEMPO TOTAL DE PROCESAMIENTO: {elapsed_time:.2f} segundos")
-                    print(f"   📄 Páginas procesadas: {stats.get('real_pages', stats['estimated_pages'])}")
-                    print(f"   ✂️  Chunks generados: {len(chunks)}")
-                    print(f"   🧠 Embeddings creados: {len(embeddings_data)}")
-                    print(f"   💾 Material ID: {material_uuid}")
-                    print(f"{'='*70}\n")
-                    
-                    await send_progress('complete', '🎉 Material procesado exitosamente', 100, {'material_id': material_uuid})
-                    
-                    # Retornar respuesta con UUID de Supabase
-                    return {
-                        "success": True,
-                        "material_id": material_uuid,
-                        "message": f"Material procesado y guardado en Supabase: {len(chunks)} chunks generados",
-                        "processing_time_seconds": round(elapsed_time, 2),  # ✅ NUEVO: Retornar tiempo
-                        "data": {
-                            "id": material_uuid,
-                            "user_id": user_id,
-                            "title": title,
-                            "filename": file.filename,
-                            "file_type": file_type,
-                            "total_chunks": len(chunks),
-                            "total_characters": len(text),
-                            "estimated_pages": stats["estimated_pages"],
-                            "real_pages": stats.get("real_pages", None),
-                            "created_at": result.data[0].get('created_at')
-                        }
-                    }
+                    return supabase_material_result(
+                        job, material_uuid, title, file_type, len(chunks), stats,
+                        embedding_stats, result.data[0].get('created_at')
+                    )
                 else:
                     raise Exception("No se recibió respuesta de Supabase")
                     
             except Exception as db_error:
                 print(f"❌ Error guardando en Supabase: {db_error}")
-                await send_progress('error', f'❌ Error: {str(db_error)}', 0, {'error': str(db_error)})
+                await set_material_status(material_uuid, 'failed')
+                await ctx.progress('saving_error', f'⚠️ Error guardando en Supabase: {str(db_error)}', 75, {'error': str(db_error)})
                 print("⚠️ Continuando con almacenamiento local...")
                 # Si falla Supabase, continuar con método local
         
         # ===== FALLBACK: GUARDAR LOCAL (SI SUPABASE NO ESTÁ DISPONIBLE) =====
-        print(f"\n💾 Guardando localmente (Supabase no disponible)")
-        material_id = get_next_material_id()
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        
-        # Guardar archivo original
-        original_filename = file.filename
-        safe_filename = f"{original_filename.rsplit('.', 1)[0]}_{material_id}_{timestamp}.{original_filename.rsplit('.', 1)[1]}"
-        material_file_path = MATERIALS_DIR / safe_filename
-        
-        print(f"💾 Guardando archivo original: {material_file_path}")
-        with open(material_file_path, 'wb') as f:
-            f.write(content)
-        
-        material_data = {
-            "id": material_id,
-            "filename": file.filename,
-            "saved_filename": safe_filename,
-            "file_path": str(material_file_path),
-            "file_exists": True,
-            "title": file.filename.replace('.pdf', '').replace('.txt', '').replace('_', ' ').title(),
-            "uploaded_at": timestamp,
-            "total_chunks": len(chunks),
-            "total_characters": len(text),
-            "estimated_pages": stats["estimated_pages"],
-            "real_pages": stats.get("real_pages", None)  # Páginas reales del PDF
-        }
-        
-        materials_db.append(material_data)
-        save_materials_index()  # Guardar índice persistente
-        
-        # Guardar embeddings en archivo JSON
-        embeddings_file = EMBEDDINGS_DIR / f"material_{material_id}_{timestamp}.json"
-        print(f"💾 Guardando embeddings en: {embeddings_file}")
-        
-        with open(embeddings_file, 'w', encoding='utf-8') as f:
-            json.dump(embeddings_data, f, ensure_ascii=False, indent=2)
-        
-        # ⏱️ NUEVO: Calcular tiempo total de procesamiento
-        elapsed_time = time.time() - start_time
-        print(f"✅ Material {material_id} procesado exitosamente")
-        print(f"⏱️  TIEMPO TOTAL DE PROCESAMIENTO: {elapsed_time:.2f} segundos")
-        print(f"   📄 Páginas procesadas: {stats['real_pages']}")
-        print(f"   ✂️  Chunks generados: {len(chunks)}")
-        print(f"   🧠 Embeddings creados: {len(embeddings_data)}")
-        
-        return {
-            "success": True,
-            "material_id": material_id,
-            "message": f"Material procesado exitosamente: {len(chunks)} chunks generados",
-            "processing_time_seconds": round(elapsed_time, 2),  # ✅ NUEVO: Retornar tiempo
-            "data": material_data
-        }
+        return await save_material_locally(
+            ctx, title, chunks, chunk_matrix, keywords, stats, embedding_stats
+        )
     
     except Exception as e:
         print(f"❌ Error procesando material: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error procesando material: {str(e)}")
+        await set_material_status(material_uuid, 'failed')
+        raise
+
+@app.get("/api/jobs/{job_id}")
+async def get_ingestion_job(job_id: str):
+    """Estado de un trabajo de ingesta (etapa actual, progreso, resultado)"""
+    job = await run_io(ingestion_store.get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    return {
+        "job_id": job['id'],
+        "session_id": job['session_id'],
+        "filename": job['filename'],
+        "status": job['status'],
+        "stage": job['stage'],
+        "completed_stages": job['completed_stages'],
+        "progress": job['progress'],
+        "message": job['message'],
+        "material_id": job['material_id'],
+        "attempts": job['attempts'],
+        "error": job['error'],
+        "result": job['result']
+    }
+
+@app.post("/api/jobs/{job_id}/retry")
+async def retry_ingestion_job(job_id: str):
+    """Re-encola un trabajo fallido (se retoma desde su último checkpoint)"""
+    if not await run_io(ingestion_store.requeue, job_id):
+        raise HTTPException(status_code=409, detail="Solo se pueden reintentar trabajos fallidos")
+    ingestion_queue.notify()
+    return {"success": True, "job_id": job_id, "status": "queued"}
+
+async def load_material_chunks(supabase, material_id: str, material_info: dict,
+                               material_version: str):
+    """
+    Descarga TODOS los chunks de un material desde Supabase y los guarda en la caché
+    
+    Returns:
+        CachedMaterial (matriz normalizada + chunks en formato HybridValidator)
+    """
+    embeddings_result = await run_io(supabase.table('material_embeddings')\
+        .select('chunk_index, chunk_text, embedding, keywords, features, normalizer_version')\
+        .eq('material_id', material_id)\
+        .order('chunk_index')\
+        .execute)
+    
+    if not embeddings_result.data or len(embeddings_result.data) == 0:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No se encontraron embeddings para el material {material_id}"
+        )
+    
+    # Convertir a matriz float32 + textos normalizados y guardar en caché
+    # Solo se normalizan las filas sin normalizer_version (subidas antes)
+    return material_cache.put(await run_cpu(
+        build_cached_material,
+        material_id,
+        embeddings_result.data,
+        normalize_cached,
+        metadata=material_info,
+        version=material_version
+    ))
+
 
 @app.post("/api/validate-answer", response_model=ValidationResult)
 async def validate_answer(answer: Answer):
@@ -664,17 +1150,22 @@ async def validate_answer(answer: Answer):
         
         # Validar longitud mínima
         try:
+            cached_material = None
+            top_k_retrieval = False  # Modo pgvector: top-K en la base de datos
+            total_chunks_db = 0
+            
             # ===== CARGAR EMBEDDINGS DESDE SUPABASE CON PGVECTOR =====
             if SUPABASE_ENABLED:
                 print(f"📂 Cargando embeddings desde Supabase para material: {material_id}")
                 supabase = get_supabase_client()
                 
                 # 1. Obtener información del material (para saber las páginas reales)
-                material_info = supabase.table('materials')\
-                    .select('estimated_pages, total_chunks')\
+                #    updated_at sirve como sello de versión para la caché
+                material_info = await run_io(supabase.table('materials')\
+                    .select('estimated_pages, total_chunks, updated_at')\
                     .eq('id', material_id)\
                     .single()\
-                    .execute()
+                    .execute)
                 
                 if not material_info.data:
                     raise HTTPException(
@@ -684,70 +1175,51 @@ async def validate_answer(answer: Answer):
                 
                 real_pages = material_info.data.get('estimated_pages', 1)
                 total_chunks_db = material_info.data.get('total_chunks', 0)
+                material_version = str(material_info.data.get('updated_at'))
                 
                 print(f"📄 Material tiene {real_pages} páginas y {total_chunks_db} chunks")
                 
-                # 2. Obtener embeddings desde Supabase
-                embeddings_result = supabase.table('material_embeddings')\
-                    .select('chunk_index, chunk_text, embedding')\
-                    .eq('material_id', material_id)\
-                    .order('chunk_index')\
-                    .execute()
+                # 2. Obtener embeddings: primero caché en memoria, luego Supabase
+                cached_material = material_cache.get(material_id, version=material_version)
                 
-                if not embeddings_result.data or len(embeddings_result.data) == 0:
-                    raise HTTPException(
-                        status_code=404,
-                        detail=f"No se encontraron embeddings para el material {material_id}"
+                if cached_material is not None:
+                    material_embeddings = cached_material.chunks
+                    print(f"⚡ {len(material_embeddings)} chunks desde caché en memoria")
+                elif use_pgvector_retrieval():
+                    # Solo viajan los K candidatos (RPC match_material_chunks o,
+                    # en modo hybrid, hybrid_match_material_chunks), no el material completo
+                    material_embeddings = []
+                    top_k_retrieval = True
+                    print(f"🎯 Recuperación top-K en Supabase ({RETRIEVAL_MODE})")
+                else:
+                    cached_material = await load_material_chunks(
+                        supabase, material_id, material_info.data, material_version
                     )
-                
-                # Convertir a formato esperado por SemanticValidator
-                material_embeddings = []
-                for emb in embeddings_result.data:
-                    chunk_text = emb['chunk_text']
-                    
-                    # ✅ NUEVO: Normalizar chunk al cargarlo (por si no se normalizó al guardar)
-                    chunk_text_normalized = normalize_text(chunk_text)
+                    material_embeddings = cached_material.chunks
                     
-                    # IMPORTANTE: Convertir el embedding de string a numpy array
-                    embedding_vector = emb['embedding']
-                    if isinstance(embedding_vector, str):
-                        # Si es string, convertir a lista
-                        embedding_vector = json.loads(embedding_vector)
-                    if isinstance(embedding_vector, list):
-                        # Convertir lista a numpy array
-                        embedding_vector = np.array(embedding_vector, dtype=np.float32)
-                    
-                    material_embeddings.append({
-                        "chunk_id": emb['chunk_index'],
-                        "text": chunk_text_normalized[:200] + "..." if len(chunk_text_normalized) > 200 else chunk_text_normalized,
-                        "text_full": chunk_text_normalized,  # ✅ Texto normalizado
-                        "embedding": embedding_vector
-                    })
-                
-                print(f"📚 {len(material_embeddings)} chunks cargados desde Supabase")
+                    print(f"📚 {len(material_embeddings)} chunks cargados desde Supabase")
                 
             else:
-                # Fallback: cargar desde archivos JSON locales
-                embeddings_files = list(EMBEDDINGS_DIR.glob(f"material_{material_id}_*.json"))
+                # Fallback: almacén binario local (matriz por mmap, sin json.load)
+                local_material = await run_io(open_material, EMBEDDINGS_DIR, material_id)
                 
-                if not embeddings_files:
-                    embeddings_files = list(EMBEDDINGS_DIR.glob("material_*.json"))
-                    if not embeddings_files:
+                if local_material is None:
+                    local_material = await run_io(open_material, EMBEDDINGS_DIR)
+                    if local_material is None:
                         raise HTTPException(
                             status_code=404, 
                             detail="No hay materiales procesados. Sube un material primero."
                         )
                 
-                print(f"📂 Cargando: {embeddings_files[0].name}")
-                with open(embeddings_files[0], 'r', encoding='utf-8') as f:
-                    material_embeddings = json.load(f)
+                print(f"📂 Cargando: {local_material.stem}")
+                # Misma interfaz que la caché (.chunks y .matrix normalizada)
+                cached_material = local_material
+                material_embeddings = local_material.chunks
                 
                 print(f"📚 {len(material_embeddings)} chunks disponibles")
             
-            # ✅ FIX: Generar embedding SOLO de la respuesta del usuario (no combinar con pregunta)
-            # Esto mejora la precisión semántica al buscar chunks que responden directamente
-            user_embedding = generate_embeddings(answer.user_answer)
-            print(f"🧠 Embedding generado (dim: {len(user_embedding)})")
+            # NOTA: El embedding de la respuesta lo genera HybridValidator (una sola vez);
+            # aquí no se vuelve a codificar para no duplicar el forward pass del modelo
             
             # ===== NUEVO: VALIDACIÓN AVANZADA MULTI-NIVEL =====
             # Sistema mejorado con:
@@ -758,17 +1230,49 @@ async def validate_answer(answer: Answer):
             
             print(f"\n🔬 Validando con HYBRID VALIDATOR (BM25 + Cosine + Coverage)...")
             
-            # Instanciar HybridValidator
-            from embeddings_module import load_model
-            embedding_model = load_model()
-            hybrid_validator = HybridValidator(embedding_model)
+            # HybridValidator compartido del proceso (ver validator_registry)
+            hybrid_validator = validator_registry.hybrid()
             
-            # Validar con HybridValidator
-            classification = hybrid_validator.validate_answer(
-                question=question_text,
-                user_answer=answer.user_answer,
-                chunks=material_embeddings
-            )
+            classification = None
+            if top_k_retrieval:
+                classification = hybrid_validator.answer_length_error(answer.user_answer)
+            if top_k_retrieval and classification is None:
+                # encode (pool cpu) → RPC top-K (pool io) → scoring (pool cpu):
+                # la espera de red no ocupa un hilo del pool cpu
+                context = await run_cpu(hybrid_validator.build_scoring_context, question_text, answer.user_answer)
+                try:
+                    material_embeddings = await run_io(
+                        fetch_top_chunks,
+                        supabase, material_id, context.query_embedding.astype(np.float32),
+                        hybrid_validator.prefilter_top_k, normalize_cached,
+                        query_text=f"{question_text} {answer.user_answer}" if use_hybrid_retrieval() else None,
+                        weights=hybrid_validator.weights
+                    )
+                except RETRIEVAL_RPC_ERRORS as e:
+                    # RPC no instalada o caída: descargar el material completo
+                    print(f"⚠️ Recuperación {RETRIEVAL_MODE} falló ({e}), usando descarga completa")
+                    cached_material = await load_material_chunks(
+                        supabase, material_id, material_info.data, material_version
+                    )
+                    material_embeddings = cached_material.chunks
+                else:
+                    classification = await run_cpu(
+                        hybrid_validator.score_retrieved,
+                        question_text, answer.user_answer, context, material_embeddings,
+                        total_chunks=total_chunks_db,
+                        prefilter_method='hybrid_rpc' if use_hybrid_retrieval() else 'pgvector'
+                    )
+            
+            # Validar con HybridValidator (encode + scoring en el pool cpu)
+            if classification is None:
+                classification = await run_cpu(
+                    hybrid_validator.validate_answer,
+                    question=question_text,
+                    user_answer=answer.user_answer,
+                    chunks=material_embeddings,
+                    # Matriz normalizada precalculada (si el material viene de la caché)
+                    chunk_matrix=cached_material.matrix if cached_material is not None else None
+                )
             
             # Mapear resultado de HybridValidator al formato esperado
             print(f"\n📊 RESULTADO HYBRID VALIDATOR:")
@@ -794,7 +1298,7 @@ async def validate_answer(answer: Answer):
                         "text_short": "",
                         "similarity": 0.0,
                         "chunk_id": 0,
-                        "total_chunks": len(material_embeddings),
+                        "total_chunks": max(total_chunks_db or 0, len(material_embeddings)),
                         "estimated_page": 1
                     }
                 )
@@ -811,17 +1315,16 @@ async def validate_answer(answer: Answer):
             best_chunk_info = classification.get('best_chunk', {})
             best_chunk_id = best_chunk_info.get('chunk_id', 0)
             
-            # Encontrar chunk correspondiente
-            best_match = next(
-                (c for c in material_embeddings if c.get('chunk_id') == best_chunk_id),
-                material_embeddings[0] if material_embeddings else {}
-            )
+            # Encontrar chunk correspondiente (acceso directo, sin recorrer el material)
+            best_match = find_chunk(material_embeddings, best_chunk_id)
+            if best_match is None:
+                best_match = material_embeddings[0] if material_embeddings else {}
             
             # Preparar top chunks desde top_3_scores (ya vienen ordenados de mayor a menor)
             top_chunks = []
             for idx, score_info in enumerate(top_3[:3]):
                 chunk_id = score_info.get('chunk_id', 0)
-                chunk = next((c for c in material_embeddings if c.get('chunk_id') == chunk_id), None)
+                chunk = find_chunk(material_embeddings, chunk_id)
                 if chunk:
                     # score_info['score'] ya es score_pct (0-100) con boosts aplicados
                     # Representa similitud entre RESPUESTA ↔ CHUNK (no chunk ↔ chunk)
@@ -840,7 +1343,8 @@ async def validate_answer(answer: Answer):
             print(f"{'='*70}\n")
             
             # Calcular posición del chunk
-            total_chunks = len(material_embeddings)
+            # (en modo pgvector material_embeddings solo tiene los K candidatos)
+            total_chunks = max(total_chunks_db or 0, len(material_embeddings))
             best_chunk_position = best_chunk_id if isinstance(best_chunk_id, int) else 0
             
             # Calcular página estimada correctamente:
@@ -919,6 +1423,10 @@ async def validate_answer(answer: Answer):
         
     except HTTPException:
         raise
+    except ModelUnavailableError as e:
+        # El modelo carga o falló: 503 (reintentar), no un 500
+        print(f"⏳ Modelo no disponible: {e}")
+        raise model_unavailable(e)
     except Exception as e:
         print(f"❌ ERROR: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -1079,6 +1587,9 @@ async def delete_material(material_id: str, authorization: Optional[str] = Heade
                 .eq('id', material_id)\
                 .execute()
             
+            # Descartar embeddings cacheados del material eliminado
+            invalidate_material(material_id)
+            
             print(f"✅ Material eliminado exitosamente de Supabase")
             
             return {
@@ -1094,6 +1605,7 @@ async def delete_material(material_id: str, authorization: Optional[str] = Heade
                 raise HTTPException(status_code=404, detail=f"Material {material_id} no encontrado")
             
             materials_db = [m for m in materials_db if m["id"] != material_id]
+            invalidate_material(material_id)
             
             return {
                 "success": True,
@@ -1187,39 +1699,124 @@ async def get_questions(topic: Optional[str] = None, difficulty: Optional[str] =
 @app.get("/api/stats")
 async def get_stats():
     """Obtiene estadísticas generales del sistema"""
-    # Contar embeddings totales
-    total_embeddings = 0
-    total_size = 0
-    
-    for file in EMBEDDINGS_DIR.glob("*.json"):
-        try:
-            with open(file, 'r') as f:
-                data = json.load(f)
-                total_embeddings += len(data)
-            total_size += file.stat().st_size
-        except:
-            pass
+    # Contar embeddings totales (desde los sidecars, sin cargar las matrices)
+    embedding_stats = await run_io(store_stats, EMBEDDINGS_DIR)
     
     return {
         "success": True,
         "stats": {
             "total_materials": len(materials_db),
             "total_questions": len(questions_db),
-            "total_embeddings": total_embeddings,
-            "storage_used_mb": round(total_size / (1024 * 1024), 2),
-            "embeddings_files": len(list(EMBEDDINGS_DIR.glob("*.json")))
+            "total_embeddings": embedding_stats["total_embeddings"],
+            "storage_used_mb": round(embedding_stats["total_bytes"] / (1024 * 1024), 2),
+            "embeddings_files": embedding_stats["materials"]
         }
     }
 
+def model_status() -> dict:
+    """Estado del modelo de embeddings (ver model_manager)"""
+    if not MODULES_LOADED:
+        return {"state": "unavailable", "loaded": False, "ready": False,
+                "error": "Módulos de embeddings no disponibles"}
+    return model_manager.status()
+
+def model_unavailable(error: Optional[Exception] = None) -> HTTPException:
+    """
+    503 con el estado del modelo (mismo formato en /api/health/ready,
+    /api/model/load y /api/validate-answer)
+    """
+    model = model_status()
+    return HTTPException(status_code=503, detail={
+        "message": f"Modelo no disponible (estado: {model['state']})",
+        "error": str(error) if error is not None else model.get("error"),
+        "model": model
+    })
+
 @app.get("/api/health")
 async def health_check():
-    """Endpoint de health check para monitoring"""
+    """
+    Endpoint de health check para monitoring
+    
+    - status/live: el proceso responde (liveness; no espera al modelo)
+    - ready: el modelo está cargado o se recarga bajo demanda (descargado por
+      inactividad); False mientras carga o si la carga falló
+    """
+    model = model_status()
     return {
         "status": "healthy",
+        "live": True,
+        "ready": model["ready"],
         "timestamp": datetime.now().isoformat(),
-        "model_loaded": True  # Verificar si el modelo está cargado
+        "model_loaded": model["loaded"],
+        "model": model,
+        "retrieval_mode": RETRIEVAL_MODE,
+        "material_cache": material_cache.stats(),
+        "normalization_cache": normalization_cache.stats(),
+        "extraction_cache": extraction_cache.stats(),
+        "worker_pools": pool_stats(),
+        "ingestion": ingestion_queue.stats(),
+        "progress_broker": progress_broker.stats(),
+        "validators": validator_registry.describe() if validator_registry is not None else None
     }
 
+@app.get("/api/health/live")
+async def liveness_check():
+    """Liveness: el proceso atiende peticiones (no depende del modelo)"""
+    return {"live": True, "timestamp": datetime.now().isoformat()}
+
+@app.get("/api/health/ready")
+async def readiness_check():
+    """Readiness: 503 mientras el modelo carga o si su carga falló"""
+    model = model_status()
+    if not model["ready"]:
+        raise model_unavailable()
+    return {"ready": True, "model": model}
+
+@app.get("/api/model/status")
+async def get_model_status():
+    """Estado del modelo: unloaded | loading | ready | failed | idle, tiempo de carga"""
+    return model_status()
+
+@app.post("/api/model/load")
+async def load_embedding_model(wait: bool = True):
+    """
+    Carga el modelo si no está en memoria (p.ej. tras descargarlo por inactividad)
+    
+    Args:
+        wait: Si True, responde cuando termina la carga; si False, solo la inicia
+    """
+    if not MODULES_LOADED:
+        raise HTTPException(status_code=503, detail="Módulos de embeddings no disponibles")
+    if wait:
+        try:
+            await run_io(model_manager.get)
+        except ModelUnavailableError as e:
+            raise model_unavailable(e)
+    else:
+        model_manager.start_loading()
+    return model_status()
+
+class ValidatorReloadRequest(BaseModel):
+    """Overrides de configuración para la recarga de validadores (ver validator_registry)"""
+    hybrid: Optional[dict] = None    # thresholds, weights, prefilter_top_k, prune_candidates
+    semantic: Optional[dict] = None  # threshold_excellent, threshold_good, threshold_acceptable, min_response_length
+
+@app.post("/api/validators/reload")
+async def reload_validators(request: Optional[ValidatorReloadRequest] = None):
+    """
+    Recarga en caliente de umbrales y pesos de los validadores (sin reiniciar uvicorn)
+    
+    Vuelve a leer VALIDATOR_CONFIG_PATH y aplica los overrides del body.
+    Los requests en curso terminan con los validadores anteriores.
+    """
+    if validator_registry is None:
+        raise HTTPException(status_code=503, detail="Validadores no disponibles")
+    overrides = request.dict(exclude_none=True) if request is not None else None
+    try:
+        return {"success": True, **(await run_cpu(validator_registry.reload, overrides))}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Configuración de validadores inválida: {e}")
+
 # ==================== FUNCIONES AUXILIARES ====================
 
 def load_materials_index():
@@ -1244,43 +1841,39 @@ def migrate_existing_materials():
     """Migra materiales existentes desde embeddings al índice"""
     global materials_db
     
-    for file in sorted(EMBEDDINGS_DIR.glob("material_*.json")):
+    # Los JSON antiguos se convierten al almacén binario antes de listarlos
+    convert_legacy_files(EMBEDDINGS_DIR)
+    for stored in list_materials(EMBEDDINGS_DIR):
         try:
-            parts = file.stem.split('_')
-            if len(parts) >= 3:
-                material_id = int(parts[1])
-                timestamp = parts[2]
-                
-                # Verificar si ya existe
-                if any(m["id"] == material_id for m in materials_db):
-                    continue
-                
-                # Cargar datos del embedding
-                with open(file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                
-                # Buscar archivo original
-                pdf_files = list(MATERIALS_DIR.glob(f"*_{material_id}_*"))
-                saved_filename = pdf_files[0].name if pdf_files else None
-                file_path = str(pdf_files[0]) if pdf_files else None
-                file_exists = bool(pdf_files)
-                original_filename = saved_filename.split(f"_{material_id}_")[0] + pdf_files[0].suffix if pdf_files else f"material_{material_id}"
-                
-                materials_db.append({
-                    "id": material_id,
-                    "filename": original_filename,
-                    "saved_filename": saved_filename,
-                    "file_path": file_path,
-                    "file_exists": file_exists,
-                    "title": original_filename.replace('.pdf', '').replace('.txt', '').replace('_', ' ').title(),
-                    "uploaded_at": timestamp,
-                    "total_chunks": len(data),
-                    "total_characters": sum(len(chunk.get("text_full", "")) for chunk in data),
-                    "estimated_pages": len(data) // 3
-                })
-                print(f"  ✅ Migrado material {material_id}: {original_filename}")
+            material_id = stored["material_id"]
+            timestamp = stored["timestamp"]
+            
+            # Verificar si ya existe
+            if any(m["id"] == material_id for m in materials_db):
+                continue
+            
+            # Buscar archivo original
+            pdf_files = list(MATERIALS_DIR.glob(f"*_{material_id}_*"))
+            saved_filename = pdf_files[0].name if pdf_files else None
+            file_path = str(pdf_files[0]) if pdf_files else None
+            file_exists = bool(pdf_files)
+            original_filename = saved_filename.split(f"_{material_id}_")[0] + pdf_files[0].suffix if pdf_files else f"material_{material_id}"
+            
+            materials_db.append({
+                "id": material_id,
+                "filename": original_filename,
+                "saved_filename": saved_filename,
+                "file_path": file_path,
+                "file_exists": file_exists,
+                "title": original_filename.replace('.pdf', '').replace('.txt', '').replace('_', ' ').title(),
+                "uploaded_at": timestamp,
+                "total_chunks": stored["total_chunks"],
+                "total_characters": stored["total_characters"],
+                "estimated_pages": stored["total_chunks"] // 3
+            })
+            print(f"  ✅ Migrado material {material_id}: {original_filename}")
         except Exception as e:
-            print(f"  ⚠️ Error migrando {file.name}: {e}")
+            print(f"  ⚠️ Error migrando {stored['stem']}: {e}")
 
 def save_materials_index():
     """Guarda el índice de materiales en el archivo JSON"""
@@ -1301,32 +1894,23 @@ def load_existing_materials():
     """Carga materiales existentes del directorio de embeddings"""
     global materials_db
     
-    for file in EMBEDDINGS_DIR.glob("material_*.json"):
+    for stored in list_materials(EMBEDDINGS_DIR):
         try:
-            # Extraer información del nombre del archivo
-            # Formato: material_{id}_{timestamp}.json
-            parts = file.stem.split('_')
-            if len(parts) >= 3:
-                material_id = int(parts[1])
-                timestamp = parts[2]
-                
-                # Cargar datos del embedding para obtener información
-                with open(file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                
-                # Agregar a la base de datos si no existe
-                if not any(m["id"] == material_id for m in materials_db):
-                    materials_db.append({
-                        "id": material_id,
-                        "filename": f"material_{material_id}",
-                        "title": f"Material {material_id}",
-                        "uploaded_at": timestamp,
-                        "total_chunks": len(data),
-                        "total_characters": sum(len(chunk.get("text_full", "")) for chunk in data),
-                        "estimated_pages": 0
-                    })
+            material_id = stored["material_id"]
+            
+            # Agregar a la base de datos si no existe
+            if not any(m["id"] == material_id for m in materials_db):
+                materials_db.append({
+                    "id": material_id,
+                    "filename": f"material_{material_id}",
+                    "title": f"Material {material_id}",
+                    "uploaded_at": stored["timestamp"],
+                    "total_chunks": stored["total_chunks"],
+                    "total_characters": stored["total_characters"],
+                    "estimated_pages": 0
+                })
         except Exception as e:
-            print(f"⚠️ Error cargando material {file}: {e}")
+            print(f"⚠️ Error cargando material {stored['stem']}: {e}")
 
 # ==================== SPRINT 2: ENDPOINTS DE TÓPICOS Y GENERACIÓN AUTOMÁTICA ====================
 
@@ -1580,7 +2164,7 @@ async def validate_answer_by_topic(answer: Answer, authorization: Optional[str]
         user = await get_current_user(authorization)
         
         # Obtener el material y su tópico
-        material = supabase.table('materials').select('topic_id').eq('id', answer.material_id).single().execute()
+        material = await run_io(supabase.table('materials').select('topic_id').eq('id', answer.material_id).single().execute)
         
         if not material.data or not material.data.get('topic_id'):
             # Si no tiene tópico, validar solo contra el material
@@ -1589,53 +2173,59 @@ async def validate_answer_by_topic(answer: Answer, authorization: Optional[str]
         topic_id = material.data['topic_id']
         
         # Obtener todos los materiales del mismo tópico
-        materials = supabase.table('materials').select('id').eq('topic_id', topic_id).eq('user_id', user['id']).execute()
+        materials = await run_io(supabase.table('materials').select('id').eq('topic_id', topic_id).eq('user_id', user['id']).execute)
         material_ids = [m['id'] for m in materials.data]
         
-        # Obtener chunks de todos los materiales del tópico
+        # Obtener chunks de todos los materiales del tópico (consultas en paralelo en el pool io)
+        chunks_results = await asyncio.gather(*[
+            run_io(supabase.table('material_embeddings').select('*').eq('material_id', mat_id).execute)
+            for mat_id in material_ids
+        ])
         all_chunks = []
-        for mat_id in material_ids:
-            chunks_result = supabase.table('material_embeddings').select('*').eq('material_id', mat_id).execute()
+        for chunks_result in chunks_results:
             all_chunks.extend(chunks_result.data)
         
         if not all_chunks:
             raise HTTPException(status_code=404, detail="No se encontraron chunks en el tópico")
         
         # Generar embedding de la respuesta
-        answer_embedding = generate_embeddings([answer.user_answer])[0]
-        
-        # Calcular similitud con todos los chunks
-        similarities = []
-        for chunk in all_chunks:
-            chunk_embedding = np.array(chunk['embedding'])
-            similarity = calculate_similarity(answer_embedding, chunk_embedding)
-            similarities.append({
-                'chunk': chunk,
-                'similarity': float(similarity)
-            })
+        answer_embedding = (await run_cpu(generate_embeddings, [answer.user_answer]))[0]
+        
+        def rank_and_format_chunks():
+            """Similitud con todos los chunks + formato para SemanticValidator (pool cpu)"""
+            similarities = []
+            for chunk in all_chunks:
+                chunk_embedding = np.array(chunk['embedding'])
+                similarity = calculate_similarity(answer_embedding, chunk_embedding)
+                similarities.append({
+                    'chunk': chunk,
+                    'similarity': float(similarity)
+                })
+            
+            # Ordenar por similitud
+            similarities.sort(key=lambda x: x['similarity'], reverse=True)
+            
+            # Formatear chunks para SemanticValidator
+            formatted = []
+            for chunk in all_chunks:
+                embedding_vector = chunk['embedding']
+                if isinstance(embedding_vector, str):
+                    embedding_vector = json.loads(embedding_vector)
+                if isinstance(embedding_vector, list):
+                    embedding_vector = np.array(embedding_vector, dtype=np.float32)
+                
+                formatted.append({
+                    "chunk_id": chunk.get('chunk_index', 0),
+                    "text": chunk.get('chunk_text', ''),
+                    "text_full": chunk.get('chunk_text', ''),
+                    "embedding": embedding_vector
+                })
+            return similarities[:5], formatted
         
-        # Ordenar por similitud
-        similarities.sort(key=lambda x: x['similarity'], reverse=True)
-        top_chunks = similarities[:5]
-        
-        # Formatear chunks para SemanticValidator
-        material_embeddings = []
-        for chunk in all_chunks:
-            embedding_vector = chunk['embedding']
-            if isinstance(embedding_vector, str):
-                embedding_vector = json.loads(embedding_vector)
-            if isinstance(embedding_vector, list):
-                embedding_vector = np.array(embedding_vector, dtype=np.float32)
-            
-            material_embeddings.append({
-                "chunk_id": chunk.get('chunk_index', 0),
-                "text": chunk.get('chunk_text', ''),
-                "text_full": chunk.get('chunk_text', ''),
-                "embedding": embedding_vector
-            })
+        top_chunks, material_embeddings = await run_cpu(rank_and_format_chunks)
         
         # Validación semántica con el mejor chunk
-        validator = SemanticValidator()
+        validator = validator_registry.semantic()
         best_similarity = top_chunks[0]['similarity']
         
         # Determinar texto de pregunta
@@ -1645,7 +2235,8 @@ async def validate_answer_by_topic(answer: Answer, authorization: Optional[str]
             if question:
                 question_text = question.get("text", "")
         
-        validation = validator.validate_answer(
+        validation = await run_cpu(
+            validator.validate_answer,
             user_embedding=answer_embedding,
             material_chunks=material_embeddings,
             user_answer=answer.user_answer,
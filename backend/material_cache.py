@@ -0,0 +1,306 @@
+"""
+Caché en memoria de embeddings por material
+
+Durante una sesión de práctica el estudiante responde 20-50 preguntas sobre
+el MISMO material. Sin caché, cada llamada a /api/validate-answer vuelve a
+descargar todos los vectores desde Supabase, decodifica cada string JSON de
+384 dimensiones y re-normaliza el texto de cada chunk (solo en filas
+guardadas sin normalizer_version).
+
+Este módulo guarda, por UUID de material:
+- Matriz contigua float32 (N x 384) con los embeddings normalizados (norma 1),
+  lista para el pre-filtrado de HybridValidator (un producto matriz-vector)
+- Textos de los chunks ya normalizados
+- Índice léxico del material (keywords por chunk, ver lexical_index.py)
+- Features precalculadas de cada chunk (ver chunk_features.py)
+- Lista de chunks en el formato que espera HybridValidator
+  (el campo 'embedding' de cada chunk es una vista de la fila de la matriz,
+  no una copia)
+
+Política de expulsión:
+- LRU acotado por bytes totales (MATERIAL_CACHE_MAX_MB)
+- TTL por entrada (MATERIAL_CACHE_TTL_SECONDS)
+- Invalidación explícita (delete_material, reprocess_material)
+- Sello de versión (p.ej. materials.updated_at): si cambia, la entrada se descarta
+
+Autor: Abel Jesús Moya Acosta
+Fecha: 17 de noviembre de 2025
+"""
+
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from chunk_features import compute_chunk_features, parse_chunk_features
+from lexical_index import LexicalIndex, extract_keywords
+
+# Configuración (variables de entorno)
+MATERIAL_CACHE_MAX_MB = float(os.getenv('MATERIAL_CACHE_MAX_MB', '256'))
+MATERIAL_CACHE_TTL_SECONDS = float(os.getenv('MATERIAL_CACHE_TTL_SECONDS', '3600'))
+
+# Longitud del texto de vista previa (igual que en main.validate_answer)
+PREVIEW_LENGTH = 200
+
+
+class CachedMaterial:
+    """Entrada de caché de un material: matriz de embeddings + textos normalizados"""
+
+    def __init__(self, material_id: str, matrix: np.ndarray, texts: List[str],
+                 chunk_ids: List[Any], metadata: Optional[dict] = None,
+                 version: Optional[str] = None,
+                 lexical_index: Optional[LexicalIndex] = None,
+                 features: Optional[List[dict]] = None):
+        self.material_id = material_id
+        # Filas con norma 1: el coseno no cambia y HybridValidator puede usar
+        # la matriz directamente en el pre-filtrado
+        matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        if matrix.size:
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            norms[norms < 1e-10] = 1.0
+            matrix = matrix / norms
+        self.matrix = matrix
+        self.texts = texts
+        self.chunk_ids = chunk_ids
+        self.metadata = metadata or {}
+        self.version = version
+        self.lexical_index = lexical_index
+        self.loaded_at = time.monotonic()
+
+        # Vista en formato de chunks (lo que consume HybridValidator)
+        self.chunks = [
+            {
+                "chunk_id": chunk_id,
+                "text": text[:PREVIEW_LENGTH] + "..." if len(text) > PREVIEW_LENGTH else text,
+                "text_full": text,
+                "embedding": self.matrix[i]
+            }
+            for i, (chunk_id, text) in enumerate(zip(chunk_ids, texts))
+        ]
+
+        # Keywords precalculadas: HybridValidator no vuelve a tokenizar
+        if lexical_index is not None:
+            for chunk, keywords, expanded in zip(self.chunks, lexical_index.chunk_keywords,
+                                                 lexical_index.chunk_expanded):
+                chunk["keywords"] = keywords
+                chunk["keywords_expanded"] = expanded
+
+        # Features precalculadas (reasoning score, palabras, números)
+        if features is not None:
+            for chunk, chunk_features in zip(self.chunks, features):
+                chunk["features"] = chunk_features
+
+        # Estimación de memoria: matriz + textos (completo y preview)
+        # + keywords (~50 bytes de overhead por string en listas y sets)
+        self.nbytes = int(self.matrix.nbytes) + sum(
+            len(t) + min(len(t), PREVIEW_LENGTH + 3) for t in texts
+        )
+        if lexical_index is not None:
+            self.nbytes += sum(
+                sum(len(w) + 50 for w in keywords) + 50 * len(expanded)
+                for keywords, expanded in zip(lexical_index.chunk_keywords,
+                                              lexical_index.chunk_expanded)
+            )
+        if features is not None:
+            # dict de 6 claves (~700 bytes) + números como strings
+            self.nbytes += sum(700 + 60 * len(f.get('numbers', ())) for f in features)
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+
+class MaterialCache:
+    """
+    Caché LRU de materiales acotada por bytes totales y TTL
+
+    Thread-safe: FastAPI ejecuta endpoints en el event loop y en threads
+    del pool, así que todas las operaciones usan un lock.
+    """
+
+    def __init__(self, max_bytes: int, ttl_seconds: float):
+        self.max_bytes = max(0, int(max_bytes))
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, CachedMaterial]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _is_expired(self, entry: CachedMaterial) -> bool:
+        if self.ttl_seconds <= 0:
+            return False
+        return (time.monotonic() - entry.loaded_at) > self.ttl_seconds
+
+    def _remove(self, material_id: str) -> Optional[CachedMaterial]:
+        entry = self._entries.pop(material_id, None)
+        if entry is not None:
+            self.total_bytes -= entry.nbytes
+        return entry
+
+    def get(self, material_id: str, version: Optional[str] = None) -> Optional[CachedMaterial]:
+        """
+        Obtiene un material de la caché
+
+        Args:
+            material_id: UUID del material
+            version: Sello de versión actual (si difiere del guardado, la entrada se descarta)
+
+        Returns:
+            CachedMaterial o None si no está, expiró o cambió de versión
+        """
+        key = str(material_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            if self._is_expired(entry) or (version is not None and entry.version != version):
+                self._remove(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, entry: CachedMaterial) -> CachedMaterial:
+        """Guarda un material y expulsa los menos usados si se supera el límite de bytes"""
+        key = str(entry.material_id)
+        with self._lock:
+            self._remove(key)
+
+            # Un material más grande que toda la caché no se guarda
+            if entry.nbytes > self.max_bytes:
+                return entry
+
+            self._entries[key] = entry
+            self.total_bytes += entry.nbytes
+
+            while self.total_bytes > self.max_bytes and self._entries:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+        return entry
+
+    def invalidate(self, material_id: str) -> bool:
+        """Elimina un material de la caché. Retorna True si estaba cacheado"""
+        with self._lock:
+            return self._remove(str(material_id)) is not None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total_requests = self.hits + self.misses
+            return {
+                "materials": len(self._entries),
+                "total_bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total_requests, 3) if total_requests else 0.0
+            }
+
+
+def build_cached_material(material_id: str, rows: List[dict], normalize_fn,
+                          metadata: Optional[dict] = None,
+                          version: Optional[str] = None) -> CachedMaterial:
+    """
+    Construye una entrada de caché a partir de filas de material_embeddings
+
+    Args:
+        material_id: UUID del material
+        rows: Filas con 'chunk_index', 'chunk_text', 'embedding' (lista o string JSON)
+              y opcionalmente 'keywords' (índice léxico persistido),
+              'features' (chunk_features.py) y 'normalizer_version' (el
+              texto ya se normalizó al guardar)
+        normalize_fn: Función de normalización de texto para filas sin
+                      normalizer_version (normalization_cache.normalize_cached)
+        metadata: Datos del material (estimated_pages, total_chunks, ...)
+        version: Sello de versión (p.ej. materials.updated_at)
+
+    Returns:
+        CachedMaterial
+    """
+    texts = []
+    chunk_ids = []
+    vectors = []
+    chunk_keywords = []
+    features = []
+
+    for row in rows:
+        embedding_vector = row['embedding']
+        if isinstance(embedding_vector, str):
+            embedding_vector = json.loads(embedding_vector)
+        vectors.append(embedding_vector)
+        # Filas marcadas con normalizer_version: el texto se guardó normalizado
+        # (y su embedding se calculó sobre ese texto), no se re-procesa
+        text = row['chunk_text'] if row.get('normalizer_version') else normalize_fn(row['chunk_text'])
+        texts.append(text)
+        chunk_ids.append(row['chunk_index'])
+
+        # Materiales subidos antes del índice léxico: tokenizar una vez al cargar
+        keywords = row.get('keywords')
+        if isinstance(keywords, str):
+            keywords = json.loads(keywords)
+        chunk_keywords.append(keywords if keywords is not None else extract_keywords(text))
+
+        # Igual para las features de chunk (o si son de otra versión)
+        features.append(parse_chunk_features(row.get('features')) or compute_chunk_features(text))
+
+    if vectors:
+        matrix = np.asarray(vectors, dtype=np.float32)
+    else:
+        matrix = np.zeros((0, 0), dtype=np.float32)
+
+    return CachedMaterial(material_id, matrix, texts, chunk_ids,
+                          metadata=metadata, version=version,
+                          lexical_index=LexicalIndex(chunk_keywords),
+                          features=features)
+
+
+# Instancia global (una por proceso)
+material_cache = MaterialCache(
+    max_bytes=int(MATERIAL_CACHE_MAX_MB * 1024 * 1024),
+    ttl_seconds=MATERIAL_CACHE_TTL_SECONDS
+)
+
+
+def find_chunk(chunks, chunk_id) -> Optional[dict]:
+    """
+    Chunk con ese chunk_id en una vista de chunks (caché, LocalChunks o top-K)
+
+    La caché y LocalChunks están ordenados por chunk_index desde 0: acceso
+    directo por posición (LocalChunks solo decodifica ese texto). El top-K
+    de la RPC viene ordenado por similitud: se busca entre sus K chunks.
+
+    Returns:
+        El chunk o None si no está
+    """
+    if isinstance(chunk_id, int) and 0 <= chunk_id < len(chunks):
+        chunk = chunks[chunk_id]
+        if chunk.get('chunk_id') == chunk_id:
+            return chunk
+    if isinstance(chunks, list):
+        return next((c for c in chunks if c.get('chunk_id') == chunk_id), None)
+    return None
+
+
+def invalidate_material(material_id: str) -> bool:
+    """Invalida la caché de un material (llamar al eliminar o re-procesar)"""
+    removed = material_cache.invalidate(material_id)
+    if removed:
+        print(f"🧹 Caché invalidada para material {material_id}")
+    return removed
@@ -0,0 +1,257 @@
+"""
+Ciclo de vida del modelo de embeddings (SentenceTransformer)
+
+Antes el modelo era un global de embeddings_module que startup_event
+cargaba de forma síncrona: uvicorn no aceptaba conexiones (ni siquiera
+/api/health) hasta tenerlo en memoria, y luego quedaba cargado para
+siempre aunque nadie validara respuestas (~500 MB en un VPS de 2 GB).
+
+ModelManager:
+- Carga en segundo plano (hilo dedicado): el servidor responde health
+  checks mientras tanto
+- Estados: unloaded → loading → ready | failed; idle = descargado por
+  inactividad (se vuelve a cargar en el siguiente uso)
+- get() espera la carga (o la inicia si hace falta); un fallo se reintenta
+  en la siguiente llamada
+- Descarga tras MODEL_IDLE_UNLOAD_SECONDS sin uso (0 = nunca). Quien ya
+  tenga una referencia al modelo termina su trabajo con ella; la memoria
+  se libera cuando se suelta la última
+- handle(): objeto con .encode que pide el modelo al manager en cada
+  llamada. Los validadores compartidos (validator_registry) lo guardan en
+  lugar del modelo, así no impiden la descarga
+
+Expone el estado en /api/model/status, /api/model/load y /api/health
+(liveness vs readiness).
+
+Autor: Abel Jesús Moya Acosta
+Fecha: 17 de noviembre de 2025
+"""
+
+import asyncio
+import gc
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+# Configuración (variables de entorno)
+MODEL_IDLE_UNLOAD_SECONDS = float(os.getenv('MODEL_IDLE_UNLOAD_SECONDS', '0'))
+MODEL_LOAD_TIMEOUT_SECONDS = float(os.getenv('MODEL_LOAD_TIMEOUT_SECONDS', '300'))
+
+# Estados del modelo
+STATE_UNLOADED = 'unloaded'
+STATE_LOADING = 'loading'
+STATE_READY = 'ready'
+STATE_FAILED = 'failed'
+STATE_IDLE = 'idle'
+
+# Estados en los que el servicio puede atender validaciones (idle recarga bajo demanda)
+SERVING_STATES = (STATE_READY, STATE_IDLE)
+
+
+class ModelUnavailableError(RuntimeError):
+    """El modelo no se pudo cargar (o no terminó de cargar a tiempo)"""
+
+
+class ModelHandle:
+    """Delegado con la interfaz de SentenceTransformer.encode (ver ModelManager.handle)"""
+
+    def __init__(self, manager: 'ModelManager'):
+        self._manager = manager
+
+    def encode(self, *args, **kwargs):
+        return self._manager.get().encode(*args, **kwargs)
+
+
+class ModelManager:
+    """
+    Carga en segundo plano, estado y descarga por inactividad de un modelo
+
+    Attributes:
+        model_name: Nombre para logs y /api/model/status
+        state: unloaded | loading | ready | failed | idle
+        load_time: Segundos de la última carga exitosa
+        loads / unloads: Cargas exitosas y descargas por inactividad
+    """
+
+    def __init__(self, model_name: str, loader: Callable[[], Any],
+                 idle_unload_seconds: float = MODEL_IDLE_UNLOAD_SECONDS,
+                 load_timeout: float = MODEL_LOAD_TIMEOUT_SECONDS):
+        """
+        Args:
+            model_name: Nombre del modelo (solo informativo)
+            loader: Construye el modelo (p.ej. lambda: SentenceTransformer(MODEL_NAME))
+            idle_unload_seconds: Inactividad antes de descargar (0 = nunca)
+            load_timeout: Espera máxima de get() por una carga en curso
+        """
+        self.model_name = model_name
+        self._loader = loader
+        self.idle_unload_seconds = max(0.0, float(idle_unload_seconds))
+        self.load_timeout = load_timeout
+
+        self._lock = threading.Lock()
+        self._loaded = threading.Condition(self._lock)
+        self._model = None
+        self._thread: Optional[threading.Thread] = None
+        self._tasks: List[asyncio.Task] = []
+
+        self.state = STATE_UNLOADED
+        self.error: Optional[str] = None
+        self._exception: Optional[BaseException] = None
+        self.load_time: Optional[float] = None
+        self.loaded_at: Optional[float] = None
+        self.last_used: Optional[float] = None
+        self.loads = 0
+        self.failures = 0
+        self.unloads = 0
+
+    # ─── Carga ───────────────────────────────────────────────────────────
+
+    def start_loading(self) -> bool:
+        """
+        Inicia la carga en segundo plano (no bloquea)
+
+        Returns:
+            bool: True si se lanzó una carga nueva; False si ya estaba
+                  cargado o cargándose
+        """
+        with self._lock:
+            return self._start_loading_locked()
+
+    def _start_loading_locked(self) -> bool:
+        if self.state in (STATE_READY, STATE_LOADING):
+            return False
+        self.state = STATE_LOADING
+        self.error = None
+        self._thread = threading.Thread(target=self._load, name="recuiva-model-loader", daemon=True)
+        self._thread.start()
+        return True
+
+    def _load(self):
+        print(f"🔄 Cargando modelo {self.model_name} en segundo plano...")
+        start = time.perf_counter()
+        try:
+            model = self._loader()
+        except Exception as e:
+            with self._lock:
+                self.state = STATE_FAILED
+                self.error = str(e)
+                self._exception = e
+                self.failures += 1
+                self._loaded.notify_all()
+            print(f"❌ Error cargando modelo {self.model_name}: {e}")
+            return
+
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._model = model
+            self.state = STATE_READY
+            self.load_time = elapsed
+            self.loaded_at = time.time()
+            self.last_used = time.monotonic()
+            self.loads += 1
+            self._loaded.notify_all()
+        print(f"✅ Modelo {self.model_name} cargado en {elapsed:.1f}s")
+
+    def get(self, timeout: Optional[float] = None):
+        """
+        Devuelve el modelo, cargándolo si hace falta (bloquea hasta tenerlo)
+
+        Un estado failed se reintenta: la causa (red, disco) pudo resolverse.
+
+        Raises:
+            ModelUnavailableError: La carga falló o superó el timeout
+        """
+        timeout = self.load_timeout if timeout is None else timeout
+        with self._lock:
+            if self.state != STATE_READY:
+                self._start_loading_locked()
+                deadline = time.monotonic() + timeout
+                while self.state == STATE_LOADING:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise ModelUnavailableError(
+                            f"El modelo {self.model_name} sigue cargando (timeout {timeout:.0f}s)"
+                        )
+                    self._loaded.wait(remaining)
+                if self.state != STATE_READY:
+                    raise ModelUnavailableError(
+                        f"No se pudo cargar el modelo {self.model_name}: {self.error}"
+                    ) from self._exception
+            self.last_used = time.monotonic()
+            return self._model
+
+    def handle(self) -> ModelHandle:
+        """Delegado con .encode que no retiene el modelo (para validadores compartidos)"""
+        return ModelHandle(self)
+
+    # ─── Descarga por inactividad ────────────────────────────────────────
+
+    def unload(self, reason: str = 'manual') -> bool:
+        """Suelta el modelo (las referencias en uso siguen válidas hasta terminar)"""
+        with self._lock:
+            if self.state != STATE_READY:
+                return False
+            self._model = None
+            self.state = STATE_IDLE
+            self.unloads += 1
+        gc.collect()
+        print(f"💤 Modelo {self.model_name} descargado ({reason})")
+        return True
+
+    def unload_if_idle(self, now: Optional[float] = None) -> bool:
+        """Descarga si lleva más de idle_unload_seconds sin usarse"""
+        if self.idle_unload_seconds <= 0:
+            return False
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            idle = self.state == STATE_READY and now - self.last_used >= self.idle_unload_seconds
+        return self.unload(f"{self.idle_unload_seconds:.0f}s sin uso") if idle else False
+
+    async def _idle_loop(self):
+        interval = max(1.0, min(60.0, self.idle_unload_seconds / 4))
+        while True:
+            await asyncio.sleep(interval)
+            self.unload_if_idle()
+
+    def start(self):
+        """Inicia la carga en segundo plano y el control de inactividad (evento startup)"""
+        self.start_loading()
+        if self.idle_unload_seconds > 0:
+            self._tasks = [asyncio.create_task(self._idle_loop())]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    # ─── Estado ──────────────────────────────────────────────────────────
+
+    @property
+    def loaded(self) -> bool:
+        return self.state == STATE_READY
+
+    @property
+    def serving(self) -> bool:
+        """Readiness: cargado, o descargado por inactividad (se recarga bajo demanda)"""
+        return self.state in SERVING_STATES
+
+    def status(self) -> Dict[str, Any]:
+        """Estado para /api/model/status y /api/health"""
+        with self._lock:
+            idle_seconds = (time.monotonic() - self.last_used) if self.last_used is not None else None
+            return {
+                'model_name': self.model_name,
+                'state': self.state,
+                'loaded': self.state == STATE_READY,
+                'ready': self.state in SERVING_STATES,
+                'load_time_seconds': round(self.load_time, 3) if self.load_time is not None else None,
+                'loaded_at': self.loaded_at,
+                'idle_seconds': round(idle_seconds, 1) if idle_seconds is not None else None,
+                'idle_unload_seconds': self.idle_unload_seconds,
+                'error': self.error,
+                'loads': self.loads,
+                'failures': self.failures,
+                'unloads': self.unloads
+            }
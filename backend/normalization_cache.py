@@ -0,0 +1,269 @@
+"""
+Caché de normalización direccionada por contenido
+
+El mismo texto de un chunk pasaba por normalize_text varias veces:
+en el chunking, otra vez en upload_material antes del embedding, dentro de
+generate_embeddings y de nuevo en validate_answer al cargarlo de Supabase.
+
+Este módulo memoiza normalize_text por el hash del texto crudo:
+- Clave: SHA-256 de (NORMALIZER_VERSION + texto crudo), así un cambio en las
+  reglas del normalizador (o activar el fast path) nunca reutiliza resultados
+  de otra versión
+- Memoria: LRU acotado por bytes (NORMALIZATION_CACHE_MAX_MB)
+- Disco: las entradas expulsadas de memoria se vuelcan a SQLite
+  (NORMALIZATION_CACHE_PATH) y se recuperan ante un fallo en memoria.
+  El archivo se poda a NORMALIZATION_CACHE_DISK_MAX_ENTRIES filas
+
+normalize_text es una función pura, así que la caché no cambia el resultado.
+
+Autor: Abel Jesús Moya Acosta
+Fecha: 17 de noviembre de 2025
+"""
+
+import hashlib
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from text_normalizer import NORMALIZER_VERSION, normalize_text
+
+# Configuración (variables de entorno)
+DEFAULT_SPILL_PATH = Path(__file__).parent.parent / "data" / "cache" / "normalization_cache.sqlite3"
+NORMALIZATION_CACHE_MAX_MB = float(os.getenv('NORMALIZATION_CACHE_MAX_MB', '32'))
+NORMALIZATION_CACHE_PATH = os.getenv('NORMALIZATION_CACHE_PATH', str(DEFAULT_SPILL_PATH))
+NORMALIZATION_CACHE_DISK_MAX_ENTRIES = int(os.getenv('NORMALIZATION_CACHE_DISK_MAX_ENTRIES', '200000'))
+
+
+def content_key(text: str, version: str = NORMALIZER_VERSION) -> str:
+    """Clave de caché: hash del texto crudo + versión del normalizador"""
+    return hashlib.sha256(f"{version}\0{text}".encode('utf-8')).hexdigest()
+
+
+class NormalizationCache:
+    """
+    Caché LRU (memoria) + volcado a SQLite (disco) de textos normalizados
+
+    Thread-safe: los endpoints async y los hilos de trabajo comparten la
+    instancia global. Dos locks:
+    - _lock: solo el LRU en memoria (operaciones O(1))
+    - _disk_lock: la conexión SQLite (lecturas, volcados, poda)
+    La normalización y todo el acceso a disco ocurren fuera de _lock, así
+    un acierto en memoria nunca espera detrás de I/O.
+    """
+
+    def __init__(self, max_bytes: int, spill_path: Optional[str] = None,
+                 max_disk_entries: int = NORMALIZATION_CACHE_DISK_MAX_ENTRIES,
+                 normalize_fn: Callable[[str], str] = normalize_text,
+                 version: str = NORMALIZER_VERSION):
+        self.max_bytes = max_bytes
+        self.spill_path = spill_path
+        self.max_disk_entries = max_disk_entries
+        self.normalize_fn = normalize_fn
+        self.version = version
+
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._disk_entries = 0
+        self.total_bytes = 0
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.spilled = 0
+
+    @staticmethod
+    def _entry_size(key: str, value: str) -> int:
+        return sys.getsizeof(key) + sys.getsizeof(value)
+
+    # ─── Disco (SQLite) ──────────────────────────────────────────────────
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        """Abre (una vez) el archivo de volcado; None si está desactivado o falla (con _disk_lock)"""
+        if self._conn is not None or not self.spill_path:
+            return self._conn
+        try:
+            Path(self.spill_path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.spill_path, check_same_thread=False)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS normalized ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            conn.commit()
+            self._disk_entries = conn.execute("SELECT COUNT(*) FROM normalized").fetchone()[0]
+            self._conn = conn
+        except sqlite3.Error as e:
+            print(f"⚠️ Caché de normalización en disco desactivada: {e}")
+            self.spill_path = None
+        return self._conn
+
+    def _disk_get(self, key: str) -> Optional[str]:
+        if not self.spill_path:
+            return None
+        with self._disk_lock:
+            conn = self._connect()
+            if conn is None:
+                return None
+            try:
+                row = conn.execute("SELECT value FROM normalized WHERE key = ?", (key,)).fetchone()
+            except sqlite3.Error as e:
+                print(f"⚠️ Error leyendo caché de normalización: {e}")
+                return None
+        return row[0] if row else None
+
+    def _spill(self, evicted: List[tuple]):
+        """Vuelca a disco las entradas expulsadas de memoria y poda si excede el límite"""
+        if not evicted or not self.spill_path:
+            return
+        with self._disk_lock:
+            self._spill_locked(evicted)
+
+    def _spill_locked(self, evicted: List[tuple]):
+        conn = self._connect()
+        if conn is None:
+            return
+        now = time.time()
+        try:
+            # Filas que ya estaban en disco (INSERT OR REPLACE las reemplaza, no suma)
+            keys = [key for key, _ in evicted]
+            existing = 0
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                existing += conn.execute(
+                    f"SELECT COUNT(*) FROM normalized WHERE key IN ({','.join('?' * len(batch))})",
+                    batch
+                ).fetchone()[0]
+            conn.executemany(
+                "INSERT OR REPLACE INTO normalized (key, value, created_at) VALUES (?, ?, ?)",
+                [(key, value, now) for key, value in evicted]
+            )
+            self._disk_entries += len(evicted) - existing
+            if self._disk_entries > self.max_disk_entries:
+                # Eliminar las más antiguas dejando margen (10%) para no podar en cada volcado
+                keep = int(self.max_disk_entries * 0.9)
+                conn.execute(
+                    "DELETE FROM normalized WHERE key NOT IN "
+                    "(SELECT key FROM normalized ORDER BY created_at DESC LIMIT ?)",
+                    (keep,)
+                )
+                self._disk_entries = conn.execute("SELECT COUNT(*) FROM normalized").fetchone()[0]
+            conn.commit()
+            self.spilled += len(evicted)
+        except sqlite3.Error as e:
+            print(f"⚠️ Error volcando caché de normalización: {e}")
+
+    # ─── Memoria (LRU) ───────────────────────────────────────────────────
+
+    def _put_locked(self, key: str, value: str) -> List[tuple]:
+        """
+        Inserta en el LRU (con _lock)
+
+        Returns:
+            Entradas expulsadas: el llamador las vuelca a disco (_spill)
+            DESPUÉS de soltar _lock
+        """
+        if key in self._entries:
+            return []
+        size = self._entry_size(key, value)
+        if size > self.max_bytes:
+            return [(key, value)]
+
+        self._entries[key] = value
+        self.total_bytes += size
+
+        evicted = []
+        while self.total_bytes > self.max_bytes and self._entries:
+            old_key, old_value = self._entries.popitem(last=False)
+            self.total_bytes -= self._entry_size(old_key, old_value)
+            evicted.append((old_key, old_value))
+        return evicted
+
+    def normalize(self, text: str) -> str:
+        """normalize_text memoizado por contenido"""
+        if not text or not isinstance(text, str):
+            return self.normalize_fn(text)
+
+        key = content_key(text, self.version)
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+
+        # Fallo en memoria: disco y normalización fuera de _lock
+        value = self._disk_get(key)
+        from_disk = value is not None
+        if not from_disk:
+            value = self.normalize_fn(text)
+
+        with self._lock:
+            if from_disk:
+                self.disk_hits += 1
+            else:
+                self.misses += 1
+            evicted = self._put_locked(key, value)
+        self._spill(evicted)
+        return value
+
+    def normalize_batch(self, texts: List[str]) -> List[str]:
+        return [self.normalize(text) for text in texts]
+
+    def clear(self):
+        """Vacía la memoria y el archivo de volcado"""
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+        with self._disk_lock:
+            conn = self._connect()
+            if conn is not None:
+                try:
+                    conn.execute("DELETE FROM normalized")
+                    conn.commit()
+                except sqlite3.Error as e:
+                    print(f"⚠️ Error vaciando caché de normalización: {e}")
+                self._disk_entries = 0
+
+    def close(self):
+        with self._disk_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def stats(self) -> Dict[str, Any]:
+        total_requests = self.hits + self.disk_hits + self.misses
+        return {
+            "version": self.version,
+            "entries": len(self._entries),
+            "size_mb": round(self.total_bytes / (1024 * 1024), 2),
+            "max_mb": round(self.max_bytes / (1024 * 1024), 2),
+            "disk_entries": self._disk_entries,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "spilled": self.spilled,
+            "hit_rate": round((self.hits + self.disk_hits) / total_requests, 3) if total_requests else 0.0
+        }
+
+
+# Instancia global (una por proceso)
+normalization_cache = NormalizationCache(
+    max_bytes=int(NORMALIZATION_CACHE_MAX_MB * 1024 * 1024),
+    spill_path=NORMALIZATION_CACHE_PATH or None
+)
+
+
+def normalize_cached(text: str) -> str:
+    """normalize_text con caché direccionada por contenido (instancia global)"""
+    return normalization_cache.normalize(text)
+
+
+def normalize_cached_batch(texts: List[str]) -> List[str]:
+    """normalize_text_batch con caché direccionada por contenido"""
+    return normalization_cache.normalize_batch(texts)
@@ -0,0 +1,481 @@
+"""
+Extracción de texto de PDF en paralelo por rangos de páginas
+
+extract_with_pdftotext lanzaba UN solo proceso pdftotext sobre todo el
+documento y extract_with_pymupdf recorría las páginas en serie
+concatenando con +=. Un libro de 1000 páginas usaba un solo núcleo.
+
+Este módulo:
+- Divide el documento en rangos de páginas contiguos (plan_page_ranges)
+- Extrae los rangos en paralelo:
+    pdftotext: un proceso `pdftotext -f/-l` por rango (hilos que solo
+               esperan al subproceso: el paralelismo lo dan los procesos)
+    PyMuPDF:   ProcessPoolExecutor (contexto 'spawn'), cada worker abre el
+               PDF desde disco y extrae su rango
+- Une el resultado EN ORDEN y conserva el offset (carácter) donde empieza
+  cada página en el texto unido (join_pages)
+- iter_pages entrega las páginas en orden a medida que termina cada rango
+  (pipeline de ingesta en streaming: el chunking empieza con el primer rango)
+- OCR de las páginas indicadas (ocr_pages) como productor/consumidor:
+  el documento se abre UNA vez con PyMuPDF, un hilo renderiza cada página
+  a un pixmap en escala de grises y la deja en una cola acotada; N hilos
+  la pasan a Tesseract (proceso externo, así que bastan hilos). El DPI de
+  cada página se ajusta para que las imágenes en vuelo quepan en
+  PDF_OCR_MEMORY_MB. Sin PyMuPDF se usa pdftoppm por página (pdf2image)
+- Cada página renderizada se busca en extraction_cache por el hash de sus
+  píxeles antes de encolarla: una página ya reconocida no vuelve a Tesseract
+
+El número de workers se ajusta a los núcleos disponibles
+(PDF_EXTRACTION_WORKERS). Documentos cortos se extraen en serie: lanzar
+procesos cuesta más que lo que se gana.
+
+Todas las funciones aceptan el PDF como ruta (el archivo del trabajo de
+ingesta, sin copias) o como bytes (se escribe UNA vez a un temporal).
+
+Este módulo solo importa la stdlib (y fitz si existe): los workers 'spawn'
+lo re-importan y no deben cargar torch ni el modelo.
+
+Autor: Abel Jesús Moya Acosta
+Fecha: 17 de noviembre de 2025
+"""
+
+import multiprocessing
+import os
+import queue
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from extraction_cache import extraction_cache, page_key
+
+try:
+    import fitz  # PyMuPDF
+    PYMUPDF_AVAILABLE = True
+except ImportError:
+    PYMUPDF_AVAILABLE = False
+
+# Configuración (variables de entorno)
+PDF_EXTRACTION_WORKERS = int(os.getenv('PDF_EXTRACTION_WORKERS', str(os.cpu_count() or 1)))
+# Páginas mínimas por rango (rangos más chicos no compensan el costo del proceso)
+PDF_MIN_PAGES_PER_RANGE = int(os.getenv('PDF_MIN_PAGES_PER_RANGE', '20'))
+# Por debajo de este número de páginas se extrae en serie
+PDF_PARALLEL_MIN_PAGES = int(os.getenv('PDF_PARALLEL_MIN_PAGES', '40'))
+
+# Separador entre páginas en el texto unido (igual que extract_with_pymupdf)
+PAGE_SEPARATOR = "\n\n"
+
+PDFTOTEXT_TIMEOUT_SECONDS = 120
+
+# OCR por página (Tesseract)
+PDF_OCR_WORKERS = int(os.getenv('PDF_OCR_WORKERS', str(os.cpu_count() or 1)))
+# Memoria para las imágenes de página en vuelo (cola + workers)
+PDF_OCR_MEMORY_MB = int(os.getenv('PDF_OCR_MEMORY_MB', '256'))
+OCR_LANG = 'spa+eng'
+# Por debajo de este DPI Tesseract pierde demasiada precisión
+OCR_MIN_DPI = 100
+
+_OCR_DONE = object()
+
+# Un PDF en disco (ruta) o en memoria (bytes)
+PdfSource = Union[str, Path, bytes]
+
+
+@contextmanager
+def pdf_file(pdf: PdfSource) -> Iterator[str]:
+    """Ruta del PDF: la misma si ya está en disco; con bytes, un temporal que se borra al salir"""
+    if not isinstance(pdf, (bytes, bytearray, memoryview)):
+        yield str(pdf)
+        return
+    temp_dir = tempfile.mkdtemp()
+    try:
+        pdf_path = os.path.join(temp_dir, 'input.pdf')
+        with open(pdf_path, 'wb') as f:
+            f.write(pdf)
+        yield pdf_path
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def plan_page_ranges(total_pages: int, workers: int = PDF_EXTRACTION_WORKERS,
+                     min_pages_per_range: int = PDF_MIN_PAGES_PER_RANGE) -> List[Tuple[int, int]]:
+    """
+    Divide [1, total_pages] en rangos contiguos (inclusive, base 1)
+
+    Se generan ~2 rangos por worker (balancea páginas lentas) sin bajar de
+    min_pages_per_range páginas por rango.
+    """
+    if total_pages <= 0:
+        return []
+    target_ranges = max(1, workers) * 2
+    size = max(max(1, min_pages_per_range), -(-total_pages // target_ranges))
+    return [(first, min(first + size - 1, total_pages)) for first in range(1, total_pages + 1, size)]
+
+
+def join_pages(pages: List[str], separator: str = PAGE_SEPARATOR) -> Tuple[str, List[int]]:
+    """
+    Une las páginas en orden
+
+    Returns:
+        (texto, offsets) donde offsets[i] es la posición donde empieza la
+        página i+1 dentro del texto
+    """
+    offsets = []
+    position = 0
+    for i, page in enumerate(pages):
+        if i:
+            position += len(separator)
+        offsets.append(position)
+        position += len(page)
+    return separator.join(pages), offsets
+
+
+def split_pages(text: str, offsets: List[int], separator: str = PAGE_SEPARATOR) -> List[str]:
+    """Inverso de join_pages: recupera cada página a partir de sus offsets"""
+    ends = [offset - len(separator) for offset in offsets[1:]] + [len(text)]
+    return [text[start:end] for start, end in zip(offsets, ends)]
+
+
+def split_pdftotext_output(output: str, expected_pages: int) -> List[str]:
+    """
+    Separa la salida de pdftotext por páginas (cada página termina en form feed)
+
+    Siempre retorna expected_pages elementos (páginas vacías incluidas).
+    """
+    pages = output.split('\f')
+    if len(pages) > expected_pages:
+        # Lo que sigue al último \f es vacío
+        extra = "".join(pages[expected_pages:]).strip()
+        pages = pages[:expected_pages]
+        if extra:
+            pages[-1] += extra
+    return pages + [""] * (expected_pages - len(pages))
+
+
+def count_pdf_pages(pdf_path: str) -> int:
+    """Número de páginas (PyMuPDF o pdfinfo de poppler). 0 si no se puede saber"""
+    if PYMUPDF_AVAILABLE:
+        try:
+            with fitz.open(pdf_path) as doc:
+                return len(doc)
+        except Exception:
+            pass
+    try:
+        result = subprocess.run(['pdfinfo', pdf_path], capture_output=True, text=True, timeout=30)
+        match = re.search(r'^Pages:\s+(\d+)', result.stdout, re.MULTILINE)
+        if match:
+            return int(match.group(1))
+    except Exception:
+        pass
+    return 0
+
+
+def pdftotext_range(pdf_path: str, first: int, last: int) -> List[str]:
+    """Extrae las páginas [first, last] con pdftotext -layout (una por elemento)"""
+    result = subprocess.run([
+        'pdftotext',
+        '-layout',
+        '-enc', 'UTF-8',
+        '-f', str(first),
+        '-l', str(last),
+        pdf_path,
+        '-'             # Salida por stdout
+    ], capture_output=True, timeout=PDFTOTEXT_TIMEOUT_SECONDS)
+    if result.returncode != 0:
+        raise RuntimeError(f"pdftotext páginas {first}-{last}: {result.stderr.decode('utf-8', 'ignore')}")
+    return split_pdftotext_output(result.stdout.decode('utf-8', errors='ignore'), last - first + 1)
+
+
+def pymupdf_range(pdf_path: str, first: int, last: int) -> List[str]:
+    """Extrae las páginas [first, last] con PyMuPDF (ejecutado en un proceso del pool)"""
+    with fitz.open(pdf_path) as doc:
+        return [doc[number - 1].get_text("text") for number in range(first, last + 1)]
+
+
+def _iter_ranges(range_fn, pdf_path: str, ranges: List[Tuple[int, int]],
+                 workers: int, use_processes: bool) -> Iterator[str]:
+    """
+    Ejecuta range_fn sobre cada rango en paralelo y entrega las páginas en orden
+
+    Como máximo 2 rangos por worker en vuelo: quien consume las páginas a
+    medida que llegan (pipeline de ingesta en streaming) no acumula el
+    documento entero.
+    """
+    if len(ranges) <= 1 or workers <= 1:
+        for first, last in ranges:
+            yield from range_fn(pdf_path, first, last)
+        return
+
+    workers = min(workers, len(ranges))
+    if use_processes:
+        # 'spawn': no heredar el estado del servidor (torch, hilos, sockets)
+        executor = ProcessPoolExecutor(max_workers=workers,
+                                       mp_context=multiprocessing.get_context('spawn'))
+    else:
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="recuiva-pdf")
+    try:
+        pending = iter(ranges)
+        futures = deque()
+        for first, last in islice(pending, workers * 2):
+            futures.append(executor.submit(range_fn, pdf_path, first, last))
+        # En orden de envío: el orden de las páginas se conserva
+        while futures:
+            pages = futures.popleft().result()
+            for first, last in islice(pending, 1):
+                futures.append(executor.submit(range_fn, pdf_path, first, last))
+            yield from pages
+    finally:
+        # Consumidor que se detiene antes de tiempo: no extraer el resto
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _extract_ranges(range_fn, pdf_path: str, ranges: List[Tuple[int, int]],
+                    workers: int, use_processes: bool) -> List[str]:
+    """Ejecuta range_fn sobre cada rango en paralelo y concatena las páginas en orden"""
+    return list(_iter_ranges(range_fn, pdf_path, ranges, workers, use_processes))
+
+
+def _iter_pymupdf_pages(pdf_path: str, workers: int) -> Iterator[str]:
+    """PyMuPDF: el mismo handle cuenta y extrae; documentos largos van al pool de procesos"""
+    with fitz.open(pdf_path) as doc:
+        total_pages = len(doc)
+        if total_pages < PDF_PARALLEL_MIN_PAGES or workers <= 1:
+            for page in doc:
+                yield page.get_text("text")
+            return
+    ranges = plan_page_ranges(total_pages, workers)
+    yield from _iter_ranges(pymupdf_range, pdf_path, ranges, workers, use_processes=True)
+
+
+def iter_pages(pdf_path: str, engine: str = 'pdftotext',
+               workers: int = PDF_EXTRACTION_WORKERS,
+               total_pages: Optional[int] = None) -> Iterator[str]:
+    """
+    Texto de cada página, en orden, a medida que se extrae cada rango
+
+    Versión en streaming de extract_pages (mismos motores y rangos). Recibe
+    siempre una ruta: el generador vive más que un `with pdf_file(...)`.
+    """
+    if engine == 'pymupdf':
+        yield from _iter_pymupdf_pages(pdf_path, workers)
+        return
+
+    total_pages = total_pages or count_pdf_pages(pdf_path)
+    if total_pages <= 0:
+        # Sin conteo de páginas: un solo proceso para todo el documento
+        result = subprocess.run(['pdftotext', '-layout', '-enc', 'UTF-8', pdf_path, '-'],
+                                capture_output=True, timeout=PDFTOTEXT_TIMEOUT_SECONDS)
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.decode('utf-8', 'ignore'))
+        output = result.stdout.decode('utf-8', errors='ignore')
+        yield from split_pdftotext_output(output, max(1, output.count('\f')))
+        return
+
+    if total_pages < PDF_PARALLEL_MIN_PAGES:
+        workers = 1
+    ranges = plan_page_ranges(total_pages, workers)
+    yield from _iter_ranges(pdftotext_range, pdf_path, ranges, workers, use_processes=False)
+
+
+def extract_pages(pdf: PdfSource, engine: str = 'pdftotext',
+                  workers: int = PDF_EXTRACTION_WORKERS,
+                  total_pages: Optional[int] = None) -> List[str]:
+    """
+    Extrae el texto de cada página (en paralelo si el documento es largo)
+
+    Args:
+        pdf: Ruta del PDF o PDF en bytes
+        engine: 'pdftotext' o 'pymupdf'
+        workers: Procesos simultáneos (default: núcleos disponibles)
+        total_pages: (Opcional) Páginas del documento si ya se conocen
+
+    Returns:
+        Lista con el texto de cada página, en orden
+    """
+    with pdf_file(pdf) as pdf_path:
+        return list(iter_pages(pdf_path, engine=engine, workers=workers, total_pages=total_pages))
+
+
+def extract_text(pdf: PdfSource, engine: str = 'pdftotext',
+                 workers: int = PDF_EXTRACTION_WORKERS) -> Tuple[str, List[int], int]:
+    """
+    Extrae y une el texto del documento
+
+    Returns:
+        (texto, offsets de inicio de cada página, número de páginas)
+    """
+    pages = extract_pages(pdf, engine=engine, workers=workers)
+    text, offsets = join_pages(pages)
+    return text, offsets, len(pages)
+
+
+def ocr_dpi(pages_to_ocr: int) -> int:
+    """DPI según cuántas páginas van a OCR (mismo criterio que extract_with_tesseract)"""
+    if pages_to_ocr > 100:
+        return 150
+    if pages_to_ocr > 50:
+        return 200
+    return 300
+
+
+def page_dpi(width_pt: float, height_pt: float, target_dpi: int, budget_bytes: int) -> int:
+    """
+    DPI para renderizar una página (escala de grises, 1 byte por píxel)
+
+    El mayor DPI <= target_dpi cuya imagen cabe en budget_bytes, sin bajar
+    de OCR_MIN_DPI. width_pt/height_pt en puntos (1/72 pulgada).
+    """
+    area_square_inches = (width_pt / 72.0) * (height_pt / 72.0)
+    if area_square_inches <= 0:
+        return target_dpi
+    max_dpi = int((budget_bytes / area_square_inches) ** 0.5)
+    return max(OCR_MIN_DPI, min(target_dpi, max_dpi))
+
+
+def _ocr_worker(tasks: "queue.Queue", results: Dict[int, str], lang: str):
+    """Consumidor: imágenes de la cola → Tesseract"""
+    import pytesseract
+
+    while True:
+        item = tasks.get()
+        if item is _OCR_DONE:
+            return
+        number, key, image = item
+        try:
+            results[number] = pytesseract.image_to_string(image, lang=lang)
+            extraction_cache.put_page(key, results[number])
+        except Exception as e:
+            print(f"   ⚠️ OCR falló en página {number}: {e}")
+        finally:
+            image.close()
+
+
+def _ocr_pages_pymupdf(pdf_path: str, page_numbers: List[int], workers: int,
+                       dpi: int, lang: str) -> Dict[int, str]:
+    """Productor/consumidor: un solo handle PyMuPDF renderiza, N workers hacen OCR"""
+    from PIL import Image
+
+    # Cola acotada: el productor se bloquea si Tesseract va más lento
+    tasks: "queue.Queue" = queue.Queue(maxsize=workers)
+    # Imágenes en vuelo: cola + una por worker + la que se está renderizando
+    budget_bytes = PDF_OCR_MEMORY_MB * 1024 * 1024 // (2 * workers + 1)
+    results: Dict[int, str] = {}
+
+    consumers = [
+        threading.Thread(target=_ocr_worker, args=(tasks, results, lang),
+                         name=f"recuiva-ocr-{i}", daemon=True)
+        for i in range(workers)
+    ]
+    for consumer in consumers:
+        consumer.start()
+    try:
+        with fitz.open(pdf_path) as doc:
+            for number in page_numbers:
+                try:
+                    page = doc[number - 1]
+                    pixmap = page.get_pixmap(
+                        dpi=page_dpi(page.rect.width, page.rect.height, dpi, budget_bytes),
+                        colorspace=fitz.csGRAY, alpha=False
+                    )
+                    key = page_key(pixmap.samples, lang)
+                    cached = extraction_cache.get_page(key)
+                    if cached is not None:
+                        results[number] = cached
+                        continue
+                    image = Image.frombytes("L", (pixmap.width, pixmap.height), pixmap.samples)
+                    del pixmap
+                except Exception as e:
+                    print(f"   ⚠️ Error renderizando página {number}: {e}")
+                    continue
+                tasks.put((number, key, image))
+    finally:
+        for _ in consumers:
+            tasks.put(_OCR_DONE)
+        for consumer in consumers:
+            consumer.join()
+    return results
+
+
+def ocr_page(pdf_path: str, page_number: int, dpi: int, lang: str = OCR_LANG) -> str:
+    """Renderiza UNA página con pdftoppm (escala de grises) y le aplica Tesseract (sin PyMuPDF)"""
+    import pytesseract
+    from pdf2image import convert_from_path
+
+    images = convert_from_path(pdf_path, dpi=dpi, first_page=page_number, last_page=page_number,
+                               grayscale=True)
+    if not images:
+        return ""
+    try:
+        key = page_key(images[0].tobytes(), lang)
+        text = extraction_cache.get_page(key)
+        if text is None:
+            text = pytesseract.image_to_string(images[0], lang=lang)
+            extraction_cache.put_page(key, text)
+        return text
+    finally:
+        for image in images:
+            image.close()
+
+
+def _ocr_pages_pdftoppm(pdf_path: str, page_numbers: List[int], workers: int,
+                        dpi: int, lang: str) -> Dict[int, str]:
+    """Fallback sin PyMuPDF: cada worker renderiza su página con pdftoppm"""
+    results: Dict[int, str] = {}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="recuiva-ocr") as executor:
+        futures = {number: executor.submit(ocr_page, pdf_path, number, dpi, lang) for number in page_numbers}
+        for number, future in futures.items():
+            try:
+                results[number] = future.result()
+            except Exception as e:
+                print(f"   ⚠️ OCR falló en página {number}: {e}")
+    return results
+
+
+def ocr_pages(pdf: PdfSource, page_numbers: Optional[List[int]] = None,
+              workers: int = PDF_OCR_WORKERS, dpi: Optional[int] = None,
+              lang: str = OCR_LANG) -> Dict[int, str]:
+    """
+    OCR de las páginas indicadas (base 1) en paralelo
+
+    Las páginas que fallan no aparecen en el resultado: quien llama conserva
+    el texto embebido de esas páginas.
+
+    Args:
+        pdf: Ruta del PDF o PDF en bytes
+        page_numbers: Páginas a procesar (None = todas)
+        workers: Procesos Tesseract simultáneos
+        dpi: DPI objetivo (default según cuántas páginas, ver ocr_dpi)
+        lang: Idiomas de Tesseract
+
+    Returns:
+        {número de página: texto OCR}
+    """
+    with pdf_file(pdf) as pdf_path:
+        if page_numbers is None:
+            page_numbers = list(range(1, count_pdf_pages(pdf_path) + 1))
+        if not page_numbers:
+            return {}
+        dpi = dpi or ocr_dpi(len(page_numbers))
+        workers = max(1, min(workers, len(page_numbers)))
+        if workers > 1:
+            # Cada Tesseract usa un solo hilo: el paralelismo lo da el pool
+            os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+
+        started = time.perf_counter()
+        if PYMUPDF_AVAILABLE:
+            results = _ocr_pages_pymupdf(pdf_path, page_numbers, workers, dpi, lang)
+        else:
+            results = _ocr_pages_pdftoppm(pdf_path, page_numbers, workers, dpi, lang)
+        elapsed = time.perf_counter() - started
+
+        print(f"   ⏱️ OCR: {len(results)}/{len(page_numbers)} páginas en {elapsed:.1f}s "
+              f"({len(results) / max(elapsed, 1e-6) * 60:.1f} págs/min, {workers} workers, ≤{dpi} DPI)")
+        return results
@@ -0,0 +1,321 @@
+"""
+Broker de eventos de progreso para el stream SSE de ingesta
+
+El stream /api/upload-progress/{session_id} consultaba job_events en
+SQLite cada 0.25 s por cliente conectado: latencia de hasta un intervalo
+por evento y un ciclo de despertares por cliente aunque no pasara nada.
+
+Ahora los eventos se empujan:
+- JobStore avisa tras cada commit (add_listener) y el broker entrega el
+  evento a los suscriptores del trabajo en el event loop, sin esperas
+- Buffer de repetición acotado por trabajo (PROGRESS_REPLAY_EVENTS): un
+  navegador que se conecta tarde recibe lo ya emitido; si el buffer no
+  alcanza, se completa desde job_events (historial persistente)
+- Eventos 'progress' consecutivos del mismo paso que el cliente aún no
+  leyó se fusionan en el último (p.ej. un batch de embeddings tras otro)
+- Varios procesos uvicorn: un solo watcher por proceso consulta
+  PRAGMA data_version (no lee tablas) mientras haya suscriptores; si otro
+  proceso escribió, se despierta a los suscriptores para re-leer SQLite
+- Limpieza: canales sin suscriptores de trabajos terminados (o inactivos),
+  sesiones SSE cuyo upload nunca llega (PROGRESS_SESSION_TTL_SECONDS) e
+  historial de trabajos viejos (PROGRESS_EVENTS_RETENTION_SECONDS)
+
+Autor: Abel Jesús Moya Acosta
+Fecha: 17 de noviembre de 2025
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from executors import run_io
+from ingestion_jobs import JobStore
+
+# Configuración (variables de entorno)
+PROGRESS_REPLAY_EVENTS = int(os.getenv('PROGRESS_REPLAY_EVENTS', '256'))
+PROGRESS_WATCH_INTERVAL = float(os.getenv('PROGRESS_WATCH_INTERVAL', '0.2'))
+PROGRESS_SESSION_TTL_SECONDS = float(os.getenv('PROGRESS_SESSION_TTL_SECONDS', '600'))
+PROGRESS_EVENTS_RETENTION_SECONDS = float(os.getenv('PROGRESS_EVENTS_RETENTION_SECONDS', '86400'))
+# Comentario SSE de keepalive si no hay eventos (proxies cierran conexiones mudas)
+PROGRESS_KEEPALIVE_SECONDS = 15.0
+PROGRESS_SWEEP_SECONDS = 60.0
+
+TERMINAL_EVENTS = ('complete', 'error')
+
+
+def coalesce_events(events: List[tuple]) -> List[tuple]:
+    """
+    Fusiona eventos 'progress' consecutivos del mismo paso en el último
+
+    Args:
+        events: [(seq, event), ...] en orden
+
+    Returns:
+        Lista filtrada; el último seq se conserva (el cliente no re-lee nada)
+    """
+    coalesced: List[tuple] = []
+    for seq, event in events:
+        if (coalesced and event.get('type') == 'progress'
+                and coalesced[-1][1].get('type') == 'progress'
+                and coalesced[-1][1].get('step') == event.get('step')):
+            coalesced[-1] = (seq, event)
+        else:
+            coalesced.append((seq, event))
+    return coalesced
+
+
+class _Channel:
+    """Estado en memoria de un trabajo: buffer de repetición y aviso a suscriptores"""
+
+    def __init__(self, replay_size: int):
+        self.events = deque(maxlen=max(1, replay_size))
+        self.last_seq = 0
+        self.subscribers = 0
+        self.finished = False
+        self.touched = time.monotonic()
+        self.changed = asyncio.Event()
+
+    def append(self, seq: int, event: dict):
+        if seq <= self.last_seq:
+            return  # Ya entregado (el historial SQLite lo tiene)
+        if seq != self.last_seq + 1:
+            # Hueco: el buffer deja de ser contiguo, los lectores irán a SQLite
+            self.events.clear()
+        self.events.append((seq, event))
+        self.last_seq = seq
+        if event.get('type') in TERMINAL_EVENTS:
+            self.finished = True
+
+    def since(self, after_seq: int) -> Optional[List[tuple]]:
+        """Eventos con seq > after_seq desde el buffer, o None si el buffer no alcanza"""
+        if self.last_seq <= after_seq:
+            return []
+        if not self.events or self.events[0][0] > after_seq + 1:
+            return None
+        return [(seq, event) for seq, event in self.events if seq > after_seq]
+
+    def notify(self):
+        self.touched = time.monotonic()
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+
+class ProgressBroker:
+    """
+    Pub/sub de eventos de progreso por trabajo sobre primitivas asyncio
+
+    Publicar = JobStore.add_event (cualquier hilo o proceso); el broker
+    solo distribuye. stream(session_id) es un generador async de eventos
+    (None = keepalive).
+    """
+
+    def __init__(self, store: JobStore, replay_size: int = PROGRESS_REPLAY_EVENTS,
+                 watch_interval: float = PROGRESS_WATCH_INTERVAL,
+                 session_ttl: float = PROGRESS_SESSION_TTL_SECONDS,
+                 retention_seconds: float = PROGRESS_EVENTS_RETENTION_SECONDS,
+                 keepalive_seconds: float = PROGRESS_KEEPALIVE_SECONDS):
+        self.store = store
+        self.replay_size = replay_size
+        self.watch_interval = watch_interval
+        self.session_ttl = session_ttl
+        self.retention_seconds = retention_seconds
+        self.keepalive_seconds = keepalive_seconds
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._channels: Dict[str, _Channel] = {}
+        self._jobs_changed: Optional[asyncio.Event] = None
+        self._waiting_sessions = 0
+        self._tasks: List[asyncio.Task] = []
+
+        self.published = 0
+        self.delivered = 0
+        self.coalesced = 0
+        self.external_wakeups = 0
+        self.expired_sessions = 0
+
+        store.add_listener(self._on_store_event)
+
+    def start(self):
+        """Arranca el watcher entre procesos y la limpieza (evento startup)"""
+        self._loop = asyncio.get_running_loop()
+        self._jobs_changed = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._watch_other_workers()),
+            asyncio.create_task(self._sweep_loop())
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._loop = None
+
+    # ─── Publicación (desde JobStore) ────────────────────────────────────
+
+    def _on_store_event(self, job_id: str, seq: int, event: Optional[dict]):
+        """Listener de JobStore: se ejecuta en el hilo que escribió"""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            loop.call_soon_threadsafe(self._dispatch, job_id, seq, event)
+        except RuntimeError:
+            pass  # Loop cerrándose
+
+    def _dispatch(self, job_id: str, seq: int, event: Optional[dict]):
+        if event is None:
+            self._notify_jobs()
+            return
+        channel = self._channel(job_id)
+        channel.append(seq, event)
+        channel.notify()
+        self.published += 1
+
+    def _channel(self, job_id: str) -> _Channel:
+        channel = self._channels.get(job_id)
+        if channel is None:
+            channel = self._channels[job_id] = _Channel(self.replay_size)
+        return channel
+
+    def _notify_jobs(self):
+        if self._jobs_changed is not None:
+            self._jobs_changed.set()
+            self._jobs_changed = asyncio.Event()
+
+    # ─── Suscripción (stream SSE) ────────────────────────────────────────
+
+    async def _wait_for_job(self, session_id: str) -> Optional[dict]:
+        """Espera a que el POST de upload cree el trabajo de la sesión"""
+        deadline = time.monotonic() + self.session_ttl
+        self._waiting_sessions += 1
+        try:
+            while True:
+                waiter = self._jobs_changed
+                job = await run_io(self.store.get_job_by_session, session_id)
+                if job is not None:
+                    return job
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or waiter is None:
+                    return None
+                try:
+                    await asyncio.wait_for(waiter.wait(), timeout=min(remaining, self.keepalive_seconds))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._waiting_sessions -= 1
+
+    async def stream(self, session_id: str) -> AsyncIterator[Optional[dict]]:
+        """
+        Eventos del trabajo de una sesión, desde el primero, hasta 'complete'/'error'
+
+        Produce None cuando pasa PROGRESS_KEEPALIVE_SECONDS sin eventos.
+        """
+        job = await self._wait_for_job(session_id)
+        if job is None:
+            self.expired_sessions += 1
+            yield {
+                'type': 'error',
+                'step': 'session_expired',
+                'message': '❌ No se recibió ningún archivo para esta sesión',
+                'progress': 0,
+                'data': {'session_id': session_id}
+            }
+            return
+
+        job_id = job['id']
+        print(f"📝 [SSE] Siguiendo trabajo {job_id} para session: {session_id}")
+        channel = self._channel(job_id)
+        channel.subscribers += 1
+        last_seq = 0
+        # Al conectar (y tras avisos de otros procesos) se lee el historial SQLite
+        read_store = True
+        try:
+            while True:
+                waiter = channel.changed
+                events = channel.since(last_seq)
+                if events is None or (read_store and not events):
+                    events = await run_io(self.store.events_since, job_id, last_seq)
+                read_store = False
+
+                batch = coalesce_events(events)
+                self.coalesced += len(events) - len(batch)
+                for seq, event in batch:
+                    last_seq = seq
+                    self.delivered += 1
+                    yield event
+                    if event.get('type') in TERMINAL_EVENTS:
+                        return
+                if events:
+                    continue
+
+                try:
+                    await asyncio.wait_for(waiter.wait(), timeout=self.keepalive_seconds)
+                    # Si el aviso no trajo nada al buffer, vino de otro proceso
+                    read_store = channel.last_seq <= last_seq
+                except asyncio.TimeoutError:
+                    read_store = True
+                    yield None
+        finally:
+            channel.subscribers -= 1
+            channel.touched = time.monotonic()
+
+    # ─── Varios procesos y limpieza ──────────────────────────────────────
+
+    def _has_waiters(self) -> bool:
+        return self._waiting_sessions > 0 or any(c.subscribers for c in self._channels.values())
+
+    async def _watch_other_workers(self):
+        """Un solo sondeo barato por proceso (PRAGMA data_version), solo con suscriptores"""
+        version = await run_io(self.store.data_version)
+        while True:
+            await asyncio.sleep(self.watch_interval)
+            if not self._has_waiters():
+                continue
+            try:
+                current = await run_io(self.store.data_version)
+            except Exception as e:
+                print(f"⚠️ Error consultando data_version: {e}")
+                continue
+            if current != version:
+                version = current
+                self.external_wakeups += 1
+                self._notify_jobs()
+                for channel in list(self._channels.values()):
+                    if channel.subscribers:
+                        channel.notify()
+
+    def sweep(self) -> int:
+        """Elimina canales sin suscriptores terminados o inactivos. Retorna cuántos"""
+        now = time.monotonic()
+        stale = [
+            job_id for job_id, channel in self._channels.items()
+            if channel.subscribers == 0
+            and (channel.finished or now - channel.touched > self.session_ttl)
+        ]
+        for job_id in stale:
+            del self._channels[job_id]
+        return len(stale)
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(PROGRESS_SWEEP_SECONDS)
+            try:
+                self.sweep()
+                await run_io(self.store.prune_events, self.retention_seconds)
+            except Exception as e:
+                print(f"⚠️ Error limpiando eventos de progreso: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "channels": len(self._channels),
+            "subscribers": sum(c.subscribers for c in self._channels.values()),
+            "waiting_sessions": self._waiting_sessions,
+            "published": self.published,
+            "delivered": self.delivered,
+            "coalesced": self.coalesced,
+            "external_wakeups": self.external_wakeups,
+            "expired_sessions": self.expired_sessions
+        }
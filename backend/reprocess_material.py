@@ -30,6 +30,10 @@ sys.path.insert(0, str(BACKEND_DIR))
 from chunking import chunk_text_semantic, extract_text_from_pdf
 from embeddings_module import load_model, generate_embeddings
 from supabase_client import get_supabase_client
+from material_cache import invalidate_material
+from lexical_index import LexicalIndex
+from chunk_features import compute_chunk_features
+from text_normalizer import NORMALIZER_VERSION
 import numpy as np
 
 
@@ -77,6 +81,9 @@ def reprocess_material(material_id: str, use_semantic_chunking: bool = True):
             from chunking import chunk_text
             chunks = chunk_text(text, chunk_size=1000, overlap=200)
         
+        # Índice léxico (keywords por chunk)
+        lexical_index = LexicalIndex.from_texts(chunks)
+        
         # Generar embeddings
         model = load_model()
         embeddings_data = []
@@ -85,7 +92,8 @@ def reprocess_material(material_id: str, use_semantic_chunking: bool = True):
             if (i + 1) % 10 == 0:
                 print(f"Procesando chunk {i+1}/{len(chunks)}...")
             
-            embedding = generate_embeddings(chunk_text)
+            # El chunking ya normalizó el texto: vectorizar tal cual
+            embedding = generate_embeddings(chunk_text, normalize=False)
             estimated_page = int((i / len(chunks)) * total_pages) + 1
             
             embeddings_data.append({
@@ -93,7 +101,10 @@ def reprocess_material(material_id: str, use_semantic_chunking: bool = True):
                 'chunk_index': i,
                 'chunk_text': chunk_text,
                 'embedding': embedding.tolist(),
-                'page_number': estimated_page
+                'page_number': estimated_page,
+                'keywords': lexical_index.chunk_keywords[i],
+                'features': compute_chunk_features(chunk_text),
+                'normalizer_version': NORMALIZER_VERSION
             })
         
         print(f"{len(embeddings_data)} embeddings generados")
@@ -115,6 +126,10 @@ def reprocess_material(material_id: str, use_semantic_chunking: bool = True):
             'chunking_method': 'semantic' if use_semantic_chunking else 'legacy'
         }).eq('id', material_id).execute()
         
+        # Descartar la caché en memoria (si se ejecuta dentro del proceso del API;
+        # otros procesos detectan el cambio por materials.updated_at)
+        invalidate_material(material_id)
+        
         print("="*80)
         print("RE-PROCESAMIENTO COMPLETADO")
         print(f"Chunks antiguos: {material.get('total_chunks', 0)}")
@@ -0,0 +1,156 @@
+"""
+Recuperación top-K en el servidor (pgvector)
+
+En modo 'full' validate_answer descarga TODAS las filas del material
+(texto + 384 floats serializados como texto, varios MB en libros grandes)
+y hace el pre-filtrado por coseno en Python.
+
+En modo 'pgvector' se envía el embedding de la consulta a la RPC
+match_material_chunks (database/migrations/add_topk_retrieval.sql), que
+devuelve solo los K candidatos con su texto y su vector (HybridValidator
+los re-puntúa con BM25 + coseno + cobertura). La respuesta baja a unos KB.
+
+La RPC elige la estrategia por material:
+- Materiales pequeños: escaneo exacto filtrado por material_id
+- Materiales grandes: índice HNSW con búsqueda iterativa
+
+En modo 'hybrid' se usa hybrid_match_material_chunks
+(database/migrations/add_hybrid_search.sql): la parte léxica (ts_rank_cd
+sobre chunk_tsv, índice GIN) y la vectorial se combinan en Postgres con
+los pesos de HybridValidator.weights, en un solo viaje.
+
+Autor: Abel Jesús Moya Acosta
+Fecha: 17 de noviembre de 2025
+"""
+
+import os
+from typing import List, Optional
+
+import numpy as np
+
+from lexical_index import extract_keywords
+from material_cache import build_cached_material
+
+# Errores de la RPC que activan la descarga completa del material
+# (función no instalada / error de Postgres, o fallo de red). Cualquier otro
+# error es un bug y se propaga.
+try:
+    import httpx
+    from postgrest.exceptions import APIError
+    RETRIEVAL_RPC_ERRORS = (APIError, httpx.HTTPError)
+except ImportError:
+    RETRIEVAL_RPC_ERRORS = ()
+
+# Configuración (variables de entorno)
+# 'full': descargar todo el material (usa la caché en memoria)
+# 'pgvector': top-K en la base de datos (RPC match_material_chunks)
+# 'hybrid': top-K léxico + vectorial en la base de datos (hybrid_match_material_chunks)
+RETRIEVAL_MODE = os.getenv('RETRIEVAL_MODE', 'full').lower()
+# Por debajo de este número de chunks la RPC hace escaneo exacto (sin índice)
+RETRIEVAL_EXACT_SCAN_THRESHOLD = int(os.getenv('RETRIEVAL_EXACT_SCAN_THRESHOLD', '20000'))
+# Candidatos por rama (vectorial y léxica) que la RPC híbrida combina antes del top-K
+RETRIEVAL_HYBRID_CANDIDATES = int(os.getenv('RETRIEVAL_HYBRID_CANDIDATES', '100'))
+
+MATCH_FUNCTION = 'match_material_chunks'
+HYBRID_MATCH_FUNCTION = 'hybrid_match_material_chunks'
+
+
+def use_pgvector_retrieval() -> bool:
+    """True si validate_answer debe pedir el top-K a la base de datos"""
+    return RETRIEVAL_MODE in ('pgvector', 'hybrid')
+
+
+def use_hybrid_retrieval() -> bool:
+    """True si el top-K combina búsqueda léxica y vectorial en Postgres"""
+    return RETRIEVAL_MODE == 'hybrid'
+
+
+def lexical_query(text: str) -> str:
+    """
+    Consulta para websearch_to_tsquery: keywords únicas unidas por 'or'
+
+    Las keywords son palabras alfanuméricas (extract_keywords), así que la
+    consulta no tiene sintaxis especial (comillas, '-') que websearch interprete.
+    """
+    keywords = list(dict.fromkeys(extract_keywords(text)))
+    return ' or '.join(keywords)
+
+
+def match_chunks_params(material_id: str, query_embedding: np.ndarray, k: int) -> dict:
+    """Parámetros de la RPC match_material_chunks"""
+    return {
+        'query_embedding': [round(float(x), 7) for x in np.asarray(query_embedding).ravel()],
+        'target_material_id': str(material_id),
+        'match_count': int(k),
+        'exact_scan_threshold': RETRIEVAL_EXACT_SCAN_THRESHOLD
+    }
+
+
+def hybrid_match_params(material_id: str, query_embedding: np.ndarray, query_text: str,
+                        k: int, weights: dict) -> dict:
+    """
+    Parámetros de la RPC hybrid_match_material_chunks
+
+    Args:
+        weights: HybridValidator.weights ('bm25' → peso léxico, 'cosine' → vectorial)
+    """
+    params = match_chunks_params(material_id, query_embedding, k)
+    params.update({
+        'query_text': lexical_query(query_text),
+        'lexical_weight': float(weights.get('bm25', 0.0)),
+        'vector_weight': float(weights.get('cosine', 1.0)),
+        'candidate_count': max(int(k), RETRIEVAL_HYBRID_CANDIDATES)
+    })
+    return params
+
+
+def rows_to_chunks(material_id: str, rows: List[dict], normalize_fn) -> List[dict]:
+    """
+    Convierte las filas de la RPC en chunks para HybridValidator
+
+    Reutiliza build_cached_material (mismo parseo de embeddings, keywords,
+    features y normalizer_version que el modo 'full'), conservando el orden por
+    similitud de la RPC.
+
+    Args:
+        material_id: UUID del material
+        rows: Filas de match_material_chunks ('chunk_index', 'chunk_text',
+              'embedding', 'keywords', 'features', 'normalizer_version', 'similarity' y,
+              en modo híbrido, 'lexical_score' y 'hybrid_score')
+        normalize_fn: Normalización para filas sin normalizer_version
+
+    Returns:
+        Lista de chunks con 'text_full', 'embedding' (norma 1) y los scores de la RPC
+    """
+    chunks = build_cached_material(material_id, rows, normalize_fn).chunks
+    for chunk, row in zip(chunks, rows):
+        chunk['similarity'] = float(row.get('similarity') or 0.0)
+        for key in ('lexical_score', 'hybrid_score'):
+            if key in row:
+                chunk[key] = float(row[key] or 0.0)
+    return chunks
+
+
+def fetch_top_chunks(supabase, material_id: str, query_embedding: np.ndarray, k: int,
+                     normalize_fn, query_text: Optional[str] = None,
+                     weights: Optional[dict] = None) -> List[dict]:
+    """
+    Pide a Supabase los K chunks más similares a la consulta (bloqueante)
+
+    Es I/O de red: validate_answer la ejecuta en el pool io, entre
+    build_scoring_context y score_retrieved (pool cpu) de HybridValidator.
+
+    Raises:
+        RETRIEVAL_RPC_ERRORS: La RPC no existe o Supabase no responde
+
+    Args:
+        query_text: Si se pasa (junto con weights), se usa la RPC híbrida
+                    léxica + vectorial; si no, solo la vectorial
+        weights: HybridValidator.weights
+    """
+    if query_text is not None:
+        params = hybrid_match_params(material_id, query_embedding, query_text, k, weights or {})
+        result = supabase.rpc(HYBRID_MATCH_FUNCTION, params).execute()
+    else:
+        result = supabase.rpc(MATCH_FUNCTION, match_chunks_params(material_id, query_embedding, k)).execute()
+    return rows_to_chunks(material_id, result.data or [], normalize_fn)
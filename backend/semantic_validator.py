@@ -20,6 +20,9 @@ from typing import List, Dict, Tuple, Optional
 from sklearn.metrics.pairwise import cosine_similarity
 import re
 
+# Palabras de 4+ letras (keywords compartidas con el chunk), compilado una vez
+KEYWORD_PATTERN = re.compile(r'\b\w{4,}\b')
+
 
 class SemanticValidator:
     """
@@ -290,8 +293,8 @@ class SemanticValidator:
             context_bonus = 5  # ✅ Cobertura media: +5% (2 chunks relevantes)
         
         # FACTOR 2: Palabras clave compartidas (conceptos clave cubiertos)
-        answer_keywords = set(re.findall(r'\b\w{4,}\b', user_answer.lower()))
-        chunk_keywords = set(re.findall(r'\b\w{4,}\b', best_match["text"].lower()))
+        answer_keywords = set(KEYWORD_PATTERN.findall(user_answer.lower()))
+        chunk_keywords = set(KEYWORD_PATTERN.findall(best_match["text"].lower()))
         shared_keywords = answer_keywords.intersection(chunk_keywords)
         
         keyword_bonus = 0
@@ -232,6 +232,72 @@ def hybrid_validator(embedding_model):
     except Exception as e:
         pytest.skip(f"No se pudo crear el validador: {e}")
 
+
+class HashingEncoder:
+    """
+    Encoder determinista SIN red (bolsa de palabras con hashing, 384 dims)
+
+    Imita la interfaz de SentenceTransformer.encode para probar la lógica
+    del HybridValidator cuando el modelo real no se puede descargar.
+    Cuenta las llamadas y los textos codificados.
+    """
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+        self.calls = 0
+        self.texts_encoded = 0
+
+    def _encode_one(self, text: str):
+        import re
+        import zlib
+        import numpy as np
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in re.findall(r'\w+', text.lower()):
+            vector[zlib.crc32(word.encode('utf-8')) % self.dim] += 1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def encode(self, texts, convert_to_tensor=False, convert_to_numpy=True, **kwargs):
+        import numpy as np
+        self.calls += 1
+        if isinstance(texts, str):
+            self.texts_encoded += 1
+            return self._encode_one(texts)
+        self.texts_encoded += len(texts)
+        return np.stack([self._encode_one(t) for t in texts])
+
+
+@pytest.fixture
+def hashing_encoder():
+    """Encoder determinista sin red (ver HashingEncoder)"""
+    return HashingEncoder()
+
+
+@pytest.fixture
+def offline_validator(hashing_encoder):
+    """HybridValidator con HashingEncoder: prueba la lógica sin descargar el modelo"""
+    from hybrid_validator import HybridValidator
+    return HybridValidator(hashing_encoder)
+
+
+@pytest.fixture
+def offline_chunks_punteros(material_punteros, hashing_encoder):
+    """Chunks del material de punteros con embeddings de HashingEncoder"""
+    from chunking import semantic_chunking
+
+    text_chunks = semantic_chunking(material_punteros, min_words=30, max_words=80, overlap_words=5)
+    chunks = [
+        {
+            'chunk_id': i,
+            'text_full': text,
+            'embedding': hashing_encoder._encode_one(text).tolist()
+        }
+        for i, text in enumerate(text_chunks) if text.strip()
+    ]
+    hashing_encoder.calls = 0
+    hashing_encoder.texts_encoded = 0
+    return chunks
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # HOOKS DE PYTEST
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -0,0 +1,112 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+TEST_CHUNK_FEATURES.PY - Pruebas de las Features de Chunk Precalculadas
+═══════════════════════════════════════════════════════════════════════════════
+
+Verifica:
+1. reasoning_score, palabras y números coinciden con el cálculo que
+   HybridValidator hacía en cada validación
+2. Las features persistidas se usan tal cual; las faltantes o de otra
+   versión se calculan una vez y quedan en el chunk
+3. hybrid_score lee las features del chunk en vez de recalcularlas
+═══════════════════════════════════════════════════════════════════════════════
+"""
+
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+# Agregar backend al path
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+import chunk_features
+from chunk_features import (CHUNK_FEATURES_VERSION, DIALOGUE_CHARS, REASONING_VERBS,
+                            chunk_features as get_chunk_features, compute_chunk_features,
+                            parse_chunk_features)
+
+TEXTOS = [
+    "",
+    "corto",
+    "—¿Y el collar? —preguntó la condesa, que sospechaba de Jeanne desde 1785.",
+    "Henriette pensaba que la condesa no le enviaría los 500 francos; creía, sin embargo, "
+    "que su madre entendía la situación y decidió esperar. «Nadie lo sabrá», pensó.",
+    "Un puntero almacena la dirección de memoria de otra variable. int *p = &x; ocupa 8 bytes.",
+]
+
+
+def _reasoning_score_legacy(chunk_text: str) -> float:
+    """Copia del compute_reasoning_score anterior de HybridValidator"""
+    if not chunk_text or len(chunk_text) < 10:
+        return 0.0
+    chunk_lower = chunk_text.lower()
+    dialogue_count = sum(chunk_text.count(char) for char in DIALOGUE_CHARS)
+    dialogue_ratio = min(1.0, dialogue_count / (len(chunk_text) * 0.05))
+    words = chunk_lower.split()
+    word_count = max(len(words), 1)
+    reasoning_count = 0
+    for verb in REASONING_VERBS:
+        reasoning_count += chunk_lower.count(verb)
+    reasoning_ratio = min(1.0, (reasoning_count / word_count) * 50)
+    score = 0.6 * dialogue_ratio + 0.4 * reasoning_ratio
+    return max(0.0, min(1.0, score))
+
+
+class TestComputeFeatures:
+
+    @pytest.mark.parametrize("texto", TEXTOS)
+    def test_same_values_as_validator(self, texto):
+        """TEST: Mismos valores que el cálculo por validación"""
+        features = compute_chunk_features(texto)
+
+        assert features['reasoning_score'] == _reasoning_score_legacy(texto)
+        assert features['word_count'] == len(texto.split())
+        assert set(features['numbers']) == set(chunk_features.NUMBER_PATTERN.findall(texto.lower()))
+        assert features['version'] == CHUNK_FEATURES_VERSION
+
+    def test_validator_method_uses_same_calculation(self, offline_validator):
+        for texto in TEXTOS:
+            assert offline_validator.compute_reasoning_score(texto) == _reasoning_score_legacy(texto)
+
+    def test_parse_persisted_features(self):
+        features = compute_chunk_features(TEXTOS[3])
+
+        assert parse_chunk_features(features) == features
+        assert parse_chunk_features('{"version": %d, "word_count": 3}' % CHUNK_FEATURES_VERSION)['word_count'] == 3
+        assert parse_chunk_features({'version': CHUNK_FEATURES_VERSION + 1}) is None
+        assert parse_chunk_features("no es json") is None
+        assert parse_chunk_features(None) is None
+
+    def test_missing_features_are_computed_once(self):
+        chunk = {'text_full': TEXTOS[2]}
+
+        with patch.object(chunk_features, 'compute_chunk_features',
+                          wraps=chunk_features.compute_chunk_features) as compute:
+            first = get_chunk_features(chunk)
+            second = get_chunk_features(chunk)
+
+        assert compute.call_count == 1
+        assert first is second is chunk['features']
+
+
+class TestValidatorReadsFeatures:
+
+    def test_hybrid_score_uses_stored_features(self, offline_validator, offline_chunks_punteros):
+        """TEST: Con features persistidas no se recalcula nada desde el texto"""
+        question = "¿Por qué el programador decidió usar punteros?"
+        answer = "Porque pensaba que así accedía directamente a la memoria"
+        context = offline_validator.build_scoring_context(question, answer)
+        chunks = [dict(chunk, features=compute_chunk_features(chunk['text_full']))
+                  for chunk in offline_chunks_punteros]
+
+        expected = [offline_validator.hybrid_score(question, answer, dict(chunk), chunks, context=context)
+                    for chunk in offline_chunks_punteros]
+        with patch.object(chunk_features, 'compute_chunk_features',
+                          side_effect=AssertionError("features recalculadas")):
+            stored = [offline_validator.hybrid_score(question, answer, chunk, chunks, context=context)
+                      for chunk in chunks]
+
+        assert [score for score, _ in stored] == [score for score, _ in expected]
+        assert [d['reasoning_score'] for _, d in stored] == [d['reasoning_score'] for _, d in expected]
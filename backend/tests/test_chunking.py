@@ -247,6 +247,69 @@ class TestPDFExtraction:
         assert len(available_methods) >= 1, "Debe haber al menos un método de extracción"
 
 
+# ═══════════════════════════════════════════════════════════════════════════════
+# CLASE: TestSelectiveOCR - OCR solo de las páginas que lo necesitan
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class TestSelectiveOCR:
+    """
+    Pruebas del OCR selectivo por página
+
+    classify_page_text decide por página; ocr_corrupt_pages envía a OCR
+    solo las páginas vacías o corruptas y las une en orden.
+    """
+
+    PAGINA_OK = ("Un puntero es una variable que almacena la dirección de memoria "
+                 "de otra variable. Permite acceder indirectamente al valor apuntado.")
+    PAGINA_CORRUPTA = "d e l a c o n d e s a d e l a r e i n a q u e e s t a b a e n e l p a l a c i o"
+
+    def test_page_classification(self):
+        """
+        TEST: Cada página se clasifica como ok, empty o corrupt
+        """
+        from chunking import classify_page_text
+
+        assert classify_page_text(self.PAGINA_OK)[0] == 'ok'
+        assert classify_page_text("  \n 12 \n")[0] == 'empty'
+        assert classify_page_text(self.PAGINA_CORRUPTA)[0] == 'corrupt'
+        assert classify_page_text("¤¥¦ §¨© ª«¬ ®¯° ±²³ ´µ¶ ·¸¹ º»¼ ½¾¿")[0] == 'corrupt'
+        # Tablas numéricas no son texto corrupto
+        assert classify_page_text("Tabla 3. 2019 2020 2021 1.250 3.400 5.600 12,5% 13,1%")[0] == 'ok'
+
+    def test_only_bad_pages_go_to_ocr(self):
+        """
+        TEST: Solo las páginas malas se envían a OCR y el orden se conserva
+        """
+        import chunking
+
+        pages = [self.PAGINA_OK, "", self.PAGINA_CORRUPTA, self.PAGINA_OK]
+        ocr_text = "Texto reconocido por OCR con una frase legible sobre punteros y memoria."
+        fake_ocr = Mock(side_effect=lambda content, numbers: {n: f"{ocr_text} ({n})" for n in numbers})
+
+        with patch.object(chunking, 'TESSERACT_AVAILABLE', True), \
+                patch.object(chunking, 'PDF_SELECTIVE_OCR', True), \
+                patch.object(chunking, 'ocr_pages', fake_ocr):
+            merged, replaced = chunking.ocr_corrupt_pages(b"%PDF", pages)
+
+        assert fake_ocr.call_args[0][1] == [2, 3]
+        assert replaced == 2
+        assert merged == [self.PAGINA_OK, f"{ocr_text} (2)", f"{ocr_text} (3)", self.PAGINA_OK]
+
+    def test_unreadable_ocr_keeps_text_layer(self):
+        """
+        TEST: Si el OCR de una página corrupta tampoco es legible, se conserva el original
+        """
+        import chunking
+
+        pages = [self.PAGINA_CORRUPTA]
+        with patch.object(chunking, 'TESSERACT_AVAILABLE', True), \
+                patch.object(chunking, 'PDF_SELECTIVE_OCR', True), \
+                patch.object(chunking, 'ocr_pages', Mock(return_value={1: "¤¥¦ §¨© ª«¬ ®¯°"})):
+            merged, replaced = chunking.ocr_corrupt_pages(b"%PDF", pages)
+
+        assert (merged, replaced) == (pages, 0)
+
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # CLASE: TestAdaptiveChunking - Pruebas de chunking adaptativo
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -0,0 +1,92 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+TEST_CONTRADICTION_DETECTOR.PY - Pruebas del Detector de Contradicciones
+═══════════════════════════════════════════════════════════════════════════════
+
+Verifica:
+1. Los patrones precompilados encuentran EXACTAMENTE las mismas
+   contradicciones (y en el mismo orden) que el bucle original
+2. Coincidencias solapadas, keywords repetidos en dos categorías y
+   contradicciones con la pregunta
+3. Un mismo análisis de la respuesta sirve para todos los chunks
+═══════════════════════════════════════════════════════════════════════════════
+"""
+
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+# Agregar backend al path
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from contradiction_detector import (CRITICAL_KEYWORDS, NEGATION_PATTERNS, analyze_answer,
+                                    contradiction_penalty, find_contradictions)
+from benchmark_contradiction import find_contradictions_legacy
+
+CHUNK = "Henriette recibía dinero cada año por correo. La condesa le mandaba 500 francos en una carta."
+QUESTION = "¿Qué ayuda económica recibía Henriette?"
+
+
+class TestPrecompiledDetector:
+
+    @pytest.mark.parametrize("answer,question", [
+        ("La condesa nunca le mandó dinero a Henriette", QUESTION),
+        ("La condesa nunca le mandó dinero a Henriette", ""),
+        ("Henriette recibía 500 francos por correo cada año", QUESTION),
+        ("Recibía 300 francos", ""),
+        ("No sabe no tiene dinero francos", QUESTION),
+        ("No quería ni siquiera una carta, pero nunca llegó el correo", "¿Qué sentía Henriette?"),
+        ("Nadie supo si hubo guerra; no hubo batalla ni viaje", "¿Qué pasó en la guerra?"),
+        ("Un puntero almacena la dirección de memoria", QUESTION),
+        ("", QUESTION),
+    ])
+    def test_same_contradictions_as_legacy(self, answer, question):
+        """TEST: Mismas contradicciones y mismo orden que el bucle original"""
+        assert find_contradictions(analyze_answer(answer, question), CHUNK) == \
+            find_contradictions_legacy(answer, CHUNK, question)
+
+    def test_random_texts_match_legacy(self):
+        """TEST: Respuestas y chunks aleatorios con negaciones y keywords"""
+        rng = random.Random(11)
+        words = [keyword for keywords in CRITICAL_KEYWORDS.values() for keyword in keywords]
+        words += "no nunca jamás sin ningún nada de nadie le se pero tampoco ni siquiera 15 500 2".split()
+        questions = ["", QUESTION, "¿Qué pasó en la boda?", "¿Es verdad?", "¿Qué hizo el rey?"]
+
+        for _ in range(40):
+            answer = " ".join(rng.choice(words) for _ in range(rng.randint(1, 20)))
+            chunk = " ".join(rng.choice(words) for _ in range(rng.randint(0, 40)))
+            question = rng.choice(questions)
+            assert find_contradictions(analyze_answer(answer, question), chunk) == \
+                find_contradictions_legacy(answer, chunk, question)
+
+    def test_overlapping_negations(self):
+        """TEST: 'no ... no ...' encadenados niegan todos los keywords alcanzados"""
+        analysis = analyze_answer("no sabe no tiene dinero")
+
+        # 'dinero' se alcanza desde ambos 'no' (patrones de 1 y 3 palabras intermedias)
+        assert set(analysis.negated) == {'tiene', 'dinero'}
+        assert [NEGATION_PATTERNS[i] for i in analysis.negated['dinero']] == [
+            r'\bno\s+\w+\s+{keyword}\b', r'\bno\s+\w+\s+\w+\s+\w+\s+{keyword}\b'
+        ]
+
+    def test_analysis_reused_across_chunks(self):
+        """TEST: El análisis de la respuesta no depende del chunk"""
+        analysis = analyze_answer("La condesa nunca le mandó dinero a Henriette", QUESTION)
+
+        con_dinero = contradiction_penalty(find_contradictions(analysis, CHUNK))
+        sin_relacion = contradiction_penalty(find_contradictions(analysis, "Un puntero almacena direcciones."))
+
+        # Contradice la pregunta aunque el chunk no hable de dinero
+        assert con_dinero[:2] == (True, 0.20)
+        assert sin_relacion[:2] == (True, 0.20)
+        assert "dinero" in con_dinero[2]
+
+    def test_no_negation_is_not_a_contradiction(self):
+        """TEST: Sin palabras de negación no hay análisis por patrón"""
+        analysis = analyze_answer("Henriette recibía dinero por correo", QUESTION)
+
+        assert analysis.negated == {}
+        assert contradiction_penalty(find_contradictions(analysis, CHUNK)) == (False, 1.0, "")
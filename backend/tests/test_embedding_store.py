@@ -0,0 +1,141 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+TEST_EMBEDDING_STORE.PY - Pruebas del Almacén Binario de Embeddings
+═══════════════════════════════════════════════════════════════════════════════
+
+Verifica:
+1. Guardar y abrir: matriz por mmap (float32, norma 1) y textos exactos
+2. Conversión de los JSON antiguos (indent=2) y ahorro de disco
+3. Estadísticas y listado sin cargar matrices ni convertir JSON antiguos
+4. HybridValidator valida directamente sobre el material mmap
+═══════════════════════════════════════════════════════════════════════════════
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Agregar backend al path
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from embedding_store import (
+    convert_legacy_files, list_materials, material_stem, open_material,
+    save_material, store_stats
+)
+
+
+def _material(n=20, dim=384, seed=0):
+    rng = np.random.default_rng(seed)
+    texts = [f"Chunk {i}: el puntero número {i} almacena direcciones de memoria — ñandú" for i in range(n)]
+    return texts, rng.normal(size=(n, dim)).astype(np.float32)
+
+
+class TestEmbeddingStore:
+
+    def test_roundtrip_with_mmap(self, tmp_path):
+        texts, matrix = _material()
+        keywords = [["puntero", str(i)] for i in range(len(texts))]
+        features = [{"version": 1, "word_count": i} for i in range(len(texts))]
+        save_material(tmp_path, material_stem(3, "20251117_101500"), texts, matrix,
+                      keywords=keywords, features=features)
+
+        material = open_material(tmp_path, 3)
+
+        assert isinstance(material.matrix, np.memmap)
+        assert material.matrix.dtype == np.float32
+        assert np.allclose(np.linalg.norm(material.matrix, axis=1), 1.0, atol=1e-5)
+        expected = matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+        assert np.allclose(material.matrix, expected, atol=1e-6)
+
+        assert len(material.chunks) == len(texts)
+        assert [c['text_full'] for c in material.chunks] == texts
+        assert material.chunks[np.int64(5)]['chunk_id'] == 5
+        assert material.chunks[-1]['keywords'] == keywords[-1]
+        assert material.chunks[-1]['features'] == features[-1]
+
+    def test_find_chunk_decodes_only_that_chunk(self, tmp_path, monkeypatch):
+        from material_cache import find_chunk
+
+        texts, matrix = _material()
+        save_material(tmp_path, material_stem(4, "20251117_101500"), texts, matrix)
+        material = open_material(tmp_path, 4)
+        decoded = []
+        original_text = material.text
+        monkeypatch.setattr(material, 'text', lambda index: decoded.append(index) or original_text(index))
+
+        chunk = find_chunk(material.chunks, 12)
+
+        assert chunk['text_full'] == texts[12]
+        assert decoded == [12]
+        assert find_chunk(material.chunks, len(texts)) is None
+
+    def test_legacy_json_is_converted(self, tmp_path):
+        texts, matrix = _material(n=50)
+        legacy = [
+            {"chunk_id": i, "text": text[:200], "text_full": text, "embedding": row.tolist()}
+            for i, (text, row) in enumerate(zip(texts, matrix))
+        ]
+        legacy_path = tmp_path / "material_7_20251101_090000.json"
+        legacy_path.write_text(json.dumps(legacy, ensure_ascii=False, indent=2), encoding='utf-8')
+        legacy_bytes = legacy_path.stat().st_size
+
+        material = open_material(tmp_path, 7)
+
+        assert material.chunks[10]['text_full'] == texts[10]
+        assert material.disk_bytes() * 3 < legacy_bytes
+
+        # Con remove_json el JSON ya convertido se elimina
+        convert_legacy_files(tmp_path, remove_json=True)
+        assert not legacy_path.exists()
+        assert open_material(tmp_path, 7).chunks[0]['text_full'] == texts[0]
+
+    def test_listing_and_stats(self, tmp_path):
+        for material_id, n in ((1, 5), (2, 8)):
+            texts, matrix = _material(n=n)
+            save_material(tmp_path, material_stem(material_id, "20251117_120000"), texts, matrix)
+
+        listed = {m['material_id']: m for m in list_materials(tmp_path)}
+        stats = store_stats(tmp_path)
+
+        assert listed[1]['total_chunks'] == 5
+        assert listed[2]['timestamp'] == "20251117"
+        assert listed[2]['total_characters'] == sum(len(t) for t in _material(n=8)[0])
+        assert stats['materials'] == 2
+        assert stats['total_embeddings'] == 13
+        assert stats['legacy_json_files'] == 0
+        assert open_material(tmp_path, 99) is None
+
+    def test_stats_do_not_convert_legacy_json(self, tmp_path):
+        texts, matrix = _material(n=6)
+        legacy = [{"chunk_id": i, "text_full": text, "embedding": row.tolist()}
+                  for i, (text, row) in enumerate(zip(texts, matrix))]
+        (tmp_path / "material_9_20251101_090000.json").write_text(json.dumps(legacy), encoding='utf-8')
+
+        stats = store_stats(tmp_path)
+
+        assert stats['legacy_json_files'] == 1
+        assert stats['materials'] == 0
+        assert list_materials(tmp_path) == []
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["material_9_20251101_090000.json"]
+
+        # La carga explícita sí convierte
+        assert open_material(tmp_path, 9).chunks[2]['text_full'] == texts[2]
+        assert store_stats(tmp_path)['materials'] == 1
+
+    def test_validator_uses_mmap_material(self, tmp_path, offline_validator, offline_chunks_punteros):
+        texts = [c['text_full'] for c in offline_chunks_punteros]
+        matrix = [c['embedding'] for c in offline_chunks_punteros]
+        save_material(tmp_path, material_stem(1, "20251117_120000"), texts, matrix)
+        material = open_material(tmp_path, 1)
+
+        question = "¿Qué es un puntero?"
+        answer = "Una variable que almacena la dirección de memoria de otra variable"
+        expected = offline_validator.validate_answer(question, answer, offline_chunks_punteros)
+        result = offline_validator.validate_answer(question, answer, material.chunks,
+                                                   chunk_matrix=material.matrix)
+
+        assert result['best_chunk']['chunk_id'] == expected['best_chunk']['chunk_id']
+        assert abs(result['score_raw'] - expected['score_raw']) < 1e-4
@@ -434,6 +434,35 @@ class TestBatchEmbeddings:
         assert len(chunks_relevantes) > 0, "Debe haber al menos un chunk relevante para 'puntero'"
         print(f"\n✅ Se encontraron {len(chunks_relevantes)} chunks asociados al término 'puntero'")
 
+    def test_micro_batches_match_individual_embeddings(self, embedding_model):
+        """
+        TEST: Los embeddings por micro-batch (upload) deben coincidir con los
+        generados chunk por chunk y volver en el orden original
+        """
+        from embeddings_module import generate_embeddings, iter_embedding_batches
+
+        textos = [
+            "Un puntero almacena direcciones de memoria",
+            "La declaración de un puntero usa el operador asterisco y permite acceso indirecto",
+            "Memoria",
+            "Los punteros nulos apuntan a la dirección 0",
+            "El operador ampersand obtiene la dirección de una variable en C++",
+        ]
+
+        embeddings = [None] * len(textos)
+        total_batches = 0
+        for batch_indices, batch_embeddings in iter_embedding_batches(textos, batch_size=2):
+            total_batches += 1
+            assert len(batch_indices) == len(batch_embeddings)
+            for idx, emb in zip(batch_indices, batch_embeddings):
+                embeddings[idx] = emb
+
+        assert total_batches == 3, f"5 textos en batches de 2 → 3 batches, obtenido: {total_batches}"
+        for texto, emb in zip(textos, embeddings):
+            individual = generate_embeddings(texto)
+            assert np.allclose(emb, individual, atol=1e-4), f"Embedding distinto para: {texto}"
+        print(f"✅ {len(textos)} embeddings por micro-batch coinciden con los individuales")
+
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # TESTS INDIVIDUALES (para ejecución rápida)
@@ -0,0 +1,94 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+TEST_EXECUTORS.PY - Pruebas de la Capa de Ejecución (pools de trabajo)
+═══════════════════════════════════════════════════════════════════════════════
+
+Verifica:
+1. El resultado y las excepciones de la función llegan al handler async
+2. El trabajo bloqueante NO congela el event loop
+3. Métricas de profundidad de cola por pool
+═══════════════════════════════════════════════════════════════════════════════
+"""
+
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+# Agregar backend al path
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from executors import WorkerPool, pool_stats
+
+
+class TestWorkerPool:
+
+    def test_returns_result_and_kwargs(self):
+        pool = WorkerPool("test", 2)
+        result = asyncio.run(pool.run(lambda a, b=0: a + b, 2, b=3))
+
+        assert result == 5
+        assert pool.stats()['completed'] == 1
+        pool.shutdown()
+
+    def test_propagates_exceptions(self):
+        pool = WorkerPool("test", 1)
+
+        def fail():
+            raise ValueError("error de prueba")
+
+        with pytest.raises(ValueError):
+            asyncio.run(pool.run(fail))
+        stats = pool.stats()
+        assert stats['failed'] == 1
+        assert stats['completed'] == 0
+        assert stats['active'] == 0
+        pool.shutdown()
+
+    def test_blocking_work_does_not_block_event_loop(self):
+        pool = WorkerPool("test", 1)
+        ticks = []
+
+        async def heartbeat():
+            for _ in range(5):
+                ticks.append(time.perf_counter())
+                await asyncio.sleep(0.01)
+
+        async def main():
+            await asyncio.gather(pool.run(time.sleep, 0.2), heartbeat())
+
+        start = time.perf_counter()
+        asyncio.run(main())
+
+        # El heartbeat terminó mientras el trabajo bloqueante seguía en el pool
+        assert len(ticks) == 5
+        assert ticks[-1] - start < 0.15
+        pool.shutdown()
+
+    def test_queue_depth_metrics(self):
+        pool = WorkerPool("test", 1)
+        release = threading.Event()
+
+        async def main():
+            tasks = [asyncio.ensure_future(pool.run(release.wait, 1)) for _ in range(3)]
+            await asyncio.sleep(0.05)
+            during = pool.stats()
+            release.set()
+            await asyncio.gather(*tasks)
+            return during
+
+        during = asyncio.run(main())
+
+        assert during['active'] == 1
+        assert during['queued'] == 2
+        assert pool.stats()['max_queue_depth'] >= 2
+        assert pool.stats()['queued'] == 0
+        assert pool.stats()['completed'] == 3
+        pool.shutdown()
+
+    def test_global_pools_reported(self):
+        assert set(pool_stats()) == {"io", "cpu", "ingest"}
@@ -0,0 +1,112 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+TEST_EXTRACTION_CACHE.PY - Pruebas de la Caché de Extracción de PDF
+═══════════════════════════════════════════════════════════════════════════════
+
+Verifica:
+1. Documentos y páginas OCR se recuperan por hash de contenido
+2. La versión/perfil de extracción forman parte de la clave
+3. Expulsión LRU acotada por bytes
+4. extract_pdf_document no vuelve a extraer un PDF ya procesado
+═══════════════════════════════════════════════════════════════════════════════
+"""
+
+import sys
+from pathlib import Path
+from unittest.mock import Mock, patch
+
+# Agregar backend al path
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from extraction_cache import ExtractionCache, content_digest, document_key, file_digest, page_key
+
+PDF = b"%PDF-1.4 contenido de prueba"
+
+
+class TestExtractionCache:
+
+    def test_document_roundtrip(self, tmp_path):
+        cache = ExtractionCache(str(tmp_path / "cache.sqlite3"), max_bytes=1024 * 1024)
+        key = document_key(content_digest(PDF))
+
+        assert cache.get_document(key) is None
+        cache.put_document(key, "Página uno\n\nPágina dos", 2, [0, 12])
+
+        assert cache.get_document(key) == {"text": "Página uno\n\nPágina dos", "pages": 2,
+                                           "page_offsets": [0, 12]}
+        assert (cache.stats()["document_hits"], cache.stats()["document_misses"]) == (1, 1)
+
+        # Otra instancia (otro proceso) ve lo mismo
+        assert ExtractionCache(str(tmp_path / "cache.sqlite3"), 1024 * 1024).get_document(key)["pages"] == 2
+
+    def test_keys_depend_on_content_and_profile(self, tmp_path):
+        pdf_path = tmp_path / "apuntes.pdf"
+        pdf_path.write_bytes(PDF)
+
+        assert file_digest(pdf_path, block_size=4) == content_digest(PDF)
+        assert document_key(content_digest(PDF)) == document_key(content_digest(PDF))
+        assert document_key(content_digest(PDF)) != document_key(content_digest(PDF + b" "))
+        assert document_key(content_digest(PDF), "ocr=True") != document_key(content_digest(PDF), "ocr=False")
+        assert page_key(b"\x00\xff", "spa+eng") != page_key(b"\x00\xff", "eng")
+
+    def test_lru_eviction_by_size(self, tmp_path):
+        cache = ExtractionCache(str(tmp_path / "cache.sqlite3"), max_bytes=2500)
+        for i in range(3):
+            cache.put_page(f"p{i}", "x" * 1000)
+        # p0 es la menos usada; leer p1 la protege
+        assert cache.get_page("p1") is not None
+        cache.put_page("p3", "x" * 1000)
+
+        assert cache.get_page("p0") is None
+        assert cache.get_page("p1") is not None
+        assert cache.get_page("p3") is not None
+        assert cache.stats()["size_mb"] * 1024 * 1024 <= 2500
+        assert cache.stats()["evicted"] >= 1
+
+    def test_disabled_without_path(self):
+        cache = ExtractionCache(None, max_bytes=1024)
+        cache.put_page("p", "texto")
+
+        assert cache.get_page("p") is None
+        assert cache.stats()["enabled"] is False
+
+
+class TestExtractPdfDocument:
+
+    def test_second_extraction_is_a_cache_hit(self, tmp_path):
+        import chunking
+
+        cache = ExtractionCache(str(tmp_path / "cache.sqlite3"), max_bytes=1024 * 1024)
+        pages = ["Un puntero almacena la dirección de memoria de otra variable.",
+                 "La memoria dinámica se reserva con malloc y se libera con free."]
+        layer = Mock(return_value=(pages, "PyMuPDF"))
+
+        with patch.object(chunking, 'extraction_cache', cache), \
+                patch.object(chunking, 'extract_text_layer_pages', layer):
+            first = chunking.extract_pdf_document(PDF, "apuntes.pdf")
+            second = chunking.extract_pdf_document(PDF, "apuntes.pdf")
+
+        assert layer.call_count == 1
+        assert first == second
+        assert first["pages"] == 2
+        for offset, page in zip(first["page_offsets"], pages):
+            assert first["text"][offset:].startswith(page[:10])
+
+    def test_path_source_is_read_in_place(self, tmp_path):
+        import chunking
+
+        pdf_path = tmp_path / "upload.pdf"
+        pdf_path.write_bytes(PDF)
+        cache = ExtractionCache(str(tmp_path / "cache.sqlite3"), max_bytes=1024 * 1024)
+        layer = Mock(return_value=(["Texto de la primera página del documento subido por el estudiante."], "pdftotext"))
+
+        with patch.object(chunking, 'extraction_cache', cache), \
+                patch.object(chunking, 'extract_text_layer_pages', layer):
+            chunking.extract_pdf_document(str(pdf_path), "apuntes.pdf")
+            # El hash calculado al subir evita volver a leer el archivo
+            chunking.extract_pdf_document(str(pdf_path), "apuntes.pdf", content_digest(PDF))
+
+        # El extractor recibe el archivo subido, no una copia temporal
+        layer.assert_called_once_with(str(pdf_path))
+        assert cache.stats()["document_hits"] == 1
@@ -105,6 +105,27 @@ class TestBM25TextBased:
             f"Peso BM25 esperado: 0.05 (5%), obtenido: {bm25_weight}"
         print(f"✅ Peso BM25 configurado: {bm25_weight} (5%)")
 
+    def test_single_index_matches_per_chunk_scores(self, offline_validator, offline_chunks_punteros):
+        """
+        TEST: Un índice BM25 por conjunto de candidatos da los mismos scores
+        que calcular bm25_score chunk por chunk (mapeo por posición)
+        """
+        context = offline_validator.build_scoring_context(
+            "¿Qué es un puntero?", "Una variable que guarda direcciones de memoria"
+        )
+        offline_validator.prepare_candidates(context, offline_chunks_punteros)
+        corpus = [c['text_full'] for c in offline_chunks_punteros]
+
+        for position, chunk in enumerate(offline_chunks_punteros):
+            expected = offline_validator.bm25_score(context.combined_keywords, chunk['text_full'], corpus)
+            assert context.candidate_bm25[position] == pytest.approx(expected)
+
+    def test_bm25_scores_empty_query(self, offline_validator):
+        """TEST: Query vacía o corpus vacío → scores en cero (sin excepción)"""
+        scores = offline_validator.bm25_scores([], [["puntero"], ["memoria"]])
+        assert list(scores) == [0.0, 0.0]
+        assert len(offline_validator.bm25_scores(["puntero"], [[], []])) == 2
+
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # CLASE: TestHybridScoreWeights - Pruebas de pesos del sistema
@@ -146,6 +167,27 @@ class TestHybridScoreWeights:
             f"Coseno debe ser el peso dominante (>= 70%), obtenido: {cosine_weight}"
         print(f"✅ Peso Coseno es dominante: {cosine_weight} (80%)")
     
+    @pytest.mark.parametrize('overrides', [
+        {'weights': {'bm25': -0.1}},
+        {'weights': {'cosine': float('nan')}},
+        {'thresholds': {'excelente': float('inf')}},
+        {'thresholds': {'rechazo': -0.5}},
+    ])
+    def test_invalid_weights_or_thresholds_rejected(self, hashing_encoder, overrides):
+        """TEST: Pesos y umbrales no finitos o negativos → ValueError (como las claves desconocidas)"""
+        from hybrid_validator import HybridValidator
+
+        with pytest.raises(ValueError):
+            HybridValidator(hashing_encoder, **overrides)
+
+    def test_details_weights_are_a_copy(self, offline_validator, offline_chunks_punteros):
+        """TEST: Los detalles del score no exponen el diccionario de pesos del validador compartido"""
+        _, details = offline_validator.hybrid_score("¿Qué es un puntero?", "Una variable con una dirección",
+                                                    offline_chunks_punteros[0], offline_chunks_punteros)
+
+        assert details['weights'] == offline_validator.weights
+        assert details['weights'] is not offline_validator.weights
+
     def test_hybrid_score_combines_all_components(self, hybrid_validator, chunks_punteros):
         """
         TEST: El score híbrido debe combinar BM25 + Coseno + Cobertura
@@ -283,6 +325,43 @@ class TestSemanticPrefiltering:
         else:
             print("⚠️ No se encontró constante TOP_K explícita (usando valor por defecto 15)")
 
+    def test_top_k_indices_matches_stable_sort(self):
+        """
+        TEST: argpartition + desempate debe dar el mismo TOP K que el sort
+        estable original (incluyendo empates, p.ej. cosenos recortados a 0)
+        """
+        from hybrid_validator import HybridValidator
+
+        rng = np.random.default_rng(42)
+        scores = np.clip(rng.normal(0.2, 0.3, 500), 0.0, 1.0).round(2)
+
+        for k in (1, 3, 15, 499, 500, 600):
+            expected = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)[:k]
+            result = HybridValidator.top_k_indices(scores, k)
+            assert list(result) == expected, f"TOP {k} distinto al sort estable"
+
+    def test_chunk_matrix_rows_are_unit_norm(self):
+        """TEST: La matriz del pre-filtrado tiene filas normalizadas (norma 1)"""
+        from hybrid_validator import HybridValidator
+
+        rng = np.random.default_rng(0)
+        chunks = [{'embedding': rng.random(384).tolist()} for _ in range(20)]
+        chunks.append({'embedding': [0.0] * 384})  # Vector nulo: se deja como está
+
+        matrix = HybridValidator.build_chunk_matrix(chunks)
+        norms = np.linalg.norm(matrix, axis=1)
+
+        assert matrix.shape == (21, 384)
+        assert np.allclose(norms[:20], 1.0, atol=1e-5)
+        assert norms[20] == 0.0
+
+    def test_prefilter_top_k_configurable(self):
+        """TEST: prefilter_top_k es configurable y por defecto vale 15"""
+        from hybrid_validator import HybridValidator
+
+        assert HybridValidator(None).prefilter_top_k == 15
+        assert HybridValidator(None, prefilter_top_k=30).prefilter_top_k == 30
+
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # CLASE: TestValidateAnswer - Pruebas de validación de respuestas
@@ -379,6 +458,162 @@ class TestValidateAnswer:
             print(f"✅ Resultado numérico: {result}")
 
 
+# ═══════════════════════════════════════════════════════════════════════════════
+# CLASE: TestScoringContext - Codificar una sola vez por validación
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class TestScoringContext:
+    """
+    Pruebas del contexto de scoring por request
+
+    La respuesta y "pregunta + respuesta" se codifican UNA vez y se
+    reutilizan para todos los chunks pre-filtrados.
+    (Usa HashingEncoder: no requiere descargar el modelo)
+    """
+
+    def test_validate_answer_encodes_once(self, offline_validator, offline_chunks_punteros, hashing_encoder):
+        """TEST: Una validación completa hace un solo forward pass (2 textos)"""
+        result = offline_validator.validate_answer(
+            question="¿Qué es un puntero?",
+            user_answer="Una variable que almacena la dirección de memoria de otra variable",
+            chunks=offline_chunks_punteros
+        )
+
+        assert result['category'] != 'error'
+        assert hashing_encoder.calls == 1, f"Se esperaba 1 llamada a encode, hubo {hashing_encoder.calls}"
+        assert hashing_encoder.texts_encoded == 2
+
+    def test_context_gives_same_scores(self, offline_validator, offline_chunks_punteros):
+        """TEST: hybrid_score con contexto compartido = hybrid_score sin contexto"""
+        question = "¿Por qué son importantes los punteros en C++?"
+        answer = "Porque permiten acceso directo a la memoria del sistema"
+        context = offline_validator.build_scoring_context(question, answer)
+
+        for chunk in offline_chunks_punteros:
+            score_ctx, details_ctx = offline_validator.hybrid_score(
+                question, answer, chunk, offline_chunks_punteros, context=context
+            )
+            score_old, details_old = offline_validator.hybrid_score(
+                question, answer, chunk, offline_chunks_punteros
+            )
+            assert score_ctx == pytest.approx(score_old, abs=1e-6)
+            assert details_ctx['question_type'] == details_old['question_type']
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# CLASE: TestBranchAndBound - Poda de candidatos por cota superior
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def _respuestas(preguntas_prueba):
+    return [
+        (p["pregunta"], p[clave])
+        for p in preguntas_prueba
+        for clave in ("respuesta_correcta", "respuesta_parcial", "respuesta_incorrecta")
+    ]
+
+
+def _sin_poda(validator):
+    from hybrid_validator import HybridValidator
+    return HybridValidator(validator.model, prefilter_top_k=validator.prefilter_top_k,
+                           prune_candidates=False)
+
+
+def _mismo_top3(con_poda, sin_poda):
+    if sin_poda['category'] == 'error':
+        assert con_poda == sin_poda
+        return
+    assert con_poda['top_3_scores'] == sin_poda['top_3_scores']
+    assert con_poda['ambiguity'] == sin_poda['ambiguity']
+    assert con_poda['best_chunk'] == sin_poda['best_chunk']
+    assert (con_poda['category'], con_poda['confidence']) == (sin_poda['category'], sin_poda['confidence'])
+
+
+class TestBranchAndBound:
+    """
+    Pruebas de la poda branch-and-bound de score_candidates
+
+    Los candidatos se evalúan por coseno descendente y se descartan los que
+    no pueden superar al tercer mejor: el resultado debe ser idéntico al de
+    evaluar los 15 candidatos.
+    """
+
+    def test_same_top3_offline(self, offline_validator, offline_chunks_punteros,
+                               material_collar_reina, hashing_encoder, preguntas_prueba):
+        """TEST: Mismo top 3 que sin poda (HashingEncoder, punteros + collar)"""
+        from chunking import semantic_chunking
+
+        chunks = list(offline_chunks_punteros) + [
+            {'chunk_id': f'collar_{i}', 'text_full': text,
+             'embedding': hashing_encoder._encode_one(text).tolist()}
+            for i, text in enumerate(semantic_chunking(material_collar_reina, 10, 30, 0))
+        ]
+        sin_poda = _sin_poda(offline_validator)
+        podados = 0
+        # Respuestas que copian un chunk: top 3 alto, la poda descarta el resto
+        copias = [("¿Qué ocurrió en el texto?", chunk['text_full']) for chunk in chunks]
+
+        for pregunta, respuesta in _respuestas(preguntas_prueba) + copias:
+            con = offline_validator.validate_answer(pregunta, respuesta, chunks)
+            sin = sin_poda.validate_answer(pregunta, respuesta, chunks)
+            _mismo_top3(con, sin)
+            if 'prefilter_info' in con:
+                podados += sin['prefilter_info']['scored_chunks'] - con['prefilter_info']['scored_chunks']
+
+        # La poda se activa en al menos un caso
+        assert podados > 0
+
+    def test_same_top3_with_model(self, hybrid_validator, chunks_punteros, preguntas_prueba):
+        """TEST: Mismo top 3 que sin poda con el modelo real"""
+        sin_poda = _sin_poda(hybrid_validator)
+
+        for pregunta, respuesta in _respuestas(preguntas_prueba):
+            _mismo_top3(hybrid_validator.validate_answer(pregunta, respuesta, chunks_punteros),
+                        sin_poda.validate_answer(pregunta, respuesta, chunks_punteros))
+
+    def test_upper_bound_never_below_score(self, offline_validator, offline_chunks_punteros, preguntas_prueba):
+        """TEST: La cota superior nunca queda por debajo del score real"""
+        for pregunta, respuesta in _respuestas(preguntas_prueba):
+            for largo in (respuesta, " ".join([respuesta] * 3)):  # con y sin bonus de longitud
+                context = offline_validator.build_scoring_context(pregunta, largo)
+                offline_validator.prepare_candidates(context, offline_chunks_punteros)
+                for position, chunk in enumerate(offline_chunks_punteros):
+                    score, details = offline_validator.hybrid_score(
+                        pregunta, largo, chunk, offline_chunks_punteros,
+                        context=context, candidate_index=position
+                    )
+                    bound = offline_validator.score_upper_bound(details['cosine_normalized'], context)
+                    assert score <= bound + 1e-4  # cosine_normalized viene redondeado a 4 decimales
+
+    def test_negative_weight_disables_pruning(self, offline_validator, offline_chunks_punteros,
+                                              material_collar_reina, hashing_encoder):
+        """TEST: Con un peso negativo la cota no es válida: se evalúan todos los candidatos"""
+        from chunking import semantic_chunking
+
+        chunks = list(offline_chunks_punteros) + [
+            {'chunk_id': f'collar_{i}', 'text_full': text,
+             'embedding': hashing_encoder._encode_one(text).tolist()}
+            for i, text in enumerate(semantic_chunking(material_collar_reina, 10, 30, 0))
+        ]
+        sin_poda = _sin_poda(offline_validator)
+        for validator in (offline_validator, sin_poda):
+            validator.weights['bm25'] = -0.5
+        assert not offline_validator.bound_is_sound()
+
+        for chunk in chunks:
+            con = offline_validator.validate_answer("¿Qué ocurrió en el texto?", chunk['text_full'], chunks)
+            sin = sin_poda.validate_answer("¿Qué ocurrió en el texto?", chunk['text_full'], chunks)
+            _mismo_top3(con, sin)
+            assert con['prefilter_info']['scored_chunks'] == len(chunks)
+
+    def test_upper_bound_is_monotonic(self, offline_validator):
+        """TEST: Cota no decreciente en el coseno (permite cortar el recorrido)"""
+        for pregunta in ("¿Qué es un puntero?", "¿Por qué son importantes los punteros?"):
+            context = offline_validator.build_scoring_context(pregunta, "Una variable de memoria")
+            bounds = [offline_validator.score_upper_bound(c / 100, context) for c in range(101)]
+            assert bounds == sorted(bounds)
+            assert bounds[-1] <= 1.0
+
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # CLASE: TestContradictionDetection - Pruebas de detección de contradicciones
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -0,0 +1,218 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+TEST_INGESTION_JOBS.PY - Pruebas de la Cola de Trabajos de Ingesta
+═══════════════════════════════════════════════════════════════════════════════
+
+Verifica:
+1. Encolar guarda el archivo y tomar un trabajo es atómico
+2. Checkpoints por etapa (JSON y matrices .npy)
+3. Un trabajo fallido se reintenta desde la última etapa completada
+4. Eventos de progreso en orden (los consume el stream SSE)
+5. Trabajos de procesos muertos se vuelven a encolar al reiniciar
+6. Una subida se escribe por bloques al trabajo con su SHA-256
+7. Un trabajo que agota INGESTION_JOB_MAX_ATTEMPTS queda fallido (no se
+   reencola para siempre)
+═══════════════════════════════════════════════════════════════════════════════
+"""
+
+import asyncio
+import hashlib
+import io
+import socket
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Agregar backend al path
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from ingestion_jobs import (
+    IngestionQueue, JobStore, JOB_COMPLETED, JOB_FAILED, JOB_QUEUED, JOB_RUNNING,
+    UPLOAD_CHUNK_BYTES
+)
+
+
+class TestJobStore:
+
+    def test_create_and_claim(self, tmp_path):
+        store = JobStore(tmp_path)
+        job = store.create_job("libro.pdf", b"%PDF-1.4", session_id="s1", user_id="u1")
+
+        assert job['status'] == JOB_QUEUED
+        assert Path(job['file_path']).read_bytes() == b"%PDF-1.4"
+        assert store.get_job_by_session("s1")['id'] == job['id']
+
+        claimed = store.claim_next("worker-1")
+        assert claimed['id'] == job['id']
+        assert claimed['status'] == JOB_RUNNING
+        assert claimed['attempts'] == 1
+        assert store.claim_next("worker-2") is None
+
+    def test_checkpoints(self, tmp_path):
+        store = JobStore(tmp_path)
+        job = store.create_job("apuntes.txt", b"texto")
+        matrix = np.arange(6, dtype=np.float32).reshape(2, 3)
+
+        store.save_checkpoint(job['id'], 'chunking', {'chunks': ['a', 'b']})
+        store.save_checkpoint(job['id'], 'embedding', matrix)
+
+        assert store.load_checkpoint(job['id'], 'chunking') == {'chunks': ['a', 'b']}
+        assert np.array_equal(store.load_checkpoint(job['id'], 'embedding'), matrix)
+        assert store.load_checkpoint(job['id'], 'storage') is None
+
+    def test_events_in_order(self, tmp_path):
+        store = JobStore(tmp_path)
+        job = store.create_job("apuntes.txt", b"texto")
+        for progress in (10, 20, 30):
+            store.add_event(job['id'], {'type': 'progress', 'message': f'{progress}%', 'progress': progress})
+
+        events = store.events_since(job['id'])
+        assert [event['progress'] for _, event in events] == [10, 20, 30]
+        assert [event['progress'] for _, event in store.events_since(job['id'], events[0][0])] == [20, 30]
+        assert store.get_job(job['id'])['progress'] == 30
+
+    def test_requeue_dead_workers(self, tmp_path):
+        store = JobStore(tmp_path)
+        hostname = socket.gethostname()
+        job = store.create_job("libro.pdf", b"%PDF")
+        store.claim_next(f"{hostname}:999999999#0")  # PID inexistente
+
+        assert store.requeue_dead_workers(hostname) == 1
+        assert store.get_job(job['id'])['status'] == JOB_QUEUED
+
+    def test_requeue_fails_job_at_max_attempts(self, tmp_path):
+        store = JobStore(tmp_path, max_attempts=2)
+        hostname = socket.gethostname()
+        job = store.create_job("libro.pdf", b"%PDF")
+        store.update_job(job['id'], material_id='mat-1')
+        events = []
+        store.add_listener(lambda job_id, seq, event: events.append(event))
+
+        # Primer intento: el worker muere y el trabajo se reencola
+        store.claim_next(f"{hostname}:999999999#0")
+        assert store.requeue_dead_workers(hostname) == 1
+
+        # Segundo intento (el último): ya no se reencola
+        assert store.claim_next(f"{hostname}:999999999#0")['attempts'] == 2
+        assert store.requeue_stale(stale_seconds=-1) == 0
+
+        failed = store.get_job(job['id'])
+        assert failed['status'] == JOB_FAILED
+        assert 'INGESTION_JOB_MAX_ATTEMPTS=2' in failed['error']
+        assert store.claim_next("otro:1#0") is None
+        error = events[-1]
+        assert error['type'] == 'error'
+        assert error['data']['reason'] == 'max_attempts'
+        assert error['data']['material_id'] == 'mat-1'
+
+        # Un reintento manual empieza con intentos nuevos
+        assert store.requeue(job['id'])
+        assert store.claim_next("otro:1#0")['attempts'] == 1
+
+    def test_claim_fails_queued_job_at_max_attempts(self, tmp_path):
+        store = JobStore(tmp_path, max_attempts=1)
+        exhausted = store.create_job("libro.pdf", b"%PDF")
+        store.update_job(exhausted['id'], attempts=1)  # reencolado por otro proceso
+        pending = store.create_job("apuntes.txt", b"hola")
+
+        assert store.claim_next("w:1#0")['id'] == pending['id']
+        assert store.get_job(exhausted['id'])['status'] == JOB_FAILED
+        assert store.events_since(exhausted['id'])[-1][1]['type'] == 'error'
+
+
+class TestIngestionQueue:
+
+    def test_enqueue_stream_spools_in_blocks(self, tmp_path):
+        store = JobStore(tmp_path)
+        content = b"%PDF-1.4 " + bytes(range(256)) * (UPLOAD_CHUNK_BYTES // 100)
+        upload = io.BytesIO(content)
+        reads = []
+
+        async def read(size):
+            reads.append(size)
+            return upload.read(size)
+
+        async def main():
+            queue = IngestionQueue(store)
+            return await queue.enqueue_stream("libro.pdf", read, session_id="s1")
+
+        job = asyncio.run(main())
+
+        assert Path(job['file_path']).read_bytes() == content
+        assert job['content_sha256'] == hashlib.sha256(content).hexdigest()
+        assert set(reads) == {UPLOAD_CHUNK_BYTES} and len(reads) > 2
+        assert list((tmp_path / "incoming").iterdir()) == []
+
+    def test_failed_job_resumes_from_checkpoint(self, tmp_path):
+        store = JobStore(tmp_path)
+        calls = []
+
+        async def handler(ctx):
+            if not ctx.is_done('extraction'):
+                calls.append('extraction')
+                await ctx.complete_stage('extraction', {'text': 'hola'})
+            extraction = await ctx.load('extraction')
+
+            calls.append('chunking')
+            if len(calls) == 2:
+                raise RuntimeError("caída simulada")
+            await ctx.progress('chunked', 'listo', 40)
+            return {'material_id': 7, 'text': extraction['text']}
+
+        async def main():
+            queue = IngestionQueue(store, workers=1, poll_interval=0.05)
+            queue.start(handler)
+            job = await queue.enqueue("apuntes.txt", b"hola", session_id="s1")
+            failed = await queue.wait_for(job['id'], timeout=5)
+
+            store.requeue(job['id'])
+            queue.notify()
+            completed = await queue.wait_for(job['id'], timeout=5)
+            await queue.stop()
+            return failed, completed
+
+        failed, completed = asyncio.run(main())
+
+        assert failed['status'] == JOB_FAILED
+        assert completed['status'] == JOB_COMPLETED
+        assert completed['result'] == {'material_id': 7, 'text': 'hola'}
+        # La extracción NO se repitió en el reintento
+        assert calls == ['extraction', 'chunking', 'chunking']
+
+        events = [event for _, event in store.events_since(completed['id'])]
+        assert [event['type'] for event in events] == ['error', 'progress', 'complete']
+        assert events[-1]['data']['material_id'] == 7
+        # Al completar se eliminan el archivo subido y los checkpoints
+        assert not store.job_dir(completed['id']).exists()
+
+    def test_exhausted_job_notifies_queue(self, tmp_path):
+        store = JobStore(tmp_path, max_attempts=1)
+        hostname = socket.gethostname()
+        job = store.create_job("libro.pdf", b"%PDF")
+        store.update_job(job['id'], material_id='mat-1')
+        store.claim_next(f"{hostname}:999999999#0")  # intento que murió con el proceso
+        notified = []
+
+        async def handler(ctx):
+            raise AssertionError("un trabajo sin intentos no se ejecuta")
+
+        async def on_exhausted(failed_job):
+            notified.append(failed_job['material_id'])
+
+        async def main():
+            queue = IngestionQueue(store, workers=1, poll_interval=0.05)
+            queue.start(handler, on_exhausted=on_exhausted)
+            finished = await queue.wait_for(job['id'], timeout=5)
+            for _ in range(50):
+                if notified:
+                    break
+                await asyncio.sleep(0.01)
+            await queue.stop()
+            return finished
+
+        finished = asyncio.run(main())
+
+        assert finished['status'] == JOB_FAILED
+        assert notified == ['mat-1']
@@ -0,0 +1,287 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+TEST_INGESTION_PIPELINE.PY - Pruebas del Pipeline de Ingesta en Streaming
+═══════════════════════════════════════════════════════════════════════════════
+
+Verifica:
+1. SemanticChunker por páginas == semantic_chunking sobre el texto unido
+2. TextStats por páginas == get_text_stats sobre el texto unido
+3. run_pipeline conserva el orden, acota la memoria en vuelo y solapa etapas
+4. Un error en una etapa cancela el resto y cierra el generador
+5. La capa de texto y el OCR selectivo en streaming siguen el mismo criterio
+6. iter_pdf_pages entrega las páginas de un PDF ya extraído desde la caché
+   (y no retiene las páginas de un documento demasiado grande para ella)
+7. Checkpoint por batch: un streaming interrumpido se retoma desde el
+   primer batch sin guardar (sin volver a vectorizar los anteriores)
+═══════════════════════════════════════════════════════════════════════════════
+"""
+
+import asyncio
+import random
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+# Agregar backend al path
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+import chunking
+from chunking import TextStats, get_text_stats, iter_semantic_chunks, semantic_chunking
+from extraction_cache import ExtractionCache, content_digest
+from ingestion_jobs import JobContext, JobStore
+from ingestion_pipeline import CheckpointedEmbedder, iter_chunk_batches, run_pipeline
+from pdf_extraction import join_pages
+
+PALABRAS = ("puntero memoria variable dirección función malloc free arreglo "
+            "índice valor estructura nodo lista pila cola").split()
+
+
+def _paginas(cantidad: int = 30, semilla: int = 7):
+    """Páginas sintéticas: oraciones que cruzan páginas, páginas vacías, párrafos"""
+    rng = random.Random(semilla)
+    paginas = []
+    for _ in range(cantidad):
+        palabras = []
+        for _ in range(rng.randint(0, 150)):
+            palabra = rng.choice(PALABRAS)
+            if rng.random() < 0.1:
+                palabra += rng.choice(['.', '!', '?', '...'])
+            if rng.random() < 0.03:
+                palabra += "\n\n"
+            palabras.append(palabra)
+        paginas.append(" ".join(palabras))
+    return paginas
+
+
+class TestIncrementalChunking:
+
+    @pytest.mark.parametrize("config", [(20, 60, 5), (80, 180, 20), (5, 20, 0), (10, 30, 15)])
+    def test_pages_match_full_text(self, config):
+        paginas = _paginas()
+        texto, _ = join_pages(paginas)
+
+        assert list(iter_semantic_chunks(paginas, *config)) == semantic_chunking(texto, *config)
+
+    def test_short_text_is_one_chunk(self):
+        assert list(iter_semantic_chunks(["Un puntero", "almacena una dirección."], 5, 50, 2)) == \
+            semantic_chunking("Un puntero\n\nalmacena una dirección.", 5, 50, 2)
+
+    def test_text_stats_match_full_text(self):
+        paginas = _paginas(semilla=3)
+        stats = TextStats()
+        for pagina in paginas:
+            stats.add(pagina)
+
+        assert stats.result(real_pages=30) == get_text_stats(join_pages(paginas)[0], real_pages=30)
+        assert stats.parts == 30
+
+    def test_chunk_batches(self):
+        paginas = _paginas()
+        stats = TextStats()
+
+        batches = list(iter_chunk_batches(paginas, total_pages=30, batch_size=4, stats=stats))
+
+        # ≤ 50 páginas: estrategia DETALLADA de adaptive_chunking
+        esperado = chunking.adaptive_chunking(join_pages(paginas)[0], 30)
+        assert [chunk for batch in batches for chunk in batch] == esperado
+        assert all(len(batch) == 4 for batch in batches[:-1])
+
+
+class TestRunPipeline:
+
+    def test_order_bounded_queues_and_overlap(self):
+        events = []
+        in_flight = {'max': 0, 'now': 0}
+
+        def source():
+            for number in range(20):
+                events.append(('produce', number))
+                in_flight['now'] += 1
+                in_flight['max'] = max(in_flight['max'], in_flight['now'])
+                yield number
+
+        async def double(item):
+            await asyncio.sleep(0.001)
+            return item * 2
+
+        stored = []
+
+        async def store(item):
+            await asyncio.sleep(0.002)
+            in_flight['now'] -= 1
+            events.append(('store', item))
+            stored.append(item)
+
+        asyncio.run(run_pipeline(source(), double, store, queue_size=2))
+
+        assert stored == [number * 2 for number in range(20)]
+        # Se guarda antes de que la fuente termine
+        assert events.index(('store', 0)) < events.index(('produce', 19))
+        # Colas de 2 + un elemento en cada etapa: nunca toda la fuente en memoria
+        assert in_flight['max'] <= 2 * 2 + 3
+
+    def test_failure_cancels_and_closes_source(self):
+        closed = []
+
+        def source():
+            try:
+                for number in range(1000):
+                    yield number
+            finally:
+                closed.append(True)
+
+        async def store(item):
+            if item == 3:
+                raise RuntimeError("Supabase caído")
+
+        with pytest.raises(RuntimeError):
+            asyncio.run(run_pipeline(source(), store, queue_size=1))
+
+        assert closed == [True]
+
+    def test_source_error_propagates(self):
+        def source():
+            yield 1
+            raise ValueError("PDF ilegible")
+
+        async def store(item):
+            return item
+
+        with pytest.raises(ValueError):
+            asyncio.run(run_pipeline(source(), store))
+
+
+class TestBatchCheckpoints:
+
+    @staticmethod
+    def _run(ctx, batches, embedded, fail_at=None):
+        """Streaming de batches con un embedder de prueba; fail_at simula una caída"""
+        async def embed_batch(batch):
+            if len(embedded) == fail_at:
+                raise RuntimeError("caída simulada")
+            embedded.append(batch)
+            matrix = np.asarray([[float(len(chunk)), float(i)] for i, chunk in enumerate(batch)], dtype=np.float32)
+            return matrix, [chunk.split() for chunk in batch]
+
+        stored = []
+
+        async def store(item):
+            stored.append(item)
+
+        embedder = CheckpointedEmbedder(ctx, embed_batch)
+        asyncio.run(run_pipeline(iter(batches), embedder, store))
+        return embedder, stored
+
+    def test_resume_from_first_unsaved_batch(self, tmp_path):
+        store = JobStore(tmp_path)
+        ctx = JobContext(store, store.create_job("libro.pdf", b"%PDF"))
+        batches = [[f"chunk {n} del batch {b}" for n in range(3)] for b in range(5)]
+
+        first_calls = []
+        with pytest.raises(RuntimeError):
+            self._run(ctx, batches, first_calls, fail_at=2)
+        assert len(first_calls) == 2
+
+        calls = []
+        embedder, stored = self._run(ctx, batches, calls)
+        _, reference = self._run(JobContext(store, store.create_job("otro.pdf", b"%PDF")), batches, [])
+
+        assert calls == batches[2:]  # los dos primeros salen del checkpoint
+        assert embedder.reused == 2
+        assert [item[0] for item in stored] == batches
+        for (_, matrix, keywords), (_, expected_matrix, expected_keywords) in zip(stored, reference):
+            assert np.array_equal(matrix, expected_matrix)
+            assert keywords == expected_keywords
+
+    def test_changed_batch_is_recomputed(self, tmp_path):
+        store = JobStore(tmp_path)
+        ctx = JobContext(store, store.create_job("libro.pdf", b"%PDF"))
+        batches = [["uno", "dos"], ["tres", "cuatro"], ["cinco"]]
+        self._run(ctx, batches, [])
+
+        changed = [batches[0], ["tres", "otro"], batches[2]]
+        calls = []
+        embedder, _ = self._run(ctx, changed, calls)
+
+        assert embedder.reused == 1
+        assert calls == changed[1:]
+
+
+class TestStreamingExtraction:
+
+    def test_text_layer_fallback_before_streaming(self):
+        paginas = ["", "Un puntero almacena la dirección de memoria de otra variable del programa."]
+        methods = [('pdftotext', lambda: iter(["", " "])), ('PyMuPDF', lambda: iter(paginas))]
+
+        with patch.object(chunking, '_text_layer_methods', return_value=methods):
+            assert list(chunking.iter_text_layer_pages("libro.pdf")) == paginas
+
+    def test_scanned_pdf_returns_empty_pages_of_first_method(self):
+        def falla():
+            raise RuntimeError("PDF dañado")
+
+        methods = [('pdftotext', falla), ('PyMuPDF', lambda: iter(["", ""])), ('PyPDF2', lambda: iter([""]))]
+
+        with patch.object(chunking, '_text_layer_methods', return_value=methods):
+            assert list(chunking.iter_text_layer_pages("escaneado.pdf")) == ["", ""]
+
+    def test_ocr_windows_keep_page_numbers(self):
+        legible = "Texto reconocido por OCR con una frase legible sobre punteros y memoria."
+        paginas = ["Un puntero almacena la dirección de memoria de otra variable."] * 5
+        paginas[1] = paginas[3] = ""
+        calls = []
+
+        def fake_ocr(pdf, numbers, **options):
+            calls.append(list(numbers))
+            return {number: f"{legible} ({number})" for number in numbers}
+
+        with patch.object(chunking, 'TESSERACT_AVAILABLE', True), \
+                patch.object(chunking, 'PDF_SELECTIVE_OCR', True), \
+                patch.object(chunking, 'ocr_pages', fake_ocr):
+            merged = list(chunking.iter_ocr_corrupt_pages("libro.pdf", iter(paginas), total_pages=5, window=2))
+
+        assert calls == [[2], [4]]
+        assert merged[1] == f"{legible} (2)" and merged[3] == f"{legible} (4)"
+        assert merged[0] == paginas[0]
+
+    def test_cached_document_streams_pages(self, tmp_path):
+        pdf_path = tmp_path / "apuntes.pdf"
+        pdf_path.write_bytes(b"%PDF-1.4 apuntes")
+        paginas = ["Un puntero almacena la dirección de memoria de otra variable.",
+                   "",
+                   "La memoria dinámica se reserva con malloc y se libera con free."]
+        cache = ExtractionCache(str(tmp_path / "cache.sqlite3"), max_bytes=1024 * 1024)
+
+        with patch.object(chunking, 'extraction_cache', cache), \
+                patch.object(chunking, 'extract_text_layer_pages', return_value=(paginas, "PyMuPDF")):
+            documento = chunking.extract_pdf_document(str(pdf_path), "apuntes.pdf")
+            streamed = list(chunking.iter_pdf_pages(str(pdf_path), "apuntes.pdf",
+                                                    content_digest(b"%PDF-1.4 apuntes")))
+
+        assert join_pages(streamed)[0] == documento["text"]
+        assert len(streamed) == documento["pages"]
+        assert cache.stats()["document_hits"] == 1
+
+    def test_large_document_is_not_cached(self, tmp_path):
+        pdf_path = tmp_path / "libro.pdf"
+        pdf_path.write_bytes(b"%PDF-1.4 libro")
+        paginas = [f"Página {n}: un puntero almacena la dirección de memoria de otra variable."
+                   for n in range(40)]
+        cache = ExtractionCache(str(tmp_path / "cache.sqlite3"), max_bytes=1024 * 1024,
+                                max_document_bytes=1000)
+
+        with patch.object(chunking, 'extraction_cache', cache), \
+                patch.object(chunking, 'PDF_SELECTIVE_OCR', False), \
+                patch.object(chunking, '_text_layer_methods', return_value=[('PyMuPDF', lambda: iter(paginas))]):
+            streamed = list(chunking.iter_pdf_pages(str(pdf_path), "libro.pdf",
+                                                    content_digest(b"%PDF-1.4 libro")))
+            again = list(chunking.iter_pdf_pages(str(pdf_path), "libro.pdf",
+                                                 content_digest(b"%PDF-1.4 libro")))
+
+        assert len(streamed) == len(paginas) and again == streamed
+        assert cache.stats()["document_hits"] == 0
+        assert cache.stats()["size_mb"] == 0
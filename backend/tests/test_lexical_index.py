@@ -0,0 +1,57 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+TEST_LEXICAL_INDEX.PY - Pruebas del Índice Léxico por Material
+═══════════════════════════════════════════════════════════════════════════════
+
+Verifica:
+1. Tokenización idéntica a la del HybridValidator
+2. Keywords y expansión por prefijos de cada chunk
+3. Validación con keywords precalculadas = validación re-tokenizando
+═══════════════════════════════════════════════════════════════════════════════
+"""
+
+import sys
+from pathlib import Path
+
+# Agregar backend al path
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from lexical_index import LexicalIndex, extract_keywords
+
+
+class TestLexicalIndex:
+
+    def test_extract_keywords_matches_validator(self, offline_validator):
+        """TEST: Misma tokenización que HybridValidator (stopwords, fragmentos OCR)"""
+        text = "Los punteros almacenan direcciones. H enriet te recibía dinero y el valor"
+
+        assert extract_keywords("Los punteros almacenan direcciones") == \
+            ['punteros', 'almacenan', 'direcciones']
+        assert extract_keywords(text) == offline_validator.extract_keywords(text)
+
+    def test_chunk_expansions(self):
+        """TEST: Keywords por chunk y su expansión por prefijos"""
+        index = LexicalIndex([['puntero', 'memoria', 'puntero'], ['memoria'], []])
+
+        assert index.chunk_keywords[0] == ['puntero', 'memoria', 'puntero']
+        assert 'punter' in index.chunk_expanded[0]  # Prefijo de 6 letras
+        assert index.chunk_expanded[1] == {'memoria', 'memori'}
+        assert index.chunk_expanded[2] == set()
+
+    def test_precomputed_keywords_give_same_result(self, offline_validator, offline_chunks_punteros):
+        """TEST: validate_answer con keywords del índice = re-tokenizando el texto"""
+        index = LexicalIndex.from_texts([c['text_full'] for c in offline_chunks_punteros])
+        indexed_chunks = [
+            dict(chunk, keywords=keywords, keywords_expanded=expanded)
+            for chunk, keywords, expanded in zip(offline_chunks_punteros, index.chunk_keywords,
+                                                 index.chunk_expanded)
+        ]
+        question = "¿Qué es un puntero?"
+        answer = "Una variable que almacena la dirección de memoria de otra variable"
+
+        plain = offline_validator.validate_answer(question, answer, offline_chunks_punteros)
+        indexed = offline_validator.validate_answer(question, answer, indexed_chunks)
+
+        assert [s['score_raw'] for s in indexed['top_3_scores']] == \
+            [s['score_raw'] for s in plain['top_3_scores']]
@@ -0,0 +1,149 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+TEST_MATERIAL_CACHE.PY - Pruebas de la Caché de Embeddings por Material
+═══════════════════════════════════════════════════════════════════════════════
+
+Verifica:
+1. Conversión de filas de Supabase a matriz float32 contigua (N x 384)
+2. Expulsión LRU acotada por bytes
+3. Expiración por TTL y por cambio de versión (materials.updated_at)
+4. Invalidación explícita
+═══════════════════════════════════════════════════════════════════════════════
+"""
+
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Agregar backend al path
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from material_cache import MaterialCache, build_cached_material, find_chunk
+
+
+def _rows(n, dim=384, as_json=True):
+    rng = np.random.default_rng(0)
+    rows = []
+    for i in range(n):
+        vector = rng.random(dim).tolist()
+        rows.append({
+            'chunk_index': i,
+            'chunk_text': f"  Chunk   {i} del material  ",
+            'embedding': json.dumps(vector) if as_json else vector
+        })
+    return rows
+
+
+class TestBuildCachedMaterial:
+
+    def test_matrix_is_contiguous_float32(self):
+        entry = build_cached_material("mat-1", _rows(4), str.strip)
+
+        assert entry.matrix.shape == (4, 384)
+        assert entry.matrix.dtype == np.float32
+        assert entry.matrix.flags['C_CONTIGUOUS']
+        assert entry.texts[0] == "Chunk   0 del material"
+        assert entry.chunk_ids == [0, 1, 2, 3]
+
+    def test_chunks_share_matrix_rows(self):
+        entry = build_cached_material("mat-1", _rows(3, as_json=False), str.strip)
+
+        chunk = entry.chunks[1]
+        assert chunk['chunk_id'] == 1
+        assert chunk['text_full'] == entry.texts[1]
+        assert np.shares_memory(chunk['embedding'], entry.matrix)
+
+    def test_find_chunk_by_id(self):
+        entry = build_cached_material("mat-1", _rows(5), str.strip)
+        # Top-K de la RPC: ordenado por similitud, no por chunk_index
+        top_k = [entry.chunks[3], entry.chunks[0], entry.chunks[4]]
+
+        assert find_chunk(entry.chunks, 2) is entry.chunks[2]
+        assert find_chunk(top_k, 0) is entry.chunks[0]
+        assert find_chunk(top_k, 4) is entry.chunks[4]
+        assert find_chunk(top_k, 2) is None
+        assert find_chunk(entry.chunks, 99) is None
+
+
+class TestMaterialCache:
+
+    def test_hit_and_miss(self):
+        cache = MaterialCache(max_bytes=10 * 1024 * 1024, ttl_seconds=60)
+        assert cache.get("mat-1") is None
+
+        cache.put(build_cached_material("mat-1", _rows(2), str.strip))
+        assert cache.get("mat-1") is not None
+        assert cache.stats()['hits'] == 1
+        assert cache.stats()['misses'] == 1
+
+    def test_lru_eviction_by_bytes(self):
+        entry_size = build_cached_material("x", _rows(10), str.strip).nbytes
+        cache = MaterialCache(max_bytes=int(entry_size * 2.5), ttl_seconds=60)
+
+        cache.put(build_cached_material("a", _rows(10), str.strip))
+        cache.put(build_cached_material("b", _rows(10), str.strip))
+        cache.get("a")  # "a" pasa a ser el más reciente
+        cache.put(build_cached_material("c", _rows(10), str.strip))
+
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.get("c") is not None
+        assert cache.total_bytes <= cache.max_bytes
+
+    def test_ttl_expiration(self):
+        cache = MaterialCache(max_bytes=10 * 1024 * 1024, ttl_seconds=0.01)
+        cache.put(build_cached_material("mat-1", _rows(2), str.strip))
+        time.sleep(0.02)
+
+        assert cache.get("mat-1") is None
+        assert cache.total_bytes == 0
+
+    def test_version_change_discards_entry(self):
+        cache = MaterialCache(max_bytes=10 * 1024 * 1024, ttl_seconds=60)
+        cache.put(build_cached_material("mat-1", _rows(2), str.strip, version="v1"))
+
+        assert cache.get("mat-1", version="v1") is not None
+        assert cache.get("mat-1", version="v2") is None
+
+    def test_invalidate(self):
+        cache = MaterialCache(max_bytes=10 * 1024 * 1024, ttl_seconds=60)
+        cache.put(build_cached_material("mat-1", _rows(2), str.strip))
+
+        assert cache.invalidate("mat-1") is True
+        assert cache.invalidate("mat-1") is False
+        assert cache.get("mat-1") is None
+
+    def test_chunks_carry_precomputed_keywords(self):
+        rows = _rows(2)
+        rows[0]['keywords'] = ['persistida']  # Fila con índice léxico persistido
+        entry = build_cached_material("mat-1", rows, str.strip)
+
+        assert entry.chunks[0]['keywords'] == ['persistida']
+        assert entry.chunks[1]['keywords'] == ['chunk', 'material']  # Tokenizada al cargar
+        assert 'persis' in entry.chunks[0]['keywords_expanded']
+
+    def test_chunks_carry_precomputed_features(self):
+        from chunk_features import CHUNK_FEATURES_VERSION
+
+        rows = _rows(3)
+        rows[0]['features'] = json.dumps({'version': CHUNK_FEATURES_VERSION, 'reasoning_score': 0.5,
+                                          'word_count': 4, 'numbers': ['0']})
+        rows[1]['features'] = {'version': -1, 'reasoning_score': 0.9}  # Otra versión
+        entry = build_cached_material("mat-1", rows, str.strip)
+
+        assert entry.chunks[0]['features']['reasoning_score'] == 0.5
+        # Sin features persistidas (o de otra versión): se calculan al cargar
+        assert entry.chunks[1]['features']['version'] == CHUNK_FEATURES_VERSION
+        assert entry.chunks[2]['features']['numbers'] == ['2']
+
+    def test_normalized_rows_are_not_renormalized(self):
+        rows = _rows(2)
+        rows[0]['normalizer_version'] = "2"  # Guardada ya normalizada
+        entry = build_cached_material("mat-1", rows, str.strip)
+
+        assert entry.texts[0] == rows[0]['chunk_text']
+        assert entry.texts[1] == "Chunk   1 del material"
@@ -0,0 +1,172 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+TEST_MODEL_MANAGER.PY - Pruebas del Ciclo de Vida del Modelo de Embeddings
+═══════════════════════════════════════════════════════════════════════════════
+
+Verifica:
+1. Carga en segundo plano: start_loading no bloquea y el estado pasa por
+   loading → ready (con tiempo de carga)
+2. get() espera la carga en curso y la inicia si hace falta
+3. Fallo de carga: estado failed, error reportado y reintento en get()
+4. Descarga por inactividad (idle) y recarga bajo demanda
+5. handle(): los validadores compartidos no retienen el modelo
+═══════════════════════════════════════════════════════════════════════════════
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+# Agregar backend al path
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from model_manager import (STATE_FAILED, STATE_IDLE, STATE_LOADING, STATE_READY, STATE_UNLOADED,
+                           ModelManager, ModelUnavailableError)
+
+
+class GatedLoader:
+    """Loader que espera una señal antes de devolver el modelo (simula la carga lenta)"""
+
+    def __init__(self, model, fail_times: int = 0):
+        self.model = model
+        self.fail_times = fail_times
+        self.calls = 0
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self):
+        self.calls += 1
+        self.release.wait(5)
+        if self.calls <= self.fail_times:
+            raise OSError("sin conexión a huggingface.co")
+        return self.model
+
+
+class TestBackgroundLoading:
+
+    def test_start_loading_does_not_block(self, hashing_encoder):
+        loader = GatedLoader(hashing_encoder)
+        loader.release.clear()
+        manager = ModelManager("fake-model", loader)
+
+        assert manager.start_loading() is True
+        assert manager.state == STATE_LOADING
+        assert manager.status()['loaded'] is False
+        assert manager.status()['ready'] is False
+        assert manager.start_loading() is False  # ya cargando
+
+        loader.release.set()
+        assert manager.get() is hashing_encoder
+        status = manager.status()
+        assert status['state'] == STATE_READY
+        assert status['loaded'] and status['ready']
+        assert status['load_time_seconds'] is not None
+        assert loader.calls == 1
+
+    def test_get_starts_loading_and_waits(self, hashing_encoder):
+        loader = GatedLoader(hashing_encoder)
+        manager = ModelManager("fake-model", loader)
+
+        assert manager.state == STATE_UNLOADED
+        assert manager.get() is hashing_encoder
+        assert manager.get() is hashing_encoder
+        assert loader.calls == 1
+
+    def test_concurrent_get_loads_once(self, hashing_encoder):
+        loader = GatedLoader(hashing_encoder)
+        loader.release.clear()
+        manager = ModelManager("fake-model", loader)
+        results = []
+
+        threads = [threading.Thread(target=lambda: results.append(manager.get())) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        loader.release.set()
+        for thread in threads:
+            thread.join(5)
+
+        assert results == [hashing_encoder] * 8
+        assert loader.calls == 1
+
+    def test_get_timeout_while_loading(self, hashing_encoder):
+        loader = GatedLoader(hashing_encoder)
+        loader.release.clear()
+        manager = ModelManager("fake-model", loader)
+
+        with pytest.raises(ModelUnavailableError):
+            manager.get(timeout=0.05)
+        assert manager.state == STATE_LOADING
+
+        loader.release.set()
+        assert manager.get() is hashing_encoder
+
+
+class TestLoadFailure:
+
+    def test_failed_state_reports_error_and_retries(self, hashing_encoder):
+        manager = ModelManager("fake-model", GatedLoader(hashing_encoder, fail_times=1))
+
+        with pytest.raises(ModelUnavailableError) as excinfo:
+            manager.get()
+        assert isinstance(excinfo.value.__cause__, OSError)
+        status = manager.status()
+        assert status['state'] == STATE_FAILED
+        assert status['ready'] is False
+        assert 'huggingface' in status['error']
+
+        # El siguiente uso reintenta la carga
+        assert manager.get() is hashing_encoder
+        assert manager.status()['error'] is None
+        assert manager.failures == 1 and manager.loads == 1
+
+
+class TestIdleUnload:
+
+    def test_unload_after_idle_period_and_reload_on_demand(self, hashing_encoder):
+        loader = GatedLoader(hashing_encoder)
+        manager = ModelManager("fake-model", loader, idle_unload_seconds=60)
+        manager.get()
+
+        assert manager.unload_if_idle(now=time.monotonic() + 30) is False
+        assert manager.unload_if_idle(now=time.monotonic() + 61) is True
+        status = manager.status()
+        assert status['state'] == STATE_IDLE
+        assert status['loaded'] is False
+        assert status['ready'] is True  # se recarga bajo demanda
+
+        assert manager.get() is hashing_encoder
+        assert manager.state == STATE_READY
+        assert loader.calls == 2
+        assert manager.unloads == 1
+
+    def test_idle_unload_disabled_by_default(self, hashing_encoder):
+        manager = ModelManager("fake-model", GatedLoader(hashing_encoder), idle_unload_seconds=0)
+        manager.get()
+
+        assert manager.unload_if_idle(now=time.monotonic() + 10 ** 6) is False
+        assert manager.state == STATE_READY
+
+
+class TestModelHandle:
+
+    def test_handle_encodes_without_holding_model(self, hashing_encoder, offline_chunks_punteros):
+        from hybrid_validator import HybridValidator
+
+        loader = GatedLoader(hashing_encoder)
+        manager = ModelManager("fake-model", loader, idle_unload_seconds=60)
+        validator = HybridValidator(manager.handle())
+
+        # El validador se construye sin cargar el modelo
+        assert loader.calls == 0
+
+        question, answer = "¿Qué es un puntero?", "Un puntero almacena la dirección de memoria de otra variable"
+        first = validator.validate_answer(question, answer, offline_chunks_punteros)
+        manager.unload()
+        second = validator.validate_answer(question, answer, offline_chunks_punteros)
+
+        assert first['top_3_scores'] == second['top_3_scores']
+        assert loader.calls == 2
@@ -0,0 +1,132 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+TEST_NORMALIZATION_CACHE.PY - Pruebas de la Caché de Normalización
+═══════════════════════════════════════════════════════════════════════════════
+
+Verifica:
+1. El resultado es idéntico a normalize_text (memoización pura)
+2. La clave depende del texto crudo y de la versión del normalizador
+3. LRU acotado por bytes con volcado a SQLite y recuperación desde disco
+4. Poda del archivo de volcado (conteo exacto de filas)
+5. Los aciertos en memoria no esperan al disco
+═══════════════════════════════════════════════════════════════════════════════
+"""
+
+import sys
+import threading
+from pathlib import Path
+
+# Agregar backend al path
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from normalization_cache import NormalizationCache, content_key
+from text_normalizer import normalize_text
+
+
+class CountingNormalizer:
+    """normalize_text que cuenta cuántas veces se ejecutó realmente"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, text):
+        self.calls += 1
+        return normalize_text(text)
+
+
+def _texts(n):
+    return [f"El pun tero número {i} al macena la dirección de memoria" for i in range(n)]
+
+
+class TestNormalizationCache:
+
+    def test_same_output_as_normalize_text(self):
+        cache = NormalizationCache(max_bytes=1024 * 1024)
+        for text in _texts(3) + ["Hola , ¿cómo estás ?", "", None]:
+            assert cache.normalize(text) == normalize_text(text)
+
+    def test_repeated_text_is_normalized_once(self):
+        normalizer = CountingNormalizer()
+        cache = NormalizationCache(max_bytes=1024 * 1024, normalize_fn=normalizer)
+
+        first = cache.normalize_batch(_texts(5))
+        second = cache.normalize_batch(_texts(5))
+
+        assert first == second
+        assert normalizer.calls == 5
+        assert cache.stats()['hits'] == 5
+        assert cache.stats()['misses'] == 5
+
+    def test_key_depends_on_version(self):
+        assert content_key("texto", "1") != content_key("texto", "2")
+        assert content_key("texto", "1") == content_key("texto", "1")
+
+    def test_memory_is_bounded(self):
+        cache = NormalizationCache(max_bytes=2048)
+        cache.normalize_batch(_texts(50))
+
+        assert cache.total_bytes <= cache.max_bytes
+        assert cache.stats()['entries'] < 50
+
+    def test_evicted_entries_spill_to_disk(self, tmp_path):
+        normalizer = CountingNormalizer()
+        spill_path = str(tmp_path / "normalization.sqlite3")
+        cache = NormalizationCache(max_bytes=2048, spill_path=spill_path, normalize_fn=normalizer)
+
+        texts = _texts(30)
+        expected = cache.normalize_batch(texts)
+        assert cache.stats()['spilled'] > 0
+
+        # Releer todo: lo expulsado de memoria se recupera de SQLite sin re-normalizar
+        assert cache.normalize_batch(texts) == expected
+        assert normalizer.calls == 30
+        assert cache.stats()['disk_hits'] > 0
+        cache.close()
+
+        # Otra instancia (p.ej. tras reiniciar el servidor) reutiliza el archivo
+        restarted = NormalizationCache(max_bytes=2048, spill_path=spill_path, normalize_fn=normalizer)
+        assert restarted.normalize(texts[0]) == expected[0]
+        assert normalizer.calls == 30
+        restarted.close()
+
+    def test_disk_is_pruned(self, tmp_path):
+        cache = NormalizationCache(max_bytes=1, spill_path=str(tmp_path / "n.sqlite3"),
+                                   max_disk_entries=10)
+        cache.normalize_batch(_texts(40))
+
+        assert cache.stats()['disk_entries'] <= 10
+        cache.close()
+
+    def test_disk_count_ignores_replaced_rows(self, tmp_path):
+        spill_path = str(tmp_path / "n.sqlite3")
+        cache = NormalizationCache(max_bytes=1, spill_path=spill_path)
+        texts = _texts(5)
+
+        # max_bytes=1: cada texto va directo a disco; la segunda pasada los
+        # recupera y los vuelve a volcar (INSERT OR REPLACE sobre la misma fila)
+        cache.normalize_batch(texts)
+        cache.normalize_batch(texts)
+
+        assert cache.stats()['disk_hits'] == 5
+        assert cache.stats()['disk_entries'] == 5
+        cache.close()
+
+        restarted = NormalizationCache(max_bytes=1, spill_path=spill_path)
+        restarted.normalize("texto nuevo")
+        assert restarted.stats()['disk_entries'] == 6
+        restarted.close()
+
+    def test_memory_hit_does_not_wait_for_disk(self, tmp_path):
+        cache = NormalizationCache(max_bytes=1024 * 1024, spill_path=str(tmp_path / "n.sqlite3"))
+        text = _texts(1)[0]
+        expected = cache.normalize(text)
+
+        # Otro hilo ocupa el disco (volcado o poda lentos)
+        with cache._disk_lock:
+            result = []
+            reader = threading.Thread(target=lambda: result.append(cache.normalize(text)))
+            reader.start()
+            reader.join(2)
+            assert result == [expected]
+        cache.close()
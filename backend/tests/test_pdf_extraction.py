@@ -0,0 +1,121 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+TEST_PDF_EXTRACTION.PY - Pruebas de la Extracción Paralela por Rangos
+═══════════════════════════════════════════════════════════════════════════════
+
+Verifica:
+1. Los rangos cubren todas las páginas sin huecos ni solapes
+2. Los rangos se unen en orden aunque terminen desordenados
+3. Los offsets apuntan al inicio de cada página en el texto unido
+4. La salida de pdftotext se separa por página (form feed)
+5. El DPI del OCR se ajusta al presupuesto de memoria por página
+6. Con pdftotext o PyMuPDF instalados: paralelo == serie
+═══════════════════════════════════════════════════════════════════════════════
+"""
+
+import shutil
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+# Agregar backend al path
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from pdf_extraction import (
+    OCR_MIN_DPI, PYMUPDF_AVAILABLE, _extract_ranges, extract_pages, join_pages,
+    page_dpi, plan_page_ranges, split_pages, split_pdftotext_output
+)
+
+SAMPLE_PDFS = sorted((BACKEND_DIR.parent / "data").glob("**/*.pdf")) if (BACKEND_DIR.parent / "data").exists() else []
+
+
+def _slow_first_range(pdf_path, first, last):
+    # El primer rango termina último: el orden no debe depender de quién acaba antes
+    if first == 1:
+        time.sleep(0.05)
+    return [f"página {number}" for number in range(first, last + 1)]
+
+
+class TestPageRanges:
+
+    @pytest.mark.parametrize("total_pages,workers", [(1, 4), (39, 4), (100, 1), (1000, 8), (1001, 3)])
+    def test_ranges_cover_all_pages(self, total_pages, workers):
+        ranges = plan_page_ranges(total_pages, workers, min_pages_per_range=20)
+
+        pages = [number for first, last in ranges for number in range(first, last + 1)]
+
+        assert pages == list(range(1, total_pages + 1))
+
+    def test_ranges_scale_with_workers(self):
+        assert len(plan_page_ranges(1000, 8, min_pages_per_range=20)) == 16
+        # Nunca rangos más chicos que el mínimo
+        assert len(plan_page_ranges(100, 32, min_pages_per_range=20)) == 5
+        assert plan_page_ranges(0, 4) == []
+
+
+class TestJoin:
+
+    def test_parallel_ranges_keep_order(self):
+        ranges = plan_page_ranges(100, 4, min_pages_per_range=10)
+
+        pages = _extract_ranges(_slow_first_range, "unused.pdf", ranges, workers=4, use_processes=False)
+
+        assert pages == [f"página {number}" for number in range(1, 101)]
+
+    def test_offsets_point_to_page_start(self):
+        pages = ["Capítulo 1", "", "Punteros y memoria", "Fin"]
+
+        text, offsets = join_pages(pages)
+
+        assert text == "\n\n".join(pages)
+        for offset, page in zip(offsets, pages):
+            assert text[offset:offset + len(page)] == page
+
+    def test_split_pages_inverts_join(self):
+        pages = ["Capítulo 1", "", "Punteros\n\ny memoria", "Fin"]
+
+        text, offsets = join_pages(pages)
+
+        assert split_pages(text, offsets) == pages
+
+    def test_split_pdftotext_output(self):
+        assert split_pdftotext_output("uno\fdos\f\f", 3) == ["uno", "dos", ""]
+        assert split_pdftotext_output("uno\f", 2) == ["uno", ""]
+
+
+class TestOCRDpi:
+
+    A4 = (595, 842)  # puntos
+
+    def test_target_dpi_when_budget_allows(self):
+        assert page_dpi(*self.A4, target_dpi=300, budget_bytes=64 * 1024 * 1024) == 300
+
+    def test_dpi_shrinks_to_fit_budget(self):
+        budget = 4 * 1024 * 1024
+        dpi = page_dpi(*self.A4, target_dpi=300, budget_bytes=budget)
+
+        # Imagen en grises = 1 byte por píxel
+        assert OCR_MIN_DPI <= dpi < 300
+        assert (self.A4[0] / 72 * dpi) * (self.A4[1] / 72 * dpi) <= budget
+
+    def test_dpi_never_below_minimum(self):
+        assert page_dpi(5000, 5000, target_dpi=300, budget_bytes=1024) == OCR_MIN_DPI
+
+
+@pytest.mark.skipif(not SAMPLE_PDFS, reason="No hay PDFs de ejemplo en data/")
+class TestEngines:
+
+    @pytest.mark.skipif(shutil.which('pdftotext') is None, reason="pdftotext no instalado")
+    def test_pdftotext_parallel_matches_serial(self):
+        content = SAMPLE_PDFS[0].read_bytes()
+
+        assert extract_pages(content, 'pdftotext', workers=4) == extract_pages(content, 'pdftotext', workers=1)
+
+    @pytest.mark.skipif(not PYMUPDF_AVAILABLE, reason="PyMuPDF no instalado")
+    def test_pymupdf_parallel_matches_serial(self):
+        content = SAMPLE_PDFS[0].read_bytes()
+
+        assert extract_pages(content, 'pymupdf', workers=4) == extract_pages(content, 'pymupdf', workers=1)
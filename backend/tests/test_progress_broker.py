@@ -0,0 +1,160 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+TEST_PROGRESS_BROKER.PY - Pruebas del Broker de Progreso (SSE)
+═══════════════════════════════════════════════════════════════════════════════
+
+Verifica:
+1. Los eventos se entregan al instante (sin intervalo de sondeo)
+2. Un cliente que se conecta tarde recibe lo ya emitido
+3. Eventos 'progress' consecutivos del mismo paso se fusionan
+4. Eventos escritos por otro proceso (otra conexión SQLite) llegan
+5. Sesiones sin upload expiran y los canales terminados se limpian
+═══════════════════════════════════════════════════════════════════════════════
+"""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# Agregar backend al path
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from ingestion_jobs import JobStore
+from progress_broker import ProgressBroker, coalesce_events
+
+
+def _progress(step, progress):
+    return {'type': 'progress', 'step': step, 'message': step, 'progress': progress, 'data': {}}
+
+
+def _complete():
+    return {'type': 'complete', 'step': 'complete', 'message': 'ok', 'progress': 100, 'data': {}}
+
+
+async def _collect(broker, session_id):
+    return [event for event in [e async for e in broker.stream(session_id)] if event is not None]
+
+
+class TestCoalesce:
+
+    def test_same_step_progress_is_merged(self):
+        events = [(1, _progress('a', 10)), (2, _progress('b', 20)), (3, _progress('b', 30)),
+                  (4, _progress('b', 40)), (5, _complete())]
+
+        merged = coalesce_events(events)
+
+        assert [seq for seq, _ in merged] == [1, 4, 5]
+        assert merged[1][1]['progress'] == 40
+
+
+class TestProgressBroker:
+
+    def test_events_are_pushed_immediately(self, tmp_path):
+        store = JobStore(tmp_path)
+
+        async def main():
+            # Intervalos enormes: si la entrega dependiera de sondeo, el test se colgaría
+            broker = ProgressBroker(store, watch_interval=60, keepalive_seconds=60)
+            broker.start()
+            job = store.create_job("a.txt", b"x", session_id="s1")
+            received = []
+
+            async def consume():
+                async for event in broker.stream("s1"):
+                    received.append((time.perf_counter(), event))
+
+            consumer = asyncio.create_task(consume())
+            await asyncio.sleep(0.05)
+
+            sent_at = time.perf_counter()
+            await asyncio.to_thread(store.add_event, job['id'], _progress('extract', 10))
+            await asyncio.sleep(0.02)
+            first_latency = received[0][0] - sent_at if received else None
+
+            await asyncio.to_thread(store.add_event, job['id'], _complete())
+            await asyncio.wait_for(consumer, timeout=2)
+            await broker.stop()
+            return first_latency, [event['type'] for _, event in received]
+
+        latency, types = asyncio.run(main())
+
+        assert latency is not None and latency < 0.05
+        assert types == ['progress', 'complete']
+
+    def test_late_subscriber_gets_replay(self, tmp_path):
+        store = JobStore(tmp_path)
+
+        async def main():
+            broker = ProgressBroker(store, watch_interval=60, replay_size=2)
+            broker.start()
+            job = store.create_job("a.txt", b"x", session_id="s1")
+            for step, progress in (('extract', 10), ('chunk', 40), ('embed', 70)):
+                await asyncio.to_thread(store.add_event, job['id'], _progress(step, progress))
+            await asyncio.to_thread(store.add_event, job['id'], _complete())
+            # replay_size=2 no alcanza: el resto sale del historial SQLite
+            events = await asyncio.wait_for(_collect(broker, "s1"), timeout=2)
+            await broker.stop()
+            return events
+
+        events = asyncio.run(main())
+
+        assert [event['step'] for event in events] == ['extract', 'chunk', 'embed', 'complete']
+
+    def test_events_from_other_process(self, tmp_path):
+        store = JobStore(tmp_path)
+        other_worker = JobStore(tmp_path)  # Otra conexión, como otro proceso uvicorn
+
+        async def main():
+            broker = ProgressBroker(store, watch_interval=0.02, keepalive_seconds=60)
+            broker.start()
+            consumer = asyncio.create_task(_collect(broker, "s2"))
+            await asyncio.sleep(0.05)
+
+            job = other_worker.create_job("a.txt", b"x", session_id="s2")
+            other_worker.add_event(job['id'], _progress('extract', 10))
+            other_worker.add_event(job['id'], _complete())
+            events = await asyncio.wait_for(consumer, timeout=2)
+            stats = broker.stats()
+            await broker.stop()
+            return events, stats
+
+        events, stats = asyncio.run(main())
+
+        assert [event['type'] for event in events] == ['progress', 'complete']
+        assert stats['external_wakeups'] >= 1
+        other_worker.close()
+
+    def test_session_without_upload_expires(self, tmp_path):
+        store = JobStore(tmp_path)
+
+        async def main():
+            broker = ProgressBroker(store, session_ttl=0.1, keepalive_seconds=0.05)
+            broker.start()
+            events = await asyncio.wait_for(_collect(broker, "nunca"), timeout=2)
+            await broker.stop()
+            return events, broker.stats()
+
+        events, stats = asyncio.run(main())
+
+        assert events[-1]['step'] == 'session_expired'
+        assert stats['expired_sessions'] == 1
+
+    def test_sweep_drops_finished_channels(self, tmp_path):
+        store = JobStore(tmp_path)
+
+        async def main():
+            broker = ProgressBroker(store)
+            broker.start()
+            job = store.create_job("a.txt", b"x")  # Nadie se conecta a esta sesión
+            await asyncio.to_thread(store.add_event, job['id'], _complete())
+            await asyncio.sleep(0.01)
+            before = broker.stats()['channels']
+            removed = broker.sweep()
+            await broker.stop()
+            return before, removed, broker.stats()['channels']
+
+        before, removed, after = asyncio.run(main())
+
+        assert (before, removed, after) == (1, 1, 0)
@@ -0,0 +1,179 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+TEST_RETRIEVAL.PY - Pruebas de la Recuperación top-K (pgvector)
+═══════════════════════════════════════════════════════════════════════════════
+
+Verifica:
+1. Las filas de match_material_chunks se convierten en chunks del validador
+   (vector como string, keywords persistidas, orden por similitud)
+2. validate_with_retriever da el mismo resultado que el pre-filtrado local
+   (y lo mismo por pasos: encode → RPC → score_retrieved, como en main.py)
+3. Solo se piden prefilter_top_k chunks al recuperador
+4. Modo híbrido: consulta léxica segura y pesos de HybridValidator
+═══════════════════════════════════════════════════════════════════════════════
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# Agregar backend al path
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from retrieval import (
+    HYBRID_MATCH_FUNCTION, RETRIEVAL_EXACT_SCAN_THRESHOLD, fetch_top_chunks, hybrid_match_params,
+    lexical_query, match_chunks_params, rows_to_chunks
+)
+from text_normalizer import normalize_text
+
+
+def _rpc_rows(chunks, query_embedding, k):
+    """Simula la RPC: top-K por coseno, vector serializado como en PostgREST"""
+    matrix = np.asarray([c['embedding'] for c in chunks], dtype=np.float32)
+    matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-10)
+    sims = matrix @ query_embedding
+    order = np.argsort(-sims)[:k]
+    return [
+        {
+            'chunk_index': chunks[i]['chunk_id'],
+            'chunk_text': chunks[i]['text_full'],
+            'embedding': json.dumps([float(x) for x in chunks[i]['embedding']]),
+            'keywords': None,
+            'normalizer_version': '2',
+            'similarity': float(sims[i])
+        }
+        for i in order
+    ]
+
+
+class FakeRpcClient:
+    """Cliente con la interfaz supabase.rpc(...).execute() sobre chunks en memoria"""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.calls = []
+
+    def rpc(self, name, params):
+        self.calls.append((name, params))
+        rows = _rpc_rows(self.chunks, np.asarray(params['query_embedding'], dtype=np.float32),
+                         params['match_count'])
+        result = type('Result', (), {'data': rows})()
+        return type('Query', (), {'execute': lambda _self: result})()
+
+
+class TestRowsToChunks:
+
+    def test_parses_rows_in_similarity_order(self):
+        rows = [
+            {'chunk_index': 7, 'chunk_text': 'El puntero almacena direcciones',
+             'embedding': '[0.0, 2.0]', 'keywords': ['puntero', 'almacena', 'direcciones'],
+             'normalizer_version': '2', 'similarity': 0.9},
+            {'chunk_index': 2, 'chunk_text': 'La me moria dinámica',
+             'embedding': [3.0, 4.0], 'keywords': None,
+             'normalizer_version': None, 'similarity': 0.5},
+        ]
+        chunks = rows_to_chunks("m1", rows, normalize_text)
+
+        assert [c['chunk_id'] for c in chunks] == [7, 2]
+        assert np.allclose(chunks[0]['embedding'], [0.0, 1.0])
+        assert np.allclose(chunks[1]['embedding'], [0.6, 0.8])
+        assert chunks[0]['keywords'] == ['puntero', 'almacena', 'direcciones']
+        # Fila sin normalizer_version: se normaliza y se tokeniza al cargar
+        assert chunks[1]['text_full'] == normalize_text('La me moria dinámica')
+        assert chunks[1]['keywords']
+        assert chunks[0]['similarity'] == pytest.approx(0.9)
+
+    def test_params_are_json_serializable(self):
+        params = match_chunks_params("m1", np.ones(384, dtype=np.float32), 15)
+
+        assert len(params['query_embedding']) == 384
+        assert params['match_count'] == 15
+        json.dumps(params)
+
+
+class TestHybridParams:
+
+    def test_lexical_query_joins_unique_keywords(self):
+        query = lexical_query("¿Qué es un puntero? Un puntero guarda memoria -dirección \"x\"")
+
+        assert query.split(' or ') == list(dict.fromkeys(query.split(' or ')))
+        assert 'puntero' in query.split(' or ')
+        assert '"' not in query and '-' not in query
+
+    def test_params_use_validator_weights(self, offline_validator):
+        params = hybrid_match_params("m1", np.ones(384, dtype=np.float32),
+                                     "punteros y memoria", 15, offline_validator.weights)
+
+        assert params['lexical_weight'] == offline_validator.weights['bm25']
+        assert params['vector_weight'] == offline_validator.weights['cosine']
+        assert params['candidate_count'] >= 15
+        assert params['exact_scan_threshold'] == RETRIEVAL_EXACT_SCAN_THRESHOLD
+        json.dumps(params)
+
+    def test_query_text_selects_hybrid_rpc(self, offline_chunks_punteros):
+        client = FakeRpcClient(offline_chunks_punteros)
+        query = np.asarray(offline_chunks_punteros[0]['embedding'], dtype=np.float32)
+        chunks = fetch_top_chunks(client, "m1", query, 1, normalize_text,
+                                  query_text="¿Qué es un puntero?", weights={'bm25': 0.05, 'cosine': 0.8})
+
+        assert client.calls[0][0] == HYBRID_MATCH_FUNCTION
+        assert len(chunks) == 1
+
+
+class TestValidateWithRetriever:
+
+    def test_same_result_as_local_prefilter(self, offline_validator, offline_chunks_punteros):
+        question = "¿Qué es un puntero?"
+        answer = "Una variable que almacena la dirección de memoria de otra variable"
+        client = FakeRpcClient(offline_chunks_punteros)
+
+        local = offline_validator.validate_answer(question, answer, offline_chunks_punteros)
+        remote = offline_validator.validate_with_retriever(
+            question, answer,
+            retrieve=lambda emb, k: fetch_top_chunks(client, "m1", emb, k, normalize_text),
+            total_chunks=len(offline_chunks_punteros)
+        )
+
+        assert remote['best_chunk']['chunk_id'] == local['best_chunk']['chunk_id']
+        assert remote['score_raw'] == pytest.approx(local['score_raw'], abs=1e-4)
+        assert remote['prefilter_info']['prefilter_method'] == 'pgvector'
+        assert remote['prefilter_info']['total_chunks'] == len(offline_chunks_punteros)
+        assert client.calls[0][1]['match_count'] == offline_validator.prefilter_top_k
+
+    def test_empty_retrieval_is_error(self, offline_validator):
+        result = offline_validator.validate_with_retriever(
+            "¿Qué es un puntero?",
+            "Una variable que almacena la dirección de memoria",
+            retrieve=lambda emb, k: []
+        )
+
+        assert result['category'] == 'error'
+
+    def test_split_steps_match_validate_with_retriever(self, offline_validator, offline_chunks_punteros):
+        question = "¿Qué es un puntero?"
+        answer = "Una variable que almacena la dirección de memoria de otra variable"
+        client = FakeRpcClient(offline_chunks_punteros)
+
+        combined = offline_validator.validate_with_retriever(
+            question, answer,
+            retrieve=lambda emb, k: fetch_top_chunks(client, "m1", emb, k, normalize_text),
+            total_chunks=len(offline_chunks_punteros)
+        )
+
+        # Mismos pasos que validate_answer en main.py (pool cpu / io / cpu)
+        context = offline_validator.build_scoring_context(question, answer)
+        retrieved = fetch_top_chunks(client, "m1", context.query_embedding.astype(np.float32),
+                                     offline_validator.prefilter_top_k, normalize_text)
+        split = offline_validator.score_retrieved(question, answer, context, retrieved,
+                                                  total_chunks=len(offline_chunks_punteros))
+
+        assert split['top_3_scores'] == combined['top_3_scores']
+        assert split['prefilter_info'] == combined['prefilter_info']
+
+    def test_short_answer_skips_retrieval(self, offline_validator):
+        assert offline_validator.answer_length_error("corta")['category'] == 'error'
+        assert offline_validator.answer_length_error("Una respuesta suficiente") is None
@@ -0,0 +1,69 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+TEST_TEXT_NORMALIZER.PY - Pruebas del Normalizador de Texto
+═══════════════════════════════════════════════════════════════════════════════
+
+Verifica:
+1. El motor precompilado produce EXACTAMENTE la misma salida que el
+   normalizador original (los embeddings guardados dependen de ello)
+2. Heurística needs_ocr_repair y fast path (opcional)
+═══════════════════════════════════════════════════════════════════════════════
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# Agregar backend al path
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from text_normalizer import normalize_text, needs_ocr_repair
+from benchmark_normalizer import normalize_text_legacy, simulate_ocr_damage
+
+SAMPLE_MATERIAL = BACKEND_DIR.parent / "data" / "materials" / "sample_material.txt"
+
+
+class TestCompiledNormalizer:
+
+    @pytest.mark.parametrize("text", [
+        "La fo to sín te sis es un pro ce so bi o ló gi co",
+        "Las plantas trans- forman la luz solar en ener- gía química",
+        "Hola , ¿cómo estás ? Bien .",
+        "¿Henriet te? La c ondesa env ió el din ero p or corr eo cada a ño.",
+        "Esteesun texto conlas palabras delobrero pegadas sobrela mesa",
+        "5casasin ñandúdel ÜBER àla 12ab (  x ) « hola »",
+        "",
+    ])
+    def test_same_output_as_legacy(self, text):
+        """TEST: Salida idéntica al normalizador original en casos conocidos"""
+        assert normalize_text(text, fast_path=False) == normalize_text_legacy(text)
+
+    def test_same_output_on_materials(self, material_punteros, material_collar_reina):
+        """TEST: Salida idéntica en materiales de prueba (limpios y con errores OCR)"""
+        texts = [material_punteros, material_collar_reina]
+        if SAMPLE_MATERIAL.exists():
+            texts.append(SAMPLE_MATERIAL.read_text(encoding='utf-8'))
+
+        for text in texts:
+            for variant in (text, simulate_ocr_damage(text)):
+                assert normalize_text(variant, fast_path=False) == normalize_text_legacy(variant)
+
+
+class TestFastPath:
+
+    def test_detects_ocr_fragments(self):
+        assert needs_ocr_repair("La fo to sín te sis es un proceso")
+        assert needs_ocr_repair("guar darlo en su estuche de cuer o rojo con las armas del Car denal")
+        assert needs_ocr_repair("Esteesun texto conPalabrasPegadas")
+
+    def test_clean_text_skips_repair(self):
+        text = "Un puntero es una variable que almacena la dirección de memoria de otra variable."
+
+        assert not needs_ocr_repair(text)
+        assert normalize_text(text, fast_path=True) == text
+
+    def test_fast_path_still_cleans_spacing(self):
+        """TEST: Con fast path la limpieza general (fase 4) se aplica siempre"""
+        assert normalize_text("El   libro  tiene  espacios .", fast_path=True) == "El libro tiene espacios."
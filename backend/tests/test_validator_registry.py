@@ -0,0 +1,170 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+TEST_VALIDATOR_REGISTRY.PY - Pruebas del Registro de Validadores Compartidos
+═══════════════════════════════════════════════════════════════════════════════
+
+Verifica:
+1. Una sola instancia de HybridValidator/SemanticValidator por configuración
+   (el modelo se carga una vez aunque varios hilos lo pidan a la vez)
+2. Validaciones concurrentes con la instancia compartida = validación aislada
+3. Recarga en caliente de umbrales/pesos (archivo JSON y overrides)
+4. Configuración inválida: error y se conservan los validadores actuales
+5. Patrones de tipo de pregunta precompilados = búsqueda por subcadenas
+═══════════════════════════════════════════════════════════════════════════════
+"""
+
+import json
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+# Agregar backend al path
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from validator_registry import ValidatorRegistry, load_validator_config
+
+
+class CountingLoader:
+    """model_loader que cuenta cuántas veces se pidió el modelo"""
+
+    def __init__(self, model):
+        self.model = model
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.calls += 1
+        return self.model
+
+
+class TestSharedInstances:
+
+    def test_same_instance_per_configuration(self, hashing_encoder):
+        loader = CountingLoader(hashing_encoder)
+        registry = ValidatorRegistry(loader, config_path='')
+
+        assert registry.hybrid() is registry.hybrid()
+        assert registry.semantic() is registry.semantic()
+        assert registry.hybrid().model is hashing_encoder
+        assert loader.calls == 1
+        assert registry.generation == 1
+
+    def test_concurrent_first_access_builds_once(self, hashing_encoder):
+        loader = CountingLoader(hashing_encoder)
+        registry = ValidatorRegistry(loader, config_path='')
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            validators = list(pool.map(lambda _: registry.hybrid(), range(32)))
+
+        assert all(v is validators[0] for v in validators)
+        assert loader.calls == 1
+
+    def test_concurrent_validations_match_isolated(self, hashing_encoder, offline_chunks_punteros,
+                                                   preguntas_prueba):
+        from hybrid_validator import HybridValidator
+
+        shared = ValidatorRegistry(CountingLoader(hashing_encoder), config_path='').hybrid()
+        cases = [(p["pregunta"], p[clave]) for p in preguntas_prueba
+                 for clave in ("respuesta_correcta", "respuesta_parcial", "respuesta_incorrecta")] * 4
+
+        expected = [HybridValidator(hashing_encoder).validate_answer(q, a, offline_chunks_punteros)
+                    for q, a in cases]
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda c: shared.validate_answer(c[0], c[1], offline_chunks_punteros), cases))
+
+        for result, reference in zip(results, expected):
+            assert result.get('top_3_scores') == reference.get('top_3_scores')
+            assert result['confidence'] == reference['confidence']
+
+
+class TestHotReload:
+
+    def test_reload_with_overrides_publishes_new_instance(self, hashing_encoder):
+        registry = ValidatorRegistry(CountingLoader(hashing_encoder), config_path='')
+        before = registry.hybrid()
+
+        info = registry.reload({'hybrid': {'thresholds': {'excelente': 0.80}, 'weights': {'bm25': 0.10}}})
+        after = registry.hybrid()
+
+        assert after is not before
+        assert after.thresholds['excelente'] == 0.80
+        assert after.thresholds['bueno'] == 0.70  # el resto queda por defecto
+        assert after.weights['bm25'] == 0.10
+        # La instancia anterior no se modifica (requests en curso)
+        assert before.thresholds['excelente'] == 0.85
+        assert info['generation'] == registry.generation == 2
+
+    def test_reload_reads_config_file(self, hashing_encoder, tmp_path):
+        config_path = tmp_path / "validators.json"
+        config_path.write_text(json.dumps({'semantic': {'threshold_good': 0.65}}), encoding='utf-8')
+        registry = ValidatorRegistry(CountingLoader(hashing_encoder), config_path=str(config_path))
+
+        assert registry.semantic().thresholds['BUENO'] == 0.65
+
+        config_path.write_text(json.dumps({'hybrid': {'prefilter_top_k': 5}}), encoding='utf-8')
+        registry.reload()
+
+        assert registry.hybrid().prefilter_top_k == 5
+        assert registry.semantic().thresholds['BUENO'] == 0.7
+
+    def test_reload_without_overrides_returns_to_file(self, hashing_encoder):
+        registry = ValidatorRegistry(CountingLoader(hashing_encoder), config_path='')
+        registry.reload({'hybrid': {'thresholds': {'excelente': 0.80}}})
+        registry.reload()
+
+        assert registry.hybrid().thresholds['excelente'] == 0.85
+
+    @pytest.mark.parametrize('overrides', [
+        {'hybrid': {'thresholds': {'perfecto': 0.95}}},
+        {'hybrid': {'temperatura': 1}},
+        {'otro': {}},
+        {'semantic': {'threshold_great': 0.9}},
+        {'hybrid': {'weights': {'bm25': -0.1}}},
+        {'hybrid': {'weights': {'cosine': float('nan')}}},
+        {'hybrid': {'thresholds': {'excelente': float('inf')}}},
+        {'hybrid': {'thresholds': {'bueno': -0.5}}},
+        {'hybrid': {'weights': {'coverage': 'alto'}}},
+        {'semantic': {'threshold_good': -0.7}},
+    ])
+    def test_invalid_config_keeps_current_validators(self, hashing_encoder, overrides):
+        registry = ValidatorRegistry(CountingLoader(hashing_encoder), config_path='')
+        hybrid, semantic = registry.hybrid(), registry.semantic()
+
+        with pytest.raises(ValueError):
+            registry.reload(overrides)
+
+        assert registry.hybrid() is hybrid
+        assert registry.semantic() is semantic
+        assert registry.generation == 1
+
+    def test_missing_config_file_uses_defaults(self, tmp_path):
+        config = load_validator_config(str(tmp_path / "no_existe.json"))
+
+        assert config['hybrid']['thresholds']['excelente'] == 0.85
+        assert config['hybrid']['prefilter_top_k'] == 15
+
+
+class TestPrecompiledPatterns:
+
+    def test_question_regexes_match_substring_search(self):
+        from hybrid_validator import (INFERENTIAL_QUESTION_KEYWORDS, INFERENTIAL_QUESTION_REGEX,
+                                      LITERAL_QUESTION_PATTERNS, LITERAL_QUESTION_REGEX,
+                                      REASONING_QUESTION_PATTERNS, REASONING_QUESTION_REGEX)
+
+        questions = [
+            "¿Por qué Henriette recibía dinero?", "¿Qué hizo la condesa con el collar?",
+            "¿Qué es un puntero?", "¿Cuántos años tenía?", "¿Qué papel cumple el conde?",
+            "¿para que sirve el operador &?", "Explique la aritmética de punteros",
+            "¿qué significa desreferenciar?", "¿Cómo se relaciona malloc con free?", "",
+        ]
+        for question in questions:
+            lower = question.lower()
+            for patterns, regex in ((REASONING_QUESTION_PATTERNS, REASONING_QUESTION_REGEX),
+                                    (LITERAL_QUESTION_PATTERNS, LITERAL_QUESTION_REGEX),
+                                    (INFERENTIAL_QUESTION_KEYWORDS, INFERENTIAL_QUESTION_REGEX)):
+                assert bool(regex.search(lower)) == any(p in lower for p in patterns)
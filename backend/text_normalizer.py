@@ -16,11 +16,171 @@ Fecha: 17 de noviembre de 2025
 Proyecto: Recuiva - Active Recall con IA
 """
 
+import os
 import re
 from typing import List, Union
 
 
-def normalize_text(text: str) -> str:
+# ═══════════════════════════════════════════════════════════════════════════
+# PATRONES PRECOMPILADOS
+# ═══════════════════════════════════════════════════════════════════════════
+# normalize_text se llama por cada chunk al subir, al validar y dentro del
+# chunking. Compilar los ~60 patrones una sola vez (en vez de formatear y
+# buscar en la caché de `re` en cada llamada) y cortar los bucles apenas el
+# texto deja de cambiar reduce el costo por chunk sin cambiar el resultado.
+#
+# NOTA: El ORDEN de las sustituciones importa (cada una ve el resultado de
+# la anterior), por eso se mantienen como lista ordenada y no se combinan
+# en una sola alternancia.
+#
+# Los patrones del tipo "(\w{3,})..." sin ancla al inicio se intentaban en
+# CADA posición dentro de una palabra (costo cuadrático por palabra). Como
+# la coincidencia más a la izquierda siempre empieza al inicio de la racha
+# de letras, el lookbehind "(?<!...)" da exactamente las mismas
+# coincidencias probando solo una vez por palabra.
+
+# FASE 1: Patrones específicos de errores OCR
+_PHASE1_PATTERNS = [
+    # "Henriet te" → "Henriette" (palabra larga + fragmento de 1-3 letras)
+    (re.compile(r'(?<!\w)(\w{4,})\s+([a-záéíóúñ]{1,3})\b', re.IGNORECASE), r'\1\2'),
+    # "consuf amilia" → "consufamilia" (fragmento corto + palabra larga)
+    (re.compile(r'\b([a-záéíóúñ]{3,6})\s+([a-záéíóúñ]{4,})', re.IGNORECASE), r'\1\2'),
+    # "interr ogó" → "interrogó" (palabra cortada al azar)
+    (re.compile(r'(?<!\w)(\w{3,})\s+([a-záéíóúñ]{2,4})\b', re.IGNORECASE), r'\1\2'),
+    # "V alorbe" → "Valorbe" (mayúscula + espacio + resto)
+    (re.compile(r'\b([A-ZÁÉÍÓÚÑ])\s+([a-záéíóúñ]{3,})'), r'\1\2'),
+    # "¿Henriet te?" → "¿Henriette?" (con signos de puntuación)
+    (re.compile(r'([¿¡])(\w+)\s+(\w{1,3})([?!])'), r'\1\2\3\4'),
+]
+
+# FASE 2: Palabras pegadas
+# "Esteesun" → "Este es un" (mayúscula en medio indica nueva palabra)
+_CAMEL_SPLIT_PATTERN = re.compile(r'([a-záéíóúñ])([A-ZÁÉÍÓÚÑ])')
+
+# "losdemás" → "los demás" / "delobrero" → "del obrero" (artículos pegados)
+COMMON_ARTICLES = ['el', 'la', 'los', 'las', 'un', 'una', 'unos', 'unas', 'al', 'del']
+# "conlas" → "con las", "eneste" → "en este" (preposiciones pegadas)
+COMMON_PREPOSITIONS = ['con', 'en', 'de', 'a', 'por', 'para', 'sin', 'sobre', 'entre', 'hasta', 'desde']
+
+# (palabra, patrón prefijo, patrón sufijo) en el mismo orden que antes
+_GLUED_WORD_PATTERNS = [
+    (
+        word,
+        re.compile(rf'\b({word})([a-záéíóúñ]{{3,}})', re.IGNORECASE),
+        re.compile(rf'(?<![a-záéíóúñ])([a-záéíóúñ]{{3,}})({word})\b', re.IGNORECASE),
+    )
+    for word in COMMON_ARTICLES + COMMON_PREPOSITIONS
+]
+
+# FASE 3: Fragmentación tradicional (sílabas sueltas)
+_SHORT_FRAGMENT_PATTERN = re.compile(r'\b(\w{1,2})\s+(\w{1,2})\b')    # 1-2 letras
+_MEDIUM_FRAGMENT_PATTERN = re.compile(r'\b(\w{2,4})\s+(\w{3,6})\b')   # 2-4 + 3-6 letras
+
+# FASE 4: Limpieza general
+_CLEANUP_PATTERNS = [
+    # Remover guiones de separación de línea (ej: "trans- formación")
+    (re.compile(r'(\w)-\s+(\w)'), r'\1\2'),
+    # Normalizar espacios múltiples a un solo espacio
+    (re.compile(r'\s{2,}'), ' '),
+    # Remover espacios antes de puntuación
+    (re.compile(r'\s+([.,;:!?¿¡»)])'), r'\1'),
+    # Agregar espacio después de puntuación si no existe
+    (re.compile(r'([.,;:!?])([A-Za-zÁ-úÑñ¿¡])'), r'\1 \2'),
+    # Espacios después de abrir paréntesis/comillas (quitar)
+    (re.compile(r'([(\[{«"\'¿¡])\s+'), r'\1'),
+]
+
+# ═══════════════════════════════════════════════════════════════════════════
+# FAST PATH (opcional): saltar la reparación OCR en texto limpio
+# ═══════════════════════════════════════════════════════════════════════════
+# Las fases 1-3 NO son inocuas sobre texto limpio (p.ej. "puntero es" →
+# "punteroes"), así que activar el fast path CAMBIA la salida para texto sin
+# errores OCR. Los embeddings ya guardados se calcularon sin él: activarlo
+# solo junto con el re-procesamiento de los materiales.
+NORMALIZER_FAST_PATH = os.getenv('NORMALIZER_FAST_PATH', '0') == '1'
+
+# Versión de la salida de normalize_text. Se guarda con cada chunk
+# (material_embeddings.normalizer_version) y forma parte de la clave de la
+# caché de normalización: si las reglas cambian, se incrementa.
+NORMALIZER_VERSION = "2-fast" if NORMALIZER_FAST_PATH else "2"
+
+# Palabras válidas de 1-3 letras (no cuentan como fragmentos OCR)
+_VALID_SHORT_WORDS = {
+    'a', 'e', 'o', 'u', 'y', 'al', 'da', 'de', 'di', 'do', 'el', 'en', 'es', 'fe', 'ha', 'he',
+    'ir', 'la', 'le', 'lo', 'me', 'mi', 'mí', 'ni', 'no', 'nos', 'os', 'se', 'sé', 'si', 'sí',
+    'su', 'te', 'té', 'ti', 'tu', 'tú', 'un', 'va', 've', 'vi', 'ya', 'yo',
+    'ahí', 'año', 'así', 'aún', 'con', 'cual', 'das', 'del', 'día', 'dió', 'dio', 'dos', 'era',
+    'eso', 'esa', 'ese', 'fin', 'fue', 'gran', 'han', 'has', 'hay', 'hoy', 'las', 'les', 'los',
+    'mal', 'más', 'mas', 'mes', 'mis', 'muy', 'nada', 'por', 'qué', 'que', 'sea', 'ser', 'sin',
+    'son', 'sus', 'tal', 'tan', 'tes', 'tus', 'una', 'uno', 'uso', 'van', 'ver', 'vez', 'vía',
+}
+_ALPHA_TOKEN_PATTERN = re.compile(r'[^\W\d_]+')
+_HYPHEN_BREAK_PATTERN = re.compile(r'\w-\s+\w')
+
+
+def needs_ocr_repair(text: str) -> bool:
+    """
+    Heurística rápida (estilo detect_ocr_errors): ¿el texto tiene errores OCR?
+
+    Considera daño OCR:
+    - Cualquier fragmento de 1-3 letras que no sea una palabra válida
+      (conservador: ante la duda se repara, igual que sin fast path)
+    - Palabras pegadas (minúscula seguida de mayúscula)
+    - Tokens alfabéticos anormalmente largos (> 20 letras)
+
+    Args:
+        text: Texto a analizar
+
+    Returns:
+        bool: True si conviene aplicar las fases de reparación OCR
+    """
+    tokens = _ALPHA_TOKEN_PATTERN.findall(text)
+    if not tokens:
+        return False
+
+    for token in tokens:
+        if len(token) > 20:
+            return True
+        if len(token) <= 3 and token.lower() not in _VALID_SHORT_WORDS:
+            return True
+
+    return _CAMEL_SPLIT_PATTERN.search(text) is not None
+
+
+def _repair_ocr(text: str) -> str:
+    """Fases 1-3: reparación de errores OCR (mismo orden y resultado que antes)"""
+    # FASE 1: Patrones específicos de errores OCR detectados
+    for pattern, replacement in _PHASE1_PATTERNS:
+        text = pattern.sub(replacement, text)
+
+    # FASE 2: Palabras pegadas (sin espacio donde debería haber)
+    text = _CAMEL_SPLIT_PATTERN.sub(r'\1 \2', text)
+
+    # Esta fase solo INSERTA espacios: si la palabra no aparece en el texto
+    # (sin distinguir mayúsculas) ninguno de sus dos patrones puede coincidir
+    lowered = text.lower()
+    for word, prefix_pattern, suffix_pattern in _GLUED_WORD_PATTERNS:
+        if word not in lowered:
+            continue
+        text = prefix_pattern.sub(r'\1 \2', text)
+        text = suffix_pattern.sub(r'\1 \2', text)
+
+    # FASE 3: Fragmentación tradicional (sílabas sueltas)
+    # Bucles de punto fijo: se detienen apenas no hay más reemplazos
+    for _ in range(5):
+        text, replaced = _SHORT_FRAGMENT_PATTERN.subn(r'\1\2', text)
+        if not replaced:
+            break
+
+    for _ in range(3):
+        text, replaced = _MEDIUM_FRAGMENT_PATTERN.subn(r'\1\2', text)
+        if not replaced:
+            break
+
+    return text
+
+
+def normalize_text(text: str, fast_path: bool = None) -> str:
     """
     Normaliza texto para mejorar calidad de embeddings
     
@@ -33,6 +193,9 @@ def normalize_text(text: str) -> str:
     
     Args:
         text: Texto original (puede contener errores OCR)
+        fast_path: Si True, omite la reparación OCR (fases 1-3) cuando
+                   needs_ocr_repair() no detecta errores. Default:
+                   NORMALIZER_FAST_PATH (desactivado)
         
     Returns:
         str: Texto normalizado
@@ -53,78 +216,16 @@ def normalize_text(text: str) -> str:
     if not text or not isinstance(text, str):
         return ""
     
-    # ═══════════════════════════════════════════════════════════════════════
-    # FASE 1: PATRONES ESPECÍFICOS DE ERRORES OCR DETECTADOS
-    # ═══════════════════════════════════════════════════════════════════════
-    
-    # Patrón: "Henriet te" → "Henriette" (palabra + fragmento corto)
-    # Detecta: palabra larga + espacio + 1-3 letras que deberían estar juntas
-    text = re.sub(r'(\w{4,})\s+([a-záéíóúñ]{1,3})\b', r'\1\2', text, flags=re.IGNORECASE)
-    
-    # Patrón: "consuf amilia" → "consufamilia" (fragmento + palabra larga)
-    # Detecta: fragmento corto + espacio + palabra que debería estar junta
-    text = re.sub(r'\b([a-záéíóúñ]{3,6})\s+([a-záéíóúñ]{4,})', r'\1\2', text, flags=re.IGNORECASE)
-    
-    # Patrón: "interr ogó" → "interrogó" (palabra cortada al azar)
-    text = re.sub(r'(\w{3,})\s+([a-záéíóúñ]{2,4})\b', r'\1\2', text, flags=re.IGNORECASE)
-    
-    # Patrón: "V alorbe" → "Valorbe" (mayúscula + espacio + resto)
-    text = re.sub(r'\b([A-ZÁÉÍÓÚÑ])\s+([a-záéíóúñ]{3,})', r'\1\2', text)
-    
-    # Patrón: "¿Henriet te?" → "¿Henriette?" (con signos de puntuación)
-    text = re.sub(r'([¿¡])(\w+)\s+(\w{1,3})([?!])', r'\1\2\3\4', text)
-    
-    # ═══════════════════════════════════════════════════════════════════════
-    # FASE 2: PALABRAS PEGADAS (sin espacio donde debería haber)
-    # ═══════════════════════════════════════════════════════════════════════
-    
-    # Patrón: "Esteesun" → "Este es un" (mayúscula en medio indica nueva palabra)
-    text = re.sub(r'([a-záéíóúñ])([A-ZÁÉÍÓÚÑ])', r'\1 \2', text)
-    
-    # Patrón: "losdemás" → "los demás" (artículos pegados)
-    common_articles = ['el', 'la', 'los', 'las', 'un', 'una', 'unos', 'unas', 'al', 'del']
-    for art in common_articles:
-        # "losdemás" → "los demás"
-        text = re.sub(rf'\b({art})([a-záéíóúñ]{{3,}})', rf'\1 \2', text, flags=re.IGNORECASE)
-        # "delobrero" → "del obrero"
-        text = re.sub(rf'([a-záéíóúñ]{{3,}})({art})\b', rf'\1 \2', text, flags=re.IGNORECASE)
+    if fast_path is None:
+        fast_path = NORMALIZER_FAST_PATH
     
-    # Patrón: "conlas" → "con las", "eneste" → "en este" (preposiciones pegadas)
-    common_preps = ['con', 'en', 'de', 'a', 'por', 'para', 'sin', 'sobre', 'entre', 'hasta', 'desde']
-    for prep in common_preps:
-        text = re.sub(rf'\b({prep})([a-záéíóúñ]{{3,}})', rf'\1 \2', text, flags=re.IGNORECASE)
-        text = re.sub(rf'([a-záéíóúñ]{{3,}})({prep})\b', rf'\1 \2', text, flags=re.IGNORECASE)
+    # FASES 1-3: Reparación OCR (se omite en texto limpio si fast_path)
+    if not fast_path or needs_ocr_repair(text):
+        text = _repair_ocr(text)
     
-    # ═══════════════════════════════════════════════════════════════════════
-    # FASE 3: FRAGMENTACIÓN TRADICIONAL (sílabas sueltas)
-    # ═══════════════════════════════════════════════════════════════════════
-    
-    # Fragmentos muy cortos (1-2 letras)
-    for _ in range(5):
-        text = re.sub(r'\b(\w{1,2})\s+(\w{1,2})\b', r'\1\2', text)
-    
-    # Fragmentos medianos (2-4 letras + 3-6 letras)
-    for _ in range(3):
-        text = re.sub(r'\b(\w{2,4})\s+(\w{3,6})\b', r'\1\2', text)
-    
-    # ═══════════════════════════════════════════════════════════════════════
-    # FASE 4: LIMPIEZA GENERAL
-    # ═══════════════════════════════════════════════════════════════════════
-    
-    # Remover guiones de separación de línea (ej: "trans- formación")
-    text = re.sub(r'(\w)-\s+(\w)', r'\1\2', text)
-    
-    # Normalizar espacios múltiples a un solo espacio
-    text = re.sub(r'\s{2,}', ' ', text)
-    
-    # Remover espacios antes de puntuación
-    text = re.sub(r'\s+([.,;:!?¿¡»)])', r'\1', text)
-    
-    # Agregar espacio después de puntuación si no existe
-    text = re.sub(r'([.,;:!?])([A-Za-zÁ-úÑñ¿¡])', r'\1 \2', text)
-    
-    # Espacios después de abrir paréntesis/comillas (quitar)
-    text = re.sub(r'([(\[{«"\'¿¡])\s+', r'\1', text)
+    # FASE 4: Limpieza general
+    for pattern, replacement in _CLEANUP_PATTERNS:
+        text = pattern.sub(replacement, text)
     
     # Trimear y retornar
     return text.strip()
@@ -0,0 +1,237 @@
+"""
+Registro de validadores compartidos por todo el proceso
+
+/api/validate-answer creaba un HybridValidator nuevo en CADA request (y
+validate-by-topic un SemanticValidator): copia de stopwords, diccionarios
+de umbrales y pesos, etc. Nada sobrevivía entre llamadas.
+
+Ahora el registro construye UNA instancia de cada validador por
+configuración y la comparte entre requests y entre los hilos del pool cpu:
+- Los validadores no guardan estado por request (HybridValidator lo deja
+  en ScoringContext), así que una instancia se usa desde varios hilos
+- Patrones de pregunta, lexicones de contradicciones y features de chunk
+  se compilan al importar sus módulos (hybrid_validator,
+  contradiction_detector, chunk_features)
+- La instancia publicada no se modifica: reload() construye validadores
+  NUEVOS y reemplaza la referencia. Un request en curso termina con el
+  validador que ya tenía
+
+Configuración (se lee al construir y en cada reload):
+- Variables de entorno SIMILARITY_THRESHOLD_* (SemanticValidator, igual
+  que antes en main.py)
+- Archivo JSON opcional VALIDATOR_CONFIG_PATH:
+    {
+        "hybrid": {"thresholds": {"excelente": 0.85, ...},
+                   "weights": {"bm25": 0.05, "cosine": 0.80, "coverage": 0.15},
+                   "prefilter_top_k": 15, "prune_candidates": true},
+        "semantic": {"threshold_excellent": 0.9, "threshold_good": 0.7,
+                     "threshold_acceptable": 0.5, "min_response_length": 15}
+    }
+- Overrides pasados a reload() (POST /api/validators/reload), encima del
+  archivo; un reload sin overrides vuelve a la configuración del archivo
+
+Autor: Abel Jesús Moya Acosta
+Fecha: 17 de noviembre de 2025
+"""
+
+import copy
+import json
+import math
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from hybrid_validator import HybridValidator
+from semantic_validator import SemanticValidator
+
+# Configuración (variables de entorno)
+VALIDATOR_CONFIG_PATH = os.getenv('VALIDATOR_CONFIG_PATH', '')
+
+# Claves aceptadas en cada sección de la configuración
+HYBRID_CONFIG_KEYS = ('thresholds', 'weights', 'prefilter_top_k', 'prune_candidates')
+SEMANTIC_CONFIG_KEYS = ('threshold_excellent', 'threshold_good', 'threshold_acceptable', 'min_response_length')
+SEMANTIC_THRESHOLD_KEYS = ('threshold_excellent', 'threshold_good', 'threshold_acceptable')
+
+
+def default_validator_config() -> Dict[str, Dict[str, Any]]:
+    """Configuración por defecto (constantes de HybridValidator + SIMILARITY_THRESHOLD_*)"""
+    return {
+        'hybrid': {
+            'thresholds': dict(HybridValidator.DEFAULT_THRESHOLDS),
+            'weights': dict(HybridValidator.DEFAULT_WEIGHTS),
+            'prefilter_top_k': HybridValidator.DEFAULT_PREFILTER_TOP_K,
+            'prune_candidates': True
+        },
+        'semantic': {
+            'threshold_excellent': float(os.getenv('SIMILARITY_THRESHOLD_EXCELLENT', '0.9')),
+            'threshold_good': float(os.getenv('SIMILARITY_THRESHOLD_GOOD', '0.7')),
+            'threshold_acceptable': float(os.getenv('SIMILARITY_THRESHOLD_ACCEPTABLE', '0.5')),
+            'min_response_length': 15
+        }
+    }
+
+
+def merge_validator_config(base: Dict[str, Dict[str, Any]],
+                           overrides: Optional[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Aplica overrides sobre una configuración (sin modificar base)
+
+    Los diccionarios thresholds/weights se combinan clave a clave; una
+    sección o clave desconocida, o un umbral/peso no finito o negativo,
+    lanza ValueError.
+    """
+    merged = copy.deepcopy(base)
+    allowed = {'hybrid': HYBRID_CONFIG_KEYS, 'semantic': SEMANTIC_CONFIG_KEYS}
+
+    for section, values in (overrides or {}).items():
+        if section not in allowed:
+            raise ValueError(f"Sección de configuración desconocida: '{section}' (válidas: hybrid, semantic)")
+        if not isinstance(values, dict):
+            raise ValueError(f"La sección '{section}' debe ser un objeto")
+        for key, value in values.items():
+            if key not in allowed[section]:
+                raise ValueError(f"{section}: clave desconocida '{key}' (válidas: {', '.join(allowed[section])})")
+            if isinstance(value, dict) and isinstance(merged[section].get(key), dict):
+                merged[section][key].update(value)
+            else:
+                merged[section][key] = value
+
+    for name in ('thresholds', 'weights'):
+        values = merged['hybrid'][name]
+        if not isinstance(values, dict):
+            raise ValueError(f"hybrid: '{name}' debe ser un objeto")
+        for key, value in values.items():
+            _check_non_negative(f"hybrid.{name}", key, value)
+    for key in SEMANTIC_THRESHOLD_KEYS:
+        _check_non_negative('semantic', key, merged['semantic'][key])
+    return merged
+
+
+def _check_non_negative(section: str, key: str, value: Any):
+    """Umbrales y pesos: número finito >= 0 (si no, ValueError)"""
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value) or value < 0:
+        raise ValueError(f"{section}: '{key}' debe ser un número finito >= 0 (recibido {value!r})")
+
+
+def load_validator_config(config_path: Optional[str] = None,
+                          overrides: Optional[Dict[str, Any]] = None) -> Dict[str, Dict[str, Any]]:
+    """Defaults + archivo JSON (si existe) + overrides"""
+    config = default_validator_config()
+    if config_path:
+        path = Path(config_path)
+        if path.exists():
+            with open(path, 'r', encoding='utf-8') as f:
+                config = merge_validator_config(config, json.load(f))
+        else:
+            print(f"⚠️ VALIDATOR_CONFIG_PATH no existe ({path}), usando configuración por defecto")
+    return merge_validator_config(config, overrides)
+
+
+class ValidatorRegistry:
+    """
+    Validadores compartidos (uno por configuración) con recarga en caliente
+
+    Uso:
+        registry = ValidatorRegistry(model_manager.handle)
+        validator = registry.hybrid()   # misma instancia en cada request
+        registry.reload({'hybrid': {'thresholds': {'excelente': 0.80}}})
+    """
+
+    def __init__(self, model_loader: Callable[[], Any],
+                 config_path: Optional[str] = VALIDATOR_CONFIG_PATH):
+        """
+        Args:
+            model_loader: Devuelve el modelo de embeddings, o un delegado con .encode
+                          (model_manager.handle, que no retiene el modelo);
+                          se llama al construir cada HybridValidator
+            config_path: Archivo JSON de configuración ('' = solo defaults)
+        """
+        self._model_loader = model_loader
+        self.config_path = config_path
+        self._lock = threading.Lock()
+        self._config: Optional[Dict[str, Dict[str, Any]]] = None
+        self._hybrid: Optional[HybridValidator] = None
+        self._semantic: Optional[SemanticValidator] = None
+        self.generation = 0
+        self.loaded_at: Optional[float] = None
+
+    def hybrid(self) -> HybridValidator:
+        """HybridValidator compartido (se construye en la primera llamada)"""
+        validator = self._hybrid
+        if validator is None:
+            validator = self._ensure_built()
+        return validator
+
+    def semantic(self) -> SemanticValidator:
+        """SemanticValidator compartido (no necesita el modelo)"""
+        validator = self._semantic
+        if validator is None:
+            with self._lock:
+                if self._semantic is None:
+                    if self._config is None:
+                        self._config = load_validator_config(self.config_path)
+                    self._semantic = self._build_semantic(self._config)
+            validator = self._semantic
+        return validator
+
+    def _ensure_built(self) -> HybridValidator:
+        """Primera construcción (doble verificación: un solo hilo carga el modelo)"""
+        with self._lock:
+            if self._hybrid is None:
+                config = self._config or load_validator_config(self.config_path)
+                self._publish(config, self._build_hybrid(config),
+                              self._semantic or self._build_semantic(config))
+            return self._hybrid
+
+    def _build_hybrid(self, config: Dict[str, Dict[str, Any]]) -> HybridValidator:
+        settings = config['hybrid']
+        return HybridValidator(
+            self._model_loader(),
+            prefilter_top_k=settings['prefilter_top_k'],
+            prune_candidates=bool(settings['prune_candidates']),
+            thresholds=settings['thresholds'],
+            weights=settings['weights']
+        )
+
+    @staticmethod
+    def _build_semantic(config: Dict[str, Dict[str, Any]]) -> SemanticValidator:
+        return SemanticValidator(**config['semantic'])
+
+    def _publish(self, config, hybrid: HybridValidator, semantic: SemanticValidator):
+        """Reemplaza las referencias (los validadores anteriores siguen válidos para quien los tenga)"""
+        self._config = config
+        self._hybrid = hybrid
+        self._semantic = semantic
+        self.generation += 1
+        self.loaded_at = time.time()
+
+    def reload(self, overrides: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Recarga en caliente: vuelve a leer la configuración y publica validadores nuevos
+
+        Si la configuración es inválida (ValueError) o no se puede leer, se
+        mantienen los validadores actuales y se propaga el error.
+
+        Returns:
+            dict: describe() con la configuración ya aplicada
+        """
+        config = load_validator_config(self.config_path, overrides)
+        hybrid = self._build_hybrid(config)
+        semantic = self._build_semantic(config)
+        with self._lock:
+            self._publish(config, hybrid, semantic)
+        print(f"🔄 Validadores recargados (generación {self.generation}): "
+              f"umbrales={config['hybrid']['thresholds']} pesos={config['hybrid']['weights']}")
+        return self.describe()
+
+    def describe(self) -> Dict[str, Any]:
+        """Estado del registro (para /api/validators/reload y /api/health)"""
+        return {
+            'generation': self.generation,
+            'loaded': self._hybrid is not None,
+            'loaded_at': self.loaded_at,
+            'config_path': self.config_path or None,
+            'config': copy.deepcopy(self._config)
+        }
@@ -0,0 +1,209 @@
+-- ============================================================
+-- MIGRACIÓN: Features de chunk precalculadas
+-- ============================================================
+-- Ejecutar en Supabase SQL Editor (después de add_hybrid_search.sql)
+-- Fecha: Noviembre 2025
+--
+-- El backend calcula UNA vez al guardar cada chunk los datos que solo
+-- dependen de su texto (backend/chunk_features.py): reasoning score
+-- (diálogo + verbos de razonamiento), número de palabras y números
+-- mencionados. HybridValidator los lee en vez de recalcularlos para cada
+-- chunk candidato en cada validación.
+--
+-- Las RPC de recuperación cambian su tipo de retorno (nueva columna
+-- features): Postgres no permite CREATE OR REPLACE con otro RETURNS TABLE,
+-- por eso se eliminan y se vuelven a crear.
+-- ============================================================
+
+-- {"version": 1, "reasoning_score": 0.42, "dialogue_ratio": 0.5,
+--  "reasoning_ratio": 0.3, "word_count": 180, "numbers": ["1848", "500"]}
+-- NULL en filas anteriores: el backend las calcula al cargar el material
+ALTER TABLE public.material_embeddings
+ADD COLUMN IF NOT EXISTS features JSONB;
+
+DROP FUNCTION IF EXISTS match_material_chunks(vector, UUID, INT, INT);
+DROP FUNCTION IF EXISTS hybrid_match_material_chunks(vector, TEXT, UUID, INT, FLOAT, FLOAT, INT, INT);
+
+-- Top-K de un material con texto, vector, keywords y features para re-scoring
+CREATE OR REPLACE FUNCTION match_material_chunks(
+    query_embedding vector(384),
+    target_material_id UUID,
+    match_count INT DEFAULT 15,
+    exact_scan_threshold INT DEFAULT 20000
+)
+RETURNS TABLE (
+    chunk_index INTEGER,
+    chunk_text TEXT,
+    embedding vector(384),
+    keywords JSONB,
+    features JSONB,
+    normalizer_version TEXT,
+    similarity FLOAT
+) AS $$
+DECLARE
+    material_chunks INT;
+BEGIN
+    SELECT COALESCE(m.total_chunks, 0) INTO material_chunks
+    FROM materials m
+    WHERE m.id = target_material_id;
+
+    IF COALESCE(material_chunks, 0) <= exact_scan_threshold THEN
+        -- Escaneo exacto: el CTE materializado impide usar el índice HNSW
+        RETURN QUERY
+        WITH material_rows AS MATERIALIZED (
+            SELECT me.chunk_index, me.chunk_text, me.embedding, me.keywords, me.features, me.normalizer_version
+            FROM material_embeddings me
+            WHERE me.material_id = target_material_id
+        )
+        SELECT
+            mr.chunk_index,
+            mr.chunk_text,
+            mr.embedding,
+            mr.keywords,
+            mr.features,
+            mr.normalizer_version,
+            1 - (mr.embedding <=> query_embedding) AS similarity
+        FROM material_rows mr
+        ORDER BY mr.embedding <=> query_embedding
+        LIMIT match_count;
+    ELSE
+        -- HNSW: ef_search >= K y búsqueda iterativa hasta llenar el filtro
+        PERFORM set_config('hnsw.ef_search', GREATEST(match_count * 4, 40)::TEXT, true);
+        BEGIN
+            PERFORM set_config('hnsw.iterative_scan', 'relaxed_order', true);
+        EXCEPTION WHEN OTHERS THEN
+            NULL;  -- pgvector < 0.8: sin búsqueda iterativa
+        END;
+
+        RETURN QUERY
+        SELECT
+            me.chunk_index,
+            me.chunk_text,
+            me.embedding,
+            me.keywords,
+            me.features,
+            me.normalizer_version,
+            1 - (me.embedding <=> query_embedding) AS similarity
+        FROM material_embeddings me
+        WHERE me.material_id = target_material_id
+        ORDER BY me.embedding <=> query_embedding
+        LIMIT match_count;
+    END IF;
+END;
+$$ LANGUAGE plpgsql VOLATILE;
+
+-- Candidatos rankeados por lexical_weight * ts_rank_cd + vector_weight * coseno
+CREATE OR REPLACE FUNCTION hybrid_match_material_chunks(
+    query_embedding vector(384),
+    query_text TEXT,
+    target_material_id UUID,
+    match_count INT DEFAULT 15,
+    lexical_weight FLOAT DEFAULT 0.05,
+    vector_weight FLOAT DEFAULT 0.80,
+    candidate_count INT DEFAULT 100,
+    exact_scan_threshold INT DEFAULT 20000
+)
+RETURNS TABLE (
+    chunk_index INTEGER,
+    chunk_text TEXT,
+    embedding vector(384),
+    keywords JSONB,
+    features JSONB,
+    normalizer_version TEXT,
+    lexical_score FLOAT,
+    similarity FLOAT,
+    hybrid_score FLOAT
+) AS $$
+DECLARE
+    text_query tsquery := websearch_to_tsquery('spanish', COALESCE(query_text, ''));
+    weight_total FLOAT := GREATEST(COALESCE(lexical_weight, 0) + COALESCE(vector_weight, 0), 1e-9);
+    material_chunks INT;
+    vector_ids UUID[];
+BEGIN
+    SELECT COALESCE(m.total_chunks, 0) INTO material_chunks
+    FROM materials m
+    WHERE m.id = target_material_id;
+
+    -- Candidatos vectoriales: misma estrategia que match_material_chunks
+    IF COALESCE(material_chunks, 0) <= exact_scan_threshold THEN
+        -- Escaneo exacto: el CTE materializado impide usar el índice HNSW
+        WITH material_rows AS MATERIALIZED (
+            SELECT me.id, me.embedding
+            FROM material_embeddings me
+            WHERE me.material_id = target_material_id
+        )
+        SELECT array_agg(c.id) INTO vector_ids
+        FROM (
+            SELECT mr.id
+            FROM material_rows mr
+            ORDER BY mr.embedding <=> query_embedding
+            LIMIT candidate_count
+        ) c;
+    ELSE
+        -- HNSW: ef_search >= candidate_count (máximo 1000) y búsqueda
+        -- iterativa hasta llenar el filtro por material_id
+        PERFORM set_config('hnsw.ef_search', LEAST(GREATEST(candidate_count * 4, 40), 1000)::TEXT, true);
+        BEGIN
+            PERFORM set_config('hnsw.iterative_scan', 'relaxed_order', true);
+        EXCEPTION WHEN OTHERS THEN
+            NULL;  -- pgvector < 0.8: sin búsqueda iterativa
+        END;
+
+        SELECT array_agg(c.id) INTO vector_ids
+        FROM (
+            SELECT me.id
+            FROM material_embeddings me
+            WHERE me.material_id = target_material_id
+            ORDER BY me.embedding <=> query_embedding
+            LIMIT candidate_count
+        ) c;
+    END IF;
+
+    RETURN QUERY
+    WITH lexical_candidates AS (
+        SELECT me.id
+        FROM material_embeddings me
+        WHERE me.material_id = target_material_id
+          AND me.chunk_tsv @@ text_query
+        -- Normalización 32: rank / (rank + 1), en [0, 1)
+        ORDER BY ts_rank_cd(me.chunk_tsv, text_query, 32) DESC
+        LIMIT candidate_count
+    ),
+    scored AS (
+        SELECT
+            me.chunk_index,
+            me.chunk_text,
+            me.embedding,
+            me.keywords,
+            me.features,
+            me.normalizer_version,
+            ts_rank_cd(me.chunk_tsv, text_query, 32)::FLOAT AS lexical_score,
+            (1 - (me.embedding <=> query_embedding))::FLOAT AS similarity
+        FROM material_embeddings me
+        WHERE me.id = ANY(COALESCE(vector_ids, '{}'))
+           OR me.id IN (SELECT lc.id FROM lexical_candidates lc)
+    )
+    SELECT
+        s.chunk_index,
+        s.chunk_text,
+        s.embedding,
+        s.keywords,
+        s.features,
+        s.normalizer_version,
+        s.lexical_score,
+        s.similarity,
+        (lexical_weight * s.lexical_score + vector_weight * s.similarity) / weight_total AS hybrid_score
+    FROM scored s
+    ORDER BY 9 DESC  -- hybrid_score (el nombre choca con la columna de salida)
+    LIMIT match_count;
+END;
+$$ LANGUAGE plpgsql VOLATILE;
+
+-- ============================================================
+-- VERIFICAR CAMBIOS
+-- ============================================================
+-- SELECT chunk_index, features->>'reasoning_score' AS reasoning_score
+-- FROM material_embeddings
+-- WHERE features IS NOT NULL
+-- LIMIT 5;
+-- ============================================================
@@ -0,0 +1,163 @@
+-- ============================================================
+-- MIGRACIÓN: Búsqueda híbrida léxica + vectorial en una sola RPC
+-- ============================================================
+-- Ejecutar en Supabase SQL Editor (después de add_topk_retrieval.sql)
+-- Fecha: Noviembre 2025
+--
+-- Con RETRIEVAL_MODE=hybrid el backend (backend/retrieval.py) envía el
+-- embedding de la consulta y sus keywords a hybrid_match_material_chunks.
+-- La RPC combina ts_rank_cd (índice GIN sobre chunk_tsv) y la distancia
+-- coseno con los pesos de HybridValidator.weights y devuelve solo los K
+-- candidatos finales: Python re-puntúa ese puñado con cobertura y
+-- detección de contradicciones, sin recibir los textos del material.
+-- ============================================================
+
+-- Texto del chunk indexado para búsqueda léxica (configuración 'spanish')
+ALTER TABLE public.material_embeddings
+ADD COLUMN IF NOT EXISTS chunk_tsv tsvector;
+
+-- Mantener chunk_tsv al insertar o al cambiar chunk_text (re-procesar)
+CREATE OR REPLACE FUNCTION update_chunk_tsv()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.chunk_tsv = to_tsvector('spanish', COALESCE(NEW.chunk_text, ''));
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS update_material_embeddings_chunk_tsv ON public.material_embeddings;
+CREATE TRIGGER update_material_embeddings_chunk_tsv
+    BEFORE INSERT OR UPDATE OF chunk_text ON public.material_embeddings
+    FOR EACH ROW
+    EXECUTE FUNCTION update_chunk_tsv();
+
+-- Rellenar filas existentes
+UPDATE public.material_embeddings
+SET chunk_tsv = to_tsvector('spanish', COALESCE(chunk_text, ''))
+WHERE chunk_tsv IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_embeddings_chunk_tsv
+ON public.material_embeddings
+USING gin (chunk_tsv);
+
+-- Candidatos rankeados por lexical_weight * ts_rank_cd + vector_weight * coseno
+-- query_text: keywords separadas por ' or ' (websearch_to_tsquery nunca
+-- falla por sintaxis). Se puntúa la unión de los candidate_count mejores
+-- por vector y los candidate_count mejores por texto. Los candidatos por
+-- vector siguen la estrategia de match_material_chunks: escaneo exacto hasta
+-- exact_scan_threshold chunks, HNSW con búsqueda iterativa en materiales
+-- grandes (el filtro por material_id no deja el top-K vacío).
+CREATE OR REPLACE FUNCTION hybrid_match_material_chunks(
+    query_embedding vector(384),
+    query_text TEXT,
+    target_material_id UUID,
+    match_count INT DEFAULT 15,
+    lexical_weight FLOAT DEFAULT 0.05,
+    vector_weight FLOAT DEFAULT 0.80,
+    candidate_count INT DEFAULT 100,
+    exact_scan_threshold INT DEFAULT 20000
+)
+RETURNS TABLE (
+    chunk_index INTEGER,
+    chunk_text TEXT,
+    embedding vector(384),
+    keywords JSONB,
+    normalizer_version TEXT,
+    lexical_score FLOAT,
+    similarity FLOAT,
+    hybrid_score FLOAT
+) AS $$
+DECLARE
+    text_query tsquery := websearch_to_tsquery('spanish', COALESCE(query_text, ''));
+    weight_total FLOAT := GREATEST(COALESCE(lexical_weight, 0) + COALESCE(vector_weight, 0), 1e-9);
+    material_chunks INT;
+    vector_ids UUID[];
+BEGIN
+    SELECT COALESCE(m.total_chunks, 0) INTO material_chunks
+    FROM materials m
+    WHERE m.id = target_material_id;
+
+    -- Candidatos vectoriales: misma estrategia que match_material_chunks
+    IF COALESCE(material_chunks, 0) <= exact_scan_threshold THEN
+        -- Escaneo exacto: el CTE materializado impide usar el índice HNSW
+        WITH material_rows AS MATERIALIZED (
+            SELECT me.id, me.embedding
+            FROM material_embeddings me
+            WHERE me.material_id = target_material_id
+        )
+        SELECT array_agg(c.id) INTO vector_ids
+        FROM (
+            SELECT mr.id
+            FROM material_rows mr
+            ORDER BY mr.embedding <=> query_embedding
+            LIMIT candidate_count
+        ) c;
+    ELSE
+        -- HNSW: ef_search >= candidate_count (máximo 1000) y búsqueda
+        -- iterativa hasta llenar el filtro por material_id
+        PERFORM set_config('hnsw.ef_search', LEAST(GREATEST(candidate_count * 4, 40), 1000)::TEXT, true);
+        BEGIN
+            PERFORM set_config('hnsw.iterative_scan', 'relaxed_order', true);
+        EXCEPTION WHEN OTHERS THEN
+            NULL;  -- pgvector < 0.8: sin búsqueda iterativa
+        END;
+
+        SELECT array_agg(c.id) INTO vector_ids
+        FROM (
+            SELECT me.id
+            FROM material_embeddings me
+            WHERE me.material_id = target_material_id
+            ORDER BY me.embedding <=> query_embedding
+            LIMIT candidate_count
+        ) c;
+    END IF;
+
+    RETURN QUERY
+    WITH lexical_candidates AS (
+        SELECT me.id
+        FROM material_embeddings me
+        WHERE me.material_id = target_material_id
+          AND me.chunk_tsv @@ text_query
+        -- Normalización 32: rank / (rank + 1), en [0, 1)
+        ORDER BY ts_rank_cd(me.chunk_tsv, text_query, 32) DESC
+        LIMIT candidate_count
+    ),
+    scored AS (
+        SELECT
+            me.chunk_index,
+            me.chunk_text,
+            me.embedding,
+            me.keywords,
+            me.normalizer_version,
+            ts_rank_cd(me.chunk_tsv, text_query, 32)::FLOAT AS lexical_score,
+            (1 - (me.embedding <=> query_embedding))::FLOAT AS similarity
+        FROM material_embeddings me
+        WHERE me.id = ANY(COALESCE(vector_ids, '{}'))
+           OR me.id IN (SELECT lc.id FROM lexical_candidates lc)
+    )
+    SELECT
+        s.chunk_index,
+        s.chunk_text,
+        s.embedding,
+        s.keywords,
+        s.normalizer_version,
+        s.lexical_score,
+        s.similarity,
+        (lexical_weight * s.lexical_score + vector_weight * s.similarity) / weight_total AS hybrid_score
+    FROM scored s
+    ORDER BY 8 DESC  -- hybrid_score (el nombre choca con la columna de salida)
+    LIMIT match_count;
+END;
+$$ LANGUAGE plpgsql VOLATILE;
+
+-- ============================================================
+-- VERIFICAR CAMBIOS
+-- ============================================================
+-- SELECT chunk_index, round(lexical_score::numeric, 3), round(hybrid_score::numeric, 3)
+-- FROM hybrid_match_material_chunks(
+--     (SELECT embedding FROM material_embeddings LIMIT 1),
+--     'puntero or memoria',
+--     (SELECT material_id FROM material_embeddings LIMIT 1),
+--     5
+-- );
+-- ============================================================
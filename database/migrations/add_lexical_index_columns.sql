@@ -0,0 +1,25 @@
+-- ============================================================
+-- MIGRACIÓN: Keywords persistidas por chunk
+-- ============================================================
+-- Ejecutar en Supabase SQL Editor
+-- Fecha: Noviembre 2025
+--
+-- El backend calcula las keywords de cada chunk UNA vez al subir/re-procesar
+-- el material (backend/lexical_index.py), en vez de re-tokenizar el texto en
+-- cada validación. Las estadísticas BM25 no se persisten: HybridValidator
+-- calcula BM25 sobre los candidatos de cada validación.
+-- ============================================================
+
+-- Keywords tokenizadas de cada chunk (lista JSON de strings, con repeticiones)
+ALTER TABLE public.material_embeddings
+ADD COLUMN IF NOT EXISTS keywords JSONB;
+
+-- ============================================================
+-- VERIFICAR CAMBIOS
+-- ============================================================
+-- SELECT column_name, data_type
+-- FROM information_schema.columns
+-- WHERE table_schema = 'public'
+--   AND table_name = 'material_embeddings'
+--   AND column_name = 'keywords';
+-- ============================================================
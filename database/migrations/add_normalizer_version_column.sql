@@ -0,0 +1,23 @@
+-- ============================================================
+-- MIGRACIÓN: Versión del normalizador por chunk
+-- ============================================================
+-- Ejecutar en Supabase SQL Editor
+-- Fecha: Noviembre 2025
+--
+-- El backend guarda chunk_text YA normalizado (text_normalizer.py) y
+-- vectoriza ese mismo texto. normalizer_version marca esas filas para que
+-- validate_answer no vuelva a normalizarlas al cargarlas.
+-- Las filas existentes quedan en NULL y se normalizan al cargar (como antes).
+-- ============================================================
+
+-- Versión de normalize_text usada al guardar (p.ej. '2' o '2-fast')
+ALTER TABLE public.material_embeddings
+ADD COLUMN IF NOT EXISTS normalizer_version TEXT;
+
+-- ============================================================
+-- VERIFICAR CAMBIOS
+-- ============================================================
+-- SELECT normalizer_version, COUNT(*)
+-- FROM public.material_embeddings
+-- GROUP BY normalizer_version;
+-- ============================================================
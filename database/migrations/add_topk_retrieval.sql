@@ -0,0 +1,106 @@
+-- ============================================================
+-- MIGRACIÓN: Recuperación top-K en el servidor (pgvector)
+-- ============================================================
+-- Ejecutar en Supabase SQL Editor
+-- Fecha: Noviembre 2025
+--
+-- validate_answer descargaba TODAS las filas del material (texto + vector
+-- serializado) y hacía el pre-filtrado en Python. Con RETRIEVAL_MODE=pgvector
+-- el backend (backend/retrieval.py) envía el embedding de la consulta a
+-- match_material_chunks y recibe solo los K candidatos con texto y vector.
+--
+-- Estrategia por material:
+-- - Hasta exact_scan_threshold chunks: escaneo exacto de las filas del
+--   material (idx_embeddings_material_id + ordenamiento). Resultado exacto
+--   y sin el riesgo de que el filtro deje menos de K filas del índice.
+-- - Materiales más grandes: índice HNSW con búsqueda iterativa
+--   (pgvector >= 0.8) para que el filtro por material_id no vacíe el top-K.
+-- ============================================================
+
+-- Índice HNSW (mejor recall que ivfflat y no requiere re-entrenar listas)
+CREATE INDEX IF NOT EXISTS idx_embeddings_hnsw
+ON public.material_embeddings
+USING hnsw (embedding vector_cosine_ops)
+WITH (m = 16, ef_construction = 64);
+
+-- ivfflat queda redundante (el planner usaría cualquiera de los dos)
+DROP INDEX IF EXISTS public.idx_embeddings_ivfflat;
+
+-- Top-K de un material con texto, vector y keywords para re-scoring
+CREATE OR REPLACE FUNCTION match_material_chunks(
+    query_embedding vector(384),
+    target_material_id UUID,
+    match_count INT DEFAULT 15,
+    exact_scan_threshold INT DEFAULT 20000
+)
+RETURNS TABLE (
+    chunk_index INTEGER,
+    chunk_text TEXT,
+    embedding vector(384),
+    keywords JSONB,
+    normalizer_version TEXT,
+    similarity FLOAT
+) AS $$
+DECLARE
+    material_chunks INT;
+BEGIN
+    SELECT COALESCE(m.total_chunks, 0) INTO material_chunks
+    FROM materials m
+    WHERE m.id = target_material_id;
+
+    IF COALESCE(material_chunks, 0) <= exact_scan_threshold THEN
+        -- Escaneo exacto: el CTE materializado impide usar el índice HNSW
+        RETURN QUERY
+        WITH material_rows AS MATERIALIZED (
+            SELECT me.chunk_index, me.chunk_text, me.embedding, me.keywords, me.normalizer_version
+            FROM material_embeddings me
+            WHERE me.material_id = target_material_id
+        )
+        SELECT
+            mr.chunk_index,
+            mr.chunk_text,
+            mr.embedding,
+            mr.keywords,
+            mr.normalizer_version,
+            1 - (mr.embedding <=> query_embedding) AS similarity
+        FROM material_rows mr
+        ORDER BY mr.embedding <=> query_embedding
+        LIMIT match_count;
+    ELSE
+        -- HNSW: ef_search >= K y búsqueda iterativa hasta llenar el filtro
+        PERFORM set_config('hnsw.ef_search', GREATEST(match_count * 4, 40)::TEXT, true);
+        BEGIN
+            PERFORM set_config('hnsw.iterative_scan', 'relaxed_order', true);
+        EXCEPTION WHEN OTHERS THEN
+            NULL;  -- pgvector < 0.8: sin búsqueda iterativa
+        END;
+
+        RETURN QUERY
+        SELECT
+            me.chunk_index,
+            me.chunk_text,
+            me.embedding,
+            me.keywords,
+            me.normalizer_version,
+            1 - (me.embedding <=> query_embedding) AS similarity
+        FROM material_embeddings me
+        WHERE me.material_id = target_material_id
+        ORDER BY me.embedding <=> query_embedding
+        LIMIT match_count;
+    END IF;
+END;
+$$ LANGUAGE plpgsql VOLATILE;
+
+-- ============================================================
+-- VERIFICAR CAMBIOS
+-- ============================================================
+-- SELECT indexname FROM pg_indexes
+-- WHERE tablename = 'material_embeddings';
+--
+-- SELECT chunk_index, round(similarity::numeric, 3)
+-- FROM match_material_chunks(
+--     (SELECT embedding FROM material_embeddings LIMIT 1),
+--     (SELECT material_id FROM material_embeddings LIMIT 1),
+--     5
+-- );
+-- ============================================================
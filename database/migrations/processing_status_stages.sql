@@ -0,0 +1,23 @@
+-- ============================================================
+-- MIGRACIÓN: processing_status por etapa de ingesta
+-- ============================================================
+-- Ejecutar en Supabase SQL Editor
+-- Fecha: Noviembre 2025
+--
+-- Los materiales ahora se procesan en segundo plano (backend/ingestion_jobs.py).
+-- El registro en materials se crea al empezar el trabajo y processing_status
+-- sigue cada etapa del pipeline:
+--   pending → extracting → chunking → embedding → storing → completed
+--   (o 'failed' si una etapa falla; el trabajo puede reintentarse)
+-- ============================================================
+
+COMMENT ON COLUMN public.materials.processing_status IS
+    'Etapa de ingesta: pending, extracting, chunking, embedding, storing, completed, failed';
+
+-- ============================================================
+-- VERIFICAR CAMBIOS
+-- ============================================================
+-- SELECT processing_status, COUNT(*)
+-- FROM public.materials
+-- GROUP BY processing_status;
+-- ============================================================
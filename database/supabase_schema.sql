@@ -41,7 +41,7 @@ CREATE TABLE IF NOT EXISTS public.materials (
     estimated_pages INTEGER DEFAULT 0, -- ✅ NUEVO: Páginas estimadas
     storage_bucket TEXT DEFAULT 'materials', -- ✅ NUEVO: Bucket de Supabase Storage
     storage_path TEXT, -- ✅ NUEVO: Ruta en Storage
-    processing_status TEXT DEFAULT 'pending', -- ✅ NUEVO: 'pending', 'processing', 'completed', 'failed'
+    processing_status TEXT DEFAULT 'pending', -- 'pending', 'extracting', 'chunking', 'embedding', 'storing', 'completed', 'failed'
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
@@ -60,18 +60,26 @@ CREATE TABLE IF NOT EXISTS public.material_embeddings (
     chunk_index INTEGER NOT NULL,
     chunk_text TEXT NOT NULL,
     embedding vector(384) NOT NULL, -- Dimensión del modelo all-MiniLM-L6-v2
+    keywords JSONB, -- Keywords tokenizadas del chunk (índice léxico, ver lexical_index.py)
+    features JSONB, -- Features precalculadas del chunk (reasoning score, palabras, números; ver chunk_features.py)
+    normalizer_version TEXT, -- Versión de normalize_text con que se guardó chunk_text (NULL = sin normalizar)
+    chunk_tsv tsvector, -- to_tsvector('spanish', chunk_text), mantenido por trigger (búsqueda híbrida)
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     UNIQUE(material_id, chunk_index) -- Un chunk por material
 );
 
 -- Índice para búsquedas vectoriales (similitud coseno)
--- OPTIMIZADO: lists calculado para 100-1000 chunks por material
--- Fórmula: lists = sqrt(total_rows_esperados)
--- Para 100 materiales × 300 chunks = 30,000 embeddings → sqrt(30000) ≈ 173
-CREATE INDEX IF NOT EXISTS idx_embeddings_ivfflat
-ON public.material_embeddings 
-USING ivfflat (embedding vector_cosine_ops)
-WITH (lists = 100);  -- Ajustar a 200-300 si tienes > 50,000 embeddings
+-- HNSW: mejor recall que ivfflat y no requiere re-entrenar listas al crecer
+-- (lo usa match_material_chunks en materiales grandes)
+CREATE INDEX IF NOT EXISTS idx_embeddings_hnsw
+ON public.material_embeddings
+USING hnsw (embedding vector_cosine_ops)
+WITH (m = 16, ef_construction = 64);
+
+-- Índice para búsqueda léxica (ts_rank_cd en hybrid_match_material_chunks)
+CREATE INDEX IF NOT EXISTS idx_embeddings_chunk_tsv
+ON public.material_embeddings
+USING gin (chunk_tsv);
 
 -- Índice para búsquedas por material
 CREATE INDEX IF NOT EXISTS idx_embeddings_material_id ON public.material_embeddings(material_id);
@@ -381,6 +389,187 @@ BEGIN
 END;
 $$ LANGUAGE plpgsql STABLE;
 
+-- Top-K de un material con texto, vector, keywords y features para re-scoring
+-- (backend/retrieval.py, RETRIEVAL_MODE=pgvector). Escaneo exacto en
+-- materiales pequeños, HNSW con búsqueda iterativa en los grandes
+CREATE OR REPLACE FUNCTION match_material_chunks(
+    query_embedding vector(384),
+    target_material_id UUID,
+    match_count INT DEFAULT 15,
+    exact_scan_threshold INT DEFAULT 20000
+)
+RETURNS TABLE (
+    chunk_index INTEGER,
+    chunk_text TEXT,
+    embedding vector(384),
+    keywords JSONB,
+    features JSONB,
+    normalizer_version TEXT,
+    similarity FLOAT
+) AS $$
+DECLARE
+    material_chunks INT;
+BEGIN
+    SELECT COALESCE(m.total_chunks, 0) INTO material_chunks
+    FROM materials m
+    WHERE m.id = target_material_id;
+
+    IF COALESCE(material_chunks, 0) <= exact_scan_threshold THEN
+        -- Escaneo exacto: el CTE materializado impide usar el índice HNSW
+        RETURN QUERY
+        WITH material_rows AS MATERIALIZED (
+            SELECT me.chunk_index, me.chunk_text, me.embedding, me.keywords, me.features, me.normalizer_version
+            FROM material_embeddings me
+            WHERE me.material_id = target_material_id
+        )
+        SELECT
+            mr.chunk_index,
+            mr.chunk_text,
+            mr.embedding,
+            mr.keywords,
+            mr.features,
+            mr.normalizer_version,
+            1 - (mr.embedding <=> query_embedding) AS similarity
+        FROM material_rows mr
+        ORDER BY mr.embedding <=> query_embedding
+        LIMIT match_count;
+    ELSE
+        -- HNSW: ef_search >= K y búsqueda iterativa hasta llenar el filtro
+        PERFORM set_config('hnsw.ef_search', GREATEST(match_count * 4, 40)::TEXT, true);
+        BEGIN
+            PERFORM set_config('hnsw.iterative_scan', 'relaxed_order', true);
+        EXCEPTION WHEN OTHERS THEN
+            NULL;  -- pgvector < 0.8: sin búsqueda iterativa
+        END;
+
+        RETURN QUERY
+        SELECT
+            me.chunk_index,
+            me.chunk_text,
+            me.embedding,
+            me.keywords,
+            me.features,
+            me.normalizer_version,
+            1 - (me.embedding <=> query_embedding) AS similarity
+        FROM material_embeddings me
+        WHERE me.material_id = target_material_id
+        ORDER BY me.embedding <=> query_embedding
+        LIMIT match_count;
+    END IF;
+END;
+$$ LANGUAGE plpgsql VOLATILE;
+
+-- Candidatos rankeados por lexical_weight * ts_rank_cd + vector_weight * coseno
+-- query_text: keywords separadas por ' or ' (websearch_to_tsquery nunca
+-- falla por sintaxis). Se puntúa la unión de los candidate_count mejores
+-- por vector (escaneo exacto o HNSW iterativo, como match_material_chunks)
+-- y los candidate_count mejores por texto.
+CREATE OR REPLACE FUNCTION hybrid_match_material_chunks(
+    query_embedding vector(384),
+    query_text TEXT,
+    target_material_id UUID,
+    match_count INT DEFAULT 15,
+    lexical_weight FLOAT DEFAULT 0.05,
+    vector_weight FLOAT DEFAULT 0.80,
+    candidate_count INT DEFAULT 100,
+    exact_scan_threshold INT DEFAULT 20000
+)
+RETURNS TABLE (
+    chunk_index INTEGER,
+    chunk_text TEXT,
+    embedding vector(384),
+    keywords JSONB,
+    features JSONB,
+    normalizer_version TEXT,
+    lexical_score FLOAT,
+    similarity FLOAT,
+    hybrid_score FLOAT
+) AS $$
+DECLARE
+    text_query tsquery := websearch_to_tsquery('spanish', COALESCE(query_text, ''));
+    weight_total FLOAT := GREATEST(COALESCE(lexical_weight, 0) + COALESCE(vector_weight, 0), 1e-9);
+    material_chunks INT;
+    vector_ids UUID[];
+BEGIN
+    SELECT COALESCE(m.total_chunks, 0) INTO material_chunks
+    FROM materials m
+    WHERE m.id = target_material_id;
+
+    -- Candidatos vectoriales: misma estrategia que match_material_chunks
+    IF COALESCE(material_chunks, 0) <= exact_scan_threshold THEN
+        -- Escaneo exacto: el CTE materializado impide usar el índice HNSW
+        WITH material_rows AS MATERIALIZED (
+            SELECT me.id, me.embedding
+            FROM material_embeddings me
+            WHERE me.material_id = target_material_id
+        )
+        SELECT array_agg(c.id) INTO vector_ids
+        FROM (
+            SELECT mr.id
+            FROM material_rows mr
+            ORDER BY mr.embedding <=> query_embedding
+            LIMIT candidate_count
+        ) c;
+    ELSE
+        -- HNSW: ef_search >= candidate_count (máximo 1000) y búsqueda
+        -- iterativa hasta llenar el filtro por material_id
+        PERFORM set_config('hnsw.ef_search', LEAST(GREATEST(candidate_count * 4, 40), 1000)::TEXT, true);
+        BEGIN
+            PERFORM set_config('hnsw.iterative_scan', 'relaxed_order', true);
+        EXCEPTION WHEN OTHERS THEN
+            NULL;  -- pgvector < 0.8: sin búsqueda iterativa
+        END;
+
+        SELECT array_agg(c.id) INTO vector_ids
+        FROM (
+            SELECT me.id
+            FROM material_embeddings me
+            WHERE me.material_id = target_material_id
+            ORDER BY me.embedding <=> query_embedding
+            LIMIT candidate_count
+        ) c;
+    END IF;
+
+    RETURN QUERY
+    WITH lexical_candidates AS (
+        SELECT me.id
+        FROM material_embeddings me
+        WHERE me.material_id = target_material_id
+          AND me.chunk_tsv @@ text_query
+        -- Normalización 32: rank / (rank + 1), en [0, 1)
+        ORDER BY ts_rank_cd(me.chunk_tsv, text_query, 32) DESC
+        LIMIT candidate_count
+    ),
+    scored AS (
+        SELECT
+            me.chunk_index,
+            me.chunk_text,
+            me.embedding,
+            me.keywords,
+            me.features,
+            me.normalizer_version,
+            ts_rank_cd(me.chunk_tsv, text_query, 32)::FLOAT AS lexical_score,
+            (1 - (me.embedding <=> query_embedding))::FLOAT AS similarity
+        FROM material_embeddings me
+        WHERE me.id = ANY(COALESCE(vector_ids, '{}'))
+           OR me.id IN (SELECT lc.id FROM lexical_candidates lc)
+    )
+    SELECT
+        s.chunk_index,
+        s.chunk_text,
+        s.embedding,
+        s.keywords,
+        s.features,
+        s.normalizer_version,
+        s.lexical_score,
+        s.similarity,
+        (lexical_weight * s.lexical_score + vector_weight * s.similarity) / weight_total AS hybrid_score
+    FROM scored s
+    ORDER BY 9 DESC  -- hybrid_score (el nombre choca con la columna de salida)
+    LIMIT match_count;
+END;
+$$ LANGUAGE plpgsql VOLATILE;
+
 -- Función para actualizar updated_at automáticamente
 CREATE OR REPLACE FUNCTION update_updated_at_column()
 RETURNS TRIGGER AS $$
@@ -408,6 +597,20 @@ CREATE TRIGGER update_user_profiles_updated_at
     FOR EACH ROW 
     EXECUTE FUNCTION update_updated_at_column();
 
+-- Trigger para chunk_tsv (búsqueda híbrida): se recalcula al insertar o re-procesar
+CREATE OR REPLACE FUNCTION update_chunk_tsv()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.chunk_tsv = to_tsvector('spanish', COALESCE(NEW.chunk_text, ''));
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER update_material_embeddings_chunk_tsv
+    BEFORE INSERT OR UPDATE OF chunk_text ON public.material_embeddings
+    FOR EACH ROW
+    EXECUTE FUNCTION update_chunk_tsv();
+
 -- Trigger para spaced_repetition
 CREATE TRIGGER update_spaced_repetition_updated_at 
     BEFORE UPDATE ON public.spaced_repetition 
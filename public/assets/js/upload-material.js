@@ -89,6 +89,18 @@ document.addEventListener('DOMContentLoaded', async () => {
                         eventSource.close();
                         console.log('🔚 Conexión SSE cerrada');
                     }
+                    
+                    // El material se procesa en segundo plano: el resultado llega por SSE
+                    if (data.type === 'complete') {
+                        showSuccess(data.data);
+                        uploadForm.reset();
+                        setTimeout(() => {
+                            showProgress(false);
+                        }, 2000);
+                    } else if (data.type === 'error') {
+                        showError(data.message);
+                        showProgress(false);
+                    }
                 };
                 
                 eventSource.onerror = function(error) {
@@ -97,22 +109,10 @@ document.addEventListener('DOMContentLoaded', async () => {
                 };
 
                 // ✅ Subir material con session_id en header
-                // ✅ Subir material con session_id en header
+                // El backend encola el procesamiento y responde de inmediato;
+                // el progreso y el resultado final llegan por SSE
                 const response = await api.uploadMaterial(file, sessionId);
-                
-                // El progreso se maneja por SSE ahora
-                // (eliminamos las simulaciones de progreso)
-
-                // Mostrar resultado exitoso
-                showSuccess(response);
-
-            // Limpiar formulario
-            uploadForm.reset();
-            
-            // Ocultar progreso después de 2 segundos
-            setTimeout(() => {
-                showProgress(false);
-            }, 2000);
+                console.log('📋 Trabajo de procesamiento encolado:', response.job_id);
 
         } catch (error) {
             console.error('Error al subir material:', error);